@@ -1,7 +1,7 @@
 # articles/admin.py
 from django.contrib import admin
 from django.core.exceptions import FieldDoesNotExist
-from .models import Article  # chỉ import Article của app articles
+from .models import Article, ArticleURLAlias, MediaAsset
 
 def has_field(model, name):
     try:
@@ -53,3 +53,18 @@ class ArticleAdmin(admin.ModelAdmin):
     search_fields = search_fields
     readonly_fields = readonly_fields
     filter_horizontal = filter_horizontal
+    raw_id_fields = ("duplicate_of",)
+
+
+@admin.register(MediaAsset)
+class MediaAssetAdmin(admin.ModelAdmin):
+    list_display = ("path", "size", "content_type", "created_at")
+    search_fields = ("source_url", "sha256", "path")
+    readonly_fields = ("source_url", "sha256", "path", "content_type", "size", "created_at")
+
+
+@admin.register(ArticleURLAlias)
+class ArticleURLAliasAdmin(admin.ModelAdmin):
+    list_display = ("url", "article", "created_at")
+    search_fields = ("url",)
+    raw_id_fields = ("article",)
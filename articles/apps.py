@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ArticlesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "articles"
+
+    def ready(self):
+        from articles import search
+
+        # migration sửa bảng articles_article trên SQLite xoá trigger FTS5 -> tạo lại
+        post_migrate.connect(search.restore_triggers, sender=self)
@@ -0,0 +1,68 @@
+# articles/images.py
+"""
+Ảnh đã mirror khi hiển thị: bản resize (ImageVariant, do crawler.media tạo)
+-> srcset/sizes + width/height cho card và thân bài (articles.render).
+Chỉ đọc DB, 1 query cho cả trang.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+
+@dataclass
+class ResponsiveImage:
+    src: str
+    width: int = 0
+    height: int = 0
+    srcset: str = ""        # JPEG
+    webp_srcset: str = ""
+    variants: list = field(default_factory=list)
+
+
+def storage_path(url: str | None) -> str | None:
+    """`/media/images/...` -> `images/...` (None nếu không phải ảnh trong MEDIA)."""
+    prefix = settings.MEDIA_URL.rstrip("/") + "/"
+    if url and url.startswith(prefix):
+        return url[len(prefix):]
+    return None
+
+
+def responsive_images(paths) -> dict[str, ResponsiveImage]:
+    """{path ảnh gốc: ResponsiveImage} cho ảnh đã có bản resize (ImageVariant), 1 query."""
+    from articles.models import ImageVariant
+
+    by_original: dict[str, list] = {}
+    for v in ImageVariant.objects.filter(original__in=[p for p in paths if p]).order_by("width"):
+        by_original.setdefault(v.original, []).append(v)
+
+    out = {}
+    for path, variants in by_original.items():
+        orig = next((v for v in variants if v.format == "original"), None)
+        if not orig:
+            continue
+        jpeg = [v for v in variants if v.format == "jpeg"]
+        webp = [v for v in variants if v.format == "webp"]
+        src = jpeg[-1] if jpeg else orig
+        out[path] = ResponsiveImage(
+            src=src.url,
+            width=src.width,
+            height=src.height,
+            srcset=", ".join(f"{v.url} {v.width}w" for v in jpeg),
+            webp_srcset=", ".join(f"{v.url} {v.width}w" for v in webp),
+            variants=variants,
+        )
+    return out
+
+
+def attach_card_images(articles, attr: str = "card_image") -> None:
+    """
+    Gắn `ResponsiveImage` (hoặc None) vào từng bài theo main_image_url,
+    1 query cho cả trang.
+    """
+    articles = list(articles)
+    paths = {a.pk: storage_path(a.main_image_url) for a in articles}
+    images = responsive_images(paths.values())
+    for a in articles:
+        setattr(a, attr, images.get(paths[a.pk] or ""))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0003_article_author_article_created_at_article_origin_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaAsset",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source_url", models.URLField(max_length=1000, unique=True)),
+                ("sha256", models.CharField(db_index=True, max_length=64)),
+                ("path", models.CharField(max_length=255)),
+                (
+                    "content_type",
+                    models.CharField(blank=True, default="", max_length=64),
+                ),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
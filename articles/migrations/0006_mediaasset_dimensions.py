@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0005_imagevariant"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediaasset",
+            name="height",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="mediaasset",
+            name="width",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
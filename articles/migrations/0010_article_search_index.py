@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+# DDL chép cứng (không import articles.search): sửa module về sau không đổi migration này
+SQLITE_SCHEMA = (
+    # external content: FTS chỉ lưu index, nội dung đọc từ articles_article
+    "CREATE VIRTUAL TABLE articles_article_fts USING fts5("
+    "search_blob, search_body, content='articles_article', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER articles_article_fts_ai AFTER INSERT ON articles_article BEGIN "
+    "INSERT INTO articles_article_fts(rowid, search_blob, search_body) "
+    "VALUES (new.id, new.search_blob, new.search_body); END",
+    "CREATE TRIGGER articles_article_fts_ad AFTER DELETE ON articles_article BEGIN "
+    "INSERT INTO articles_article_fts(articles_article_fts, rowid, search_blob, search_body) "
+    "VALUES ('delete', old.id, old.search_blob, old.search_body); END",
+    "CREATE TRIGGER articles_article_fts_au AFTER UPDATE OF search_blob, search_body ON articles_article "
+    "WHEN old.search_blob IS NOT new.search_blob OR old.search_body IS NOT new.search_body BEGIN "
+    "INSERT INTO articles_article_fts(articles_article_fts, rowid, search_blob, search_body) "
+    "VALUES ('delete', old.id, old.search_blob, old.search_body); "
+    "INSERT INTO articles_article_fts(rowid, search_blob, search_body) "
+    "VALUES (new.id, new.search_blob, new.search_body); END",
+    "INSERT INTO articles_article_fts(articles_article_fts) VALUES ('rebuild')",
+)
+SQLITE_DROP = (
+    "DROP TRIGGER IF EXISTS articles_article_fts_ai",
+    "DROP TRIGGER IF EXISTS articles_article_fts_ad",
+    "DROP TRIGGER IF EXISTS articles_article_fts_au",
+    "DROP TABLE IF EXISTS articles_article_fts",
+)
+
+POSTGRES_SCHEMA = (
+    "ALTER TABLE articles_article ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple'::regconfig, coalesce(search_blob, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(search_body, '')), 'B')) STORED",
+    "CREATE INDEX articles_search_gin ON articles_article USING GIN (search_vector)",
+)
+POSTGRES_DROP = (
+    "DROP INDEX IF EXISTS articles_search_gin",
+    "ALTER TABLE articles_article DROP COLUMN IF EXISTS search_vector",
+)
+
+
+def _has_fts5(conn):
+    with conn.cursor() as cur:
+        cur.execute("PRAGMA compile_options")
+        return any("FTS5" in row[0] for row in cur.fetchall())
+
+
+def install_index(apps, schema_editor):
+    # SQLite: bảng FTS5 + trigger; Postgres: cột tsvector + GIN; SQLite thiếu FTS5: bỏ qua (icontains).
+    # Bài cũ chưa có search_body: chạy `manage.py reindex_search`.
+    conn = schema_editor.connection
+    if conn.vendor == "sqlite":
+        statements = SQLITE_SCHEMA if _has_fts5(conn) else ()
+    else:
+        statements = POSTGRES_SCHEMA if conn.vendor == "postgresql" else ()
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def uninstall_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}.get(schema_editor.connection.vendor, ())
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0009_article_body_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="search_body",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(install_index, uninstall_index),
+    ]
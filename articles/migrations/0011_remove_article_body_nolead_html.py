@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:01
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0010_article_search_index"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="article",
+            name="body_nolead_html",
+        ),
+    ]
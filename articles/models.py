@@ -1,26 +1,21 @@
 # articles/models.py
 import re
-import unicodedata
 from html import unescape
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.utils.text import slugify
 
+from articles import render, search
+from articles.textnorm import fold
+
 
 # -------- Utils -------------------------------------------------
 def _norm(s: str | None) -> str:
     """
-    Normalize: bỏ dấu, lower, trim. Luôn bắt ngoại lệ để không crash.
+    Normalize: bỏ dấu (cả đ -> d, articles.textnorm), lower, trim.
     """
-    if not s:
-        return ""
-    try:
-        s = unicodedata.normalize("NFKD", s)
-        s = s.encode("ascii", "ignore").decode("utf-8")
-    except Exception:
-        s = s or ""
-    return s.lower().strip()
+    return fold(s).strip()
 
 
 _tag_re = re.compile(r"<[^>]+>")
@@ -29,7 +24,7 @@ _tag_re = re.compile(r"<[^>]+>")
 def _strip_html(html: str) -> str:
     """
     (Giữ lại để dùng nơi khác) Bóc HTML -> text thô.
-    Không dùng cho search_blob theo yêu cầu mới.
+    Dùng cho search_body (text thân bài để tìm kiếm).
     """
     if not html:
         return ""
@@ -60,6 +55,10 @@ class Article(models.Model):
     # Có thể lưu cấu trúc chi tiết (đoạn/ảnh/quote...) nếu crawler sinh ra
     blocks = models.JSONField(blank=True, null=True, default=dict)
 
+    # Biến thể render của content_html (articles/render.py), tính lúc lưu; template in thẳng
+    body_html = models.TextField(blank=True, default="", editable=False)
+    body_version = models.PositiveSmallIntegerField(default=0, editable=False)
+
     # Tác giả khi đăng tay; bài crawl thì để trống
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -77,23 +76,36 @@ class Article(models.Model):
 
     is_visible = models.BooleanField(default=True)
 
-    # DÙNG CHO SEARCH: chỉ chứa title + excerpt đã normalize
+    # DÙNG CHO SEARCH (articles.search): title + excerpt / text thân bài đã bỏ dấu
     search_blob = models.TextField(blank=True, default="")
+    search_body = models.TextField(blank=True, default="", editable=False)
 
     # Liên kết category (từ app sources)
     categories = models.ManyToManyField("sources.Category", related_name="articles", blank=True)
 
+    # Chống tin gần trùng (crawler/neardup.py): chữ ký MinHash, khoá LSH ở ArticleLSHBand.
+    # duplicate_of trỏ về bài gốc của cụm (None = bài gốc / không trùng)
+    minhash = models.BinaryField(blank=True, null=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        "self", related_name="duplicates", blank=True, null=True, on_delete=models.SET_NULL,
+    )
+
     class Meta:
         ordering = ("-published_at", "-id")
         indexes = [
             models.Index(fields=["-published_at"], name="articles_pub_idx"),
             models.Index(fields=["is_visible", "-published_at"], name="articles_vis_pub_idx"),
+            models.Index(fields=["body_version"], name="articles_body_ver_idx"),
         ]
 
     def __str__(self):
         return self.title or self.slug or f"Article#{self.pk}"
 
-    def save(self, *args, **kwargs):
+    def fill_computed_fields(self):
+        """
+        slug / origin / search_blob / search_body tính từ các field khác. save() tự gọi;
+        bulk_create/bulk_update bỏ qua save() nên phải gọi tay (crawler.persist).
+        """
         # slug auto (không ép unique để tránh đổi URL cũ)
         try:
             if not self.slug and self.title:
@@ -105,7 +117,6 @@ class Article(models.Model):
         if self.author_id and self.origin != Article.Origin.USER:
             self.origin = Article.Origin.USER
 
-
         # Nếu là bài người dùng đăng mà chưa có published_at -> gán now
         if self.origin == Article.Origin.USER and not self.published_at:
             try:
@@ -113,13 +124,95 @@ class Article(models.Model):
             except Exception:
                 pass
 
-        # build search_blob: CHỈ title + excerpt (không lấy content_html)
-        try:
-            title_part = self.title or ""
-            excerpt_part = self.excerpt or ""
-            self.search_blob = _norm(f"{title_part} {excerpt_part}")
-        except Exception:
-            if not self.search_blob:
-                self.search_blob = ""
+        self.fill_search_fields()
+
+    def fill_search_fields(self):
+        """search_blob (title + excerpt) / search_body (text thân bài), đã bỏ dấu — nguồn của articles.search."""
+        deferred = self.get_deferred_fields()     # field chưa nạp: không query thêm chỉ để tính lại
+        if not deferred & {"title", "excerpt"}:
+            self.search_blob = _norm(f"{self.title or ''} {self.excerpt or ''}")
+        if "content_html" not in deferred:
+            self.search_body = _norm(_strip_html(self.content_html))[:search.BODY_CHARS]
 
+    @property
+    def detail_html(self) -> str:
+        """Thân bài cho trang chi tiết (đủ nội dung như content_html, thêm width/height/srcset)."""
+        if not self.body_version:
+            return self.content_html      # chưa render (manage.py render_bodies)
+        return self.body_html
+
+    def save(self, *args, **kwargs):
+        self.fill_computed_fields()
+        # biến thể render: chỉ tính lại khi content_html có trong lần ghi này
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or not render.SOURCE_FIELDS.isdisjoint(update_fields):
+            render.fill_bodies([self])
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *render.FIELDS}
         return super().save(*args, **kwargs)
+
+
+class MediaAsset(models.Model):
+    """
+    Ảnh đã mirror về MEDIA, lưu theo nội dung (content-addressed):
+    source URL -> sha256 -> path. Nhiều URL có thể trỏ cùng 1 file.
+    """
+    source_url = models.URLField(max_length=1000, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    path = models.CharField(max_length=255)  # path tương đối trong storage
+    content_type = models.CharField(max_length=64, blank=True, default="")
+    size = models.PositiveIntegerField(default=0)
+    # kích thước thật, đọc từ header file lúc tải (0 = không rõ, vd. SVG)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.path
+
+    @property
+    def url(self) -> str:
+        return settings.MEDIA_URL.rstrip("/") + "/" + self.path
+
+
+class ImageVariant(models.Model):
+    """
+    Bản resize của 1 ảnh trong MEDIA (srcset cho card/lưới bài).
+    `format="original"` lưu kích thước ảnh gốc (path = original).
+    """
+    original = models.CharField(max_length=255, db_index=True)  # path tương đối của ảnh gốc
+    path = models.CharField(max_length=255)
+    format = models.CharField(max_length=16)  # "webp" | "jpeg" | "original"
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["original", "format", "width"], name="imagevariant_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.path} ({self.width}x{self.height})"
+
+    @property
+    def url(self) -> str:
+        return settings.MEDIA_URL.rstrip("/") + "/" + self.path
+
+
+class ArticleURLAlias(models.Model):
+    """Biến thể URL (tracking, AMP, mobile, redirect...) đã gặp của 1 bài."""
+    url = models.URLField(max_length=1000, unique=True)
+    article = models.ForeignKey(Article, related_name="url_aliases", on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.url
+
+
+class ArticleLSHBand(models.Model):
+    """Khoá LSH (band của chữ ký MinHash) -> bài; tra bài gần trùng bằng 1 query IN."""
+    key = models.BigIntegerField(db_index=True)
+    article = models.ForeignKey(Article, related_name="lsh_bands", on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"{self.key} -> {self.article_id}"
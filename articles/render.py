@@ -0,0 +1,134 @@
+# articles/render.py
+"""
+Biến thể render của thân bài, tính 1 lần khi lưu / trích xuất bài: lúc request
+template chỉ in chuỗi đã lưu, không parse HTML.
+
+- `body_html`: content_html + width/height cho ảnh trong MEDIA (trình duyệt giữ
+  chỗ, không nhảy layout) và srcset/sizes khi ảnh đã có bản resize (ImageVariant).
+- `body_version`: RENDER_VERSION của lần render. PENDING = còn ảnh chưa có bản
+  resize, task_make_image_variants render lại khi resize xong; 0 / bản cũ hơn
+  RENDER_VERSION -> `manage.py render_bodies` (backfill).
+
+`fill_bodies(articles)` chỉ gán field (parse bằng crawler.sanitize, 2 query cho
+cả lô), người gọi tự ghi DB.
+"""
+from __future__ import annotations
+
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from articles.images import responsive_images, storage_path
+from crawler import sanitize
+
+RENDER_VERSION = 2
+PENDING = 1
+FIELDS = ("body_html", "body_version")
+SOURCE_FIELDS = frozenset({"content_html"})      # đổi các field này -> render lại
+# .prose nằm trong khung 1100px (padding 24px)
+SIZES = "(min-width:1100px) 1052px, 100vw"
+PENDING_WINDOW = timedelta(days=1)                # quá hạn mà vẫn chưa có bản resize -> thôi chờ
+MATCH_BATCH = 200                                 # số URL ảnh mỗi query refresh_pending
+_NO_VARIANTS = (".svg", ".gif")                   # make_variants bỏ qua svg / gif động
+
+
+def _image_info(paths: set[str]) -> tuple[dict, dict]:
+    """
+    ({path: ResponsiveImage} ảnh đã có bản resize,
+     {path: (width, height)} ảnh còn lại — kích thước đọc lúc mirror, MediaAsset).
+    """
+    from articles.models import MediaAsset
+
+    images = responsive_images(paths)
+    # path CAS = images/ab/cd/<sha256>.<ext> -> tra theo sha256 (có index)
+    missing = {os.path.splitext(os.path.basename(p))[0]: p for p in paths if p not in images}
+    dims = {}
+    if missing:
+        for path, w, h in MediaAsset.objects.filter(sha256__in=list(missing)) \
+                .values_list("path", "width", "height"):
+            if path in paths and w and h:
+                dims[path] = (w, h)
+    return images, dims
+
+
+def _decorate(root, images: dict, dims: dict) -> tuple[bool, bool]:
+    """Gắn width/height/srcset cho ảnh trong MEDIA -> (cây có đổi, còn ảnh chờ bản resize)."""
+    changed = pending = False
+    make_variants = getattr(settings, "MEDIA_MAKE_VARIANTS", True)
+    for img in root.iter("img"):
+        src = img.get("src")
+        path = storage_path(src)
+        if not path:
+            continue
+        info = images.get(path)
+        if info is not None:
+            orig = next(v for v in info.variants if v.format == "original")
+            size = (orig.width, orig.height)
+            if info.srcset and not img.get("srcset"):
+                # ảnh gốc lớn hơn bản resize lớn nhất: thêm vào cho màn hình rộng / HiDPI
+                extra = f", {src} {orig.width}w" if orig.width > info.width else ""
+                img.set("srcset", info.srcset + extra)
+                img.set("sizes", SIZES)
+                changed = True
+        else:
+            size = dims.get(path)
+            if make_variants and not path.lower().endswith(_NO_VARIANTS):
+                pending = True
+        if size and not img.get("width") and not img.get("height"):
+            img.set("width", str(size[0]))
+            img.set("height", str(size[1]))
+            changed = True
+    return changed, pending
+
+
+def fill_bodies(articles) -> None:
+    """Tính body_html / body_version cho các bài (không ghi DB)."""
+    articles = list(articles)
+    parsed = [sanitize.parse(a.content_html) if a.content_html else None for a in articles]
+    paths = {
+        p for cleaned in parsed if cleaned is not None
+        for img in cleaned.root.iter("img") if (p := storage_path(img.get("src")))
+    }
+    images, dims = _image_info(paths) if paths else ({}, {})
+
+    for a, cleaned in zip(articles, parsed):
+        if cleaned is None:
+            a.body_html = ""
+            a.body_version = RENDER_VERSION
+            continue
+        changed, pending = _decorate(cleaned.root, images, dims)
+        # không đổi gì thì giữ nguyên chuỗi gốc (khỏi serialize lại)
+        a.body_html = cleaned.html if changed else a.content_html
+        a.body_version = PENDING if pending else RENDER_VERSION
+
+
+def refresh_pending(paths) -> int:
+    """Render lại bài đang chờ bản resize của các ảnh vừa resize xong; trả về số bài."""
+    from django.utils import timezone
+
+    from articles.models import Article
+
+    prefix = settings.MEDIA_URL.rstrip("/") + "/"
+    urls = [prefix + p for p in paths]
+    if not urls:
+        return 0
+    qs = Article.objects.filter(body_version=PENDING, updated_at__gte=timezone.now() - PENDING_WINDOW)
+    todo = {}
+    # lọc bằng LIKE trong DB (trên các bài PENDING, articles_body_ver_idx), chỉ tải content_html
+    # của bài khớp; LIKE của SQLite không phân biệt hoa/thường -> so lại chính xác.
+    # Chia lô: chuỗi OR dài vượt giới hạn độ sâu biểu thức của SQLite
+    for i in range(0, len(urls), MATCH_BATCH):
+        batch = urls[i:i + MATCH_BATCH]
+        q = Q()
+        for u in batch:
+            q |= Q(content_html__contains=u)
+        for a in qs.filter(q).only("id", "content_html"):
+            if any(u in a.content_html for u in batch):
+                todo[a.pk] = a
+    todo = list(todo.values())
+    if todo:
+        fill_bodies(todo)
+        Article.objects.bulk_update(todo, FIELDS)
+    return len(todo)
@@ -0,0 +1,303 @@
+# articles/search.py
+"""
+Tìm kiếm toàn văn cho Article — 1 API cho Home, Category và trang quản trị.
+
+- Văn bản được bỏ dấu sẵn ở Python lúc lưu (articles.textnorm.fold, cả đ -> d):
+  `search_blob` = title + excerpt, `search_body` = text thân bài (cắt BODY_CHARS).
+  Article.fill_computed_fields() tính cả 2, kể cả đường bulk (crawler.persist).
+- SQLite: bảng FTS5 external-content `articles_article_fts` đọc thẳng 2 cột trên,
+  trigger giữ đồng bộ với mọi kiểu ghi (save, bulk_create/bulk_update, update()).
+  Xếp hạng bm25, search_blob nặng BLOB_WEIGHT lần thân bài.
+- Postgres: cột tsvector GENERATED ... STORED (search_blob trọng số A, thân bài B)
+  + index GIN, xếp hạng ts_rank_cd (Postgres không có bm25).
+- Từ quá phổ biến (khớp gần hết bảng) làm bm25/ts_rank phải chấm mọi bài khớp:
+  chỉ xét RANK_WINDOW bài khớp mới nhất (id lớn nhất) trong số bài qua các
+  filter đã có trên qs (category, origin, …) — số kết quả tối đa cũng là
+  RANK_WINDOW. Truy vấn hẹp hơn cửa sổ không bị ảnh hưởng; filter phải áp
+  trước khi gọi `search`.
+- DB khác / SQLite build không có FTS5: search_blob__icontains từng từ như cũ,
+  không xếp hạng.
+
+`search(qs, q)` lọc + gắn `search_rank` (nhỏ hơn = khớp hơn) rồi sắp theo đó;
+`attach_snippets(objs, q)` gắn `search_title` / `search_snippet` (HTML có <mark>)
+cho các bài của 1 trang kết quả. Schema tạo ở migration 0010; trigger SQLite được tạo
+lại sau mỗi lần migrate (`restore_triggers`, đăng ký ở ArticlesConfig.ready).
+"""
+from __future__ import annotations
+
+import html
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.safestring import mark_safe
+
+from articles.textnorm import fold, tokens
+
+FIELDS = ("search_blob", "search_body")
+BODY_CHARS = 20_000           # thân bài dài hơn chỉ index phần đầu
+BLOB_WEIGHT = 4.0
+MAX_TERMS = 8
+RANK_WINDOW = getattr(settings, "SEARCH_RANK_WINDOW", 20_000)   # 0 = xếp hạng mọi bài khớp
+SNIPPET_CHARS = 220
+
+FTS_TABLE = "articles_article_fts"
+
+SQLITE_TABLE = (
+    # external content: FTS chỉ lưu index, nội dung đọc từ articles_article
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"search_blob, search_body, content='articles_article', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON articles_article BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, search_blob, search_body) "
+        f"VALUES (new.id, new.search_blob, new.search_body); END"
+    ),
+    f"{FTS_TABLE}_ad": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON articles_article BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_blob, search_body) "
+        f"VALUES ('delete', old.id, old.search_blob, old.search_body); END"
+    ),
+    # save() ghi lại mọi cột -> chỉ đụng index khi text đổi thật
+    f"{FTS_TABLE}_au": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_blob, search_body "
+        f"ON articles_article "
+        f"WHEN old.search_blob IS NOT new.search_blob OR old.search_body IS NOT new.search_body BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_blob, search_body) "
+        f"VALUES ('delete', old.id, old.search_blob, old.search_body); "
+        f"INSERT INTO {FTS_TABLE}(rowid, search_blob, search_body) "
+        f"VALUES (new.id, new.search_blob, new.search_body); END"
+    ),
+}
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+POSTGRES_SCHEMA = (
+    "ALTER TABLE articles_article ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple'::regconfig, coalesce(search_blob, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(search_body, '')), 'B')) STORED",
+    "CREATE INDEX articles_search_gin ON articles_article USING GIN (search_vector)",
+)
+
+
+# ---------- schema ----------
+def install(schema_editor) -> None:
+    """
+    Tạo index toàn văn theo schema hiện tại (DB dựng không qua migration, vd bench_search);
+    SQLite thiếu FTS5 thì bỏ qua (dùng icontains). Migration 0010 giữ bản DDL riêng.
+    """
+    conn = schema_editor.connection
+    if conn.vendor == "sqlite":
+        if not _sqlite_has_fts5(conn):
+            return
+        statements = (SQLITE_TABLE, *SQLITE_TRIGGERS.values(), SQLITE_REBUILD)
+    elif conn.vendor == "postgresql":
+        statements = POSTGRES_SCHEMA
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def _sqlite_has_fts5(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("PRAGMA compile_options")
+        return any("FTS5" in row[0] for row in cur.fetchall())
+
+
+def _sqlite_objects(cur) -> set[str]:
+    names = [FTS_TABLE, *SQLITE_TRIGGERS]
+    cur.execute(f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names)
+    return {row[0] for row in cur.fetchall()}
+
+
+def restore_triggers(sender=None, using: str = DEFAULT_DB_ALIAS, **kwargs) -> list[str]:
+    """
+    Handler post_migrate: `_remake_table` của SQLite (AddField/AlterField... về sau trên
+    Article) xoá trigger của bảng -> tạo lại trigger thiếu và 'rebuild' index (bài ghi
+    trong lúc thiếu trigger chưa vào FTS). Trả về tên trigger đã tạo lại.
+    """
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return []
+    with conn.cursor() as cur:
+        present = _sqlite_objects(cur)
+        if FTS_TABLE not in present:
+            return []
+        missing = [name for name in SQLITE_TRIGGERS if name not in present]
+        for name in missing:
+            cur.execute(SQLITE_TRIGGERS[name])
+        if missing:
+            cur.execute(SQLITE_REBUILD)
+    _backends.pop(using, None)
+    return missing
+
+
+# ---------- backend ----------
+_backends: dict[str, str] = {}
+
+
+def backend(alias: str = "default") -> str:
+    """'fts5' | 'postgres' | 'icontains' cho DB alias (nhớ theo process)."""
+    name = _backends.get(alias)
+    if name is None:
+        conn = connections[alias]
+        name = "icontains"
+        if conn.vendor == "postgresql":
+            name = "postgres"
+        elif conn.vendor == "sqlite":
+            # thiếu trigger = index không theo kịp bảng -> không dùng FTS
+            with conn.cursor() as cur:
+                if len(_sqlite_objects(cur)) == 1 + len(SQLITE_TRIGGERS):
+                    name = "fts5"
+        _backends[alias] = name
+    return name
+
+
+def terms(q: str | None) -> list[str]:
+    """Từ khoá đã bỏ dấu: 'Đà Nẵng!' -> ['da', 'nang']."""
+    return list(dict.fromkeys(tokens(q)))[:MAX_TERMS]
+
+
+def _prefix(words, i: int) -> bool:
+    # từ cuối có thể đang gõ dở -> khớp theo tiền tố (trừ từ 1 ký tự); các từ khác khớp nguyên từ
+    return i == len(words) - 1 and len(words[i]) > 1
+
+
+def _fts5_query(words) -> str:
+    return " ".join(f'"{w}"*' if _prefix(words, i) else f'"{w}"' for i, w in enumerate(words))
+
+
+def _tsquery(words) -> str:
+    return " & ".join(f"{w}:*" if _prefix(words, i) else w for i, w in enumerate(words))
+
+
+def _windowed(matched, key: str):
+    """
+    Chỉ giữ RANK_WINDOW bài khớp mới nhất (`key` = id, lớn nhất trước) của chính queryset đã lọc:
+    mốc tính trên cả category/origin/… của người gọi, lọc hẹp không bị cửa sổ của cả bảng làm rỗng.
+    """
+    if not RANK_WINDOW:
+        return matched
+    inner = matched.order_by().extra(order_by=[f"-{key}"]).values("id")[:RANK_WINDOW]
+    sql, params = inner.query.get_compiler(using=matched.db).as_sql()
+    return matched.extra(where=[f"{key} >= (SELECT min(id) FROM ({sql}) w)"], params=list(params))
+
+
+def search(qs, q: str | None, order: bool = True):
+    """
+    Lọc queryset Article theo q (bỏ dấu, mọi từ đều phải có). order=True: sắp
+    theo độ khớp rồi bài mới hơn. q rỗng -> trả nguyên qs.
+    """
+    words = terms(q)
+    if not words:
+        return qs
+    kind = backend(qs.db)
+    if kind == "fts5":
+        expr = _fts5_query(words)
+        # mốc theo rowid của FTS: FTS5 duyệt doclist theo rowid giảm dần (dừng sau RANK_WINDOW bài)
+        # và dùng được `rowid >= mốc` ở truy vấn ngoài
+        qs = _windowed(qs.extra(tables=[FTS_TABLE], params=[expr],
+                                where=[f"{FTS_TABLE}.rowid = articles_article.id", f"{FTS_TABLE} MATCH %s"]),
+                       f"{FTS_TABLE}.rowid")
+        qs = qs.extra(select={"search_rank": f"bm25({FTS_TABLE}, {BLOB_WEIGHT}, 1.0)"})
+    elif kind == "postgres":
+        tsq = _tsquery(words)
+        qs = _windowed(qs.extra(where=["articles_article.search_vector @@ to_tsquery('simple', %s)"],
+                                params=[tsq]),
+                       "articles_article.id")
+        qs = qs.extra(
+            # âm để cùng chiều với bm25 của SQLite (nhỏ hơn = khớp hơn)
+            select={"search_rank": "-ts_rank_cd(articles_article.search_vector, to_tsquery('simple', %s))"},
+            select_params=[tsq],
+        )
+    else:
+        for w in words:
+            qs = qs.filter(search_blob__icontains=w)
+        return qs.order_by("-published_at", "-id") if order else qs
+    return qs.order_by("search_rank", "-published_at", "-id") if order else qs
+
+
+# ---------- đoạn trích ----------
+@lru_cache(maxsize=4096)
+def _fold_char(ch: str) -> str:
+    return fold(ch)
+
+
+def _fold_map(text: str) -> tuple[str, list[int]]:
+    """Bản bỏ dấu của text + vị trí ký tự gốc ứng với từng ký tự đã bỏ dấu."""
+    out, pos = [], []
+    for i, ch in enumerate(text):
+        f = _fold_char(ch)
+        out.append(f)
+        pos.extend([i] * len(f))
+    pos.append(len(text))
+    return "".join(out), pos
+
+
+def _hits(text: str, words) -> list[tuple[int, int]]:
+    folded, pos = _fold_map(text)
+    alts = "|".join(re.escape(w) + ("[a-z0-9]*" if _prefix(words, i) else "(?![a-z0-9])")
+                    for i, w in enumerate(words))
+    pattern = re.compile(rf"(?<![a-z0-9])(?:{alts})")
+    return [(pos[m.start()], pos[m.end()]) for m in pattern.finditer(folded)]
+
+
+def highlight(text: str, words, width: int = 0) -> str | None:
+    """
+    HTML đã escape của text, từ khớp bọc <mark>; width > 0 -> chỉ lấy đoạn quanh
+    chỗ khớp đầu tiên. None nếu không khớp từ nào.
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    hits = _hits(text, words) if words else []
+    if not hits:
+        return None
+    start, end = 0, len(text)
+    if width and len(text) > width:
+        first, last = hits[0]
+        start = max(0, first - width // 4)
+        if start:                                     # cắt ở ranh giới từ
+            start = text.find(" ", start, first) + 1 or start
+        end = min(len(text), start + width)
+        cut = text.rfind(" ", last, end)
+        if end < len(text) and cut > 0:
+            end = cut
+    out, cur = ["…" if start else ""], start
+    for s, e in hits:
+        if s < cur or e > end:
+            continue
+        out += [html.escape(text[cur:s]), "<mark>", html.escape(text[s:e]), "</mark>"]
+        cur = e
+    out += [html.escape(text[cur:end]), "…" if end < len(text) else ""]
+    return "".join(out)
+
+
+def attach_snippets(objs, q: str | None) -> None:
+    """
+    Gắn `search_title` (tiêu đề có <mark>) và `search_snippet` (đoạn excerpt; excerpt
+    không khớp thì đoạn thân bài — 1 query cho cả trang) cho bài của 1 trang kết quả.
+    """
+    from articles.models import Article, _strip_html
+
+    words = terms(q)
+    objs = list(objs)
+    need_body = []
+    for a in objs:
+        a.search_title = a.search_snippet = None
+        if not words:
+            continue
+        title = highlight(a.title, words)
+        a.search_title = mark_safe(title) if title else None
+        snip = highlight(a.excerpt, words, SNIPPET_CHARS)
+        if snip is None:
+            need_body.append(a)
+        a.search_snippet = mark_safe(snip) if snip else None
+    if need_body:
+        bodies = dict(Article.objects.using(need_body[0]._state.db)
+                      .filter(pk__in=[a.pk for a in need_body]).values_list("id", "content_html"))
+        for a in need_body:
+            snip = highlight(_strip_html(bodies.get(a.pk, ""))[:BODY_CHARS], words, SNIPPET_CHARS)
+            a.search_snippet = mark_safe(snip) if snip else None
@@ -1,3 +1,196 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import lxml.html
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from articles import render, search
+from articles.models import Article, ImageVariant, MediaAsset
+
+
+def _article(i, title, **kw):
+    return Article.objects.create(title=title, source_url=f"https://e.vn/tin/{i}.html", **kw)
+
+
+class SearchWindowTests(TestCase):
+    def setUp(self):
+        if search.backend() != "fts5":
+            self.skipTest("SQLite build không có FTS5")
+
+    def test_window_is_taken_after_the_callers_filters(self):
+        # bài user là các bài khớp cũ nhất: cửa sổ của cả bảng (10 bài mới nhất) không chứa bài nào
+        old = [_article(i, f"Bão số {i}", origin=Article.Origin.USER) for i in range(3)]
+        for i in range(3, 20):
+            _article(i, f"Bão số {i}")
+        qs = Article.objects.filter(origin=Article.Origin.USER)
+        with mock.patch.object(search, "RANK_WINDOW", 10):
+            found = set(search.search(qs, "bao").values_list("id", flat=True))
+            everything = search.search(Article.objects.all(), "bao").count()
+        self.assertEqual(found, {a.id for a in old})
+        self.assertEqual(everything, 10)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        if search.backend() != "fts5":
+            self.skipTest("SQLite build không có FTS5")
+
+    def _ids(self, q, qs=None):
+        return list(search.search(qs or Article.objects.all(), q).values_list("id", flat=True))
+
+    def test_folds_diacritics_and_requires_every_term(self):
+        flood = _article(1, "Lũ lụt ở Đà Nẵng")
+        _article(2, "Nắng nóng ở Hà Nội")
+        self.assertEqual(self._ids("lu lut da nang"), [flood.id])
+        self.assertEqual(self._ids("ĐÀ NẴNG"), [flood.id])
+        self.assertEqual(self._ids("lũ hà nội"), [])
+
+    def test_last_word_matches_as_prefix(self):
+        a = _article(1, "Chứng khoán tăng điểm")
+        self.assertEqual(self._ids("chung kho"), [a.id])
+        self.assertEqual(self._ids("kho chung"), [])
+
+    def test_title_match_ranks_above_body_match(self):
+        body = _article(1, "Tin trong ngày", content_html="<p>Bão Yagi đổ bộ vào miền Bắc.</p>")
+        title = _article(2, "Bão Yagi suy yếu")
+        self.assertEqual(self._ids("yagi"), [title.id, body.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        a = _article(1, "Giá vàng")
+        a.title = "Giá xăng"
+        a.save()
+        self.assertEqual(self._ids("vang"), [])
+        self.assertEqual(self._ids("xang"), [a.id])
+        a.delete()
+        self.assertEqual(self._ids("xang"), [])
+
+    def test_snippets_mark_folded_hits(self):
+        a = _article(1, "Lũ lụt miền Trung", content_html="<p>Nước lũ dâng cao ở Huế.</p>")
+        search.attach_snippets([a], "lu")     # từ cuối khớp tiền tố: cả "lụt"
+        self.assertEqual(a.search_title, "<mark>Lũ</mark> <mark>lụt</mark> miền Trung")
+        self.assertEqual(a.search_snippet, "Nước <mark>lũ</mark> dâng cao ở Huế.")
+
+
+class SearchTriggerTests(TestCase):
+    def setUp(self):
+        if search.backend() != "fts5":
+            self.skipTest("SQLite build không có FTS5")
+        self.addCleanup(search._backends.clear)
+
+    def test_post_migrate_restores_triggers_dropped_by_a_table_remake(self):
+        # _remake_table của SQLite (AddField/AlterField về sau) xoá trigger như thế này
+        with connection.cursor() as cur:
+            for name in search.SQLITE_TRIGGERS:
+                cur.execute(f"DROP TRIGGER {name}")
+        search._backends.clear()
+        self.assertEqual(search.backend(), "icontains")
+        a = _article(1, "Bão Yagi")      # ghi lúc thiếu trigger: chưa vào index
+
+        emit_post_migrate_signal(0, False, "default")
+        self.assertEqual(search.backend(), "fts5")
+        self.assertEqual(list(search.search(Article.objects.all(), "yagi").values_list("id", flat=True)), [a.id])
+
+
+class DetailBodyTests(TestCase):
+    def test_detail_keeps_every_body_image(self):
+        # ảnh đầu thân bài không nhất thiết là ảnh đại diện (og:image, URL nhập tay...)
+        body = '<figure><img src="https://e.vn/1.jpg"/></figure><p>Chữ.</p><p><img src="https://e.vn/2.jpg"/></p>'
+        a = _article(1, "Tin", content_html=body, main_image_url="https://e.vn/og.jpg")
+        a.refresh_from_db()
+        self.assertEqual(a.body_version, render.RENDER_VERSION)
+        self.assertEqual(a.detail_html, body)
+
+
+SHA = "ab" * 32
+PHOTO = f"images/ab/ab/{SHA}.jpg"
+
+
+def _variants(path, width, height, widths=(320, 640)):
+    rows = [ImageVariant(original=path, path=path, format="original", width=width, height=height)]
+    for w in widths:
+        for fmt, ext in (("webp", ".webp"), ("jpeg", ".jpg")):
+            rows.append(ImageVariant(original=path, path=path.replace(".jpg", f"-{w}w{ext}"), format=fmt,
+                                     width=w, height=height * w // width))
+    ImageVariant.objects.bulk_create(rows)
+
+
+def _img(path, attrs=""):
+    return f'<p>Chữ.</p><figure><img src="/media/{path}"{attrs}/></figure>'
+
+
+def _img_attrs(html):
+    return dict(lxml.html.fromstring(html).find(".//img").attrib)
+
+
+@override_settings(MEDIA_URL="/media/", MEDIA_MAKE_VARIANTS=True)
+class RenderBodyTests(TestCase):
+    def setUp(self):
+        MediaAsset.objects.create(source_url="https://e.vn/a.jpg", sha256=SHA, path=PHOTO, width=1600, height=900)
+
+    def test_resized_image_gets_srcset_and_size(self):
+        _variants(PHOTO, 1600, 900)
+        a = _article(1, "Tin", content_html=_img(PHOTO))
+        self.assertEqual(a.body_version, render.RENDER_VERSION)
+        self.assertEqual(_img_attrs(a.body_html), {
+            "src": f"/media/{PHOTO}", "width": "1600", "height": "900", "sizes": render.SIZES,
+            "srcset": f"/media/images/ab/ab/{SHA}-320w.jpg 320w, /media/images/ab/ab/{SHA}-640w.jpg 640w, "
+                      f"/media/{PHOTO} 1600w",
+        })
+
+    def test_waiting_for_variants_is_pending(self):
+        a = _article(1, "Tin", content_html=_img(PHOTO))
+        self.assertEqual(a.body_version, render.PENDING)
+        self.assertEqual(_img_attrs(a.body_html), {"src": f"/media/{PHOTO}", "width": "1600", "height": "900"})
+
+        with override_settings(MEDIA_MAKE_VARIANTS=False):
+            render.fill_bodies([a])
+        self.assertEqual(a.body_version, render.RENDER_VERSION)
+
+    def test_svg_never_pending(self):
+        svg = f"images/cd/cd/{'cd' * 32}.svg"
+        MediaAsset.objects.create(source_url="https://e.vn/logo.svg", sha256="cd" * 32, path=svg)
+        a = _article(1, "Tin", content_html=_img(svg))
+        self.assertEqual((a.body_version, a.body_html), (render.RENDER_VERSION, a.content_html))
+
+    def test_untouched_bodies_keep_original_string(self):
+        cases = [
+            '<p>Chữ   và\n<img src="https://e.vn/ngoai.jpg"></p>',             # ảnh ngoài MEDIA
+            _img(PHOTO, ' width="10" height="5" srcset="x.jpg 10w"'),            # đã có sẵn thuộc tính
+            "",
+        ]
+        _variants(PHOTO, 1600, 900)
+        for i, body in enumerate(cases):
+            a = _article(i, "Tin", content_html=body)
+            self.assertEqual((a.body_html, a.body_version), (body, render.RENDER_VERSION))
+
+    def test_render_follows_content_html_only(self):
+        a = _article(1, "Tin", content_html="<p>một</p>")
+        a.content_html = "<p>hai</p>"
+        a.title = "Tin mới"
+        a.save(update_fields=["title"])
+        a.refresh_from_db()
+        self.assertEqual(a.body_html, "<p>một</p>")
+        a.content_html = "<p>hai</p>"
+        a.save(update_fields=["content_html"])
+        a.refresh_from_db()
+        self.assertEqual(a.body_html, "<p>hai</p>")
+
+    def test_refresh_pending_after_variants(self):
+        waiting = _article(1, "Chờ", content_html=_img(PHOTO))
+        stale = _article(2, "Cũ", content_html=_img(PHOTO))
+        other = _article(3, "Khác", content_html=_img(f"images/ef/ef/{'ef' * 32}.jpg"))
+        expired = timezone.now() - render.PENDING_WINDOW - timedelta(hours=1)
+        Article.objects.filter(pk=stale.pk).update(updated_at=expired)
+        self.assertEqual({a.body_version for a in (waiting, stale, other)}, {render.PENDING})
+
+        _variants(PHOTO, 1600, 900)
+        self.assertEqual(render.refresh_pending([PHOTO]), 1)
+        self.assertEqual(render.refresh_pending([]), 0)
+
+        versions = dict(Article.objects.values_list("pk", "body_version"))
+        self.assertEqual(versions, {waiting.pk: render.RENDER_VERSION, stale.pk: render.PENDING,
+                                    other.pk: render.PENDING})
+        self.assertIn("srcset", _img_attrs(Article.objects.get(pk=waiting.pk).body_html))
@@ -0,0 +1,23 @@
+# articles/textnorm.py
+"""Chuẩn hoá tiếng Việt để so khớp: bỏ dấu (kể cả đ -> d), lower, tách từ."""
+from __future__ import annotations
+
+import re
+import unicodedata
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# NFKD không tách được đ/Đ (không phải chữ ghép) -> map tay
+_SPECIAL = str.maketrans({"đ": "d", "Đ": "D"})
+
+
+def fold(s: str | None) -> str:
+    """'Đà Nẵng tăng trưởng' -> 'da nang tang truong'."""
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFKD", s.translate(_SPECIAL))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s.lower()
+
+
+def tokens(s: str | None) -> list[str]:
+    return _WORD_RE.findall(fold(s))
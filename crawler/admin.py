@@ -1,5 +1,108 @@
 # crawler/admin.py
+from datetime import timedelta
+
 from django.contrib import admin
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import CrawlEvent, CrawlRun, DeadLetter
+
+TREND_DAYS = 7
+
+
+class CrawlEventInline(admin.TabularInline):
+    model = CrawlEvent
+    extra = 0
+    can_delete = False
+    fields = ("source", "feed_status", "entries_seen", "skipped", "fetched", "created", "updated",
+              "too_short", "failed", "bytes", "time_fetch", "time_db")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CrawlRun)
+class CrawlRunAdmin(admin.ModelAdmin):
+    list_display = ("id", "command", "started_at", "finished_at", "duration", "error")
+    list_filter = ("command",)
+    date_hierarchy = "started_at"
+    inlines = [CrawlEventInline]
+
+
+@admin.register(CrawlEvent)
+class CrawlEventAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "source", "run", "feed_status", "entries_seen", "skipped", "fetched",
+                    "created", "updated", "too_short", "failed", "bytes",
+                    "time_fetch", "time_readability", "time_trafilatura", "time_sanitize",
+                    "time_images", "time_db", "time_other")
+    list_filter = ("source", "feed_status", "run__command")
+    list_select_related = ("source", "run")
+    date_hierarchy = "created_at"
+    readonly_fields = [f.name for f in CrawlEvent._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), "trend_days": TREND_DAYS, "trends": self._trends()}
+        return super().changelist_view(request, extra_context=extra_context)
+
+    @staticmethod
+    def _trends():
+        """
+        Theo nguồn: TREND_DAYS ngày gần nhất so với TREND_DAYS ngày trước đó
+        (số bài, lỗi, ms/bài theo stage) — 2 query GROUP BY.
+        """
+        now = timezone.now()
+        sums = {f"time_{s}": Sum(f"time_{s}") for s in CrawlEvent.STAGES}
+        sums.update(fetched=Sum("fetched"), created=Sum("created"), failed=Sum("failed"))
+
+        def window(start, end):
+            rows = (CrawlEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+                    .values("source_id", "source__name").annotate(**sums))
+            return {r["source_id"]: r for r in rows}
+
+        cur = window(now - timedelta(days=TREND_DAYS), now)
+        prev = window(now - timedelta(days=2 * TREND_DAYS), now - timedelta(days=TREND_DAYS))
+
+        def per_page(row):
+            n = (row or {}).get("fetched") or 0
+            if not n:
+                return {}
+            return {s: row[f"time_{s}"] * 1000 / n for s in CrawlEvent.STAGES}
+
+        out = []
+        for source_id, row in cur.items():
+            old = prev.get(source_id)
+            ms, old_ms = per_page(row), per_page(old)
+            out.append({
+                "source": row["source__name"] or "?",
+                "fetched": row["fetched"], "created": row["created"], "failed": row["failed"],
+                "prev_failed": (old or {}).get("failed") or 0,
+                "stages": [(s, ms.get(s, 0.0), old_ms.get(s)) for s in CrawlEvent.STAGES],
+                "total_ms": sum(ms.values()),
+                "prev_total_ms": sum(old_ms.values()) if old_ms else None,
+            })
+        out.sort(key=lambda r: -r["total_ms"])
+        return out
+
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = ("url", "kind", "source", "dead", "attempts", "status_code", "error",
+                    "last_failed_at", "retry_at")
+    list_filter = ("dead", "kind", "status_code", "source")
+    list_select_related = ("source",)
+    search_fields = ("url", "error")
+    date_hierarchy = "last_failed_at"
+    readonly_fields = [f.name for f in DeadLetter._meta.fields]
+    actions = ["retry_now"]
+
+    def has_add_permission(self, request):
+        return False
 
-# App 'crawler' hiện không có model quản trị trong admin.
-# Để trống file này để tránh ImportError khi autodiscover.
+    @admin.action(description="Cho crawl lại ở lượt kế tiếp (xoá khỏi dead-letter)")
+    def retry_now(self, request, queryset):
+        n = queryset.delete()[0]
+        self.message_user(request, f"Đã xoá {n} URL khỏi dead-letter.")
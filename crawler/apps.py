@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CrawlerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "crawler"
+
+    def ready(self):
+        from crawler import classifier  # noqa: F401  (đăng ký signal xoá cache luật category)
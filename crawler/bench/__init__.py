@@ -0,0 +1 @@
+# crawler/bench: công cụ benchmark offline cho crawler (server giả lập, corpus…)
@@ -0,0 +1,234 @@
+# crawler/bench/corpus.py
+"""
+Corpus HTML bài báo cho benchmark trích xuất (không cần mạng lúc chạy).
+
+- Corpus ghi lại: 1 thư mục / phiên bản, không sửa sau khi ghi:
+
+      <root>/<version>/manifest.json
+      <root>/<version>/<id>.html.gz
+
+  manifest: {"version", "recorded_at", "pages": [{id, url, source, file, charset, bytes, sha256}]}
+  Ghi bằng `record()` (tải bài mới nhất từ các nguồn đang bật, qua client dùng chung).
+- Corpus tổng hợp: sinh tất định theo seed, mô phỏng markup của các báo đã seed
+  (ảnh lazy/srcset, <a href=*.jpg>, tên file ảnh trần, script/iframe/quảng cáo)
+  + vài trang quá khổ (hàng trăm đoạn/ảnh, lồng sâu).
+
+`digest()` băm toàn bộ bytes + URL -> baseline biết nó được đo trên corpus nào.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from crawler.bench.server import PARAGRAPH
+
+SYNTHETIC_VERSION = "synthetic-1"
+# profile trích xuất (crawler.profiles) khớp markup của trang tổng hợp
+SYNTHETIC_PROFILE = {
+    "title": "h1.title-detail", "body": "article.fck_detail", "description": "p.description",
+    "hero": "article.fck_detail figure img", "drop": ["h1.title-detail", "p.description"],
+}
+
+
+@dataclass
+class CorpusPage:
+    id: str
+    url: str
+    source: str
+    content: bytes
+    charset: str = "utf-8"
+
+    @property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.content).hexdigest()
+
+
+@dataclass
+class Corpus:
+    version: str
+    pages: list[CorpusPage]
+
+    @property
+    def bytes(self) -> int:
+        return sum(len(p.content) for p in self.pages)
+
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        for p in self.pages:
+            h.update(p.url.encode("utf-8"))
+            h.update(p.sha256.encode("ascii"))
+        return h.hexdigest()[:16]
+
+    def __add__(self, other: "Corpus") -> "Corpus":
+        version = "+".join(v for v in (self.version, other.version) if v)
+        return Corpus(version, self.pages + other.pages)
+
+
+# ---------- corpus ghi lại ----------
+def latest_version(root: Path) -> Path | None:
+    """Thư mục phiên bản mới nhất trong `root` (hoặc chính `root` nếu có manifest)."""
+    root = Path(root)
+    if (root / "manifest.json").exists():
+        return root
+    versions = sorted(p for p in root.glob("*/manifest.json")) if root.is_dir() else []
+    return versions[-1].parent if versions else None
+
+
+def load(path: Path) -> Corpus:
+    path = Path(path)
+    manifest = json.loads((path / "manifest.json").read_text("utf-8"))
+    pages = []
+    for row in manifest["pages"]:
+        content = gzip.decompress((path / row["file"]).read_bytes())
+        if hashlib.sha256(content).hexdigest() != row["sha256"]:
+            raise ValueError(f"corpus {path}: {row['file']} không khớp sha256 trong manifest")
+        pages.append(CorpusPage(row["id"], row["url"], row.get("source", ""), content, row.get("charset") or "utf-8"))
+    return Corpus(manifest["version"], pages)
+
+
+def record(root: Path, per_source: int = 10, version: str | None = None, log=print) -> Path:
+    """Tải `per_source` bài mới nhất của mỗi nguồn đang bật -> phiên bản corpus mới."""
+    from django.utils.text import slugify
+
+    from crawler.document import fetch_page
+    from crawler.feeds import conditional_get
+    from sources.models import Source
+
+    version = version or datetime.now(timezone.utc).strftime("%Y.%m.%d")
+    out = Path(root) / version
+    if out.exists():
+        raise FileExistsError(f"{out} đã tồn tại (corpus không ghi đè; chọn version khác)")
+    out.mkdir(parents=True)
+
+    rows = []
+    sources = Source.objects.filter(is_active=True).exclude(rss_url="").order_by("id")
+    for src in sources:
+        poll = conditional_get(src.rss_url)
+        if poll.error:
+            log(f"  [FEED] {src.name}: {poll.error}")
+            continue
+        n = 0
+        for e in poll.entries:
+            if n >= per_source:
+                break
+            url = e.get("link")
+            if not url:
+                continue
+            try:
+                page = fetch_page(url)
+            except Exception as ex:
+                log(f"  [FAIL] {url}: {ex}")
+                continue
+            pid = f"{slugify(src.name)[:40]}-{n:03d}"
+            (out / f"{pid}.html.gz").write_bytes(gzip.compress(page.content, mtime=0))
+            rows.append({"id": pid, "url": page.final_url or url, "source": src.name,
+                         "file": f"{pid}.html.gz", "charset": page.charset,
+                         "bytes": len(page.content), "sha256": hashlib.sha256(page.content).hexdigest()})
+            n += 1
+        log(f"  [OK] {src.name}: {n} bài")
+
+    manifest = {"version": version, "recorded_at": datetime.now(timezone.utc).isoformat(), "pages": rows}
+    (out / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=1), "utf-8")
+    return out
+
+
+# ---------- corpus tổng hợp ----------
+_WORDS = PARAGRAPH.split() + (
+    "Hà Nội TP.HCM Đà Nẵng người dân chính quyền thành phố dự án giao thông bệnh viện "
+    "học sinh giáo viên đội tuyển bóng đá giá vàng lãi suất ngân hàng doanh nghiệp"
+).split()
+
+_CHROME = (
+    "<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments)}"
+    "gtag('config','G-XXXX');</script>"
+    "<style>.fck_detail p{margin:0 0 1em}.box-ads{display:none}</style>"
+    "<header class=\"header\"><nav><ul>" + "".join(
+        f"<li><a href=\"/chuyen-muc-{k}\">Chuyên mục {k}</a></li>" for k in range(12)
+    ) + "</ul></nav></header>"
+)
+_FOOTER = (
+    "<div class=\"box-ads\"><iframe src=\"https://ads.example/slot\" width=\"300\" height=\"250\"></iframe></div>"
+    "<section class=\"related\"><h3>Tin liên quan</h3><ul>" + "".join(
+        f"<li><a href=\"/tin-lien-quan-{k}.html\">Tin liên quan số {k} về kinh tế xã hội</a></li>" for k in range(8)
+    ) + "</ul></section><footer><p>© Báo thử nghiệm. Giấy phép số 123/GP-BTTTT.</p></footer>"
+    "<noscript><img src=\"https://track.example/p.gif\"></noscript>"
+)
+
+_SITES = ("vnexpress.net", "tuoitre.vn", "thanhnien.vn", "vietnamnet.vn", "dantri.com.vn", "vtv.vn",
+          "www.vietnamplus.vn")
+
+
+def _para(rng: random.Random, words: int = 45) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    if rng.random() < 0.2:
+        text += f" <a href=\"/bai-viet-{rng.randint(1, 9999)}.html\">Xem thêm</a>"
+    if rng.random() < 0.2:
+        text = f"<strong>{text[:40]}</strong>{text[40:]}"
+    return text + "."
+
+
+def _image(rng: random.Random, host: str, k: int) -> str:
+    """Các kiểu ảnh hay gặp: lazy data-src, srcset, <a href=*.jpg>, ảnh trong <p>, tên file trần."""
+    src = f"https://i.{host}/2026/10/{rng.randint(10, 99)}/anh-{k}-{rng.randint(1000, 9999)}.jpg"
+    cap = " ".join(rng.choice(_WORDS) for _ in range(12))
+    kind = rng.randrange(5)
+    if kind == 0:
+        return (f"<figure class=\"tplCaption\"><div class=\"fig-picture\"><picture>"
+                f"<source data-srcset=\"{src}?w=680 1x, {src}?w=1020 2x\">"
+                f"<img data-src=\"{src}\" alt=\"{cap[:30]}\" src=\"data:image/gif;base64,R0lGODlhAQABAAAAACw=\">"
+                f"</picture></div><figcaption><p class=\"Image\">{cap}</p></figcaption></figure>")
+    if kind == 1:
+        return (f"<figure class=\"VCSortableInPreviewMode\" type=\"Photo\"><div><a href=\"{src}\" "
+                f"data-fancybox=\"img\"><img src=\"{src}?w=660\" alt=\"\"></a></div>"
+                f"<figcaption class=\"PhotoCMS_Caption\"><p>{cap}</p></figcaption></figure>")
+    if kind == 2:
+        return f"<p><a href=\"{src}\">{src.rsplit('/', 1)[1]}</a></p>"
+    if kind == 3:
+        return (f"<p style=\"text-align:center\"><img srcset=\"{src} 1x, {src}?2x 2x\" alt=\"\"></p>"
+                f"<p><em>{src.rsplit('/', 1)[1]} (ở đây)</em></p>")
+    return (f"<figure class=\"image align-center\"><img data-original=\"{src}\" loading=\"lazy\">"
+            f"<figcaption>{cap}</figcaption></figure><span>{src.rsplit('/', 1)[1].upper()}</span>")
+
+
+def synthetic_page(i: int, paragraphs: int = 14, images: int = 4, depth: int = 2) -> CorpusPage:
+    rng = random.Random(0xBE7C + i)
+    host = _SITES[i % len(_SITES)]
+    title = " ".join(rng.choice(_WORDS) for _ in range(12)).capitalize()
+    body = [f"<p class=\"description\">{_para(rng, 30)}</p>"]
+    image_at = set(rng.sample(range(paragraphs), min(images, paragraphs)))
+    for k in range(paragraphs):
+        if k in image_at:
+            body.append(_image(rng, host, k))
+        if rng.random() < 0.08:
+            body.append(f"<h2>{' '.join(rng.choice(_WORDS) for _ in range(8))}</h2>")
+        if rng.random() < 0.05:
+            body.append("<ul>" + "".join(f"<li>{_para(rng, 12)}</li>" for _ in range(4)) + "</ul>")
+        if rng.random() < 0.04:
+            body.append(f"<blockquote><p>{_para(rng, 25)}</p></blockquote>")
+        body.append(f"<p class=\"Normal\">{_para(rng)}</p>")
+    body.append("<p class=\"Normal\" style=\"text-align:right;\"><strong>Phóng viên</strong></p>")
+    inner = "\n".join(body)
+    for _ in range(depth):
+        inner = f"<div class=\"wrap\">{inner}</div>"
+    html = (
+        f"<!doctype html><html lang=\"vi\"><head><meta charset=\"utf-8\"><title>{title} - {host}</title>"
+        f"<meta property=\"og:title\" content=\"{title}\">"
+        f"<meta property=\"og:image\" content=\"https://i.{host}/og/{i}.jpg\">"
+        f"<link rel=\"canonical\" href=\"https://{host}/bai-{i}.html\"></head><body>{_CHROME}"
+        f"<main><article class=\"fck_detail\"><h1 class=\"title-detail\">{title}</h1>{inner}</article></main>"
+        f"{_FOOTER}</body></html>"
+    )
+    return CorpusPage(f"synthetic-{i:04d}", f"https://{host}/bai-{i}.html", host, html.encode("utf-8"))
+
+
+def synthetic(pages: int = 40, oversized: int = 3) -> Corpus:
+    """`pages` bài cỡ thường + `oversized` bài quá khổ (400-1200 đoạn, 100-300 ảnh, lồng 30-90 tầng)."""
+    out = [synthetic_page(i, paragraphs=8 + i % 25, images=i % 7, depth=1 + i % 4) for i in range(pages)]
+    for k in range(oversized):
+        out.append(synthetic_page(10_000 + k, paragraphs=400 * (k + 1), images=100 * (k + 1), depth=30 * (k + 1)))
+    return Corpus(f"{SYNTHETIC_VERSION}:{pages}+{oversized}", out)
@@ -0,0 +1,231 @@
+# crawler/bench/extract.py
+"""
+Benchmark các bước trích xuất nội dung trên 1 corpus (crawler.bench.corpus).
+
+Mỗi trang chạy đúng pipeline của ParsedDocument._cleaned/content (trừ mirror ảnh):
+
+    parse -> readability (Document.summary)
+    -> clean (sanitize.clean: allow-list, link ảnh, tên file — 1 lượt duyệt lxml)
+    -> render (CleanHTML.render: content_html + blocks + excerpt)
+
+- Thời gian: mỗi stage lặp `repeat` lần trên cùng input, lấy lần nhanh nhất;
+  cộng qua các trang.
+- Bộ nhớ: 1 lượt riêng với tracemalloc, peak Python heap của từng stage
+  (libxml2 cấp phát ngoài Python heap -> không tính; xem thêm maxrss).
+- Checksum: sha256 output từng stage (theo thứ tự corpus) + digest nội dung cuối
+  từng trang (content_html, blocks, excerpt — cùng cách băm với chuỗi
+  BeautifulSoup/bleach cũ, so được với baseline cũ) -> tăng tốc mà đổi kết quả
+  là lộ ngay.
+
+`compare(report, baseline)` trả về danh sách lỗi (chậm hơn / tốn bộ nhớ hơn / output khác).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+
+import lxml.html
+from readability import Document
+
+from crawler import sanitize
+from crawler.bench.corpus import Corpus
+
+STAGES = ("parse", "readability", "clean", "render")
+PACKAGES = ("lxml", "readability-lxml")
+
+# dưới mức này (ms/trang) chênh lệch coi là nhiễu đo
+MIN_DELTA_MS = 0.05
+
+
+def _parse(page):
+    parser = lxml.html.HTMLParser(encoding=page.charset)
+    return lxml.html.document_fromstring(page.content, parser=parser)
+
+
+def _summary(tree) -> str:
+    return Document(tree).summary(html_partial=True)
+
+
+def _digest(out) -> bytes:
+    if isinstance(out, sanitize.CleanHTML):
+        out = out.html
+    elif isinstance(out, sanitize.Rendered):
+        # = sha(serialize + blocks + excerpt) như digest trang của pipeline cũ
+        return hashlib.sha256(_digest(out.html) + _digest(out.blocks) + _digest(out.excerpt)).digest()
+    elif isinstance(out, (list, dict)):
+        out = json.dumps(out, ensure_ascii=False, sort_keys=True)
+    elif not isinstance(out, str):
+        return b""            # cây lxml: không băm (đã có checksum readability)
+    return hashlib.sha256(out.encode("utf-8")).digest()
+
+
+def _pipeline(page):
+    """[(stage, hàm)] — mỗi hàm nhận output của stage trước (không stage nào sửa input)."""
+    return [
+        ("parse", lambda _: _parse(page)),
+        ("readability", _summary),
+        ("clean", lambda html: sanitize.clean(html or page.content.decode(page.charset, "replace"),
+                                              base_url=page.url)),
+        ("render", sanitize.CleanHTML.render),
+    ]
+
+
+def run_page(page, repeat: int = 3, trace_memory: bool = False):
+    """
+    Chạy pipeline cho 1 trang.
+    Trả về ({stage: giây nhanh nhất}, {stage: peak byte}, {stage: digest output}, digest trang).
+    """
+    seconds, peaks, digests = {}, {}, {}
+    value = None
+    for stage, fn in _pipeline(page):
+        best = float("inf")
+        for _ in range(1 if trace_memory else max(1, repeat)):
+            if trace_memory:
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            t0 = time.perf_counter()
+            out = fn(value)
+            best = min(best, time.perf_counter() - t0)
+            if trace_memory:
+                peaks[stage] = max(0, tracemalloc.get_traced_memory()[1] - base)
+        value = out
+        seconds[stage] = best
+        digests[stage] = _digest(out)
+    return seconds, peaks, digests, digests["render"].hex()[:16]
+
+
+def versions() -> dict[str, str]:
+    out = {"python": platform.python_version()}
+    for name in PACKAGES:
+        try:
+            out[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            pass
+    return out
+
+
+def run(corpus: Corpus, repeat: int = 3, memory: bool = True, log=None) -> dict:
+    n = len(corpus.pages)
+    totals = dict.fromkeys(STAGES, 0.0)
+    peaks = dict.fromkeys(STAGES, 0)
+    stage_hash = {s: hashlib.sha256() for s in STAGES}
+    pages = {}
+
+    for i, page in enumerate(corpus.pages):
+        secs, _, digests, final = run_page(page, repeat=repeat)
+        for s in STAGES:
+            totals[s] += secs[s]
+            stage_hash[s].update(digests[s])
+        pages[page.id] = final
+        if log and (i + 1) % 20 == 0:
+            log(f"  {i + 1}/{n} trang")
+
+    if memory:
+        tracemalloc.start()
+        try:
+            for page in corpus.pages:
+                _, pk, _, _ = run_page(page, trace_memory=True)
+                for s in STAGES:
+                    peaks[s] = max(peaks[s], pk[s])
+        finally:
+            tracemalloc.stop()
+
+    mb = corpus.bytes / 1e6
+    stages = {}
+    for s in STAGES:
+        sec = totals[s]
+        stages[s] = {
+            "seconds": round(sec, 6),
+            "ms_per_page": round(sec * 1000 / n, 4) if n else 0.0,
+            "pages_per_s": round(n / sec, 1) if sec else 0.0,
+            "peak_kb": round(peaks[s] / 1024, 1) if memory else None,
+            "checksum": stage_hash[s].hexdigest()[:16] if s != "parse" else "",
+        }
+    total = sum(totals.values())
+    # ru_maxrss: KB trên Linux, byte trên macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "corpus": {"version": corpus.version, "digest": corpus.digest(), "pages": n, "bytes": corpus.bytes},
+        "env": versions(),
+        "repeat": repeat,
+        "stages": stages,
+        "total": {
+            "seconds": round(total, 6),
+            "ms_per_page": round(total * 1000 / n, 4) if n else 0.0,
+            "pages_per_s": round(n / total, 1) if total else 0.0,
+            "mb_per_s": round(mb / total, 2) if total else 0.0,
+            "maxrss_mb": round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+        },
+        "pages": pages,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.25, mem_tolerance: float = 0.5) -> list[str]:
+    """Các điểm hồi quy so với baseline (rỗng = đạt)."""
+    if report["corpus"]["digest"] != baseline["corpus"]["digest"]:
+        return [f"corpus khác baseline ({report['corpus']['version']} {report['corpus']['digest']} "
+                f"!= {baseline['corpus']['version']} {baseline['corpus']['digest']}) — đo lại baseline"]
+    problems = []
+    for s, cur in report["stages"].items():
+        old = baseline["stages"].get(s)
+        if not old:
+            continue
+        if old.get("checksum") != cur["checksum"]:
+            problems.append(f"{s}: output khác baseline ({cur['checksum']} != {old.get('checksum')})")
+        limit = old["ms_per_page"] * (1 + tolerance)
+        if cur["ms_per_page"] > limit and cur["ms_per_page"] - old["ms_per_page"] > MIN_DELTA_MS:
+            problems.append(f"{s}: chậm hơn {cur['ms_per_page']:.3f} ms/trang "
+                            f"(baseline {old['ms_per_page']:.3f}, ngưỡng +{tolerance:.0%})")
+        if cur.get("peak_kb") is not None and old.get("peak_kb"):
+            if cur["peak_kb"] > old["peak_kb"] * (1 + mem_tolerance) and cur["peak_kb"] - old["peak_kb"] > 64:
+                problems.append(f"{s}: peak bộ nhớ {cur['peak_kb']:.0f}KB (baseline {old['peak_kb']:.0f}KB)")
+    changed = [pid for pid, d in report["pages"].items() if baseline.get("pages", {}).get(pid) != d]
+    if changed:
+        more = f" (+{len(changed) - 5})" if len(changed) > 5 else ""
+        problems.append(f"{len(changed)} trang có nội dung khác baseline: {', '.join(changed[:5])}{more}")
+    return problems
+
+
+def format_report(report: dict, baseline: dict | None = None) -> list[str]:
+    c = report["corpus"]
+    if baseline and baseline["corpus"]["digest"] != c["digest"]:
+        baseline = None         # corpus khác -> so % không có nghĩa
+    lines = [f"corpus {c['version']} [{c['digest']}]: {c['pages']} trang, {c['bytes'] / 1e6:.1f}MB, "
+             f"repeat={report['repeat']} (lấy lần nhanh nhất)",
+             f"{'stage':<20} {'ms/trang':>9} {'trang/s':>9} {'peak KB':>9} {'baseline':>9}  checksum"]
+    for s, st in report["stages"].items():
+        old = (baseline or {}).get("stages", {}).get(s)
+        delta = f"{(st['ms_per_page'] / old['ms_per_page'] - 1) * 100:+8.0f}%" if old and old["ms_per_page"] else ""
+        peak = f"{st['peak_kb']:9.0f}" if st["peak_kb"] is not None else f"{'-':>9}"
+        lines.append(f"{s:<20} {st['ms_per_page']:9.3f} {st['pages_per_s']:9.1f} {peak} {delta:>9}  {st['checksum']}")
+    t = report["total"]
+    lines.append(f"{'tổng':<20} {t['ms_per_page']:9.3f} {t['pages_per_s']:9.1f}  "
+                 f"{t['mb_per_s']:.2f}MB/s HTML, maxrss {t['maxrss_mb']}MB")
+    return lines
+
+
+def run_document(page, profile=None, repeat: int = 3):
+    """
+    CPU (process_time) để trích xuất 1 trang như tasks._extract_document (trừ DB, mirror ảnh):
+    canonical, thân bài + sanitize, text, metadata, content. Trả về (giây nhanh nhất, ParsedDocument).
+    """
+    from crawler.document import FetchedPage, ParsedDocument
+
+    best, doc = float("inf"), None
+    for _ in range(max(1, repeat)):
+        fetched = FetchedPage(url=page.url, content=page.content, final_url=page.url, encoding=page.charset)
+        doc = ParsedDocument(fetched, mirror_images=False, profile=profile)
+        t0 = time.process_time()
+        doc.canonical_url
+        html = doc.summary_html
+        sanitize.clean(html, normalize=False).html if html else ""
+        doc.text, doc.metadata, doc.description
+        doc.content
+        best = min(best, time.process_time() - t0)
+    return best, doc
@@ -0,0 +1,180 @@
+# crawler/bench/server.py
+"""
+HTTP server giả lập (chạy local, không cần mạng) để benchmark crawler.
+
+    with StandInServer(feeds=7, entries=20, latency=0.2) as srv:
+        srv.feed_urls  # -> ["http://127.0.0.1:PORT/feed/0.rss", ...]
+
+Routes:
+- /feed/<f>.rss           RSS với `entries` item trỏ về /a/<f>/<i>.html
+- /a/<f>/<i>.html         trang bài báo tổng hợp (đủ dài để qua ngưỡng too_short, các bài
+                          xáo từ khác nhau để không bị coi là tin gần trùng),
+                          kèm `images` ảnh (ảnh đầu nằm trong <figure> có caption)
+- /img/<f>/<i>/<k>.jpg    ảnh JPEG nhỏ, bytes cố định theo path
+Mỗi request ngủ `latency` giây để mô phỏng độ trễ mạng.
+Response có ETag, hỗ trợ If-None-Match -> 304 (để thử conditional GET).
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import random
+import threading
+import time
+from email.utils import formatdate
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARAGRAPH = (
+    "Theo báo cáo mới nhất của Bộ Kế hoạch và Đầu tư, tăng trưởng kinh tế quý này đạt mức "
+    "cao so với cùng kỳ, trong đó khu vực công nghiệp và dịch vụ đóng góp phần lớn. "
+    "Các chuyên gia nhận định đà phục hồi sẽ tiếp tục nhờ xuất khẩu và đầu tư công."
+)
+
+
+def article_html(f: int, i: int, paragraphs: int = 8, images: int = 0) -> str:
+    rng = random.Random(f * 100_003 + i)
+    words = PARAGRAPH.split()
+    paras = [f"<p>{' '.join(rng.sample(words, len(words)))} (Đoạn {k + 1}, bài {f}-{i}.)</p>"
+             for k in range(paragraphs)]
+    for k in reversed(range(images)):
+        src = f"/img/{f}/{i}/{k}.jpg"
+        img = (f"<figure><img src=\"{src}\" alt=\"Ảnh {k + 1}\"><figcaption>Ảnh minh hoạ {k + 1}"
+               "</figcaption></figure>" if k == 0 else f"<p><img data-src=\"{src}\" alt=\"\"></p>")
+        paras.insert(min(k, len(paras)), img)
+    body = "\n".join(paras)
+    return (
+        "<!doctype html><html lang=\"vi\"><head><meta charset=\"utf-8\">"
+        f"<title>Bài thử nghiệm {f}-{i}</title>"
+        f"<meta property=\"og:title\" content=\"Bài thử nghiệm {f}-{i}\">"
+        "<meta name=\"description\" content=\"Bài viết tổng hợp dùng để benchmark crawler.\">"
+        "</head><body><header><nav><a href=\"/\">Trang chủ</a></nav></header>"
+        f"<article class=\"fck_detail\"><h1>Bài thử nghiệm {f}-{i}</h1>{body}</article>"
+        "<footer><p>Bản quyền thuộc về tòa soạn.</p></footer></body></html>"
+    )
+
+
+def feed_xml(base: str, f: int, entries: int, now: float | None = None) -> str:
+    now = now or time.time()
+    items = "".join(
+        "<item>"
+        f"<title>Bài thử nghiệm {f}-{i}</title>"
+        f"<link>{base}/a/{f}/{i}.html</link>"
+        f"<pubDate>{formatdate(now - i * 60, usegmt=True)}</pubDate>"
+        "</item>"
+        for i in range(entries)
+    )
+    return (
+        "<?xml version=\"1.0\" encoding=\"UTF-8\"?><rss version=\"2.0\"><channel>"
+        f"<title>Feed {f}</title><link>{base}/</link>{items}</channel></rss>"
+    )
+
+
+@lru_cache(maxsize=4096)
+def image_bytes(path: str, size: tuple[int, int] = (640, 360)) -> bytes:
+    """JPEG xác định theo path (màu suy ra từ hash) để ảnh khác nhau có bytes khác nhau."""
+    from PIL import Image
+
+    r, g, b = hashlib.md5(path.encode()).digest()[:3]
+    buf = io.BytesIO()
+    Image.new("RGB", size, (r, g, b)).save(buf, "JPEG", quality=80)
+    return buf.getvalue()
+
+
+class StandInServer:
+    def __init__(self, feeds: int = 7, entries: int = 20, latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, images: int = 0,
+                 image_latency: float | None = None):
+        self.feeds = feeds
+        self.entries = entries
+        self.latency = latency
+        self.images = images
+        self.image_latency = latency if image_latency is None else image_latency
+        self.requests = 0
+        self.not_modified = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        # client bỏ ngang (hết deadline) -> không in traceback ConnectionReset
+        self.httpd.handle_error = lambda request, client_address: None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def feed_urls(self) -> list[str]:
+        return [f"{self.base_url}/feed/{f}.rss" for f in range(self.feeds)]
+
+    def route(self, path: str) -> tuple[int, str, bytes]:
+        """(status, content-type, body) cho 1 path. Ghi đè để thêm route."""
+        parts = path.strip("/").split("/")
+        try:
+            if parts[0] == "feed" and len(parts) == 2:
+                f = int(parts[1].split(".")[0])
+                return 200, "application/rss+xml; charset=utf-8", \
+                    feed_xml(self.base_url, f, self.entries, self.started).encode("utf-8")
+            if parts[0] == "a" and len(parts) == 3:
+                f, i = int(parts[1]), int(parts[2].split(".")[0])
+                return 200, "text/html; charset=utf-8", \
+                    article_html(f, i, images=self.images).encode("utf-8")
+            if parts[0] == "img" and len(parts) == 4 and \
+                    all(x.split(".")[0].isdigit() for x in parts[1:]):
+                return 200, "image/jpeg", image_bytes(path)
+        except ValueError:
+            pass
+        return 404, "text/plain", b"not found"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                path = self.path.split("?", 1)[0]
+                latency = server.image_latency if path.startswith("/img/") else server.latency
+                if latency:
+                    time.sleep(latency)
+                status, ctype, body = server.route(path)
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                if status == 200:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="standin-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
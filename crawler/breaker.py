@@ -0,0 +1,125 @@
+# crawler/breaker.py
+"""
+Circuit breaker theo host cho HTTP client dùng chung.
+
+- closed: request đi bình thường; lỗi tạm thời liên tiếp (timeout, lỗi kết nối,
+  5xx, 429) được đếm, response tốt reset bộ đếm.
+- open: sau CRAWLER_BREAKER_FAILURES lỗi liên tiếp -> mọi request tới host bị từ
+  chối ngay bằng `HostUnavailable` (không tốn slot / timeout) trong thời gian
+  nghỉ; thời gian nghỉ nhân đôi mỗi lần mở lại (± jitter), trần MAX_COOLDOWN.
+- half-open: hết thời gian nghỉ -> đúng 1 request thăm dò được đi; thành công ->
+  closed, lỗi -> open lại với thời gian nghỉ dài hơn.
+
+Trạng thái nằm trong process (mỗi worker Celery tự học), không cần DB/cache.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+TRANSIENT_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class HostUnavailable(requests.ConnectionError):
+    """Host đang bị ngắt mạch (circuit open) -> không gửi request."""
+
+
+@dataclass
+class HostCircuit:
+    state: str = CLOSED
+    failures: int = 0        # lỗi liên tiếp
+    opened: int = 0          # số lần mở liên tiếp (không có lần thăm dò nào thành công)
+    retry_at: float = 0.0    # time.monotonic() được thăm dò
+    probing: bool = False
+    rejected: int = 0        # request bị từ chối khi open
+
+
+def is_host_failure(exc: BaseException | None = None, status: int | None = None) -> bool:
+    """Lỗi do phía host (đáng đếm cho breaker), không phải do URL/nội dung cụ thể."""
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    from crawler.http_archive import ReplayMiss
+
+    if isinstance(exc, (HostUnavailable, ReplayMiss)):
+        return False
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, cooldown: float = 60.0, max_cooldown: float = 1800.0,
+                 jitter: float = 0.2):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._hosts: dict[str, HostCircuit] = {}
+
+    def before(self, host: str) -> None:
+        """Gọi trước request; raise `HostUnavailable` nếu host đang open (hoặc đang có request thăm dò)."""
+        with self._lock:
+            c = self._hosts.get(host)
+            if c is None or c.state == CLOSED:
+                return
+            if c.state == OPEN and time.monotonic() >= c.retry_at:
+                c.state, c.probing = HALF_OPEN, False
+            if c.state == HALF_OPEN and not c.probing:
+                c.probing = True
+                return
+            c.rejected += 1
+            msg = f"{host}: circuit {c.state}, thử lại sau {max(0.0, c.retry_at - time.monotonic()):.0f}s"
+        raise HostUnavailable(msg)
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            c = self._hosts.get(host)
+            if c is not None and (c.state != CLOSED or c.failures):
+                c.state, c.failures, c.opened, c.probing = CLOSED, 0, 0, False
+
+    def release(self, host: str) -> None:
+        """before() cho đi nhưng không gửi request nào (robots cấm...): half-open nhả lượt thăm dò."""
+        with self._lock:
+            c = self._hosts.get(host)
+            if c is not None and c.state == HALF_OPEN:
+                c.probing = False
+
+    def failure(self, host: str) -> None:
+        with self._lock:
+            c = self._hosts.setdefault(host, HostCircuit())
+            c.failures += 1
+            if c.state == HALF_OPEN or c.failures >= self.threshold:
+                wait = min(self.max_cooldown, self.cooldown * 2 ** c.opened)
+                c.state, c.probing = OPEN, False
+                c.opened += 1
+                c.retry_at = time.monotonic() + wait * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            c = self._hosts.get(host)
+            return c.state if c else CLOSED
+
+    def snapshot(self) -> dict[str, HostCircuit]:
+        """Host có lỗi / đang ngắt (bản copy)."""
+        with self._lock:
+            return {h: HostCircuit(**vars(c)) for h, c in self._hosts.items() if c.state != CLOSED or c.rejected}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+
+def format_circuits(circuits: dict[str, HostCircuit]) -> list[str]:
+    now = time.monotonic()
+    return [
+        f"{host:<32} {c.state:<9} lỗi liên tiếp={c.failures} mở={c.opened} lần "
+        f"từ chối={c.rejected} thăm dò sau {max(0.0, c.retry_at - now):.0f}s"
+        for host, c in sorted(circuits.items())
+    ]
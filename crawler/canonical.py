@@ -0,0 +1,136 @@
+# crawler/canonical.py
+"""
+Chuẩn hoá URL bài báo về 1 dạng duy nhất (khoá chống trùng):
+
+- scheme/host viết thường, bỏ port mặc định, bỏ fragment;
+- host mobile/AMP (m., mobile., amp.) -> host chính (+ CRAWLER_HOST_ALIASES);
+- bỏ đoạn AMP trong path (/amp, /amp/..., .amp.html) và dấu "/" cuối;
+- bỏ tham số tracking (utm_*, fbclid, gclid, zarsrc...), sắp xếp tham số còn lại;
+- `<link rel="canonical">` / `og:url` của trang được ưu tiên khi hợp lệ.
+
+Các biến thể URL đã gặp được lưu ở `ArticleURLAlias` để lần sau trỏ thẳng
+về bài, không phải tải lại.
+"""
+from __future__ import annotations
+
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from django.conf import settings
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "zarsrc", "zacc", "gidzl", "ref", "ref_src", "cmpid",
+    "amp", "outputtype",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "__")
+MOBILE_PREFIXES = ("m.", "mobile.", "amp.")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+AMP_PATH_RE = re.compile(r"(^|/)amp(/|$)", re.I)
+AMP_SUFFIX_RE = re.compile(r"\.amp(\.html?)?$", re.I)
+
+
+def _host(host: str) -> str:
+    host = host.lower().strip(".")
+    aliases = getattr(settings, "CRAWLER_HOST_ALIASES", {})
+    if host in aliases:
+        host = aliases[host]
+    else:
+        for p in MOBILE_PREFIXES:
+            if host.startswith(p) and host.count(".") >= 2:
+                host = host[len(p):]
+                break
+    return host
+
+
+def _path(path: str) -> str:
+    path = re.sub(r"/{2,}", "/", path or "/")
+    path = AMP_SUFFIX_RE.sub(lambda m: m.group(1) or "", path)
+    while AMP_PATH_RE.search(path):
+        path = AMP_PATH_RE.sub(lambda m: m.group(1) or m.group(2), path, count=1)
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+    return path or "/"
+
+
+def _is_tracking(key: str) -> bool:
+    k = key.lower()
+    return k in TRACKING_PARAMS or k.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize(url: str | None) -> str:
+    """Dạng chuẩn của URL (chuỗi rỗng nếu không phải http/https)."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    try:
+        p = urlsplit(url)
+    except ValueError:
+        return ""
+    scheme = p.scheme.lower()
+    if scheme not in ("http", "https") or not p.netloc:
+        return ""
+    try:
+        port = p.port
+    except ValueError:
+        return ""
+    netloc = _host(p.hostname or "")
+    if port and DEFAULT_PORTS.get(scheme) != str(port):
+        netloc = f"{netloc}:{port}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+                             if not _is_tracking(k)))
+    return urlunsplit((scheme, netloc, _path(p.path), query, ""))
+
+
+def pick_canonical(url: str, declared: str | None) -> str:
+    """
+    URL chuẩn của bài: `declared` (rel=canonical/og:url) nếu dùng được, ngược lại
+    chính `url`. Bỏ qua canonical trỏ về trang chủ/chuyên mục rỗng (lỗi template hay gặp).
+    """
+    base = canonicalize(url)
+    if declared:
+        cand = canonicalize(urljoin(url, declared.strip()))
+        if cand and urlsplit(cand).path not in ("", "/"):
+            return cand
+    return base
+
+
+def variants(*urls: str | None) -> list[str]:
+    """Các URL (thô + chuẩn hoá) không trùng, giữ thứ tự — dùng để tra alias."""
+    out = []
+    for u in urls:
+        for v in (u, canonicalize(u)):
+            if v and v not in out:
+                out.append(v)
+    return out
+
+
+def resolve(urls: list[str]) -> dict[str, tuple[int, object]]:
+    """
+    {url: (article_id, published_at)} cho các URL đã biết, khớp theo
+    Article.source_url hoặc ArticleURLAlias (2 query cho cả lô).
+    """
+    from articles.models import Article, ArticleURLAlias
+
+    urls = [u for u in dict.fromkeys(urls) if u]
+    if not urls:
+        return {}
+    found = {u: (pk, pub) for u, pk, pub in Article.objects.filter(source_url__in=urls)
+             .values_list("source_url", "id", "published_at")}
+    rest = [u for u in urls if u not in found]
+    if rest:
+        found.update((u, (pk, pub)) for u, pk, pub in ArticleURLAlias.objects.filter(url__in=rest)
+                     .values_list("url", "article_id", "article__published_at"))
+    return found
+
+
+def remember_aliases(article, urls: list[str]) -> list[str]:
+    """Lưu các biến thể URL trỏ về `article`; trả về các URL alias mới ghi."""
+    from articles.models import ArticleURLAlias
+
+    new = [u for u in dict.fromkeys(urls) if u and u != article.source_url and len(u) <= 1000]
+    if new:
+        ArticleURLAlias.objects.bulk_create(
+            [ArticleURLAlias(url=u, article=article) for u in new], ignore_conflicts=True,
+        )
+    return new
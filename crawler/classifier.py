@@ -0,0 +1,152 @@
+# crawler/classifier.py
+"""
+Gắn category cho bài theo từ khoá lưu ở Category.keywords (sửa trong admin).
+
+- Toàn bộ từ khoá được gộp thành 1 regex (dài trước, khớp theo ranh giới từ)
+  và so trên title + mô tả đã bỏ dấu (articles.textnorm), nên "Bóng Đá",
+  "bong da" hay "BÓNG-ĐÁ" đều khớp "bóng đá".
+- Điểm mỗi category = số lần khớp, từ khoá trong tiêu đề tính TITLE_WEIGHT.
+- Luật đã biên dịch + id category cache trong process, không query DB mỗi bài;
+  lưu/xoá Category thì xoá cache của process đó. Process khác (worker Celery,
+  crawl_now...) mỗi RECHECK_SECONDS so version = (số category, updated_at lớn
+  nhất) bằng 1 query aggregate và nạp lại khi đổi — version nằm trong DB nên
+  không phụ thuộc cache dùng chung (LocMemCache là riêng từng process).
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.text import slugify
+
+from articles.textnorm import tokens
+
+FALLBACK_NAME = "Khác"
+TITLE_WEIGHT = 2
+RECHECK_SECONDS = getattr(settings, "CRAWLER_CLASSIFIER_RECHECK", 10)
+# gắn tối đa N category, category phụ cần đạt >= MIN_SHARE điểm của category cao nhất
+MAX_CATEGORIES = getattr(settings, "CRAWLER_MAX_CATEGORIES", 2)
+MIN_SHARE = 0.5
+
+_SPLIT_RE = re.compile(r"[,;\n]+")
+
+
+def _normalize(s: str | None) -> str:
+    return " ".join(tokens(s))
+
+
+def parse_keywords(raw: str | None) -> list[str]:
+    """'Bóng đá, V-League\\nworld cup' -> ['bong da', 'v league', 'world cup']."""
+    return [k for k in (_normalize(p) for p in _SPLIT_RE.split(raw or "")) if k]
+
+
+@dataclass
+class Rules:
+    pattern: re.Pattern | None
+    by_keyword: dict[str, tuple[int, ...]]
+    fallback_id: int | None
+    version: object = None
+    checked_at: float = field(default_factory=time.monotonic)
+
+    def scores(self, title: str, text: str = "") -> Counter:
+        out: Counter = Counter()
+        if self.pattern is None:
+            return out
+        for s, weight in ((_normalize(title), TITLE_WEIGHT), (_normalize(text), 1)):
+            for m in self.pattern.finditer(s):
+                for cid in self.by_keyword[m.group(0)]:
+                    out[cid] += weight
+        return out
+
+
+def compile_rules(categories, fallback_id: int | None = None, version=None) -> Rules:
+    """categories: iterable (id, keywords thô)."""
+    by_keyword: dict[str, list[int]] = {}
+    for cid, raw in categories:
+        for kw in parse_keywords(raw):
+            ids = by_keyword.setdefault(kw, [])
+            if cid not in ids:
+                ids.append(cid)
+    pattern = None
+    if by_keyword:
+        alts = "|".join(re.escape(k) for k in sorted(by_keyword, key=len, reverse=True))
+        pattern = re.compile(rf"\b(?:{alts})\b")
+    return Rules(pattern, {k: tuple(v) for k, v in by_keyword.items()}, fallback_id, version)
+
+
+_rules: Rules | None = None
+_lock = threading.Lock()
+
+
+def _version() -> tuple:
+    """(số category, updated_at lớn nhất): thêm / sửa / xoá category đều làm đổi."""
+    from django.db.models import Count, Max
+
+    from sources.models import Category
+
+    agg = Category.objects.aggregate(n=Count("id"), at=Max("updated_at"))
+    return agg["n"], agg["at"]
+
+
+def _load() -> Rules:
+    from sources.models import Category
+
+    fallback = Category.objects.filter(name=FALLBACK_NAME).values_list("id", flat=True).first()
+    if fallback is None:
+        fallback = Category.objects.get_or_create(
+            name=FALLBACK_NAME, defaults={"slug": slugify(FALLBACK_NAME) or "khac"}
+        )[0].pk
+    version = _version()     # đọc trước các dòng: sửa chen giữa -> lần kiểm sau nạp lại
+    rows = Category.objects.exclude(keywords="").values_list("id", "keywords")
+    return compile_rules(rows, fallback, version)
+
+
+def get_rules() -> Rules:
+    global _rules
+    rules = _rules
+    now = time.monotonic()
+    if rules is not None and now - rules.checked_at < RECHECK_SECONDS:
+        return rules
+    with _lock:
+        rules = _rules
+        if rules is not None and now - rules.checked_at >= RECHECK_SECONDS:
+            if _version() == rules.version:
+                rules.checked_at = now
+            else:
+                rules = None
+        if rules is None:
+            rules = _rules = _load()
+    return rules
+
+
+def invalidate() -> None:
+    """Bỏ luật đã biên dịch của process này (process khác tự thấy version đổi)."""
+    global _rules
+    _rules = None
+
+
+@receiver(post_save, sender="sources.Category")
+@receiver(post_delete, sender="sources.Category")
+def _category_changed(sender, **kwargs):
+    invalidate()
+
+
+def classify(title: str, text: str = "") -> list[tuple[int, int]]:
+    """[(category_id, điểm)] giảm dần theo điểm; rỗng nếu không khớp từ khoá nào."""
+    return get_rules().scores(title, text).most_common()
+
+
+def pick(title: str, text: str = "", limit: int = MAX_CATEGORIES) -> list[int]:
+    """Id category để gắn cho bài: các category điểm cao (xem MIN_SHARE), hoặc 'Khác'."""
+    ranked = classify(title, text)
+    if not ranked:
+        fallback = get_rules().fallback_id
+        return [fallback] if fallback else []
+    top = ranked[0][1]
+    return [cid for cid, score in ranked[:limit] if score >= top * MIN_SHARE]
@@ -0,0 +1,144 @@
+# crawler/deadletter.py
+"""
+Theo dõi URL lỗi (bảng crawler.DeadLetter) để lượt crawl sau không thử lại mù quáng.
+
+- Lỗi tạm thời (timeout, lỗi kết nối, 5xx, 429, lỗi trích xuất): attempts += 1,
+  retry_at = now + CRAWLER_RETRY_BASE × 2^(attempts-1) ± jitter (trần CRAWLER_RETRY_MAX);
+  quá CRAWLER_RETRY_ATTEMPTS lần -> dead.
+- Lỗi vĩnh viễn (404/410/451/401/403, robots.txt cấm, body quá cỡ): dead ngay.
+- `due()`: trang bài tới giờ thử lại -> beat (tasks.dispatch_due_sources) xếp lại
+  vào hàng đợi theo nguồn, kể cả URL đã trôi khỏi feed.
+- Host đang bị ngắt mạch (crawler.breaker.HostUnavailable): không ghi — URL chưa
+  hề được thử, lượt sau đi lại bình thường.
+- `blocked(urls)` / `holds(urls)`: 1 query, URL đang dead hoặc chưa tới retry_at
+  -> bỏ khỏi lượt này (known_urls.filter_known cho trang bài, utils._mirror_images
+  cho ảnh); URL chờ thử lại làm feed chưa "xử lý xong" (feeds.FeedPoll.save_to).
+"""
+from __future__ import annotations
+
+import random
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from crawler import canonical
+from crawler.breaker import HostUnavailable
+from crawler.http_archive import ReplayMiss
+
+PERMANENT_STATUSES = frozenset({400, 401, 403, 404, 410, 451})
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+RETRY_BASE = _setting("CRAWLER_RETRY_BASE", 15 * 60)
+RETRY_MAX = _setting("CRAWLER_RETRY_MAX", 24 * 3600)
+RETRY_ATTEMPTS = _setting("CRAWLER_RETRY_ATTEMPTS", 5)
+RETRY_BATCH = _setting("CRAWLER_RETRY_BATCH", 200)       # số URL tối đa mỗi tick beat
+RETRY_LEASE = _setting("CRAWLER_INFLIGHT_TTL", 30 * 60)  # giây "giữ chỗ" URL đã phát lại
+JITTER = 0.2
+
+
+def _key(url: str) -> str:
+    return canonical.canonicalize(url) or url
+
+
+def classify(exc: BaseException) -> tuple[bool, int | None] | None:
+    """(vĩnh viễn?, HTTP status) của lỗi; None = không tính cho URL."""
+    from crawler.http_client import ResponseTooLarge, RobotsDisallowed
+
+    if isinstance(exc, (HostUnavailable, ReplayMiss)):
+        return None
+    if isinstance(exc, (RobotsDisallowed, ResponseTooLarge)):
+        return True, None
+    response = getattr(exc, "response", None)
+    status = response.status_code if isinstance(exc, requests.HTTPError) and response is not None else None
+    if status is not None:
+        return status in PERMANENT_STATUSES, status
+    return False, None
+
+
+def _retry_at(attempts: int, now):
+    wait = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+    return now + timedelta(seconds=wait * (1 + random.uniform(-JITTER, JITTER)))
+
+
+def record(url: str, exc: BaseException, source_id: int | None = None, kind: str = "page"):
+    """Ghi 1 lần lỗi của URL; trả về DeadLetter (None nếu lỗi không tính cho URL)."""
+    from crawler.models import DeadLetter
+
+    verdict = classify(exc)
+    if verdict is None or not url:
+        return None
+    permanent, status = verdict
+    now = timezone.now()
+    row, _ = DeadLetter.objects.get_or_create(url=_key(url)[:1000], defaults={"kind": kind, "source_id": source_id})
+    row.attempts += 1
+    row.status_code = status
+    row.error = (str(exc) or exc.__class__.__name__)[:2000]
+    row.dead = permanent or row.attempts >= RETRY_ATTEMPTS
+    row.retry_at = None if row.dead else _retry_at(row.attempts, now)
+    row.save()
+    return row
+
+
+def record_many(errors: dict, source_id: int | None = None, kind: str = "image") -> int:
+    """{url: exception} -> số dòng đã ghi."""
+    return sum(1 for url, exc in errors.items() if record(url, exc, source_id=source_id, kind=kind))
+
+
+def holds(urls) -> dict[str, bool]:
+    """{URL (dạng truyền vào): dead?} của URL đang dead hoặc chưa tới hạn thử lại."""
+    from django.db.models import Q
+
+    from crawler.models import DeadLetter
+
+    keys = {u: _key(u) for u in urls if u}
+    if not keys:
+        return {}
+    held = dict(
+        DeadLetter.objects.filter(url__in=set(keys.values()))
+        .filter(Q(dead=True) | Q(retry_at__gt=timezone.now()))
+        .values_list("url", "dead")
+    )
+    return {u: held[k] for u, k in keys.items() if k in held} if held else {}
+
+
+def blocked(urls) -> set[str]:
+    """URL (dạng truyền vào) đang dead hoặc chưa tới hạn thử lại."""
+    return set(holds(urls))
+
+
+def due(now=None, limit: int = RETRY_BATCH) -> dict[int, list[str]]:
+    """
+    {source_id: [URL]} trang bài đã tới retry_at, đã "giữ chỗ" retry_at = now + RETRY_LEASE
+    để tick sau không phát lại trong lúc task còn chạy (lỗi tiếp -> record() ghi lịch mới,
+    thành công -> purge_resolved() xoá dòng).
+    """
+    from crawler.models import DeadLetter
+
+    now = now or timezone.now()
+    rows = list(
+        DeadLetter.objects.filter(kind="page", dead=False, retry_at__lte=now, source__isnull=False)
+        .order_by("retry_at").values_list("id", "source_id", "url")[:limit]
+    )
+    if not rows:
+        return {}
+    DeadLetter.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(retry_at=now + timedelta(seconds=RETRY_LEASE))
+    out: dict[int, list[str]] = {}
+    for _, source_id, url in rows:
+        out.setdefault(source_id, []).append(url)
+    return out
+
+
+def purge_resolved() -> int:
+    """Xoá dòng đang chờ thử lại mà URL đã thành bài (lần thử lại thành công)."""
+    from articles.models import Article
+
+    from crawler.models import DeadLetter
+
+    done = Article.objects.filter(source_url__isnull=False).values("source_url")
+    return DeadLetter.objects.filter(dead=False, kind="page", url__in=done).delete()[0]
@@ -0,0 +1,306 @@
+# crawler/document.py
+"""
+Fetch-once / parse-once cho 1 bài báo.
+
+- `FetchedPage`: bytes gốc + header của đúng 1 lần tải.
+- `ParsedDocument`: 1 cây lxml duy nhất; title, metadata, readability summary,
+  text trafilatura, ảnh meta, nội dung sạch (content_html/blocks/excerpt…)
+  đều được tính lười (lazy) và nhớ lại (cached_property).
+- `timings`: thời gian cộng dồn theo từng stage (giây) để đo/so sánh.
+- `profile` (crawler.profiles): nguồn có selector riêng -> thân bài, title,
+  metadata lấy thẳng từ cây, không chạy readability/trafilatura; profile trượt
+  thì quay về đường chung.
+- `snapshot()` / `from_snapshot()`: phần chỉ tốn CPU (parse, readability,
+  trafilatura, sanitize) tính ở process khác rồi dựng lại doc ở thread mirror
+  ảnh / ghi DB (crawler.pipeline).
+"""
+from __future__ import annotations
+
+import codecs
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import lxml.html
+import requests
+from django.utils.functional import cached_property   # không khoá: functools (3.11) khoá chung mọi instance
+from readability import Document
+from trafilatura import extract
+from trafilatura.metadata import extract_metadata
+
+from crawler import sanitize
+from crawler.canonical import pick_canonical
+from crawler.http_client import REQUEST_TIMEOUT, CrawlerClient, get_client
+from crawler.profiles import Profile, ProfileResult
+from crawler.utils import _abs_url, _rewrite_images_to_media
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?\s*([\w-]+)""", re.I)
+
+# ảnh đại diện: og:image -> og:image:secure_url -> twitter:image -> itemprop=image -> link image_src
+_META_IMAGE_XPATHS = (
+    ('//meta[@property="og:image"]', "content"),
+    ('//meta[@property="og:image:secure_url"]', "content"),
+    ('//meta[@name="twitter:image"]', "content"),
+    ('//meta[@itemprop="image"]', "content"),
+    ('//link[@rel="image_src"]', "href"),
+)
+
+_CANONICAL_XPATHS = (
+    ('//link[@rel="canonical"]', "href"),
+    ('//meta[@property="og:url"]', "content"),
+)
+
+# cached_property chuyển nguyên giá trị qua snapshot (đều picklable)
+_SNAPSHOT_FIELDS = ("profiled", "summary_html", "short_title", "text", "canonical_url", "meta_image")
+_METADATA_ATTRS = ("title", "description", "image", "date")
+
+
+def _known_codec(name: str) -> bool:
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return False
+    return True
+
+
+@dataclass
+class FetchedPage:
+    url: str
+    content: bytes
+    status: int = 200
+    headers: dict = field(default_factory=dict)
+    final_url: str = ""
+    encoding: str | None = None   # charset từ Content-Type (nếu có)
+    elapsed: float = 0.0
+
+    @classmethod
+    def from_html(cls, url: str, html: str) -> "FetchedPage":
+        """Bọc HTML đã có sẵn (engine, crawl_once…) thành FetchedPage."""
+        return cls(url=url, content=html.encode("utf-8"), final_url=url, encoding="utf-8")
+
+    @classmethod
+    def from_response(cls, url: str, r: requests.Response, elapsed: float = 0.0) -> "FetchedPage":
+        ctype = r.headers.get("Content-Type", "")
+        return cls(
+            url=url,
+            content=r.content,
+            status=r.status_code,
+            headers=dict(r.headers),
+            final_url=r.url,
+            encoding=r.encoding if "charset" in ctype.lower() else None,
+            elapsed=elapsed or r.elapsed.total_seconds(),
+        )
+
+    @cached_property
+    def charset(self) -> str:
+        """Content-Type -> <meta charset> -> utf-8; tên codec Python không biết thì bỏ qua."""
+        m = _META_CHARSET_RE.search(self.content[:4096])
+        for name in (self.encoding, m.group(1).decode("ascii", "ignore") if m else None):
+            if name and _known_codec(name):
+                return name.lower()
+        return "utf-8"
+
+    @cached_property
+    def text(self) -> str:
+        return self.content.decode(self.charset, errors="replace")
+
+
+def fetch_page(url: str, timeout=REQUEST_TIMEOUT, client: CrawlerClient | None = None) -> FetchedPage:
+    """Tải trang đúng 1 lần (qua client dùng chung). Raise requests.HTTPError nếu status lỗi."""
+    t0 = time.perf_counter()
+    r = (client or get_client()).get(url, kind="page", timeout=timeout)
+    r.raise_for_status()
+    return FetchedPage.from_response(url, r, elapsed=time.perf_counter() - t0)
+
+
+class ParsedDocument:
+    def __init__(self, page: FetchedPage, mirror_images: bool = True, profile: Profile | None = None,
+                 fetch_images: bool = True):
+        self.page = page
+        self.url = page.url
+        self.mirror_images = mirror_images
+        self.fetch_images = fetch_images    # False: chỉ map ảnh đã mirror, không tải ảnh mới
+        self.profile = profile
+        self.timings: dict[str, float] = defaultdict(float)
+        if page.elapsed:
+            self.timings["fetch"] += page.elapsed
+        # giá trị người gọi tính sẵn ở process khác (vd: crawler.tasks._prepare_page)
+        self.precomputed: dict = {}
+        self._clean_html: str | None = None   # HTML đã sanitize từ snapshot
+
+    @contextmanager
+    def timed(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - t0
+
+    # ---------- 1 lần parse ----------
+    @cached_property
+    def tree(self):
+        with self.timed("parse"):
+            try:
+                try:
+                    parser = lxml.html.HTMLParser(encoding=self.page.charset)
+                except LookupError:
+                    # codec Python biết nhưng libxml2 không -> parse text Python đã decode
+                    return lxml.html.document_fromstring(self.page.text)
+                return lxml.html.document_fromstring(self.page.content, parser=parser)
+            except Exception:
+                return lxml.html.document_fromstring("<html><body></body></html>")
+
+    # ---------- Các phần suy ra từ cây (lazy + memoized) ----------
+    @cached_property
+    def profiled(self) -> ProfileResult | None:
+        """Kết quả theo profile của nguồn; None = không có profile hoặc selector trượt."""
+        if self.profile is None:
+            return None
+        with self.timed("profile"):
+            try:
+                return self.profile.extract(self.tree, self.url)
+            except Exception:
+                return None
+
+    @cached_property
+    def _readability(self) -> Document | None:
+        # readability tự deepcopy cây khi clean -> không làm bẩn self.tree
+        try:
+            return Document(self.tree)
+        except Exception:
+            return None
+
+    @cached_property
+    def summary_html(self) -> str:
+        """HTML phần thân bài theo profile / readability (chưa sanitize)."""
+        if self.profiled is not None:
+            return self.profiled.body_html
+        with self.timed("readability"):
+            try:
+                return self._readability.summary(html_partial=True)
+            except Exception:
+                return ""
+
+    @cached_property
+    def short_title(self) -> str:
+        if self.profiled is not None:
+            return self.profiled.title
+        with self.timed("readability"):
+            try:
+                return (self._readability.short_title() or "").strip()
+            except Exception:
+                return ""
+
+    @cached_property
+    def metadata(self):
+        if self.profiled is not None:
+            return self.profiled      # cùng thuộc tính title/description/image/date
+        with self.timed("metadata"):
+            try:
+                return extract_metadata(self.tree, self.url)
+            except Exception:
+                return None
+
+    @cached_property
+    def text(self) -> str:
+        """Plain text theo profile / trafilatura (trafilatura 2.x làm việc trên bản copy của cây)."""
+        if self.profiled is not None:
+            return self.profiled.text
+        with self.timed("trafilatura"):
+            try:
+                return extract(self.tree, include_comments=False, include_links=False) or ""
+            except Exception:
+                return ""
+
+    @cached_property
+    def title(self) -> str:
+        return (getattr(self.metadata, "title", None) or "").strip() or self.short_title
+
+    @cached_property
+    def description(self) -> str:
+        return (getattr(self.metadata, "description", None) or "").strip()
+
+    @cached_property
+    def meta_image(self) -> str | None:
+        with self.timed("meta_image"):
+            for xp, attr in _META_IMAGE_XPATHS:
+                for el in self.tree.xpath(xp):
+                    if el.get(attr):
+                        return el.get(attr)
+            return None
+
+    @cached_property
+    def canonical_url(self) -> str:
+        """URL chuẩn của bài (rel=canonical / og:url nếu hợp lệ, không thì URL đã tải)."""
+        declared = None
+        for xp, attr in _CANONICAL_XPATHS:
+            declared = next((el.get(attr) for el in self.tree.xpath(xp) if el.get(attr)), None)
+            if declared:
+                break
+        return pick_canonical(self.page.final_url or self.url, declared) or self.url
+
+    # ---------- Nội dung sạch ----------
+    @cached_property
+    def _cleaned(self) -> sanitize.CleanHTML:
+        """Thân bài đã sanitize + chuẩn hoá ảnh/tên file (crawler.sanitize, 1 lượt duyệt lxml)."""
+        with self.timed("sanitize"):
+            if self._clean_html is not None:
+                return sanitize.parse(self._clean_html)
+            return sanitize.clean(self.summary_html or self.page.text, base_url=self.url)
+
+    @cached_property
+    def content(self) -> dict:
+        """
+        Cùng format với utils.fetch_and_extract:
+        { title, excerpt, content_html, main_image_url, main_image_caption, blocks }
+        """
+        cleaned = self._cleaned
+        hero_url, hero_cap = None, ""
+        if self.mirror_images:
+            with self.timed("images"):
+                hero_url, hero_cap = _rewrite_images_to_media(cleaned, base_url=self.url, fetch=self.fetch_images)
+
+        with self.timed("blocks"):
+            rendered = cleaned.render()
+
+        return {
+            "title": self.short_title,
+            "excerpt": rendered.excerpt,
+            "content_html": rendered.html,
+            "main_image_url": hero_url or _abs_url(self.url, self.meta_image),
+            "main_image_caption": hero_cap,
+            "blocks": rendered.blocks,
+        }
+
+    # ---------- Chuyển qua process khác (crawler.pipeline) ----------
+    def snapshot(self) -> dict:
+        """
+        Tính mọi phần chỉ cần CPU (parse, profile/readability, metadata, trafilatura,
+        sanitize) -> dict picklable, dựng lại bằng `from_snapshot`. Không gồm mirror
+        ảnh / blocks (cần mạng + DB, tính sau ở `content`).
+        """
+        snap = {name: getattr(self, name) for name in _SNAPSHOT_FIELDS}
+        meta = self.metadata
+        snap["metadata"] = None if meta is None else {k: getattr(meta, k, None) for k in _METADATA_ATTRS}
+        snap["clean_html"] = self._cleaned.html
+        snap["precomputed"] = dict(self.precomputed)
+        snap["timings"] = {k: v for k, v in self.timings.items() if k != "fetch"}
+        return snap
+
+    @classmethod
+    def from_snapshot(cls, page: FetchedPage, snap: dict, mirror_images: bool = True,
+                      fetch_images: bool = True) -> "ParsedDocument":
+        """Doc từ `snapshot()` của process khác: không parse lại cây, chỉ parse lại HTML sạch khi cần."""
+        doc = cls(page, mirror_images=mirror_images, fetch_images=fetch_images)
+        for name in _SNAPSHOT_FIELDS:
+            doc.__dict__[name] = snap[name]
+        meta = snap["metadata"]
+        doc.__dict__["metadata"] = None if meta is None else SimpleNamespace(**meta)
+        doc._clean_html = snap["clean_html"]
+        doc.precomputed = dict(snap.get("precomputed") or {})
+        for k, v in snap["timings"].items():
+            doc.timings[k] += v
+        return doc
@@ -0,0 +1,234 @@
+# crawler/engine.py
+"""
+Engine crawl bất đồng bộ (asyncio) cho `crawl_now` / `crawl_recent --sync`.
+
+- Tải RSS + HTML bài song song, giới hạn bằng 1 semaphore toàn cục
+  (`concurrency`) và 1 semaphore cho mỗi host (`per_host`).
+- Vòng lặp asyncio chạy ở thread riêng; trang đã tải được đẩy qua hàng đợi
+  có giới hạn về thread gọi `run()`, nơi chạy code trích xuất/lưu DB sẵn có
+  (ORM của Django không dùng được trong event loop, và SQLite chỉ có 1 writer).
+"""
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+from urllib.parse import urlparse
+
+from django.db import connections
+
+from crawler.document import FetchedPage
+from crawler.feeds import FeedPoll, conditional_get
+from crawler.http_client import REQUEST_TIMEOUT, get_client
+
+
+@dataclass
+class FeedJob:
+    source_id: int
+    name: str
+    rss_url: str
+    etag: str = ""
+    last_modified: str = ""
+    feed_hash: str = ""
+    feed_bytes: int = 0
+    extract_profile: dict = field(default_factory=dict)   # Source.extract_profile (crawler.pipeline)
+
+    @classmethod
+    def from_source(cls, src, force: bool = False) -> "FeedJob":
+        """`force=True`: bỏ qua validator đã lưu (luôn tải lại feed)."""
+        profile = src.extract_profile or {}
+        if force:
+            return cls(src.id, src.name, src.rss_url, extract_profile=profile)
+        return cls(src.id, src.name, src.rss_url, src.feed_etag, src.feed_last_modified,
+                   src.feed_hash, src.feed_bytes, extract_profile=profile)
+
+
+@dataclass
+class FeedResult:
+    job: FeedJob
+    entries: list = field(default_factory=list)
+    error: str = ""
+    poll: FeedPoll | None = None
+
+    @property
+    def skipped(self) -> bool:
+        return bool(self.poll and self.poll.skipped)
+
+
+@dataclass
+class PageResult:
+    source_id: int
+    url: str
+    published: str | None
+    page: FetchedPage | None = None
+    error: str = ""
+    elapsed: float = 0.0
+    exc: Exception | None = field(default=None, repr=False)   # để phân loại lỗi (crawler.deadletter)
+
+
+@dataclass
+class EngineStats:
+    feeds: int = 0
+    feeds_skipped: int = 0
+    pages: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+
+_DONE = object()
+
+
+class CrawlEngine:
+    """
+    engine = CrawlEngine(concurrency=16, per_host=4, limit=50)
+    stats = engine.run(jobs, on_page=..., on_feed=...)
+
+    `entry_filter(entry) -> bool` để lọc entry (vd: theo thời gian ở crawl_recent).
+    `entries_hook(job, entries) -> entries` chạy trong thread pool (được dùng ORM),
+    vd: bỏ các URL đã có trong DB trước khi tải trang.
+    """
+
+    def __init__(self, concurrency: int = 8, per_host: int = 2, limit: int = 50,
+                 timeout=REQUEST_TIMEOUT,
+                 entry_filter: Callable[[dict], bool] | None = None,
+                 entries_hook: Callable[[FeedJob, list], list] | None = None):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.limit = limit
+        self.timeout = timeout
+        self.entry_filter = entry_filter
+        self.entries_hook = entries_hook
+        # pool keep-alive + rate limit theo host + robots.txt: dùng client chung
+        self._client = get_client()
+
+    # ---------- HTTP (chạy trong thread pool) ----------
+    def _get_page(self, url: str) -> FetchedPage:
+        r = self._client.get(url, kind="page", timeout=self.timeout)
+        r.raise_for_status()
+        return FetchedPage.from_response(url, r)
+
+    # ---------- asyncio ----------
+    async def _bounded(self, url: str, fn, *args):
+        host = urlparse(url).netloc
+        sem = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with self._global, sem:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, url, *args)
+
+    async def _emit(self, item) -> None:
+        # put() chặn khi consumer chậm -> backpressure cho phía tải
+        await asyncio.get_running_loop().run_in_executor(None, self._out.put, item)
+
+    async def _fetch_page(self, source_id: int, url: str, published: str | None) -> None:
+        if self._stop.is_set():
+            return
+        t0 = time.perf_counter()
+        try:
+            page = await self._bounded(url, self._get_page)
+            res = PageResult(source_id, url, published, page=page)
+        except Exception as e:
+            res = PageResult(source_id, url, published, error=str(e) or e.__class__.__name__, exc=e)
+        res.elapsed = time.perf_counter() - t0
+        await self._emit(res)
+
+    def _poll(self, url: str, job: FeedJob) -> FeedPoll:
+        return conditional_get(url, job.etag, job.last_modified, job.feed_hash, job.feed_bytes,
+                               client=self._client, timeout=self.timeout)
+
+    def _run_hook(self, job: FeedJob, entries: list) -> list:
+        try:
+            return self.entries_hook(job, entries)
+        finally:
+            connections.close_all()  # chỉ đóng connection của thread pool hiện tại
+
+    async def _crawl_feed(self, job: FeedJob) -> None:
+        poll = await self._bounded(job.rss_url, self._poll, job)
+        if poll.error or poll.skipped:
+            await self._emit(FeedResult(job, error=poll.error, poll=poll))
+            return
+
+        picked = []
+        for e in poll.entries[:self.limit]:
+            if not e.get("link"):
+                continue
+            if self.entry_filter and not self.entry_filter(e):
+                continue
+            picked.append(e)
+        if self.entries_hook and picked:
+            picked = await asyncio.get_running_loop().run_in_executor(
+                self._pool, self._run_hook, job, picked)
+        await self._emit(FeedResult(job, entries=picked, poll=poll))
+
+        await asyncio.gather(*(
+            self._fetch_page(job.source_id, e.get("link"), e.get("published") or e.get("updated"))
+            for e in picked
+        ))
+
+    async def _main(self, jobs: list[FeedJob]) -> None:
+        self._global = asyncio.Semaphore(self.concurrency)
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        try:
+            await asyncio.gather(*(self._crawl_feed(j) for j in jobs))
+        finally:
+            await self._emit(_DONE)
+            self._done_sent = True
+
+    def _thread_main(self, jobs: list[FeedJob]) -> None:
+        self._done_sent = False
+        try:
+            asyncio.run(self._main(jobs))
+        finally:
+            if not self._done_sent:
+                self._out.put(_DONE)
+
+    # ---------- API ----------
+    def run(self, jobs: Iterable[FeedJob],
+            on_page: Callable[[PageResult], object],
+            on_feed: Callable[[FeedResult], object] | None = None,
+            on_error: Callable[[PageResult], object] | None = None) -> EngineStats:
+        jobs = list(jobs)
+        stats = EngineStats()
+        self._out: queue.Queue = queue.Queue(maxsize=self.concurrency * 2)
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crawl-io")
+        self._stop = threading.Event()
+
+        t0 = time.perf_counter()
+        th = threading.Thread(target=self._thread_main, args=(jobs,), name="crawl-engine", daemon=True)
+        th.start()
+        finished = False
+        try:
+            while True:
+                item = self._out.get()
+                if item is _DONE:
+                    finished = True
+                    break
+                if isinstance(item, FeedResult):
+                    stats.feeds += 1
+                    stats.feeds_skipped += int(item.skipped)
+                    if on_feed:
+                        on_feed(item)
+                    continue
+                if item.error:
+                    stats.failed += 1
+                    if on_error:
+                        on_error(item)
+                    continue
+                on_page(item)
+                stats.pages += 1
+        finally:
+            if not finished:
+                # consumer lỗi giữa chừng: dừng tải mới, xả hàng đợi để thread engine kết thúc
+                self._stop.set()
+                while self._out.get() is not _DONE:
+                    pass
+            th.join()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        stats.elapsed = time.perf_counter() - t0
+        return stats
@@ -0,0 +1,151 @@
+# crawler/feeds.py
+"""
+Poll RSS với conditional GET (ETag / Last-Modified) + hash nội dung.
+
+- Gửi If-None-Match / If-Modified-Since từ validator đã lưu trên Source.
+- 304 hoặc body trùng hash lần trước -> bỏ qua cả feed (không duyệt entry,
+  không fan-out task).
+- Validator mới chỉ được ghi (`FeedPoll.save_to`) sau khi entry đã được xử lý
+  và không bài nào lỗi / bị hoãn (dead-letter chờ thử lại): nếu không, lần poll
+  sau feed trả 304 / trùng hash và bài lỗi tạm thời không bao giờ được thử lại.
+  Khi đó chỉ ghi lịch poll, validator cũ giữ nguyên.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+
+import feedparser
+
+from crawler.http_client import REQUEST_TIMEOUT, CrawlerClient, get_client
+
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"   # server trả 304
+UNCHANGED = "unchanged"         # 200 nhưng body trùng hash
+ERROR = "error"
+
+
+@dataclass
+class FeedPoll:
+    status: str
+    entries: list = field(default_factory=list)
+    etag: str = ""
+    last_modified: str = ""
+    content_hash: str = ""
+    bytes: int = 0           # số byte thực tải về
+    saved_bytes: int = 0     # ước lượng byte tiết kiệm được (304)
+    error: str = ""
+
+    @property
+    def skipped(self) -> bool:
+        return self.status in (NOT_MODIFIED, UNCHANGED)
+
+    def validator_fields(self) -> dict:
+        """Field validator của Source sau lần poll này ({} nếu feed lỗi)."""
+        fields = {}
+        if self.status == ERROR:
+            return fields
+        if self.etag:
+            fields["feed_etag"] = self.etag
+        if self.last_modified:
+            fields["feed_last_modified"] = self.last_modified
+        if self.content_hash:
+            fields["feed_hash"] = self.content_hash
+        if self.bytes:
+            fields["feed_bytes"] = self.bytes
+        return fields
+
+    def save_to(self, source_id: int, validators: bool = True) -> None:
+        """
+        Ghi validator mới + lịch poll kế tiếp (crawler/scheduler.py) lên Source, 1 UPDATE.
+        `validators=False`: còn entry lỗi / bị hoãn -> chỉ ghi lịch, giữ validator cũ
+        để lần poll sau vẫn duyệt lại feed.
+        """
+        from crawler import scheduler
+        from sources.models import Source
+
+        fields = scheduler.plan_for(source_id, self)
+        if validators:
+            fields.update(self.validator_fields())    # feed lỗi: giữ validator cũ, chỉ lùi lịch
+        if fields:
+            Source.objects.filter(pk=source_id).update(**fields)
+
+
+def conditional_get(url: str, etag: str = "", last_modified: str = "", old_hash: str = "",
+                    old_bytes: int = 0, client: CrawlerClient | None = None,
+                    timeout=REQUEST_TIMEOUT) -> FeedPoll:
+    """Tải + parse 1 feed; không truy cập DB (dùng được trong thread bất kỳ)."""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        r = (client or get_client()).get(url, kind="feed", headers=headers, timeout=timeout)
+        if r.status_code == 304:
+            return FeedPoll(NOT_MODIFIED, etag=r.headers.get("ETag", etag),
+                            last_modified=r.headers.get("Last-Modified", last_modified),
+                            saved_bytes=old_bytes)
+        r.raise_for_status()
+    except Exception as e:
+        return FeedPoll(ERROR, error=str(e) or e.__class__.__name__)
+
+    body = r.content
+    poll = FeedPoll(
+        FETCHED,
+        etag=r.headers.get("ETag", ""),
+        last_modified=r.headers.get("Last-Modified", ""),
+        content_hash=hashlib.sha256(body).hexdigest(),
+        bytes=len(body),
+    )
+    if old_hash and poll.content_hash == old_hash:
+        poll.status = UNCHANGED
+        return poll
+    poll.entries = feedparser.parse(body).entries or []
+    return poll
+
+
+def poll_feed(src, force: bool = False, client: CrawlerClient | None = None) -> FeedPoll:
+    """Poll feed của 1 Source. `force=True` bỏ qua validator (luôn tải + xử lý)."""
+    if force:
+        return conditional_get(src.rss_url, client=client)
+    return conditional_get(
+        src.rss_url,
+        etag=src.feed_etag,
+        last_modified=src.feed_last_modified,
+        old_hash=src.feed_hash,
+        old_bytes=src.feed_bytes,
+        client=client,
+    )
+
+
+@dataclass
+class PollStats:
+    """Đếm số lần poll / bỏ qua trong 1 lượt chạy."""
+    polled: int = 0
+    not_modified: int = 0
+    unchanged: int = 0
+    errors: int = 0
+    bytes: int = 0
+    saved_bytes: int = 0
+
+    @property
+    def skipped(self) -> int:
+        return self.not_modified + self.unchanged
+
+    def add(self, poll: FeedPoll) -> None:
+        self.polled += 1
+        self.bytes += poll.bytes
+        if poll.status == NOT_MODIFIED:
+            self.not_modified += 1
+            self.saved_bytes += poll.saved_bytes
+        elif poll.status == UNCHANGED:
+            self.unchanged += 1
+        elif poll.status == ERROR:
+            self.errors += 1
+
+    def __str__(self) -> str:
+        return (f"feeds polled={self.polled} skipped={self.skipped} "
+                f"(304={self.not_modified}, unchanged={self.unchanged}) errors={self.errors} "
+                f"downloaded={self.bytes / 1024:.0f}KB saved~{self.saved_bytes / 1024:.0f}KB")
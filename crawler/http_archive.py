@@ -0,0 +1,197 @@
+# crawler/http_archive.py
+"""
+Ghi / phát lại response HTTP của crawler (feed, trang bài, robots.txt, ảnh).
+
+- 1 file SQLite, mỗi URL 1 dòng, khoá = canonical.canonicalize(url) (biến thể
+  utm_*, m./amp. dùng chung 1 bản ghi); body lưu đã giải nén gzip của server
+  rồi nén zlib.
+- record: client tải thật như bình thường và ghi lại mọi response (trừ 304).
+- replay: client không ra mạng, trả response từ archive; giả lập độ trễ
+  (cố định hoặc đúng thời gian lúc ghi) + băng thông; URL không có trong
+  archive -> `ReplayMiss` (coi như lỗi kết nối). If-None-Match /
+  If-Modified-Since khớp validator đã ghi -> 304 như server thật.
+
+Bật bằng CRAWLER_HTTP_MODE=record|replay + CRAWLER_HTTP_ARCHIVE=<file>, hoặc
+`crawl_now --record-http FILE` / `--replay-http FILE`.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import timedelta
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from crawler.canonical import canonicalize
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# body đã giải nén -> các header mô tả encoding/độ dài cũ không còn đúng
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS response (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT '',
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    elapsed REAL NOT NULL DEFAULT 0,
+    recorded_at REAL NOT NULL
+)
+"""
+
+
+class ReplayMiss(requests.ConnectionError):
+    """URL không có trong archive khi replay."""
+
+
+@dataclass
+class Recorded:
+    url: str
+    status: int
+    headers: dict
+    body: bytes
+    elapsed: float = 0.0
+
+
+@dataclass
+class ArchiveStats:
+    recorded: int = 0
+    hits: int = 0
+    misses: int = 0
+    not_modified: int = 0
+    bytes: int = 0            # body đã giải nén (ghi hoặc phát lại)
+    stored_bytes: int = 0     # sau nén zlib (chỉ khi ghi)
+    simulated_wait: float = 0.0
+
+    def __str__(self) -> str:
+        ratio = f", nén còn {self.stored_bytes / self.bytes:.0%}" if self.stored_bytes and self.bytes else ""
+        return (f"http archive: ghi {self.recorded}, hit {self.hits} (304: {self.not_modified}), "
+                f"miss {self.misses}, {self.bytes / 1024:.0f}KB{ratio}, chờ giả lập {self.simulated_wait:.1f}s")
+
+
+def key(url: str) -> str:
+    return canonicalize(url) or url
+
+
+class HttpArchive:
+    """Đọc/ghi archive từ nhiều thread (1 connection SQLite + lock)."""
+
+    def __init__(self, path, latency: float | None = 0.0, bandwidth: float = 0.0):
+        self.path = str(path)
+        self.latency = latency          # None = dùng thời gian thật lúc ghi
+        self.bandwidth = bandwidth      # byte/giây, 0 = không giới hạn
+        self.stats = ArchiveStats()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM response").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # ---------- record ----------
+    def put(self, url: str, r: requests.Response, kind: str = "", elapsed: float = 0.0) -> None:
+        if r.status_code == 304:
+            return              # giữ bản 200 đã ghi trước đó
+        body = r.content or b""
+        headers = {k: v for k, v in r.headers.items() if k.lower() not in _DROP_HEADERS}
+        packed = zlib.compress(body, 6)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO response (key, url, kind, status, headers, body, size, elapsed, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key(url), r.url or url, kind, r.status_code, json.dumps(headers), packed, len(body),
+                 elapsed, time.time()),
+            )
+            self._db.commit()
+            self.stats.recorded += 1
+            self.stats.bytes += len(body)
+            self.stats.stored_bytes += len(packed)
+
+    # ---------- replay ----------
+    def get(self, url: str) -> Recorded | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, headers, body, elapsed FROM response WHERE key = ?", (key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        return Recorded(row[0], row[1], json.loads(row[2]), zlib.decompress(row[3]), row[4])
+
+    def replay(self, url: str, headers: dict | None = None) -> requests.Response:
+        rec = self.get(url)
+        if rec is None:
+            with self._lock:
+                self.stats.misses += 1
+            raise ReplayMiss(f"không có trong archive: {url}")
+
+        req = CaseInsensitiveDict(headers or {})
+        saved = CaseInsensitiveDict(rec.headers)
+        not_modified = rec.status == 200 and (
+            (req.get("If-None-Match") and req["If-None-Match"] == saved.get("ETag"))
+            or (req.get("If-Modified-Since") and req["If-Modified-Since"] == saved.get("Last-Modified"))
+        )
+        body = b"" if not_modified else rec.body
+
+        wait = rec.elapsed if self.latency is None else self.latency
+        if self.bandwidth:
+            wait += len(body) / self.bandwidth
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self.stats.hits += 1
+            self.stats.not_modified += int(bool(not_modified))
+            self.stats.bytes += len(body)
+            self.stats.simulated_wait += wait
+
+        r = requests.Response()
+        r.status_code = 304 if not_modified else rec.status
+        r.headers = CaseInsensitiveDict({**rec.headers, "Content-Length": str(len(body))})
+        r.url = rec.url
+        r.reason = "Not Modified" if not_modified else "OK" if rec.status < 400 else "Replayed"
+        r.encoding = get_encoding_from_headers(r.headers)
+        r.elapsed = timedelta(seconds=wait)
+        r._content = body
+        r._content_consumed = True
+        return r
+
+
+# ---------- dùng chung cho các lệnh crawl ----------
+def add_arguments(parser) -> None:
+    parser.add_argument("--record-http", metavar="FILE",
+                        help="Ghi mọi response (feed, trang, ảnh, robots.txt) vào archive FILE")
+    parser.add_argument("--replay-http", metavar="FILE",
+                        help="Không ra mạng: phát lại response từ archive FILE")
+    parser.add_argument("--replay-latency", default="0",
+                        help="Với --replay-http: độ trễ mỗi request (giây) hoặc 'recorded' = như lúc ghi")
+    parser.add_argument("--replay-bandwidth", type=float, default=0,
+                        help="Với --replay-http: băng thông giả lập KB/s mỗi request (0 = không giới hạn)")
+
+
+def apply_options(client, opts) -> HttpArchive | None:
+    """Bật record/replay trên client theo tuỳ chọn dòng lệnh; trả về archive (nếu có)."""
+    if opts.get("replay_http"):
+        latency = opts.get("replay_latency") or "0"
+        client.use_archive(REPLAY, opts["replay_http"],
+                           latency=None if latency == "recorded" else float(latency),
+                           bandwidth=(opts.get("replay_bandwidth") or 0) * 1024)
+    elif opts.get("record_http"):
+        client.use_archive(RECORD, opts["record_http"])
+    return client.archive
@@ -0,0 +1,342 @@
+# crawler/http_client.py
+"""
+HTTP client dùng chung cho crawler (feed, trang bài, ảnh).
+
+- 1 `requests.Session` mỗi process (fork-safe cho Celery prefork), pool
+  keep-alive theo host.
+- Token bucket mỗi domain (lịch sự với publisher), tự hạ tốc theo
+  `Crawl-delay` trong robots.txt.
+- robots.txt được cache theo host (TTL), URL bị cấm -> `RobotsDisallowed`.
+- Timeout + retry thống nhất (urllib3 Retry, tôn trọng Retry-After).
+- Bộ đếm theo host: số request, lỗi, byte, tổng/max latency.
+- Body đọc theo chunk với trần `CRAWLER_MAX_PAGE_BYTES` (feed/trang bài);
+  ảnh thì caller tự stream (`stream=True`, xem crawler.media.store_stream).
+- Ghi / phát lại response qua archive (crawler.http_archive, `use_archive`)
+  để chạy lại 1 lượt crawl không cần mạng.
+- Circuit breaker theo host (crawler.breaker): host lỗi liên tiếp bị ngắt,
+  request tới đó fail ngay bằng `HostUnavailable` thay vì chờ timeout.
+
+    from crawler.http_client import get_client
+    r = get_client().get(url, kind="page")
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+from crawler import breaker, http_archive
+
+USER_AGENT = "VNNewsBot/1.0 (+contact@example.com) Chrome/127.0"
+HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+CONNECT_TIMEOUT = _setting("CRAWLER_CONNECT_TIMEOUT", 5)
+READ_TIMEOUT = _setting("CRAWLER_READ_TIMEOUT", 20)
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)  # (connect, read) giây
+
+
+class RobotsDisallowed(requests.RequestException):
+    """URL bị robots.txt cấm với User-Agent của crawler."""
+
+
+class ResponseTooLarge(requests.RequestException):
+    """Body vượt giới hạn byte cho phép."""
+
+
+def read_capped(r: requests.Response, max_bytes: int, chunk_size: int = 64 * 1024) -> bytes:
+    """Đọc body theo chunk, bỏ ngang khi vượt `max_bytes` (tính sau giải nén gzip)."""
+    declared = int(r.headers.get("Content-Length") or 0)
+    if declared > max_bytes:
+        r.close()
+        raise ResponseTooLarge(f"{r.url}: Content-Length {declared} > {max_bytes}", response=r)
+    buf = bytearray()
+    for chunk in r.iter_content(chunk_size):
+        buf += chunk
+        if len(buf) > max_bytes:
+            r.close()
+            raise ResponseTooLarge(f"{r.url}: body > {max_bytes} bytes", response=r)
+    return bytes(buf)
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    errors: int = 0
+    bytes: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.requests if self.requests else 0.0
+
+
+class TokenBucket:
+    """`rate` request/giây, cho phép dồn tối đa `burst` request."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.001)
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Chặn tới khi có token; trả về số giây đã chờ."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CrawlerClient:
+    def __init__(self, rate: float | None = None, burst: int | None = None,
+                 retries: int | None = None, pool_maxsize: int | None = None,
+                 obey_robots: bool | None = None, robots_ttl: int | None = None,
+                 timeout=REQUEST_TIMEOUT):
+        self.rate = rate if rate is not None else _setting("CRAWLER_HOST_RATE", 4.0)
+        self.burst = burst if burst is not None else _setting("CRAWLER_HOST_BURST", 8)
+        self.obey_robots = obey_robots if obey_robots is not None else _setting("CRAWLER_OBEY_ROBOTS", True)
+        self.robots_ttl = robots_ttl if robots_ttl is not None else _setting("CRAWLER_ROBOTS_TTL", 3600)
+        self.max_bytes = _setting("CRAWLER_MAX_PAGE_BYTES", 5 * 1024 * 1024)
+        self.max_image_bytes = _setting("CRAWLER_MAX_IMAGE_BYTES", 10 * 1024 * 1024)
+        self.timeout = timeout
+
+        retries = retries if retries is not None else _setting("CRAWLER_HTTP_RETRIES", 2)
+        pool_maxsize = pool_maxsize or _setting("CRAWLER_POOL_MAXSIZE", 32)
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            backoff_jitter=_setting("CRAWLER_HTTP_BACKOFF_JITTER", 0.5),  # giãn các lần retry đồng loạt
+            backoff_max=_setting("CRAWLER_HTTP_BACKOFF_MAX", 10),
+            status_forcelist=tuple(breaker.TRANSIENT_STATUSES),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._robots: dict[str, tuple[float, RobotFileParser | None]] = {}
+        self._robots_locks: dict[str, threading.Lock] = {}
+        self._stats: dict[str, HostStats] = {}
+        self.breaker = breaker.CircuitBreaker(
+            threshold=_setting("CRAWLER_BREAKER_FAILURES", 5),
+            cooldown=_setting("CRAWLER_BREAKER_COOLDOWN", 60),
+            max_cooldown=_setting("CRAWLER_BREAKER_MAX_COOLDOWN", 1800),
+        )
+
+        self.mode = http_archive.LIVE
+        self.archive: http_archive.HttpArchive | None = None
+        mode, path = _setting("CRAWLER_HTTP_MODE", ""), _setting("CRAWLER_HTTP_ARCHIVE", "")
+        if mode in (http_archive.RECORD, http_archive.REPLAY) and path:
+            self.use_archive(mode, path, latency=_setting("CRAWLER_REPLAY_LATENCY", 0.0),
+                             bandwidth=_setting("CRAWLER_REPLAY_BANDWIDTH", 0))
+
+    # ---------- record / replay ----------
+    def use_archive(self, mode: str, path=None, latency: float | None = 0.0, bandwidth: float = 0) -> None:
+        """
+        mode "record": tải thật + ghi vào archive `path`; "replay": chỉ đọc archive
+        (latency giây mỗi request, None = đúng thời gian lúc ghi; bandwidth byte/giây);
+        "live": tắt archive.
+        """
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+        if mode == http_archive.REPLAY and not os.path.exists(path):
+            raise FileNotFoundError(f"không có archive {path}")
+        self.mode = mode
+        if mode != http_archive.LIVE:
+            self.archive = http_archive.HttpArchive(path, latency=latency, bandwidth=bandwidth)
+
+    def _send(self, url: str, kind: str, headers: dict | None, timeout, stream: bool,
+              max_bytes: int | None) -> requests.Response:
+        """1 GET thật (hoặc phát lại); body đã đọc sẵn trừ khi stream ở chế độ live."""
+        if self.mode == http_archive.REPLAY:
+            r = self.archive.replay(url, headers)
+            cap = max_bytes or (self.max_image_bytes if stream else self.max_bytes)
+            if len(r.content) > cap:
+                raise ResponseTooLarge(f"{url}: body > {cap} bytes", response=r)
+            return r
+
+        t0 = time.perf_counter()
+        r = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+        if not stream or self.mode == http_archive.RECORD:
+            # record: đọc hết cả ảnh để ghi; caller stream vẫn iter_content được từ _content
+            r._content = read_capped(r, max_bytes or (self.max_image_bytes if stream else self.max_bytes))
+            r._content_consumed = True
+        if self.mode == http_archive.RECORD:
+            self.archive.put(url, r, kind=kind, elapsed=time.perf_counter() - t0)
+        return r
+
+    # ---------- politeness ----------
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            b = self._buckets.get(host)
+            if b is None:
+                b = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return b
+
+    def _robots_for(self, scheme: str, host: str) -> RobotFileParser | None:
+        with self._lock:
+            cached = self._robots.get(host)
+            if cached and time.monotonic() - cached[0] < self.robots_ttl:
+                return cached[1]
+            host_lock = self._robots_locks.setdefault(host, threading.Lock())
+
+        with host_lock:   # mỗi host chỉ 1 thread tải robots.txt
+            with self._lock:
+                cached = self._robots.get(host)
+                if cached and time.monotonic() - cached[0] < self.robots_ttl:
+                    return cached[1]
+            rp: RobotFileParser | None = None
+            try:
+                r = self._send(f"{scheme}://{host}/robots.txt", "robots", None, self.timeout, False, None)
+                self._record(host, r, 0.0, len(r.content))
+                if r.status_code < 400:
+                    rp = RobotFileParser()
+                    rp.parse(r.text.splitlines())
+                    delay = rp.crawl_delay(USER_AGENT) or rp.crawl_delay("*")
+                    if delay:
+                        b = self._bucket(host)
+                        b.rate = min(b.rate, 1.0 / float(delay))
+                        b.burst = 1
+            except requests.RequestException:
+                rp = None   # không tải được robots.txt -> coi như cho phép
+            with self._lock:
+                self._robots[host] = (time.monotonic(), rp)
+            return rp
+
+    def allowed(self, url: str) -> bool:
+        if not self.obey_robots:
+            return True
+        p = urlparse(url)
+        rp = self._robots_for(p.scheme or "https", p.netloc)
+        return rp is None or rp.can_fetch(USER_AGENT, url)
+
+    def set_rate(self, rate: float, burst: int | None = None) -> None:
+        """Đổi rate limit mỗi host (áp dụng cả cho bucket đã tạo)."""
+        with self._lock:
+            self.rate = rate
+            if burst is not None:
+                self.burst = burst
+            self._buckets.clear()
+
+    # ---------- stats ----------
+    def _record(self, host: str, r: requests.Response | None, elapsed: float, nbytes: int) -> None:
+        with self._lock:
+            st = self._stats.setdefault(host, HostStats())
+            st.requests += 1
+            st.bytes += nbytes
+            st.latency_total += elapsed
+            st.latency_max = max(st.latency_max, elapsed)
+            if r is None or r.status_code >= 400:
+                st.errors += 1
+
+    def record_bytes(self, url: str, nbytes: int) -> None:
+        """Cộng byte cho response stream=True (đọc xong mới biết kích thước)."""
+        with self._lock:
+            self._stats.setdefault(urlparse(url).netloc, HostStats()).bytes += nbytes
+
+    def stats(self) -> dict[str, HostStats]:
+        with self._lock:
+            return {h: HostStats(**vars(s)) for h, s in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    # ---------- API ----------
+    def get(self, url: str, kind: str = "page", headers: dict | None = None,
+            stream: bool = False, timeout=None, check_robots: bool = True,
+            max_bytes: int | None = None) -> requests.Response:
+        """
+        GET qua pool chung. `kind` ("feed" | "page" | "image") chỉ để log/đếm.
+        Không raise theo status: caller tự `raise_for_status()` (feed cần xử lý 304).
+        Khi không stream, body bị giới hạn `max_bytes` (mặc định CRAWLER_MAX_PAGE_BYTES)
+        -> `ResponseTooLarge`. Host đang bị ngắt mạch -> `HostUnavailable` ngay.
+        """
+        host = urlparse(url).netloc
+        self.breaker.before(host)
+        sent = failed = False
+        try:
+            if check_robots and not self.allowed(url):
+                raise RobotsDisallowed(f"robots.txt disallows {url}")
+            self._bucket(host).acquire()
+
+            t0 = time.perf_counter()
+            try:
+                r = self._send(url, kind, headers, timeout or self.timeout, stream, max_bytes)
+            except requests.RequestException as e:
+                self._record(host, None, time.perf_counter() - t0, 0)
+                sent = not isinstance(e, http_archive.ReplayMiss)
+                failed = breaker.is_host_failure(e)
+                raise
+            sent = True
+            nbytes = 0 if stream else len(r.content)
+            self._record(host, r, time.perf_counter() - t0, nbytes)
+            failed = breaker.is_host_failure(status=r.status_code)
+            return r
+        finally:
+            # chưa có request thật (robots cấm, archive không có URL...): không phải kết quả
+            # thăm dò -> chỉ nhả lượt thăm dò; lỗi của riêng URL (404, quá cỡ...) không tính cho host
+            if not sent:
+                self.breaker.release(host)
+            elif failed:
+                self.breaker.failure(host)
+            else:
+                self.breaker.success(host)
+
+
+_client: CrawlerClient | None = None
+_client_pid: int | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> CrawlerClient:
+    """Client dùng chung trong process (tạo lại sau fork)."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = CrawlerClient()
+            _client_pid = os.getpid()
+        return _client
+
+
+def format_stats(stats: dict[str, HostStats], top: int = 10) -> list[str]:
+    rows = sorted(stats.items(), key=lambda kv: -kv[1].requests)[:top]
+    return [
+        f"{host:<32} req={s.requests:<5} err={s.errors:<3} {s.bytes / 1024:8.0f}KB "
+        f"avg={s.latency_avg * 1000:6.0f}ms max={s.latency_max * 1000:6.0f}ms"
+        for host, s in rows
+    ]
@@ -0,0 +1,246 @@
+# crawler/known_urls.py
+"""
+Lọc URL đã có trong DB trước khi fan-out / tải trang.
+
+- 1 query `source_url__in` (+ 1 query alias) cho cả feed, theo cả URL thô lẫn
+  URL đã chuẩn hoá (crawler.canonical) — thay vì mỗi bài tự tải rồi mới
+  phát hiện trùng ở get_or_create.
+- Bloom filter (tuỳ chọn, bật khi có settings.CRAWLER_BLOOM_PATH): URL chắc
+  chắn mới thì khỏi hỏi DB; URL "có thể đã biết" vẫn được DB xác nhận nên
+  false positive không làm mất bài. Nhiều process (worker Celery, crawl_now...)
+  dùng chung 1 file: `flush()` khoá file, nạp bản trên đĩa rồi gộp URL mới của
+  process mình vào (không ghi đè phần process khác vừa thêm); process thấy
+  mtime file đổi thì nạp lại trước khi lọc.
+- "Revisit": bài đã biết nhưng đăng trong CRAWLER_REVISIT_HOURS giờ gần đây
+  vẫn được tải lại (cập nhật nội dung/ảnh).
+- URL đang trong dead-letter (crawler.deadletter: lỗi vĩnh viễn hoặc chưa tới
+  giờ thử lại) bị hoãn, thêm 1 query cho phần URL còn lại.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from crawler import canonical, deadletter
+
+
+class BloomFilter:
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        m = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.size = max(8, m)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    # ---------- persist ----------
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(self.size.to_bytes(8, "little"))
+            f.write(self.hashes.to_bytes(2, "little"))
+            f.write(self.count.to_bytes(8, "little"))
+            f.write(self.bits)
+        os.replace(tmp, path)   # ghi atomically: nhiều worker có thể cùng lưu
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with open(path, "rb") as f:
+            bf = cls.__new__(cls)
+            bf.size = int.from_bytes(f.read(8), "little")
+            bf.hashes = int.from_bytes(f.read(2), "little")
+            bf.count = int.from_bytes(f.read(8), "little")
+            bf.bits = bytearray(f.read())
+        return bf
+
+
+_bloom: BloomFilter | None = None
+_bloom_mtime: int | None = None      # mtime (ns) của file lúc nạp / ghi _bloom
+_bloom_lock = threading.Lock()
+_pending: list[str] = []             # URL remember() chưa flush -> gộp vào bản trên đĩa
+
+
+def _bloom_path() -> str:
+    return str(getattr(settings, "CRAWLER_BLOOM_PATH", "") or "")
+
+
+def _mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Khoá giữa các process quanh đọc-gộp-ghi file Bloom (flock; không có fcntl thì bỏ qua)."""
+    try:
+        import fcntl
+    except ImportError:     # Windows
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _with_pending(bf: BloomFilter) -> BloomFilter:
+    for url in _pending:
+        bf.add(url)
+    return bf
+
+
+def get_bloom() -> BloomFilter | None:
+    """
+    Bloom filter dùng chung trong process (None nếu chưa cấu hình path). File bị
+    process khác ghi lại (mtime đổi) -> nạp lại, giữ URL của process này chưa flush.
+    """
+    global _bloom, _bloom_mtime
+    path = _bloom_path()
+    if not path:
+        return None
+    with _bloom_lock:
+        mtime = _mtime(path)
+        if mtime is not None and (_bloom is None or mtime != _bloom_mtime):
+            _bloom, _bloom_mtime = _with_pending(BloomFilter.load(path)), mtime
+        elif _bloom is None:
+            _bloom = _with_pending(rebuild_bloom(save=False))
+        return _bloom
+
+
+def rebuild_bloom(save: bool = True) -> BloomFilter:
+    """Dựng lại Bloom filter từ toàn bộ Article.source_url + ArticleURLAlias."""
+    from articles.models import Article, ArticleURLAlias
+
+    capacity = getattr(settings, "CRAWLER_BLOOM_CAPACITY", 1_000_000)
+    bf = BloomFilter(capacity=max(capacity, (Article.objects.count() + ArticleURLAlias.objects.count()) * 2))
+    for url in Article.objects.exclude(source_url__isnull=True) \
+            .values_list("source_url", flat=True).iterator(chunk_size=5000):
+        bf.add(url)
+    for url in ArticleURLAlias.objects.values_list("url", flat=True).iterator(chunk_size=5000):
+        bf.add(url)
+    path = _bloom_path()
+    if save and path:
+        with _file_lock(path):
+            bf.save(path)
+    return bf
+
+
+def remember(url: str) -> None:
+    """Gọi sau khi lưu Article mới."""
+    bf = get_bloom()
+    if bf is not None and url:
+        with _bloom_lock:
+            bf.add(url)
+            _pending.append(url)
+
+
+def flush() -> None:
+    """
+    Gộp URL mới của process này vào file Bloom (gọi cuối mỗi lượt crawl / lô task):
+    dưới khoá file, nạp bản trên đĩa (có thể vừa được process khác ghi), thêm URL
+    chưa flush rồi ghi lại — không process nào làm mất URL của process khác.
+    """
+    global _bloom, _bloom_mtime
+    path = _bloom_path()
+    with _bloom_lock:
+        if not _pending or not path:
+            return
+        with _file_lock(path):
+            bf = _with_pending(BloomFilter.load(path)) if os.path.exists(path) else _bloom
+            bf.save(path)
+            _bloom, _bloom_mtime = bf, _mtime(path)
+        _pending.clear()
+
+
+@dataclass
+class KnownStats:
+    seen: int = 0
+    new: int = 0
+    skipped: int = 0    # đã có trong DB -> bỏ qua
+    revisit: int = 0    # đã có nhưng còn mới -> tải lại
+    db_checked: int = 0  # số URL phải hỏi DB (phần còn lại Bloom đã loại)
+    deferred: int = 0   # dead-letter chưa tới giờ thử lại -> hoãn (feed chưa xử lý xong)
+    dead: int = 0       # dead-letter vĩnh viễn -> bỏ
+
+    def merge(self, other: "KnownStats") -> None:
+        for k in ("seen", "new", "skipped", "revisit", "db_checked", "deferred", "dead"):
+            setattr(self, k, getattr(self, k) + getattr(other, k))
+
+    def __str__(self) -> str:
+        deferred = f" deferred={self.deferred}" if self.deferred else ""
+        dead = f" dead={self.dead}" if self.dead else ""
+        return f"new={self.new} skipped={self.skipped} revisit={self.revisit}{deferred}{dead}"
+
+
+def filter_known(entries: list, revisit_hours: int | None = None) -> tuple[list, KnownStats]:
+    """
+    entries: entry feedparser (có "link"). Trả về (entries cần tải, thống kê).
+    Giữ nguyên thứ tự entry. Entry được coi là đã biết nếu URL thô hoặc URL
+    chuẩn hoá khớp 1 bài / 1 alias.
+    """
+    if revisit_hours is None:
+        revisit_hours = getattr(settings, "CRAWLER_REVISIT_HOURS", 0)
+
+    stats = KnownStats()
+    forms = {e["link"]: canonical.variants(e["link"]) for e in entries if e.get("link")}
+    stats.seen = len(forms)
+
+    bloom = get_bloom()
+    maybe = [v for vs in forms.values() for v in vs if bloom is None or v in bloom]
+    stats.db_checked = len(maybe)
+
+    resolved = canonical.resolve(maybe)
+    known: dict[str, object] = {}
+    for url, vs in forms.items():
+        hit = next((resolved[v] for v in vs if v in resolved), None)
+        if hit:
+            known[url] = hit[1]
+
+    cutoff = timezone.now() - timedelta(hours=revisit_hours) if revisit_hours else None
+    out = []
+    for e in entries:
+        url = e.get("link")
+        if not url:
+            continue
+        if url not in known:
+            stats.new += 1
+            out.append(e)
+        elif cutoff and known[url] and known[url] >= cutoff:
+            stats.revisit += 1
+            out.append(e)
+        else:
+            stats.skipped += 1
+    held = deadletter.holds([e["link"] for e in out]) if out else {}
+    if held:
+        out = [e for e in out if e["link"] not in held]
+        stats.dead = sum(held.values())
+        stats.deferred = len(held) - stats.dead
+        stats.new = sum(1 for e in out if e["link"] not in known)
+    return out, stats
@@ -0,0 +1,126 @@
+# crawler/ledger.py
+"""
+Sổ ghi các lượt crawl: CrawlRun (1 lượt) + CrawlEvent (1 nguồn trong lượt đó).
+
+    ledger = CrawlLedger("crawl_now")
+    ledger.feed(src.id, poll, seen=len(poll.entries), to_fetch=len(entries))
+    ledger.page(src.id, "created", doc.timings, nbytes)
+    ledger.finish()                # ghi CrawlEvent (1 bulk insert)
+
+Chạy sync thì cộng dồn trong RAM rồi ghi 1 lần ở finish(). Celery: task feed
+tạo sẵn dòng CrawlEvent (`open_event`), task bài cộng vào bằng UPDATE ... F()
+(`RunRecorder`, cùng interface `page()` với CrawlLedger).
+"""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+
+from django.db.models import F
+from django.utils import timezone
+
+COUNTERS = ("entries_seen", "skipped", "fetched", "created", "updated", "too_short", "failed", "bytes")
+STAGE_FIELDS = {f"time_{s}": s for s in ("fetch", "readability", "trafilatura", "sanitize", "images", "db")}
+
+
+def _page_deltas(status: str, timings: dict | None, nbytes: int = 0) -> dict[str, float]:
+    """Các field cần cộng thêm cho 1 trang (status: created/updated/too_short/failed/queued)."""
+    d: dict[str, float] = defaultdict(float)
+    if nbytes:
+        d["fetched"] += 1
+        d["bytes"] += nbytes
+    if status in ("created", "updated", "too_short", "failed"):
+        d[status] += 1
+    known = set(STAGE_FIELDS.values())
+    for stage, sec in (timings or {}).items():
+        d[f"time_{stage}" if stage in known else "time_other"] += sec
+    return d
+
+
+class _Tally:
+    def __init__(self):
+        self.values: dict[str, float] = defaultdict(float)
+        self.timings: dict[str, float] = defaultdict(float)
+        self.feed_status = ""
+
+    def add(self, deltas: dict, timings: dict | None = None) -> None:
+        for k, v in deltas.items():
+            self.values[k] += v
+        for k, v in (timings or {}).items():
+            self.timings[k] += v
+
+
+class CrawlLedger:
+    """Cộng dồn số liệu theo nguồn cho 1 lượt crawl (gọi được từ nhiều thread)."""
+
+    def __init__(self, command: str):
+        from crawler.models import CrawlRun
+
+        self.run = CrawlRun.objects.create(command=command[:64])
+        self._tallies: dict[int | None, _Tally] = defaultdict(_Tally)
+        self._lock = threading.Lock()
+
+    def feed(self, source_id: int, poll=None, seen: int = 0, to_fetch: int = 0,
+             status: str | None = None) -> None:
+        with self._lock:
+            t = self._tallies[source_id]
+            t.feed_status = status or (poll.status if poll is not None else "")
+            t.add({"entries_seen": seen, "skipped": max(0, seen - to_fetch),
+                   "bytes": getattr(poll, "bytes", 0) or 0})
+
+    def page(self, source_id: int, status: str, timings: dict | None = None, nbytes: int = 0) -> None:
+        with self._lock:
+            self._tallies[source_id].add(_page_deltas(status, timings, nbytes), timings)
+
+    def written(self, source_id: int, created: bool, seconds: float = 0.0) -> None:
+        """Kết quả bài đã qua BatchWriter (`seconds`: phần thời gian ghi lô của bài này)."""
+        with self._lock:
+            self._tallies[source_id].add({"created" if created else "updated": 1, "time_db": seconds},
+                                         {"db": seconds})
+
+    def finish(self, error: str = ""):
+        from crawler.models import CrawlEvent
+
+        with self._lock:
+            events = []
+            for source_id, t in self._tallies.items():
+                ev = CrawlEvent(run=self.run, source_id=source_id, feed_status=t.feed_status[:16],
+                                timings={k: round(v, 4) for k, v in t.timings.items()})
+                for k, v in t.values.items():
+                    setattr(ev, k, int(v) if k in COUNTERS else v)
+                events.append(ev)
+            CrawlEvent.objects.bulk_create(events)
+            self._tallies.clear()
+        self.run.finished_at = timezone.now()
+        self.run.error = error
+        self.run.save(update_fields=["finished_at", "error"])
+        return self.run
+
+
+def open_event(command: str, source_id: int, poll=None, seen: int = 0, to_fetch: int = 0):
+    """Celery: tạo CrawlRun + CrawlEvent ngay để các task bài cộng dồn vào (trả về run_id)."""
+    from crawler.models import CrawlEvent, CrawlRun
+
+    run = CrawlRun.objects.create(command=command[:64], finished_at=timezone.now())
+    CrawlEvent.objects.create(
+        run=run, source_id=source_id, feed_status=(poll.status if poll is not None else "")[:16],
+        entries_seen=seen, skipped=max(0, seen - to_fetch), bytes=getattr(poll, "bytes", 0) or 0,
+    )
+    return run.id
+
+
+class RunRecorder:
+    """Celery: cộng kết quả từng bài vào CrawlEvent của lượt `run_id` (UPDATE ... F(), không đọc trước)."""
+
+    def __init__(self, run_id: int):
+        self.run_id = run_id
+
+    def page(self, source_id: int, status: str, timings: dict | None = None, nbytes: int = 0) -> None:
+        from crawler.models import CrawlEvent, CrawlRun
+
+        deltas = _page_deltas(status, timings, nbytes)
+        if deltas:
+            CrawlEvent.objects.filter(run_id=self.run_id, source_id=source_id).update(
+                **{k: F(k) + (int(v) if k in COUNTERS else v) for k, v in deltas.items()}
+            )
+        CrawlRun.objects.filter(pk=self.run_id).update(finished_at=timezone.now())
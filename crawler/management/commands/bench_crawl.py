@@ -0,0 +1,105 @@
+# crawler/management/commands/bench_crawl.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from sources.models import Source
+from crawler.bench.server import StandInServer
+from crawler.engine import CrawlEngine, FeedJob
+from crawler.feeds import conditional_get
+from crawler.http_client import format_stats, get_client
+from crawler.persist import BatchWriter
+from crawler.tasks import _fetch_and_save_article
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Benchmark crawl offline với HTTP server giả lập: so sánh đường tuần tự "
+            "(crawl_now) với engine asyncio. Mọi thay đổi DB được rollback.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--feeds", type=int, default=7)
+        parser.add_argument("--entries", type=int, default=20, help="Số entry mỗi feed")
+        parser.add_argument("--latency", type=float, default=0.2, help="Độ trễ giả lập mỗi request (giây)")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--per-host", type=int, default=16,
+                            help="Server giả lập chỉ có 1 host nên mặc định = concurrency")
+        parser.add_argument("--host-rate", type=float, default=0,
+                            help="Rate limit request/giây cho host giả lập (0 = không giới hạn)")
+        parser.add_argument("--skip-sequential", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=50,
+                            help="Thêm 1 lượt engine ghi DB theo lô N bài (0 = bỏ qua)")
+
+    def handle(self, *args, **opts):
+        client = get_client()
+        client.set_rate(opts["host_rate"] or 1e6, burst=None if opts["host_rate"] else 1_000_000)
+        client.obey_robots = False
+        with StandInServer(feeds=opts["feeds"], entries=opts["entries"], latency=opts["latency"]) as srv:
+            self.stdout.write(f"Stand-in server: {srv.base_url} "
+                              f"({opts['feeds']} feeds × {opts['entries']} entries, latency {opts['latency']}s)")
+            results = []
+            if not opts["skip_sequential"]:
+                results.append(("sequential", *self._run(srv, self._sequential)))
+            results.append((f"engine c={opts['concurrency']}/h={opts['per_host']}",
+                            *self._run(srv, lambda jobs: self._engine(jobs, opts))))
+            if opts["batch_size"] > 0:
+                results.append((f"engine + lô {opts['batch_size']}",
+                                *self._run(srv, lambda jobs: self._engine(jobs, opts, opts["batch_size"]))))
+
+        base = results[0][2] / results[0][1] if results[0][1] else 0.0
+        for name, elapsed, pages, reqs, timings, hosts in results:
+            rate = pages / elapsed if elapsed else 0.0
+            speedup = f"  x{rate / base:.1f}" if base and name != "sequential" else ""
+            self.stdout.write(f"{name:<24} {pages:>5} bài  {reqs:>5} req  {elapsed:7.2f}s  "
+                              f"{rate:7.2f} bài/s{speedup}")
+            stages = "  ".join(f"{k}={v * 1000 / max(pages, 1):.1f}ms"
+                               for k, v in sorted(timings.items(), key=lambda kv: -kv[1]))
+            self.stdout.write(f"{'':<24} /bài: {stages}")
+            for line in format_stats(hosts):
+                self.stdout.write(f"{'':<24} {line}")
+
+    def _run(self, srv, fn):
+        box = {}
+        self.timings = {}
+        req0 = srv.requests
+        get_client().reset_stats()
+        try:
+            with transaction.atomic():
+                jobs = [
+                    FeedJob(Source.objects.create(name=f"bench-{i}", rss_url=url).id, f"bench-{i}", url)
+                    for i, url in enumerate(srv.feed_urls)
+                ]
+                t0 = time.perf_counter()
+                box["pages"] = fn(jobs)
+                box["elapsed"] = time.perf_counter() - t0
+                raise _Rollback
+        except _Rollback:
+            pass
+        return box["elapsed"], box["pages"], srv.requests - req0, self.timings, get_client().stats()
+
+    def _sequential(self, jobs):
+        n = 0
+        for job in jobs:
+            for e in conditional_get(job.rss_url).entries:
+                _fetch_and_save_article(job.source_id, e.get("link"), e.get("published"),
+                                        timings=self.timings)
+                n += 1
+        return n
+
+    def _engine(self, jobs, opts, batch_size=0):
+        engine = CrawlEngine(concurrency=opts["concurrency"], per_host=opts["per_host"],
+                             limit=opts["entries"])
+        writer = BatchWriter(batch_size) if batch_size else None
+        stats = engine.run(
+            jobs,
+            on_page=lambda p: _fetch_and_save_article(p.source_id, p.url, p.published, page=p.page,
+                                                      timings=self.timings, writer=writer),
+        )
+        if writer:
+            writer.flush()
+            self.timings["db (lô)"] = writer.stats.lock_seconds
+        return stats.pages
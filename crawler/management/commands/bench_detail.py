@@ -0,0 +1,120 @@
+# crawler/management/commands/bench_detail.py
+import hashlib
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from articles import render
+from articles.models import Article, ImageVariant, MediaAsset
+from web.views import ArticleDetailView
+
+PARA = ("<p>Theo báo cáo mới nhất, tăng trưởng kinh tế quý này đạt mức cao so với cùng kỳ, "
+        "trong đó khu vực <a href=\"https://example.invalid/cn\">công nghiệp</a> và <b>dịch vụ</b> "
+        "đóng góp phần lớn; nhiều địa phương ghi nhận số doanh nghiệp thành lập mới tăng mạnh.</p>")
+WIDTHS = (320, 640, 960)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _Baseline(ArticleDetailView):
+    """Trang chi tiết như trước khi có biến thể render: tải content_html, in nguyên văn."""
+
+    def get_queryset(self):
+        return Article.objects.filter(is_visible=True).prefetch_related("categories")
+
+    def get_object(self, queryset=None):
+        a = super().get_object(queryset)
+        a.body_version = 0             # detail_html -> content_html
+        return a
+
+
+class _PerRequest(_Baseline):
+    """Gắn width/height/srcset lúc request (parse HTML + 2 query mỗi lần) thay vì lúc lưu."""
+
+    def get_object(self, queryset=None):
+        a = super().get_object(queryset)
+        render.fill_bodies([a])
+        return a
+
+
+class Command(BaseCommand):
+    help = ("Benchmark thời gian request ArticleDetailView với bài dài: in content_html như cũ, "
+            "gắn width/height/srcset lúc request, in biến thể đã render sẵn (articles/render.py). "
+            "Bài thử + ảnh giả tạo trong transaction rồi rollback.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--paragraphs", type=int, default=400, help="Số đoạn văn của bài thử")
+        parser.add_argument("--images", type=int, default=40, help="Số ảnh (figure) trong bài")
+        parser.add_argument("--repeat", type=int, default=30, help="Số request mỗi cách")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                rows, size = self._run(opts)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"Bài thử: {opts['paragraphs']} đoạn, {opts['images']} ảnh, "
+                          f"content_html {size['content'] / 1024:.0f} KiB, "
+                          f"render 1 lần lúc lưu {size['fill'] * 1000:.1f} ms")
+        base = statistics.median(rows[0][1])
+        self.stdout.write(f"{'':<26} {'median':>9} {'p90':>9} {'min':>9}")
+        for name, walls in rows:
+            med = statistics.median(walls)
+            p90 = sorted(walls)[int(len(walls) * 0.9) - 1 if len(walls) > 1 else 0]
+            speedup = f"  x{base / med:.1f}" if name != rows[0][0] and med else ""
+            self.stdout.write(f"{name:<26} {med * 1000:7.2f}ms {p90 * 1000:7.2f}ms "
+                              f"{min(walls) * 1000:7.2f}ms{speedup}")
+
+    def _run(self, opts):
+        prefix = settings.MEDIA_URL.rstrip("/") + "/"
+        parts, paths = [], []
+        for i in range(opts["images"]):
+            sha = hashlib.sha256(f"bench-detail-{i}".encode()).hexdigest()
+            path = f"images/{sha[:2]}/{sha[2:4]}/{sha}.jpg"
+            paths.append(path)
+            MediaAsset.objects.create(source_url=f"https://bench-detail.invalid/{i}.jpg", sha256=sha,
+                                      path=path, width=1600, height=900)
+            ImageVariant.objects.create(original=path, path=path, format="original", width=1600, height=900)
+            for w in WIDTHS:
+                ImageVariant.objects.create(original=path, path=f"{path[:-4]}.w{w}.jpg",
+                                            format="jpeg", width=w, height=w * 9 // 16)
+        every = max(1, opts["paragraphs"] // max(1, opts["images"]))
+        for i in range(opts["paragraphs"]):
+            if i % every == 0 and i // every < len(paths):
+                parts.append(f'<figure><img alt="Ảnh {i}" src="{prefix}{paths[i // every]}"/>'
+                             f"<figcaption>Chú thích ảnh {i}</figcaption></figure>")
+            parts.append(PARA)
+        content = "".join(parts)
+
+        a = Article(title="Bench chi tiết bài", slug=f"bench-detail-{int(time.time())}",
+                    content_html=content, main_image_url=prefix + paths[0] if paths else "")
+        t0 = time.perf_counter()
+        render.fill_bodies([a])
+        fill = time.perf_counter() - t0
+        a.save()
+
+        rf = RequestFactory()
+        rows = []
+        for name, view in (("content_html (như cũ)", _Baseline),
+                           ("srcset lúc request", _PerRequest),
+                           ("biến thể đã render", ArticleDetailView)):
+            fn = view.as_view()
+            walls = []
+            for _ in range(opts["repeat"]):
+                req = rf.get(f"/a/{a.slug}/")
+                req.user = AnonymousUser()
+                t0 = time.perf_counter()
+                resp = fn(req, slug=a.slug)
+                resp.render()
+                walls.append(time.perf_counter() - t0)
+            rows.append((name, walls))
+        return rows, {"content": len(content.encode()), "fill": fill}
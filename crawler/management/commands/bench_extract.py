@@ -0,0 +1,87 @@
+# crawler/management/commands/bench_extract.py
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from crawler.bench import corpus as bench_corpus
+from crawler.bench import extract as bench_extract
+
+DEFAULT_BASELINE = Path(bench_extract.__file__).resolve().parent / "baselines" / "extract.json"
+
+
+class Command(BaseCommand):
+    help = ("Benchmark offline các bước trích xuất (readability, sanitize, chuyển link ảnh, dọn tên file, "
+            "blocks, excerpt) trên corpus HTML đã ghi + corpus tổng hợp; so với baseline, "
+            "lỗi (exit 1) nếu chậm hơn ngưỡng hoặc output khác checksum.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", default=getattr(settings, "CRAWLER_BENCH_CORPUS", ""),
+                            help="Thư mục corpus ghi lại (gốc chứa các phiên bản, hoặc 1 phiên bản cụ thể)")
+        parser.add_argument("--synthetic", type=int, default=40, help="Số trang tổng hợp cỡ thường")
+        parser.add_argument("--oversized", type=int, default=3, help="Số trang tổng hợp quá khổ")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--no-memory", action="store_true", help="Bỏ lượt đo bộ nhớ (tracemalloc)")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument("--save-baseline", action="store_true", help="Ghi kết quả lần này làm baseline")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Cho phép chậm hơn baseline (0.25 = 25%%)")
+        parser.add_argument("--json", dest="json_out", help="Ghi báo cáo đầy đủ ra file JSON")
+        parser.add_argument("--record", type=int, metavar="N", default=0,
+                            help="Tải N bài/nguồn đang bật thành phiên bản corpus mới trong --corpus rồi thoát")
+        parser.add_argument("--corpus-version", help="Tên phiên bản khi --record (mặc định: ngày UTC)")
+
+    def handle(self, *args, **opts):
+        if opts["record"]:
+            if not opts["corpus"]:
+                raise CommandError("--record cần --corpus (hoặc settings.CRAWLER_BENCH_CORPUS)")
+            out = bench_corpus.record(Path(opts["corpus"]), opts["record"], opts["corpus_version"],
+                                      log=self.stdout.write)
+            self.stdout.write(self.style.SUCCESS(f"Đã ghi corpus {out}"))
+            return
+
+        corpus = self._corpus(opts)
+        if not corpus.pages:
+            raise CommandError("Corpus rỗng")
+        report = bench_extract.run(corpus, repeat=opts["repeat"], memory=not opts["no_memory"],
+                                   log=self.stdout.write if opts["verbosity"] >= 2 else None)
+        if opts["json_out"]:
+            Path(opts["json_out"]).write_text(json.dumps(report, ensure_ascii=False, indent=1), "utf-8")
+
+        path = Path(opts["baseline"])
+        baseline = json.loads(path.read_text("utf-8")) if path.exists() else None
+        for line in bench_extract.format_report(report, baseline):
+            self.stdout.write(line)
+
+        if opts["save_baseline"]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, ensure_ascii=False, indent=1) + "\n", "utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Đã ghi baseline {path}"))
+            return
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(f"Chưa có baseline {path} (chạy với --save-baseline)"))
+            return
+
+        if baseline.get("env") != report["env"]:
+            self.stdout.write(self.style.WARNING(
+                f"Môi trường khác baseline: {baseline.get('env')} -> {report['env']} "
+                "(checksum có thể đổi theo phiên bản thư viện)"))
+        problems = bench_extract.compare(report, baseline, tolerance=opts["tolerance"])
+        if problems:
+            for p in problems:
+                self.stderr.write(self.style.ERROR(f"  REGRESSION {p}"))
+            raise CommandError(f"{len(problems)} hồi quy so với baseline {path}")
+        self.stdout.write(self.style.SUCCESS("OK: không hồi quy so với baseline"))
+
+    def _corpus(self, opts):
+        out = bench_corpus.Corpus("", [])
+        if opts["corpus"] and not Path(opts["corpus"]).exists():
+            self.stdout.write(self.style.WARNING(f"Chưa có corpus ghi lại ở {opts['corpus']}, chỉ dùng trang tổng hợp"))
+        elif opts["corpus"]:
+            path = bench_corpus.latest_version(Path(opts["corpus"]))
+            if path is None:
+                raise CommandError(f"Không thấy manifest.json trong {opts['corpus']} (ghi bằng --record N)")
+            out = bench_corpus.load(path)
+        if opts["synthetic"] or opts["oversized"]:
+            out = out + bench_corpus.synthetic(opts["synthetic"], opts["oversized"])
+        return out
@@ -0,0 +1,83 @@
+# crawler/management/commands/bench_images.py
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from crawler.bench.server import StandInServer
+from crawler.document import ParsedDocument, fetch_page
+from crawler.http_client import get_client
+from crawler.utils import _rewrite_images_to_media
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Benchmark mirror ảnh với server ảnh giả lập: tải tuần tự (như cũ) so với "
+            "thread pool + hạn chót mỗi bài, và lượt crawl lại khi ảnh đã có trong MediaAsset. "
+            "File ảnh ghi vào thư mục tạm rồi xoá, thay đổi DB được rollback.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=5)
+        parser.add_argument("--images", type=int, default=20, help="Số ảnh mỗi bài")
+        parser.add_argument("--image-latency", type=float, default=0.2,
+                            help="Độ trễ giả lập mỗi request ảnh (giây)")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Số luồng mỗi bài (mặc định settings.CRAWLER_IMAGE_WORKERS)")
+        parser.add_argument("--deadline", type=float, default=None,
+                            help="Hạn chót mỗi bài, giây (mặc định settings.CRAWLER_IMAGE_DEADLINE)")
+
+    def handle(self, *args, **opts):
+        client = get_client()
+        client.set_rate(1e6, burst=1_000_000)
+        client.obey_robots = False
+        media = tempfile.mkdtemp(prefix="bench-images-")
+        try:
+            with override_settings(MEDIA_ROOT=media, MEDIA_MAKE_VARIANTS=False), \
+                    StandInServer(feeds=1, entries=opts["articles"], latency=0,
+                                  images=opts["images"], image_latency=opts["image_latency"]) as srv:
+                self.stdout.write(f"Stand-in server: {srv.base_url} ({opts['articles']} bài × "
+                                  f"{opts['images']} ảnh, latency ảnh {opts['image_latency']}s)")
+                pages = [fetch_page(f"{srv.base_url}/a/0/{i}.html") for i in range(opts["articles"])]
+                pool = dict(workers=opts["workers"], deadline=opts["deadline"])
+                rows = []
+                self._rolled_back(lambda: rows.append(("sequential", self._run(pages, workers=1, deadline=0))))
+                self._rolled_back(lambda: rows.extend([
+                    (f"pool w={opts['workers'] or 'default'}", self._run(pages, **pool)),
+                    ("re-crawl (cached)", self._run(pages, **pool)),
+                ]))
+        finally:
+            shutil.rmtree(media, ignore_errors=True)
+
+        base = statistics.mean(rows[0][1][0]) if rows[0][1][0] else 0.0
+        for name, (walls, kept, heroes) in rows:
+            avg = statistics.mean(walls)
+            speedup = f"  x{base / avg:.1f}" if avg and name != "sequential" else ""
+            self.stdout.write(f"{name:<18} /bài avg={avg:6.2f}s max={max(walls):6.2f}s  "
+                              f"ảnh giữ lại={kept}  hero={heroes}{speedup}")
+
+    def _rolled_back(self, fn):
+        """Chạy fn trong transaction rồi rollback (MediaAsset của lượt trước không ảnh hưởng lượt sau)."""
+        try:
+            with transaction.atomic():
+                fn()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, pages, workers, deadline):
+        walls, kept, heroes = [], 0, 0
+        for page in pages:
+            cleaned = ParsedDocument(page, mirror_images=False)._cleaned
+            t0 = time.perf_counter()
+            hero, _cap = _rewrite_images_to_media(cleaned, base_url=page.url, workers=workers, deadline=deadline)
+            walls.append(time.perf_counter() - t0)
+            kept += sum(1 for _ in cleaned.root.iter("img"))
+            heroes += bool(hero)
+        return walls, kept, heroes
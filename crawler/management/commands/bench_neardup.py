@@ -0,0 +1,94 @@
+# crawler/management/commands/bench_neardup.py
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from crawler import neardup
+
+SYLLABLES = (
+    "anh bao ben cac cho chinh cong cua dan dau den dieu doi dong duoc gia giao hai hang hoc "
+    "khi kinh lam lien luat mot nam nguoi nhieu nhung phat quan quoc sau tai tang thanh the "
+    "thi trong truong tu va viec viet voi xa xay yeu"
+).split()
+
+
+def _story(rng: random.Random, words: int) -> list[str]:
+    return [rng.choice(SYLLABLES) + rng.choice(SYLLABLES) for _ in range(words)]
+
+
+def _perturb(rng: random.Random, toks: list[str], rate: float) -> list[str]:
+    """Bản phát lại: đổi ~rate số từ + thêm câu dẫn/ghi nguồn như báo khác hay làm."""
+    out = [rng.choice(SYLLABLES) if rng.random() < rate else t for t in toks]
+    return ["theo", "bao", "khac"] + out + ["nguon", "tong", "hop"]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark phát hiện bài gần trùng (MinHash + LSH) trên corpus tổng hợp: tốc độ tính chữ ký, "
+            "thời gian tra ứng viên khi index có hàng triệu bài, precision/recall.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stories", type=int, default=5000, help="Số bài gốc (có text thật)")
+        parser.add_argument("--dups", type=float, default=0.3, help="Tỉ lệ bài gốc có bản phát lại")
+        parser.add_argument("--words", type=int, default=300, help="Số từ mỗi bài")
+        parser.add_argument("--noise", type=float, default=0.02, help="Tỉ lệ từ bị đổi ở bản phát lại")
+        parser.add_argument("--scale", type=int, default=500_000,
+                            help="Thêm N chữ ký ngẫu nhiên vào index để đo tra cứu ở quy mô lớn")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        n = opts["stories"]
+        stories = [_story(rng, opts["words"]) for _ in range(n)]
+        dup_of = {i: rng.randrange(n) for i in range(n, n + int(n * opts["dups"]))}
+        docs = [" ".join(t) for t in stories]
+        docs += [" ".join(_perturb(rng, stories[src], opts["noise"])) for src in dup_of.values()]
+
+        t0 = time.perf_counter()
+        sigs = [neardup.signature(d) for d in docs]
+        t_hash = time.perf_counter() - t0
+        self.stdout.write(f"MinHash: {len(docs)} bài × {opts['words']} từ trong {t_hash:.2f}s "
+                          f"(~{len(docs) / t_hash:.0f} bài/s)")
+
+        index = neardup.LSHIndex()
+        t0 = time.perf_counter()
+        for i in range(n):
+            index.add(i, sigs[i])
+        # bài "nền": khoá band ngẫu nhiên (không cần text thật, chỉ để index to như production)
+        dummy = (0,) * neardup.NUM_PERM
+        for k in range(opts["scale"]):
+            index.sigs[-1 - k] = dummy
+            for _ in range(neardup.BANDS):
+                index.buckets[rng.getrandbits(64) - (1 << 63)].append(-1 - k)
+        t_build = time.perf_counter() - t0
+        self.stdout.write(f"Index: {len(index)} chữ ký, {len(index.buckets)} bucket trong {t_build:.2f}s")
+
+        lat, tp, fp, fn = [], 0, 0, 0
+        for i in range(n, len(docs)):
+            t0 = time.perf_counter()
+            hit = index.find(sigs[i])
+            lat.append(time.perf_counter() - t0)
+            if hit and hit[0] == dup_of[i]:
+                tp += 1
+            else:
+                fn += 1
+                fp += hit is not None
+        # bài gốc không được khớp nhầm với bài gốc khác
+        probes = rng.sample(range(n), min(n, 2000))
+        for i in probes:
+            t0 = time.perf_counter()
+            hit = index.find(sigs[i], accept=lambda k, i=i: k != i)
+            lat.append(time.perf_counter() - t0)
+            fp += hit is not None
+
+        lat_us = sorted(x * 1e6 for x in lat)
+        p99 = lat_us[int(len(lat_us) * 0.99) - 1] if lat_us else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        self.stdout.write(f"Tra cứu: {len(lat_us)} lần, trung bình {statistics.mean(lat_us):.1f}µs, "
+                          f"p99 {p99:.1f}µs (index {len(index)} chữ ký)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Recall {recall:.3f}, precision {precision:.3f} (ngưỡng Jaccard {index.threshold}, "
+            f"noise {opts['noise']:.0%})"
+        ))
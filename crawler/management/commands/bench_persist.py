@@ -0,0 +1,97 @@
+# crawler/management/commands/bench_persist.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from articles.models import Article
+from crawler import canonical
+from crawler.persist import BatchWriter, ExtractedArticle, save_one
+from sources.models import Category
+
+BODY = ("<p>Theo báo cáo mới nhất, tăng trưởng kinh tế quý này đạt mức cao so với cùng kỳ, "
+        "trong đó khu vực công nghiệp và dịch vụ đóng góp phần lớn.</p>")
+
+
+class Command(BaseCommand):
+    help = ("Benchmark bước ghi DB của crawler (không tải mạng): từng bài (get_or_create + M2M add + save) "
+            "so với BatchWriter (bulk upsert theo lô). Bài thử có URL riêng và được xoá sau khi đo.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=500)
+        parser.add_argument("--batch-size", type=int, action="append", dest="batch_sizes",
+                            help="Kích thước lô (lặp lại được, mặc định 50 và 200)")
+        parser.add_argument("--paragraphs", type=int, default=20, help="Độ dài content_html mỗi bài")
+
+    def handle(self, *args, **opts):
+        n = opts["articles"]
+        cat_ids = list(Category.objects.values_list("id", flat=True)[:10])
+        rng = random.Random(1)
+        rows = []
+        prefix = f"https://bench-persist.invalid/{int(time.time())}"
+        try:
+            rows.append(("từng bài", self._run(f"{prefix}/one", n, rng, cat_ids, opts, None)))
+            for size in opts["batch_sizes"] or [50, 200]:
+                rows.append((f"lô {size}", self._run(f"{prefix}/b{size}", n, rng, cat_ids, opts, size)))
+        finally:
+            Article.objects.filter(source_url__startswith=prefix).delete()
+
+        self.stdout.write(f"{'':<12} {'pha':<10} {'bài/s':>9} {'query/bài':>10} {'lock tb':>10} {'lock max':>10}")
+        for name, phases in rows:
+            for phase, (elapsed, queries, hold_avg, hold_max) in phases.items():
+                self.stdout.write(
+                    f"{name:<12} {phase:<10} {n / elapsed if elapsed else 0:9.0f} {queries / n:10.1f} "
+                    f"{hold_avg * 1000:8.2f}ms {hold_max * 1000:8.2f}ms"
+                )
+        self.stdout.write("lock = thời gian 1 transaction ghi (từng bài: mỗi bài; lô: mỗi lô)")
+
+    def _items(self, prefix, n, rng, cat_ids, opts, existing=None):
+        out = []
+        for i in range(n):
+            url = f"{prefix}/{i}.html"
+            out.append(ExtractedArticle(
+                url=url,
+                seen_urls=canonical.variants(url, f"{url}?utm_source=rss"),
+                existing_id=(existing or {}).get(url),
+                title=f"Bài thử ghi DB {i}",
+                content_html=BODY * (opts["paragraphs"] + (1 if existing else 0)),
+                blocks={"blocks": [{"type": "p", "text": "x"}]},
+                excerpt="Tóm tắt bài thử",
+                main_image_url="https://example.com/a.jpg",
+                category_ids=rng.sample(cat_ids, min(2, len(cat_ids))),
+            ))
+        return out
+
+    def _run(self, prefix, n, rng, cat_ids, opts, batch_size):
+        phases = {}
+        for phase in ("tạo mới", "cập nhật"):
+            existing = None
+            if phase == "cập nhật":
+                existing = dict(Article.objects.filter(source_url__startswith=prefix)
+                                .values_list("source_url", "id"))
+            items = self._items(prefix, n, rng, cat_ids, opts, existing)
+            queries = [0]
+
+            def count(execute, sql, params, many, context):
+                queries[0] += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                t0 = time.perf_counter()
+                if batch_size is None:
+                    holds = []
+                    for it in items:
+                        t1 = time.perf_counter()
+                        save_one(it)
+                        holds.append(time.perf_counter() - t1)
+                    hold_avg, hold_max = sum(holds) / len(holds), max(holds)
+                else:
+                    with BatchWriter(batch_size) as writer:
+                        for it in items:
+                            writer.add(it)
+                    st = writer.stats
+                    hold_avg, hold_max = st.lock_seconds / st.batches, st.max_lock_seconds
+                elapsed = time.perf_counter() - t0
+            phases[phase] = (elapsed, queries[0], hold_avg, hold_max)
+        return phases
@@ -0,0 +1,105 @@
+# crawler/management/commands/bench_profiles.py
+import json
+import statistics
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from crawler import profiles
+from crawler.bench import corpus as bench_corpus
+from crawler.bench.extract import run_document
+from crawler.management.commands.seed_sources import FEEDS, PROFILES
+from sources.models import Source
+
+
+def _fmt(value, spec: str, suffix: str = "") -> str:
+    return "-" if value is None else f"{value:{spec}}{suffix}"
+
+
+class Command(BaseCommand):
+    help = ("So sánh CPU trích xuất mỗi bài: profile theo nguồn (selector trên cây lxml) với đường chung "
+            "(readability + trafilatura), trên corpus ghi lại + trang tổng hợp. Báo số bài profile trượt "
+            "và độ lệch text/title giữa 2 đường.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", default=getattr(settings, "CRAWLER_BENCH_CORPUS", ""))
+        parser.add_argument("--synthetic", type=int, default=40)
+        parser.add_argument("--oversized", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--profile-json", help="File JSON profile dùng cho mọi trang (thử selector mới)")
+
+    def handle(self, *args, **opts):
+        corpus = bench_corpus.Corpus("", [])
+        root = Path(opts["corpus"]) if opts["corpus"] else None
+        if root and root.exists():
+            path = bench_corpus.latest_version(root)
+            if path is None:
+                raise CommandError(f"Không thấy manifest.json trong {root}")
+            corpus = bench_corpus.load(path)
+        if opts["synthetic"] or opts["oversized"]:
+            corpus = corpus + bench_corpus.synthetic(opts["synthetic"], opts["oversized"])
+        if not corpus.pages:
+            raise CommandError("Corpus rỗng")
+
+        override = None
+        if opts["profile_json"]:
+            override = profiles.compile_profile(json.loads(Path(opts["profile_json"]).read_text("utf-8")))
+        lookup = self._profile_lookup()
+
+        rows = {}   # nguồn -> [(generic, profiled, fallback, text ratio, same title)]
+        for page in corpus.pages:
+            profile = override or lookup(page)
+            generic, gdoc = run_document(page, None, opts["repeat"])
+            if profile is None:
+                rows.setdefault(page.source or "?", []).append((generic, None, True, None, None))
+                continue
+            fast, pdoc = run_document(page, profile, opts["repeat"])
+            hit = pdoc.profiled is not None
+            ratio = len(pdoc.text) / len(gdoc.text) if hit and gdoc.text else None
+            same_title = hit and pdoc.title.strip() == gdoc.title.strip()
+            rows.setdefault(page.source or "?", []).append((generic, fast, not hit, ratio, same_title))
+
+        self.stdout.write(f"corpus {corpus.version}: {len(corpus.pages)} trang, repeat={opts['repeat']} "
+                          "(CPU process_time, lần nhanh nhất)")
+        self.stdout.write(f"{'nguồn':<28} {'bài':>4} {'chung ms':>9} {'profile ms':>11} {'x':>6} "
+                          f"{'trượt':>6} {'text/chung':>11} {'title khớp':>11}")
+        all_g, all_p = [], []
+        for source, items in sorted(rows.items()):
+            g = [r[0] for r in items]
+            p = [r[1] for r in items if r[1] is not None]
+            fallback = sum(1 for r in items if r[2])
+            ratios = [r[3] for r in items if r[3] is not None]
+            titles = [r[4] for r in items if r[4] is not None]
+            all_g += g
+            all_p += [r[1] if r[1] is not None else r[0] for r in items]
+            gm = statistics.mean(g) * 1000
+            pm = statistics.mean(p) * 1000 if p else None
+            self.stdout.write(
+                f"{source[:28]:<28} {len(items):>4} {gm:9.2f} {_fmt(pm, '.2f'):>11} "
+                f"{_fmt(gm / pm if pm else None, '.1f', 'x'):>6} {fallback:>6} "
+                f"{_fmt(statistics.median(ratios) if ratios else None, '.0%'):>11} "
+                f"{f'{sum(titles)}/{len(titles)}' if titles else '-':>11}"
+            )
+        g, p = statistics.mean(all_g) * 1000, statistics.mean(all_p) * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f"tổng: chung {g:.2f} ms/bài, có profile (kể cả bài trượt chạy đường chung) {p:.2f} ms/bài "
+            f"-> x{g / p:.1f}"))
+
+    @staticmethod
+    def _profile_lookup():
+        """Profile của trang: Source trong DB (theo tên) > PROFILES của seed_sources (theo tên/host)."""
+        by_name = {s.name: s.extract_profile for s in Source.objects.exclude(extract_profile={})}
+        by_name = {**PROFILES, **by_name}
+        by_host = {urlparse(home).netloc.removeprefix("www."): by_name.get(name) for name, home, _ in FEEDS}
+
+        def lookup(page):
+            if page.id.startswith("synthetic-"):
+                return profiles.compile_profile(bench_corpus.SYNTHETIC_PROFILE)
+            spec = by_name.get(page.source) or by_host.get(urlparse(page.url).netloc.removeprefix("www."))
+            try:
+                return profiles.compile_profile(spec)
+            except profiles.ProfileError:
+                return None
+        return lookup
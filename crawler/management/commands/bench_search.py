@@ -0,0 +1,163 @@
+# crawler/management/commands/bench_search.py
+import os
+import random
+import statistics
+import tempfile
+import time
+import unicodedata
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from articles import search
+from articles.models import Article
+from articles.textnorm import fold
+from web.views import CARD_DEFER
+
+ALIAS = "bench_search"
+RARE = "Quỳnh"          # tên riêng hiếm: 1/RARE_EVERY bài có trong tiêu đề
+RARE_EVERY = 10_000
+
+# âm tiết tổng hợp: phụ âm đầu × vần × thanh (cả đ) -> vài nghìn từ, tần suất theo Zipf như văn bản báo
+ONSETS = "b c ch d đ g gi h kh l m n ng nh ph qu s t th tr v x".split() + [""]
+RHYMES = ("a ai an ang anh ao at au ay e em en eo i im in inh it o oi om on ong ot "
+          "u ui um un ung ut ua uy ươ ương ươc uôn uông iêt iêu yên").split()
+TONES = ("", "\u0300", "\u0301", "\u0303", "\u0309", "\u0323")    # huyền sắc ngã hỏi nặng
+_VOWELS = "aeiouyăâêôơư"
+
+
+def _syllable(onset: str, rhyme: str, tone: str) -> str:
+    # vị trí dấu thanh theo chính tả thông dụng: nguyên âm có mũ/móc, vần có phụ âm cuối -> nguyên âm cuối,
+    # vần mở 2 nguyên âm -> nguyên âm đầu (trừ uy)
+    vowels = [k for k, ch in enumerate(rhyme) if ch in _VOWELS]
+    marked = [k for k in vowels if rhyme[k] in "ăâêôơư"]
+    if marked:
+        i = marked[-1]
+    elif vowels[-1] < len(rhyme) - 1 or rhyme == "uy":
+        i = vowels[-1]
+    else:
+        i = vowels[0]
+    return unicodedata.normalize("NFC", onset + rhyme[:i + 1] + tone + rhyme[i + 1:])
+
+
+def _vocab(rng: random.Random) -> list[str]:
+    out = sorted({_syllable(o, r, t) for o in ONSETS for r in RHYMES for t in TONES})
+    rng.shuffle(out)
+    return out
+
+
+class Command(BaseCommand):
+    help = ("Benchmark tìm kiếm trên bảng Article tổng hợp (file SQLite tạm): "
+            "filter icontains cũ (_common_filters) so với articles.search (FTS5 + bm25), "
+            "đo count + trang đầu như Paginator. Bảng tạm bị xoá sau khi đo.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=100_000, help="Số bài tổng hợp (vd 1000000)")
+        parser.add_argument("--body-words", type=int, default=60, help="Số từ thân bài mỗi bài")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--keep", help="Giữ file DB tổng hợp ở đường dẫn này (chạy lại không phải dựng)")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        path = opts["keep"] or os.path.join(tempfile.mkdtemp(prefix="bench-search-"), "db.sqlite3")
+        fresh = not os.path.exists(path)
+        connections.databases[ALIAS] = {**connections.databases["default"],
+                                        "ENGINE": "django.db.backends.sqlite3", "NAME": path}
+        rng = random.Random(opts["seed"])
+        vocab = _vocab(rng)
+        try:
+            if fresh:
+                self._build(rng, vocab, opts)
+            kind = search.backend(ALIAS)
+            n = Article.objects.using(ALIAS).count()
+            self.stdout.write(f"{n} bài, DB {os.path.getsize(path) / 2**20:.0f} MiB, backend {kind}")
+            if kind != "fts5":
+                raise CommandError("SQLite build này không có FTS5")
+            self._compare(vocab, opts["repeat"])
+        finally:
+            connections[ALIAS].close()
+            del connections.databases[ALIAS]
+            if not opts["keep"]:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+
+    def _build(self, rng, vocab, opts):
+        # chỉ bảng Article (+ index toàn văn như migration 0010), không chạy data migration của app khác
+        with connections[ALIAS].schema_editor() as editor:
+            editor.create_model(Article)
+            search.install(editor)
+        with connections[ALIAS].cursor() as cur:
+            cur.execute("PRAGMA foreign_keys = OFF")   # không có bảng auth_user / sources_category
+        folded = [fold(w) for w in vocab]
+        cum = list(_zipf_cum(len(vocab)))
+        n, body_words = opts["articles"], opts["body_words"]
+        now = timezone.now()
+        t0, batch = time.perf_counter(), []
+
+        def text(k):
+            idx = rng.choices(range(len(vocab)), cum_weights=cum, k=k)
+            return " ".join(vocab[i] for i in idx), " ".join(folded[i] for i in idx)
+
+        for i in range(n):
+            title, title_f = text(rng.randint(6, 12))
+            if i % RARE_EVERY == 0:
+                title, title_f = f"{title} {RARE}", f"{title_f} {fold(RARE)}"
+            excerpt, excerpt_f = text(rng.randint(20, 40))
+            _body, body_f = text(body_words)
+            batch.append(Article(
+                title=title.capitalize(), slug=f"b-{i}", excerpt=excerpt,
+                source_url=f"https://bench-search.invalid/{i}",
+                search_blob=f"{title_f} {excerpt_f}", search_body=body_f,
+                published_at=now - timedelta(minutes=n - i), is_visible=True,
+            ))
+            if len(batch) == 5000:
+                Article.objects.using(ALIAS).bulk_create(batch, batch_size=500)
+                batch = []
+                if (i + 1) % 100_000 == 0:
+                    self.stdout.write(f"  {i + 1}/{n} bài ({time.perf_counter() - t0:.0f}s)")
+        Article.objects.using(ALIAS).bulk_create(batch, batch_size=500)
+        with connections[ALIAS].cursor() as cur:
+            cur.execute(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('optimize')")
+            cur.execute("ANALYZE")
+        self.stdout.write(f"Dựng {n} bài (trigger FTS5 đồng bộ khi INSERT) trong {time.perf_counter() - t0:.0f}s")
+
+    def _compare(self, vocab, repeat):
+        base = Article.objects.using(ALIAS).filter(is_visible=True).defer(*CARD_DEFER)   # như HomeView
+        # từ phổ biến / trung bình / ít gặp theo hạng Zipf, 2 từ, tiền tố không dấu, tên riêng hiếm
+        queries = [vocab[0], vocab[50], vocab[3000], f"{vocab[10]} {vocab[200]}", fold(vocab[5])[:3],
+                   RARE, f"{vocab[0]} {fold(RARE)}"]
+
+        self.stdout.write(f"{'query':<24} {'':<10} {'kết quả':>9} {'count':>9} {'trang 1':>9}")
+        for q in queries:
+            rows = [("icontains", self._legacy(base, q)), ("fts5", search.search(base, q))]
+            for name, qs in rows:
+                counts, firsts, total = [], [], 0
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    total = qs.count()
+                    counts.append(time.perf_counter() - t0)
+                    t0 = time.perf_counter()
+                    list(qs[:18])
+                    firsts.append(time.perf_counter() - t0)
+                self.stdout.write(f"{q[:24]:<24} {name:<10} {total:>9} "
+                                  f"{statistics.median(counts) * 1000:7.1f}ms "
+                                  f"{statistics.median(firsts) * 1000:7.1f}ms")
+
+    @staticmethod
+    def _legacy(qs, q):
+        """web.views._common_filters trước khi có articles.search."""
+        return qs.filter(
+            Q(title__icontains=q) |
+            Q(excerpt__icontains=q) |
+            Q(search_blob__icontains=q.lower())
+        ).order_by("-published_at", "-id")
+
+
+def _zipf_cum(n: int):
+    acc = 0.0
+    for rank in range(1, n + 1):
+        acc += 1.0 / rank
+        yield acc
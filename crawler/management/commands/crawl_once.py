@@ -4,6 +4,7 @@ from articles.models import Article
 from sources.models import Category
 from taggit.utils import parse_tags
 from crawler.utils import fetch_and_extract
+from crawler.canonical import canonicalize
 from django.utils.text import slugify
 
 class Command(BaseCommand):
@@ -20,7 +21,7 @@ class Command(BaseCommand):
         data = fetch_and_extract(url)
 
         art = Article.objects.create(
-            source_url=url,
+            source_url=canonicalize(url) or url,
             title=data["title"],
             excerpt=data["excerpt"],
             content_html=data["content_html"],
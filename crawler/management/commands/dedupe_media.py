@@ -0,0 +1,109 @@
+# crawler/management/commands/dedupe_media.py
+import hashlib
+import json
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from articles.models import Article
+from crawler import media
+from crawler.utils import IMG_EXTS
+
+LEGACY_DIR = "articles"
+
+
+class Command(BaseCommand):
+    help = ("Chuyển ảnh mirror kiểu cũ (media/articles/<host>/<uuid>.ext) sang kho content-addressed "
+            "(media/images/ab/cd/<sha256>.ext), sửa tham chiếu trong content_html/blocks/main_image_url "
+            "và xoá bản trùng.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Chỉ thống kê, không ghi gì")
+        parser.add_argument("--keep-old", action="store_true", help="Không xoá file cũ sau khi chuyển")
+        parser.add_argument("--delete-orphans", action="store_true",
+                            help="Xoá cả file trong media/articles không bài nào tham chiếu")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        dry = opts["dry_run"]
+        prefix = settings.MEDIA_URL.rstrip("/") + "/"
+        legacy_re = re.compile(re.escape(prefix) + rf"({LEGACY_DIR}/[^\"'\s<>()]+)")
+
+        mapping: dict[str, str | None] = {}   # path cũ -> path mới (None = file không còn)
+        hashes: dict[str, int] = {}           # sha256 -> size
+        old_bytes = 0
+
+        def migrate(old: str) -> str | None:
+            nonlocal old_bytes
+            if old not in mapping:
+                mapping[old] = None
+                if default_storage.exists(old):
+                    with default_storage.open(old, "rb") as f:
+                        data = f.read()
+                    old_bytes += len(data)
+                    ext = os.path.splitext(old)[1].lower()
+                    ext = ext if ext in IMG_EXTS else ".jpg"
+                    if dry:
+                        sha = hashlib.sha256(data).hexdigest()
+                        path = media.cas_path(sha, ext)
+                    else:
+                        sha, path = media.store_bytes(data, ext)
+                    hashes[sha] = len(data)
+                    mapping[old] = path
+            return mapping[old]
+
+        def rewrite(text: str) -> str:
+            def sub(m):
+                new = migrate(m.group(1))
+                return prefix + new if new else m.group(0)
+            return legacy_re.sub(sub, text) if text and prefix in text else text
+
+        fields = ["content_html", "blocks", "main_image_url"]
+        qs = Article.objects.only("id", *fields).order_by("id")
+        batch, changed, scanned = [], 0, 0
+        for a in qs.iterator(chunk_size=opts["batch_size"]):
+            scanned += 1
+            html, img = rewrite(a.content_html), rewrite(a.main_image_url)
+            blocks = a.blocks
+            if blocks:
+                raw = json.dumps(blocks, ensure_ascii=False)
+                new_raw = rewrite(raw)
+                if new_raw != raw:
+                    blocks = json.loads(new_raw)
+            if (html, img, blocks) != (a.content_html, a.main_image_url, a.blocks):
+                a.content_html, a.main_image_url, a.blocks = html, img, blocks
+                batch.append(a)
+                changed += 1
+            if len(batch) >= opts["batch_size"]:
+                if not dry:
+                    Article.objects.bulk_update(batch, fields)
+                batch = []
+        if batch and not dry:
+            Article.objects.bulk_update(batch, fields)
+
+        # dọn file cũ: đã chuyển (luôn) + không ai tham chiếu (khi --delete-orphans)
+        to_delete = [p for p, new in mapping.items() if new] if not opts["keep_old"] else []
+        orphan_bytes = 0
+        if opts["delete_orphans"] and default_storage.exists(LEGACY_DIR):
+            for path in media.walk(LEGACY_DIR):
+                if path not in mapping:
+                    orphan_bytes += default_storage.size(path)
+                    to_delete.append(path)
+        if not dry:
+            for path in to_delete:
+                default_storage.delete(path)
+
+        new_bytes = sum(hashes.values())
+        verb = "Sẽ" if dry else "Đã"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} sửa {changed}/{scanned} bài; {len(mapping)} file cũ -> {len(hashes)} file theo hash "
+            f"({sum(1 for v in mapping.values() if v is None)} file mất)."
+        ))
+        self.stdout.write(
+            f"Dung lượng ảnh được tham chiếu: {old_bytes / 1e6:.1f}MB -> {new_bytes / 1e6:.1f}MB; "
+            f"{verb.lower()} xoá {len(to_delete)} file cũ"
+            + (f" (trong đó {orphan_bytes / 1e6:.1f}MB không ai dùng)" if opts["delete_orphans"] else "")
+        )
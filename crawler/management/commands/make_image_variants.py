@@ -0,0 +1,52 @@
+# crawler/management/commands/make_image_variants.py
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from crawler import media
+from crawler.pipeline import init_worker
+from crawler.utils import IMG_EXTS
+
+
+class Command(BaseCommand):
+    help = ("Sinh bản resize (WebP/JPEG theo MEDIA_VARIANT_WIDTHS) cho ảnh đã mirror "
+            "trong media/images và media/articles (backfill), chạy bằng process pool.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", action="append", dest="dirs",
+                            help=f"Thư mục trong MEDIA (mặc định: {media.CAS_DIR}, articles)")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--force", action="store_true", help="Làm lại cả ảnh đã có variant")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        dirs = opts["dirs"] or [media.CAS_DIR, "articles"]
+        paths = [
+            p for d in dirs if default_storage.exists(d) for p in media.walk(d)
+            if p.lower().endswith(IMG_EXTS) and not media.VARIANT_RE.search(p)
+        ]
+        todo = []
+        for i in range(0, len(paths), opts["batch_size"]):
+            chunk = paths[i:i + opts["batch_size"]]
+            todo += chunk if opts["force"] else media.missing_variants(chunk)
+        self.stdout.write(f"{len(paths)} ảnh gốc, {len(todo)} cần tạo variant")
+
+        t0, done, made, rows = time.perf_counter(), 0, 0, []
+        with ProcessPoolExecutor(max_workers=max(1, opts["workers"]), initializer=init_worker) as pool:
+            for out in pool.map(media.make_variants, todo, chunksize=8):
+                done += 1
+                made += len(out) - 1 if out else 0
+                rows += out
+                if len(rows) >= opts["batch_size"]:
+                    media.save_variants(rows)
+                    rows = []
+                if done % 100 == 0:
+                    self.stdout.write(f"  {done}/{len(todo)}")
+        media.save_variants(rows)
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f"Xong {done} ảnh, {made} variant trong {elapsed:.1f}s "
+            f"(~{done / elapsed if elapsed else 0:.1f} ảnh/s)"
+        ))
@@ -0,0 +1,73 @@
+# crawler/management/commands/merge_duplicate_articles.py
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length
+
+from articles.models import Article
+from crawler import canonical
+
+
+class Command(BaseCommand):
+    help = ("Gộp các bài trùng do khác biến thể URL (utm_*, AMP, mobile, dấu / cuối...): "
+            "giữ 1 bài, chuyển category/bình luận/reaction sang, URL còn lại thành alias.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        groups = defaultdict(list)
+        rows = (Article.objects.exclude(source_url__isnull=True).exclude(source_url="")
+                .annotate(n=Length("content_html")).values_list("id", "source_url", "n"))
+        for pk, url, n in rows.iterator(chunk_size=5000):
+            groups[canonical.canonicalize(url) or url].append((n or 0, -pk, url))
+
+        merged = renamed = 0
+        for canon, items in groups.items():
+            items.sort(reverse=True)   # nội dung dài nhất, rồi id nhỏ nhất
+            keep_id = -items[0][1]
+            losers = [-pk for _, pk, _ in items[1:]]
+            if opts["dry_run"]:
+                if losers:
+                    self.stdout.write(f"{canon}: giữ #{keep_id}, gộp {losers}")
+                merged += len(losers)
+                renamed += items[0][2] != canon
+                continue
+            with transaction.atomic():
+                keep = Article.objects.get(pk=keep_id)
+                for loser in Article.objects.filter(pk__in=losers):
+                    self._merge(keep, loser)
+                    merged += 1
+                if keep.source_url != canon and not Article.objects.filter(source_url=canon).exists():
+                    old = keep.source_url
+                    keep.source_url = canon
+                    keep.save(update_fields=["source_url"])
+                    canonical.remember_aliases(keep, [old])
+                    renamed += 1
+
+        verb = "Sẽ gộp" if opts["dry_run"] else "Đã gộp"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {merged} bài trùng; chuẩn hoá URL {renamed} bài."))
+
+    def _merge(self, keep, loser):
+        keep.categories.add(*loser.categories.all())
+        # FK trỏ tới bài (bình luận, reaction, alias...) -> chuyển sang bài giữ lại;
+        # dòng vi phạm unique (vd. reaction trùng session) thì bỏ
+        for rel in Article._meta.related_objects:
+            if not rel.one_to_many:
+                continue
+            field = rel.field.name
+            qs = rel.related_model.objects.filter(**{field: loser})
+            try:
+                with transaction.atomic():
+                    qs.update(**{field: keep})
+            except IntegrityError:
+                for obj in qs:
+                    try:
+                        with transaction.atomic():
+                            rel.related_model.objects.filter(pk=obj.pk).update(**{field: keep})
+                    except IntegrityError:
+                        obj.delete()
+        url = loser.source_url
+        loser.delete()
+        canonical.remember_aliases(keep, [url])
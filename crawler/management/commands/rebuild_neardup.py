@@ -0,0 +1,57 @@
+# crawler/management/commands/rebuild_neardup.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from articles.models import Article, _strip_html
+from crawler import neardup
+
+
+class Command(BaseCommand):
+    help = ("Tính lại chữ ký MinHash + khoá LSH cho bài đã có và gom cụm tin gần trùng (duplicate_of). "
+            "Bài cũ không còn HTML gốc nên chữ ký tính trên title + text của content_html.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--days", type=int, default=neardup.WINDOW_DAYS,
+                            help="Chỉ gom bài đăng cách nhau tối đa N ngày (0 = không giới hạn)")
+
+    def handle(self, *args, **opts):
+        window = timedelta(days=opts["days"]) if opts["days"] else None
+        index = neardup.LSHIndex()
+        published = {}
+        batch, n, dups, t0 = [], 0, 0, time.perf_counter()
+
+        def flush():
+            with transaction.atomic():
+                Article.objects.bulk_update([a for a, _ in batch], ["minhash", "duplicate_of"])
+                neardup.save_bands([(a.pk, sig) for a, sig in batch])
+            batch.clear()
+
+        # theo thứ tự đăng -> bài gốc của cụm là bài xuất hiện đầu tiên
+        qs = Article.objects.only("id", "title", "content_html", "published_at").order_by("published_at", "id")
+        for a in qs.iterator(chunk_size=opts["batch_size"]):
+            n += 1
+            sig = neardup.signature(f"{a.title}\n{_strip_html(a.content_html)}")
+            a.minhash, a.duplicate_of_id = neardup.pack(sig), None
+            if sig:
+                pub = a.published_at
+                hit = index.find(sig, accept=lambda k: not (window and pub and published[k]
+                                                            and pub - published[k] > window))
+                if hit:
+                    a.duplicate_of_id = hit[0]
+                    dups += 1
+                else:
+                    index.add(a.pk, sig)   # chỉ bài gốc vào index -> cụm luôn trỏ về bài gốc
+                    published[a.pk] = pub
+            batch.append((a, sig))
+            if len(batch) >= opts["batch_size"]:
+                flush()
+        if batch:
+            flush()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{n} bài, {dups} bài gần trùng, {len(index)} bài gốc trong {time.perf_counter() - t0:.1f}s"
+        ))
@@ -0,0 +1,229 @@
+# crawler/management/commands/reextract.py
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Sum
+
+from articles import render, search
+from articles.models import Article
+from crawler import profiles, raw_archive
+from crawler.models import RawPage
+from crawler.persist import _update_many
+from crawler.pipeline import init_worker
+
+FIELDS = ("content_html", "blocks", "excerpt", "main_image_url", "main_image_caption")
+
+
+def _extract(job):
+    """
+    Chạy trong process con: đọc 1 bản ghi archive -> trích xuất bằng code hiện tại
+    (cùng quy tắc chọn content_html như crawler.tasks._extract_document).
+    -> (article_id, {field: value}, byte HTML gốc) hoặc (article_id, None, lỗi).
+    """
+    from crawler.document import FetchedPage, ParsedDocument
+    from crawler import sanitize
+
+    article_id, path, offset, length, profile_spec, fetch_images = job
+    try:
+        meta, html = raw_archive.read_record(path, offset, length)
+        page = FetchedPage(url=meta.get("fetched_url") or meta["url"], content=html,
+                           status=meta.get("status") or 200, final_url=meta.get("final_url") or "",
+                           encoding=meta.get("encoding"))
+        doc = ParsedDocument(page, profile=profiles.compile_profile(profile_spec), fetch_images=fetch_images)
+        cleaned = sanitize.clean_summary(doc.summary_html)
+        parsed = doc.content
+        if parsed.get("content_html") and len(parsed["content_html"]) > len(cleaned):
+            cleaned = parsed["content_html"]
+        fields = {
+            "content_html": cleaned,
+            "blocks": parsed.get("blocks") or {},
+            "excerpt": (parsed.get("excerpt") or doc.description or doc.text[:300])[:800],
+            "main_image_url": (parsed.get("main_image_url") or getattr(doc.metadata, "image", None) or "")[:1000],
+            "main_image_caption": (parsed.get("main_image_caption") or "")[:500],
+        }
+        return article_id, fields, len(html)
+    except Exception as e:
+        return article_id, None, str(e) or e.__class__.__name__
+    finally:
+        connections.close_all()   # process con giữ connection riêng, đóng sau mỗi trang
+
+
+class Command(BaseCommand):
+    help = ("Trích xuất lại bài từ HTML gốc trong raw archive (crawler/raw_archive.py) bằng code hiện tại, "
+            "process pool, cập nhật content_html/blocks/excerpt/ảnh đại diện theo lô. Không tải lại trang; "
+            "ảnh chỉ dùng bản đã mirror trừ khi --fetch-images.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", action="append", help="Tên hoặc id nguồn (lặp lại được)")
+        parser.add_argument("--ids", help="Danh sách id bài, cách nhau dấu phẩy")
+        parser.add_argument("--limit", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunksize", type=int, default=8, help="Số trang mỗi lần gửi cho process con")
+        parser.add_argument("--batch-size", type=int, default=200, help="Số bài mỗi lô UPDATE")
+        parser.add_argument("--fetch-images", action="store_true", help="Tải ảnh chưa từng mirror")
+        parser.add_argument("--dry-run", action="store_true", help="Chỉ trích xuất + đếm, không ghi")
+        parser.add_argument("--reindex", action="store_true",
+                            help="Dựng lại chỉ mục RawPage từ các segment trước khi chạy")
+
+    def handle(self, *args, **opts):
+        archive = raw_archive.get_archive()
+        if archive is None:
+            raise CommandError("CRAWLER_RAW_ARCHIVE trống (raw archive đang tắt)")
+        if opts["reindex"]:
+            self.stdout.write(f"reindex: {self._reindex(archive)} bản ghi")
+        # chỉ mục ghi trước khi có bài (lô chưa flush) -> nối lại theo URL
+        if RawPage.objects.filter(article__isnull=True).exists():
+            self._link_articles()
+
+        qs = RawPage.objects.filter(article__isnull=False)
+        if opts["ids"]:
+            qs = qs.filter(article_id__in=[int(x) for x in opts["ids"].split(",") if x.strip()])
+        if opts["source"]:
+            names = [s for s in opts["source"] if not s.isdigit()]
+            ids = [int(s) for s in opts["source"] if s.isdigit()]
+            qs = qs.filter(article__in=self._articles_of_sources(names, ids))
+        qs = qs.order_by("segment", "offset")   # đọc segment tuần tự
+        if opts["limit"]:
+            qs = qs[:opts["limit"]]
+        rows = list(qs.values_list("article_id", "segment", "offset", "length"))
+        if not rows:
+            self.stdout.write("Không có trang nào trong archive.")
+            return
+
+        specs = self._profiles([r[0] for r in rows])
+        jobs = [(aid, str(archive.root / seg), off, length, specs.get(aid), opts["fetch_images"])
+                for aid, seg, off, length in rows]
+        self.stdout.write(f"{len(jobs)} trang, {opts['workers']} process")
+
+        connections.close_all()   # không để process con (fork) dùng chung connection của cha
+        t0 = time.perf_counter()
+        done = changed = failed = html_bytes = 0
+        batch = []
+        with ProcessPoolExecutor(max_workers=max(1, opts["workers"]), initializer=init_worker) as pool:
+            for article_id, fields, extra in pool.map(_extract, jobs, chunksize=max(1, opts["chunksize"])):
+                done += 1
+                if fields is None:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"  [FAIL] #{article_id}: {extra}"))
+                    continue
+                html_bytes += extra
+                batch.append((article_id, fields))
+                if len(batch) >= opts["batch_size"]:
+                    changed += self._write(batch, opts["dry_run"])
+                    batch = []
+                if done % 500 == 0:
+                    self.stdout.write(f"  {done}/{len(jobs)}")
+        changed += self._write(batch, opts["dry_run"])
+        elapsed = time.perf_counter() - t0
+
+        stored = RawPage.objects.aggregate(n=Sum("length"), raw=Sum("size"))
+        pages = RawPage.objects.count()
+        disk = archive.disk_bytes()
+        verb = "sẽ đổi" if opts["dry_run"] else "đã đổi"
+        self.stdout.write(self.style.SUCCESS(
+            f"Xong {done} trang trong {elapsed:.1f}s (~{done / elapsed if elapsed else 0:.1f} trang/s, "
+            f"{html_bytes / elapsed / 1e6 if elapsed else 0:.1f} MB HTML/s): {verb} {changed} bài, lỗi {failed}"
+        ))
+        if pages:
+            self.stdout.write(
+                f"archive: {pages} trang, {disk / 1e6:.1f} MB trên đĩa = {disk / pages / 1024:.1f} KB/bài "
+                f"(HTML gốc {(stored['raw'] or 0) / pages / 1024:.1f} KB/bài, "
+                f"nén còn {(stored['n'] or 0) / (stored['raw'] or 1):.0%}, codec "
+                f"{'zstd' if raw_archive.zstandard else 'zlib'})"
+            )
+
+    @staticmethod
+    def _write(batch, dry_run: bool) -> int:
+        """Chỉ ghi bài có field đổi; bài trùng (duplicate_of) giữ ảnh đại diện của bài gốc."""
+        if not batch:
+            return 0
+        current = {a.pk: a for a in Article.objects.filter(pk__in=[aid for aid, _ in batch])
+                   .only("id", "title", "duplicate_of", *FIELDS)}
+        groups: dict[tuple, list] = {}
+        rerender = []
+        for aid, fields in batch:
+            a = current.get(aid)
+            if a is None or not fields["content_html"]:
+                continue    # bài đã xoá / trích xuất rỗng: giữ nguyên nội dung cũ
+            if a.duplicate_of_id:
+                fields = {k: v for k, v in fields.items() if k not in ("main_image_url", "main_image_caption")}
+            diff = tuple(k for k, v in fields.items() if getattr(a, k) != v)
+            if not diff:
+                continue
+            for k in diff:
+                setattr(a, k, fields[k])
+            if "excerpt" in diff or "content_html" in diff:
+                a.fill_search_fields()
+                diff += search.FIELDS
+            if not render.SOURCE_FIELDS.isdisjoint(diff):
+                rerender.append(a)
+                diff += render.FIELDS
+            groups.setdefault(diff, []).append(a)
+        if not dry_run:
+            render.fill_bodies(rerender)
+            with transaction.atomic():
+                for diff, objs in groups.items():
+                    _update_many(objs, diff)
+        return sum(len(v) for v in groups.values())
+
+    @staticmethod
+    def _profiles(article_ids) -> dict:
+        """{article_id: extract_profile của nguồn} — Article không có FK nguồn nên ghép theo host của source_url."""
+        from urllib.parse import urlparse
+
+        from sources.models import Source
+
+        by_host = {}
+        for homepage, spec in Source.objects.exclude(extract_profile={}).values_list("homepage", "extract_profile"):
+            if homepage:
+                by_host[urlparse(homepage).netloc.removeprefix("www.")] = spec
+        if not by_host:
+            return {}
+        out = {}
+        for aid, url in Article.objects.filter(pk__in=article_ids).values_list("id", "source_url"):
+            spec = by_host.get(urlparse(url or "").netloc.removeprefix("www."))
+            if spec:
+                out[aid] = spec
+        return out
+
+    @staticmethod
+    def _articles_of_sources(names, ids):
+        from urllib.parse import urlparse
+
+        from django.db.models import Q
+
+        from sources.models import Source
+
+        hosts = [urlparse(h).netloc.removeprefix("www.") for h in
+                 Source.objects.filter(Q(name__in=names) | Q(pk__in=ids)).values_list("homepage", flat=True) if h]
+        if not hosts:
+            raise CommandError("Không tìm thấy nguồn")
+        q = Q()
+        for h in hosts:
+            q |= Q(source_url__contains=f"://{h}/") | Q(source_url__contains=f"://www.{h}/")
+        return Article.objects.filter(q).values("pk")
+
+    @staticmethod
+    def _link_articles() -> int:
+        rows = RawPage.objects.filter(article__isnull=True).values_list("id", "url")
+        ids = dict(Article.objects.filter(source_url__in=[u for _, u in rows]).values_list("source_url", "id"))
+        objs = [RawPage(pk=pk, article_id=ids[u]) for pk, u in rows if u in ids]
+        RawPage.objects.bulk_update(objs, ["article"], batch_size=500)
+        return len(objs)
+
+    @staticmethod
+    def _reindex(archive) -> int:
+        """Quét segment, bản ghi mới nhất của mỗi URL thắng (thứ tự tên segment + offset)."""
+        from datetime import datetime
+
+        latest = {}
+        for segment, offset, length, meta in archive.scan():
+            latest[meta["url"]] = (segment, offset, length, meta)
+        objs = [RawPage(url=url[:1000], segment=seg, offset=off, length=length, size=meta.get("size") or 0,
+                        codec=meta["codec"], fetched_at=datetime.fromisoformat(meta["fetched_at"]))
+                for url, (seg, off, length, meta) in latest.items()]
+        RawPage.objects.bulk_create(objs, batch_size=500, update_conflicts=True, unique_fields=["url"],
+                                    update_fields=["segment", "offset", "length", "size", "codec", "fetched_at"])
+        return len(objs)
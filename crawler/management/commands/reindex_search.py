@@ -1,14 +1,51 @@
 # crawler/management/commands/reindex_search.py
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from articles import search
 from articles.models import Article
+from crawler.persist import _update_many
+
 
 class Command(BaseCommand):
-    help = "Rebuild search_blob cho toàn bộ bài"
+    help = ("Tính lại search_blob / search_body (bỏ dấu) cho toàn bộ bài theo lô; index toàn văn "
+            "(FTS5 / tsvector) tự cập nhật theo (articles/search.py).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--optimize", action="store_true",
+                            help="SQLite: gộp segment của bảng FTS5 sau khi xong (chậm, index gọn hơn)")
 
     def handle(self, *args, **opts):
-        n = 0
-        for a in Article.objects.all().iterator():
-            # gọi save để rebuild search_blob
-            a.save(update_fields=["search_blob"])
-            n += 1
-        self.stdout.write(self.style.SUCCESS(f"Reindexed {n} articles"))
+        qs = Article.objects.only("id", "title", "excerpt", "content_html", *search.FIELDS)
+        size = max(1, opts["batch_size"])
+        t0, n, changed, last = time.perf_counter(), 0, 0, 0
+        while True:
+            batch = list(qs.filter(pk__gt=last).order_by("pk")[:size])
+            if not batch:
+                break
+            dirty = []
+            for a in batch:
+                old = (a.search_blob, a.search_body)
+                a.fill_search_fields()
+                if (a.search_blob, a.search_body) != old:
+                    dirty.append(a)
+            if dirty:
+                # trigger / cột generated chỉ đụng index của bài có text đổi
+                with transaction.atomic():
+                    _update_many(dirty, search.FIELDS)
+            n += len(batch)
+            changed += len(dirty)
+            last = batch[-1].pk
+
+        if opts["optimize"] and search.backend() == "fts5":
+            from django.db import connection
+
+            with connection.cursor() as cur:
+                cur.execute(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('optimize')")
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f"Reindexed {n} articles ({changed} đổi) trong {elapsed:.1f}s, backend {search.backend()}"
+        ))
@@ -0,0 +1,53 @@
+# crawler/management/commands/render_bodies.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from articles import render
+from articles.models import Article
+from crawler.persist import _update_many
+
+
+class Command(BaseCommand):
+    help = ("Tính lại biến thể render của thân bài (articles/render.py: width/height/srcset) "
+            "cho bài chưa render / render bằng phiên bản cũ / còn chờ bản resize ảnh (backfill).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Render lại mọi bài, kể cả bài đã mới")
+        parser.add_argument("--ids", help="Danh sách id bài, cách nhau dấu phẩy")
+        parser.add_argument("--limit", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=500, help="Số bài mỗi lô UPDATE")
+
+    def handle(self, *args, **opts):
+        qs = Article.objects.all()
+        if not opts["all"]:
+            qs = qs.filter(body_version__lt=render.RENDER_VERSION)
+        if opts["ids"]:
+            qs = qs.filter(pk__in=[int(x) for x in opts["ids"].split(",") if x.strip()])
+        total = qs.count()
+        if opts["limit"]:
+            total = min(total, opts["limit"])
+        self.stdout.write(f"{total} bài cần render (phiên bản {render.RENDER_VERSION})")
+
+        size = max(1, opts["batch_size"])
+        t0, done, last = time.perf_counter(), 0, 0
+        while done < total:
+            # duyệt theo id (keyset): bài vừa render xong rời khỏi bộ lọc mà không làm lệch trang
+            batch = list(qs.filter(pk__gt=last).order_by("pk").only("id", "content_html")[:min(size, total - done)])
+            if not batch:
+                break
+            render.fill_bodies(batch)
+            with transaction.atomic():
+                _update_many(batch, render.FIELDS)
+            done += len(batch)
+            last = batch[-1].pk
+            if done % (size * 10) == 0:
+                self.stdout.write(f"  {done}/{total}")
+
+        elapsed = time.perf_counter() - t0
+        pending = Article.objects.filter(body_version=render.PENDING).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Xong {done} bài trong {elapsed:.1f}s (~{done / elapsed if elapsed else 0:.0f} bài/s); "
+            f"{pending} bài còn chờ bản resize ảnh (make_image_variants rồi chạy lại)"
+        ))
@@ -1,20 +1,56 @@
 # crawler/management/commands/retag_categories.py
+import time
+
 from django.core.management.base import BaseCommand
-from articles.models import Article
-from crawler.tasks import _pick_category  # dùng lại hàm
+from django.db import transaction
+
+from articles.models import Article, _strip_html
+from crawler import classifier
+
 
 class Command(BaseCommand):
-    help = "Gắn Category tự động cho các bài chưa có"
+    help = ("Gắn Category tự động theo từ khoá (Category.keywords) cho các bài chưa có category; "
+            "--all để chấm lại mọi bài. Đọc bài theo lô, ghi bảng M2M bằng bulk insert.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Chấm lại cả bài đã có category")
+        parser.add_argument("--replace", action="store_true",
+                            help="Cùng --all: xoá category cũ của bài trước khi gắn")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Chỉ đếm, không ghi")
 
     def handle(self, *args, **opts):
-        n = 0
-        for a in Article.objects.filter(category__isnull=True):
-            cat = _pick_category(a.title or a.summary or a.content[:120])
-            if cat:
-                a.category = cat
-                a.save(update_fields=["category"])
-                n += 1
-        self.stdout.write(self.style.SUCCESS(f"Retagged: {n}"))
+        Through = Article.categories.through
+        qs = Article.objects.only("id", "title", "excerpt", "content_html").order_by("id")
+        if not opts["all"]:
+            qs = qs.filter(categories__isnull=True)
+
+        n, links, batch, t0 = 0, 0, [], time.perf_counter()
+
+        def flush():
+            nonlocal links
+            ids = [aid for aid, _ in batch]
+            rows = [Through(article_id=aid, category_id=cid) for aid, cids in batch for cid in cids]
+            links += len(rows)
+            if not opts["dry_run"]:
+                with transaction.atomic():
+                    if opts["replace"]:
+                        Through.objects.filter(article_id__in=ids).delete()
+                    Through.objects.bulk_create(rows, ignore_conflicts=True)
+            batch.clear()
+
+        for a in qs.iterator(chunk_size=opts["batch_size"]):
+            n += 1
+            text = a.excerpt or _strip_html(a.content_html)[:300]
+            batch.append((a.pk, classifier.pick(a.title, text)))
+            if len(batch) >= opts["batch_size"]:
+                flush()
+        if batch:
+            flush()
+
+        verb = "Sẽ gắn" if opts["dry_run"] else "Đã gắn"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {links} category cho {n} bài trong {time.perf_counter() - t0:.1f}s"
+        ))
         if n == 0:
-            self.stdout.write("No articles needed retagging.")
-    
\ No newline at end of file
+            self.stdout.write("Không có bài nào cần gắn category.")
@@ -11,15 +11,57 @@ FEEDS = [
     ("VietnamPlus - Thời sự", "https://www.vietnamplus.vn", "https://www.vietnamplus.vn/rss/thoi-su.rss"),
 ]
 
+# Selector theo layout từng báo (crawler/profiles.py). Chỉ gán khi nguồn chưa có profile;
+# selector trượt thì bài tự quay về readability -> kiểm lại bằng bench_profiles khi báo đổi giao diện.
+PROFILES = {
+    "VnExpress - Tin mới": {
+        "title": "h1.title-detail", "body": "article.fck_detail", "description": "p.description",
+        "date": "span.date", "hero": "article.fck_detail figure img", "caption": "article.fck_detail figure figcaption",
+        "drop": ["div.box-tinlienquanv2", "div.banner-ads", "div.box_embed_video", "p.Normal[align=right]"],
+    },
+    "Tuổi Trẻ - Mới nhất": {
+        "title": ["h1.detail-title", "h1.article-title"], "body": "div.detail-content",
+        "description": "h2.detail-sapo", "date": "div.detail-time [data-role=publishdate]",
+        "drop": ["div.VCSortableInPreviewMode[type=RelatedOneNews]", "div.relate-container", "div.kbwscwl-relatedbox"],
+    },
+    "Thanh Niên - Thời sự": {
+        "title": "h1.detail-title", "body": ["div.detail-cmain", "div.detail-content"],
+        "description": "h2.detail-sapo", "date": "div.detail-time [data-role=publishdate]",
+        "drop": ["div.VCSortableInPreviewMode[type=RelatedNewsBox]", "div.box-relate"],
+    },
+    "VietNamNet - Thời sự": {
+        "title": "h1.content-detail-title", "body": ["div.maincontent", "div.content-detail"],
+        "description": "h2.content-detail-sapo", "date": "div.bread-crumb-detail__time",
+        "drop": ["div.article-relate", "div.insert-wiki-content"],
+    },
+    "Dân Trí - Mới nhất": {
+        "title": ["h1.title-page.detail", "h1.e-magazine__title"], "body": ["div.singular-content", "div.e-magazine__body"],
+        "description": "h2.singular-sapo", "date": "time.author-time",
+        "drop": ["article.article-related", "div.dt-news__body-ads"],
+    },
+    "VTV - Thời sự": {
+        "title": "h1.title_detail", "body": ["div#entry-body", "div.ta-justify"],
+        "description": "h2.sapo", "date": "p.news-info span.time",
+        "drop": ["div.VCSortableInPreviewMode[type=RelatedNewsBox]"],
+    },
+    "VietnamPlus - Thời sự": {
+        "title": "h1.article__title", "body": "div.article__body", "description": "div.article__sapo",
+        "date": "time.time", "drop": ["div.article__related", "div.ads"],
+    },
+}
+
+
 class Command(BaseCommand):
     help = "Seed/cập nhật danh sách nguồn RSS"
 
     def handle(self, *args, **opts):
         n = 0
         for name, home, rss in FEEDS:
-            _, created = Source.objects.update_or_create(
+            src, created = Source.objects.update_or_create(
                 name=name,
                 defaults={"homepage": home, "rss_url": rss, "is_active": True, "source_score": 1.0}
             )
             n += int(created)
+            if not src.extract_profile and name in PROFILES:
+                Source.objects.filter(pk=src.pk).update(extract_profile=PROFILES[name])
         self.stdout.write(self.style.SUCCESS(f"Upserted {n} new sources"))
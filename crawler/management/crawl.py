@@ -0,0 +1,228 @@
+# crawler/management/crawl.py
+"""
+Phần chung của crawl_now / crawl_recent khi crawl đồng bộ (không qua Celery).
+
+- 1 CrawlRun (crawler.ledger) cho cả lượt, BatchWriter ghi DB theo lô.
+- Tuần tự (mặc định), engine asyncio (--concurrency) hoặc pipeline theo stage
+  (--pipeline); bài lỗi ghi vào ledger / dead-letter rồi bỏ qua.
+- Validator feed (ETag/Last-Modified/hash) chỉ ghi sau khi bài của feed đã
+  xuống DB và không bài nào lỗi / bị hoãn — lần poll sau duyệt lại feed đó.
+
+Lệnh con đặt `ledger_name`, `touch_sources`, gán `entry_filter` (nếu lọc entry)
+rồi gọi `crawl(sources, limit, opts)`.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from crawler import deadletter, http_archive, known_urls, pipeline, raw_archive
+from crawler.breaker import format_circuits
+from crawler.engine import CrawlEngine, FeedJob
+from crawler.feeds import PollStats, poll_feed
+from crawler.http_client import format_stats, get_client
+from crawler.ledger import CrawlLedger
+from crawler.persist import BATCH_SIZE, BatchWriter
+from crawler.pipeline import CrawlPipeline
+from crawler.tasks import _fetch_and_save_article, _save_extracted
+from sources.models import Source
+
+
+class CrawlCommand(BaseCommand):
+    ledger_name = ""
+    touch_sources = False     # ghi Source.last_crawled_at cho nguồn poll được
+    entry_filter = None       # entry -> bool (vd: chỉ bài trong N giờ ở crawl_recent)
+
+    def add_crawl_arguments(self, parser, note=""):
+        """Tuỳ chọn của lượt crawl đồng bộ; `note` đứng đầu help (vd: "Với --sync: ")."""
+        def h(text):
+            text = note + text
+            return text[:1].upper() + text[1:]
+
+        parser.add_argument("--concurrency", type=int, default=0,
+                            help=h("số request song song (engine asyncio). 0 = tuần tự như cũ"))
+        parser.add_argument("--per-host", type=int, default=2,
+                            help="Số request song song tối đa mỗi host (khi --concurrency > 0 / --pipeline)")
+        parser.add_argument("--force", action="store_true",
+                            help="Bỏ qua ETag/Last-Modified/hash, luôn xử lý lại feed")
+        parser.add_argument("--revisit-hours", type=int, default=None,
+                            help=h("tải lại cả bài đã có nếu đăng trong N giờ gần đây "
+                                   "(mặc định settings.CRAWLER_REVISIT_HOURS)"))
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help=h("ghi DB theo lô N bài (bulk upsert). 0 = ghi từng bài như cũ"))
+        pipeline.add_arguments(parser)
+        http_archive.add_arguments(parser)
+
+    def setup_client(self, opts):
+        self.verbosity = opts["verbosity"]
+        self.archive = http_archive.apply_options(get_client(), opts)
+
+    def crawl(self, sources, limit, opts):
+        self.ledger = CrawlLedger(self.ledger_name)
+        self.incomplete = set()     # nguồn có bài lỗi / bị hoãn -> chưa ghi validator feed
+        writer = BatchWriter(opts["batch_size"], on_written=self._written) if opts["batch_size"] > 0 else None
+        try:
+            if opts["concurrency"] > 0 or opts["pipeline"]:
+                self._handle_concurrent(sources, limit, opts, writer)
+            else:
+                self._handle_sequential(sources, limit, opts, writer)
+        except BaseException as e:
+            self.ledger.finish(error=repr(e))
+            raise
+        run = self.ledger.finish()
+        self.stdout.write(f"ledger: CrawlRun #{run.pk}")
+
+    def _handle_sequential(self, sources, limit, opts, writer=None):
+        total = 0
+        polls, known_total, done = PollStats(), known_urls.KnownStats(), []
+        for src in sources:
+            poll = poll_feed(src, force=opts["force"])
+            polls.add(poll)
+            if poll.skipped:
+                self.stdout.write(f"  [SKIP] {src.name} - feed không đổi ({poll.status})")
+                self.ledger.feed(src.id, poll)
+                poll.save_to(src.id)
+                continue
+            if not poll.entries:
+                self.ledger.feed(src.id, poll)
+                poll.save_to(src.id)  # feed lỗi/rỗng: chỉ cập nhật lịch poll
+                continue
+
+            entries = [e for e in poll.entries[:limit] if self.entry_filter is None or self.entry_filter(e)]
+            entries, known = known_urls.filter_known(entries, opts["revisit_hours"])
+            known_total.merge(known)
+            self.ledger.feed(src.id, poll, seen=len(poll.entries), to_fetch=len(entries))
+            self.stdout.write(f"  [SYNC] {src.name} - {len(entries)} entries ({known})")
+            if known.deferred:
+                self.incomplete.add(src.id)     # dead-letter chờ thử lại: feed chưa xử lý xong
+            for e in entries:
+                url = e.get("link")
+                pub = e.get("published") or e.get("updated")
+                self._fetch(src.id, url, pub, writer=writer)  # chạy inline, không cần Celery
+                total += 1
+            done.append((src.id, poll))
+
+        # validator chỉ ghi sau khi bài của feed đã xuống DB (lô cuối) và không bài nào lỗi / bị hoãn
+        if writer:
+            writer.flush()
+        for source_id, poll in done:
+            poll.save_to(source_id, validators=source_id not in self.incomplete)
+        self._touch([source_id for source_id, _ in done])
+        self._finish(f"Done. fetched ~{total} entries", polls, known_total, writer)
+
+    def _handle_concurrent(self, sources, limit, opts, writer=None):
+        """Engine asyncio (--concurrency) hoặc pipeline theo stage (--pipeline)."""
+        polls, done = PollStats(), []
+        known_by_source = {}
+
+        def drop_known(job, entries):
+            entries, known = known_urls.filter_known(entries, opts["revisit_hours"])
+            known_by_source[job.source_id] = known
+            if known.deferred:
+                self.incomplete.add(job.source_id)
+            return entries
+
+        jobs = [FeedJob.from_source(s, force=opts["force"]) for s in sources]
+
+        def on_feed(res):
+            self._on_feed_result(res)
+            if res.poll:
+                polls.add(res.poll)
+                done.append(res)
+            if res.error:
+                self.stdout.write(self.style.WARNING(f"  [ENGINE] {res.job.name}: lỗi feed ({res.error})"))
+            elif res.skipped:
+                self.stdout.write(f"  [SKIP] {res.job.name} - feed không đổi ({res.poll.status})")
+            elif res.entries:
+                known = known_by_source.get(res.job.source_id, "")
+                self.stdout.write(f"  [ENGINE] {res.job.name} - {len(res.entries)} entries ({known})")
+
+        def on_page(page):
+            self._fetch(page.source_id, page.url, page.published, page=page.page, writer=writer)
+
+        def on_article(res):
+            self._save(res, writer)
+
+        if opts["pipeline"]:
+            runner = CrawlPipeline.from_options(opts, per_host=opts["per_host"], limit=limit,
+                                                entry_filter=self.entry_filter, entries_hook=drop_known)
+            stats = runner.run(jobs, on_article=on_article, on_feed=on_feed, on_error=self._on_page_error)
+        else:
+            engine = CrawlEngine(concurrency=opts["concurrency"], per_host=opts["per_host"], limit=limit,
+                                 entry_filter=self.entry_filter, entries_hook=drop_known)
+            stats = engine.run(jobs, on_page=on_page, on_feed=on_feed, on_error=self._on_page_error)
+        if writer:
+            writer.flush()
+        # validator chỉ ghi sau khi đã xử lý xong entry và không bài nào lỗi / bị hoãn
+        for res in done:
+            res.poll.save_to(res.job.source_id, validators=res.job.source_id not in self.incomplete)
+        self._touch([res.job.source_id for res in done if not res.error])
+        known_total = known_urls.KnownStats()
+        for k in known_by_source.values():
+            known_total.merge(k)
+        self._finish(f"Done. fetched {stats.pages} entries ({stats.failed} lỗi) "
+                     f"in {stats.elapsed:.1f}s ~ {stats.pages_per_sec:.2f} bài/s",
+                     polls, known_total, writer)
+        if opts["pipeline"]:
+            for line in stats.lines():
+                self.stdout.write(f"  {line}")
+
+    def _touch(self, source_ids):
+        if self.touch_sources and source_ids:
+            Source.objects.filter(pk__in=source_ids).update(last_crawled_at=timezone.now())
+
+    def _finish(self, summary, polls, known_total, writer):
+        known_urls.flush()
+        raw_archive.flush()
+        self.stdout.write(self.style.SUCCESS(summary))
+        self.stdout.write(str(polls))
+        self.stdout.write(f"urls {known_total}")
+        if writer:
+            self.stdout.write(str(writer.stats))
+        self.write_host_stats()
+
+    # ---------- ledger (CrawlRun / CrawlEvent) ----------
+    def _written(self, item, created, seconds):
+        self.ledger.written(item.source_id, created, seconds)
+
+    def _fetch(self, source_id, url, pub, **kwargs):
+        """1 bài; lỗi được ghi vào ledger rồi bỏ qua để không dừng cả lượt crawl."""
+        try:
+            return _fetch_and_save_article(source_id, url, pub, ledger=self.ledger, **kwargs)
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  [FAIL] {url}: {e}"))
+            self.incomplete.add(source_id)
+            return "failed"
+
+    def _save(self, res, writer=None):
+        """Bài đã trích xuất ở pipeline; lỗi ghi vào ledger rồi bỏ qua như _fetch."""
+        try:
+            return _save_extracted(res.doc, res.item, res.source_id, writer=writer, ledger=self.ledger)
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  [FAIL] {res.url}: {e}"))
+            self.incomplete.add(res.source_id)
+            return "failed"
+
+    def _on_feed_result(self, res):
+        if res.error:
+            self.ledger.feed(res.job.source_id, res.poll, status="error")
+        elif res.skipped:
+            self.ledger.feed(res.job.source_id, res.poll)
+        else:
+            self.ledger.feed(res.job.source_id, res.poll, seen=len(res.poll.entries), to_fetch=len(res.entries))
+
+    def _on_page_error(self, page):
+        self.incomplete.add(page.source_id)
+        self.ledger.page(page.source_id, "failed", {"fetch": page.elapsed})
+        if page.exc is not None:
+            deadletter.record(page.url, page.exc, source_id=page.source_id)
+
+    def write_host_stats(self):
+        if self.archive is not None:
+            self.stdout.write(str(self.archive.stats))
+        circuits = get_client().breaker.snapshot()
+        if circuits:
+            self.stdout.write(self.style.WARNING(f"circuit breaker: {len(circuits)} host lỗi"))
+            for line in format_circuits(circuits):
+                self.stdout.write(f"  {line}")
+        if self.verbosity >= 2:
+            for line in format_stats(get_client().stats()):
+                self.stdout.write(f"  {line}")
@@ -0,0 +1,273 @@
+# crawler/media.py
+"""
+Kho ảnh content-addressed cho crawler.
+
+- File lưu 1 lần theo sha256 của bytes: `images/ab/cd/<sha256>.<ext>`;
+  logo/ảnh byline/ảnh phân phối lại giữa các bài chỉ tốn 1 bản.
+- Bảng `MediaAsset` map source URL -> sha256 -> path: URL đã mirror thì
+  không tải lại nữa.
+- Bản resize (WebP + JPEG theo MEDIA_VARIANT_WIDTHS) nằm cạnh ảnh gốc:
+  `<gốc>-<w>w.webp|.jpg`, kích thước ghi vào `ImageVariant`; card dùng
+  articles.images.attach_card_images để có srcset/sizes + width/height.
+- Tải ảnh dạng stream (`store_stream`): giới hạn byte, nhận dạng định dạng
+  + kích thước thật từ vài KB đầu, bỏ ngang khi không phải ảnh/quá lớn;
+  bytes đi qua file tạm (spool) nên RAM mỗi ảnh bị chặn trên.
+- Hàm ở đây không đụng DB trừ `lookup`/`record`/`save_variants`/`missing_variants`
+  (gọi từ thread chính; thread/process pool chỉ ghi file). Phần đọc cho trang
+  (`responsive_images`, `attach_card_images`) nằm ở articles.images.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+
+CAS_DIR = "images"
+VARIANT_WIDTHS = tuple(getattr(settings, "MEDIA_VARIANT_WIDTHS", (320, 640, 960)))
+VARIANT_FORMATS = (("webp", ".webp", 78), ("jpeg", ".jpg", 80))   # (format, ext, quality)
+VARIANT_RE = re.compile(r"-\d+w\.(webp|jpg)$")
+
+MAX_IMAGE_BYTES = getattr(settings, "CRAWLER_MAX_IMAGE_BYTES", 10 * 1024 * 1024)
+MAX_IMAGE_PIXELS = getattr(settings, "CRAWLER_MAX_IMAGE_PIXELS", 40_000_000)
+SNIFF_BYTES = 64 * 1024        # header JPEG có thể nằm sau EXIF lớn
+SPOOL_BYTES = 256 * 1024       # quá ngưỡng này thì spool ra đĩa
+CHUNK_BYTES = 16 * 1024
+
+# định dạng -> (ext, content-type)
+FORMATS = {
+    "JPEG": (".jpg", "image/jpeg"),
+    "PNG": (".png", "image/png"),
+    "GIF": (".gif", "image/gif"),
+    "WEBP": (".webp", "image/webp"),
+    "SVG": (".svg", "image/svg+xml"),
+}
+
+
+class ImageRejected(Exception):
+    """Response không phải ảnh hợp lệ / vượt giới hạn -> không lưu."""
+
+
+@dataclass
+class StoredImage:
+    source_url: str
+    sha256: str
+    path: str
+    content_type: str = ""
+    size: int = 0
+    width: int = 0
+    height: int = 0
+
+    @property
+    def url(self) -> str:
+        return media_url(self.path)
+
+
+def media_url(path: str) -> str:
+    return settings.MEDIA_URL.rstrip("/") + "/" + path
+
+
+def cas_path(sha256: str, ext: str) -> str:
+    return f"{CAS_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def store_bytes(data: bytes, ext: str) -> tuple[str, str]:
+    """Lưu bytes theo hash (bỏ qua nếu đã có). Trả về (sha256, path)."""
+    sha = hashlib.sha256(data).hexdigest()
+    path = cas_path(sha, ext)
+    if not default_storage.exists(path):
+        saved = default_storage.save(path, ContentFile(data))
+        if saved != path:
+            # thread/worker khác vừa ghi cùng hash -> storage đổi tên, bỏ bản thừa
+            default_storage.delete(saved)
+    return sha, path
+
+
+def walk(path: str):
+    """Duyệt đệ quy mọi file dưới 1 thư mục trong storage."""
+    dirs, files = default_storage.listdir(path)
+    for f in files:
+        yield f"{path}/{f}"
+    for d in dirs:
+        yield from walk(f"{path}/{d}")
+
+
+def sniff_format(head: bytes) -> str | None:
+    """Định dạng theo magic bytes (None = không phải ảnh hỗ trợ)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    text = head[:1024].lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith((b"<svg", b"<?xml")) and b"<svg" in text:
+        return "SVG"
+    return None
+
+
+def sniff_size(head: bytes) -> tuple[int, int] | None:
+    """(width, height) từ phần đầu file nếu đã đủ header, không decode pixel."""
+    from PIL import ImageFile
+
+    parser = ImageFile.Parser()
+    try:
+        parser.feed(head)
+    except Exception:
+        return None
+    return parser.image.size if parser.image else None
+
+
+def store_stream(chunks, source_url: str = "", max_bytes: int | None = None,
+                 deadline: float | None = None) -> StoredImage:
+    """
+    Ghi ảnh từ iterator bytes vào kho content-addressed mà không giữ cả file
+    trong RAM. Raise `ImageRejected` khi: không phải ảnh (magic bytes),
+    vượt `max_bytes`, ảnh quá nhiều pixel, hoặc quá `deadline` (time.monotonic).
+    """
+    max_bytes = max_bytes or MAX_IMAGE_BYTES
+    digest, head, total = hashlib.sha256(), b"", 0
+    fmt, size = None, None
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            total += len(chunk)
+            if total > max_bytes:
+                raise ImageRejected(f"quá {max_bytes} bytes")
+            if deadline is not None and time.monotonic() > deadline:
+                raise ImageRejected("quá hạn")
+            if size is None and len(head) < SNIFF_BYTES:
+                head += chunk
+                if fmt is None:
+                    fmt = sniff_format(head)
+                    if fmt is None and len(head) >= 16:
+                        raise ImageRejected("không phải ảnh")
+                if fmt and fmt != "SVG":
+                    size = sniff_size(head)
+                    if size and size[0] * size[1] > MAX_IMAGE_PIXELS:
+                        raise ImageRejected(f"ảnh quá lớn {size[0]}x{size[1]}")
+            digest.update(chunk)
+            spool.write(chunk)
+
+        if fmt is None:
+            raise ImageRejected("không phải ảnh")
+        ext, content_type = FORMATS[fmt]
+        sha = digest.hexdigest()
+        path = cas_path(sha, ext)
+        if not default_storage.exists(path):
+            spool.seek(0)
+            saved = default_storage.save(path, File(spool))
+            if saved != path:
+                default_storage.delete(saved)
+    w, h = size or (0, 0)
+    return StoredImage(source_url, sha, path, content_type=content_type, size=total, width=w, height=h)
+
+
+def lookup(urls: list[str]) -> dict[str, str]:
+    """{source_url: media URL} cho các URL đã mirror trước đó (file còn tồn tại)."""
+    from articles.models import MediaAsset
+
+    if not urls:
+        return {}
+    rows = MediaAsset.objects.filter(source_url__in=urls).values_list("source_url", "path")
+    return {u: media_url(p) for u, p in rows if default_storage.exists(p)}
+
+
+def record(items: list[StoredImage]) -> None:
+    """Ghi map URL -> file cho ảnh vừa tải (URL đã có thì cập nhật path)."""
+    from articles.models import MediaAsset
+
+    if not items:
+        return
+    MediaAsset.objects.bulk_create(
+        [MediaAsset(source_url=i.source_url[:1000], sha256=i.sha256, path=i.path,
+                    content_type=i.content_type[:64], size=i.size, width=i.width, height=i.height)
+         for i in items],
+        update_conflicts=True,
+        unique_fields=["source_url"],
+        update_fields=["sha256", "path", "content_type", "size", "width", "height"],
+    )
+
+
+
+# ---------- Variants ----------
+def variant_path(original: str, width: int, ext: str) -> str:
+    return f"{os.path.splitext(original)[0]}-{width}w{ext}"
+
+
+def make_variants(original: str) -> list[dict]:
+    """
+    Tạo bản resize cho 1 ảnh trong storage (không đụng DB, chạy được trong
+    process pool). Trả về các dòng cho `save_variants`; [] nếu không xử lý được
+    (svg, gif động, file hỏng...).
+    """
+    from PIL import Image, ImageOps
+
+    if original.lower().endswith(".svg") or VARIANT_RE.search(original):
+        return []
+    try:
+        with default_storage.open(original, "rb") as f:
+            im = Image.open(f)
+            if getattr(im, "is_animated", False):
+                return []
+            im = ImageOps.exif_transpose(im)
+            im.load()
+    except Exception:
+        return []
+
+    ow, oh = im.size
+    if not ow or not oh:
+        return []
+    rows = [dict(original=original, path=original, format="original", width=ow, height=oh)]
+    # ảnh nhỏ hơn bản lớn nhất: thêm 1 bản đúng cỡ gốc (nén lại WebP/JPEG)
+    widths = [w for w in VARIANT_WIDTHS if w < ow] + ([ow] if ow <= max(VARIANT_WIDTHS) else [])
+    rgba = im.convert("RGBA") if im.mode in ("RGBA", "LA", "P") else im.convert("RGB")
+    for w in widths:
+        h = max(1, round(oh * w / ow))
+        resized = rgba.resize((w, h), Image.LANCZOS) if w != ow else rgba
+        for fmt, ext, quality in VARIANT_FORMATS:
+            out = resized
+            if fmt == "jpeg" and out.mode == "RGBA":
+                bg = Image.new("RGB", out.size, (255, 255, 255))
+                bg.paste(out, mask=out.split()[-1])
+                out = bg
+            buf = io.BytesIO()
+            out.save(buf, fmt.upper(), quality=quality, **({"method": 4} if fmt == "webp" else {"optimize": True}))
+            path = variant_path(original, w, ext)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            default_storage.save(path, ContentFile(buf.getvalue()))
+            rows.append(dict(original=original, path=path, format=fmt, width=w, height=h))
+    return rows
+
+
+def save_variants(rows: list[dict]) -> None:
+    from articles.models import ImageVariant
+
+    if not rows:
+        return
+    ImageVariant.objects.bulk_create(
+        [ImageVariant(**r) for r in rows],
+        update_conflicts=True,
+        unique_fields=["original", "format", "width"],
+        update_fields=["path", "height"],
+    )
+
+
+def missing_variants(paths: list[str]) -> list[str]:
+    """Các ảnh gốc trong `paths` chưa có ImageVariant."""
+    from articles.models import ImageVariant
+
+    done = set(ImageVariant.objects.filter(original__in=paths, format="original")
+               .values_list("original", flat=True))
+    return [p for p in dict.fromkeys(paths) if p not in done]
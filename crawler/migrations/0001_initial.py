@@ -0,0 +1,98 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("sources", "0004_category_keywords"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrawlRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("command", models.CharField(max_length=64)),
+                ("started_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, default="")),
+            ],
+            options={
+                "ordering": ("-started_at",),
+            },
+        ),
+        migrations.CreateModel(
+            name="CrawlEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "feed_status",
+                    models.CharField(blank=True, default="", max_length=16),
+                ),
+                ("entries_seen", models.PositiveIntegerField(default=0)),
+                ("skipped", models.PositiveIntegerField(default=0)),
+                ("fetched", models.PositiveIntegerField(default=0)),
+                ("created", models.PositiveIntegerField(default=0)),
+                ("updated", models.PositiveIntegerField(default=0)),
+                ("too_short", models.PositiveIntegerField(default=0)),
+                ("failed", models.PositiveIntegerField(default=0)),
+                ("bytes", models.BigIntegerField(default=0)),
+                ("time_fetch", models.FloatField(default=0)),
+                ("time_readability", models.FloatField(default=0)),
+                ("time_trafilatura", models.FloatField(default=0)),
+                ("time_sanitize", models.FloatField(default=0)),
+                ("time_images", models.FloatField(default=0)),
+                ("time_db", models.FloatField(default=0)),
+                ("time_other", models.FloatField(default=0)),
+                ("timings", models.JSONField(blank=True, default=dict)),
+                (
+                    "source",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="crawl_events",
+                        to="sources.source",
+                    ),
+                ),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="crawler.crawlrun",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-created_at",),
+                "indexes": [
+                    models.Index(
+                        fields=["source", "-created_at"], name="crawlevent_src_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crawler", "0001_initial"),
+        ("sources", "0006_source_poll_schedule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeadLetter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=1000, unique=True)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("page", "Trang bài"), ("image", "Ảnh")],
+                        default="page",
+                        max_length=8,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("error", models.TextField(blank=True, default="")),
+                ("first_failed_at", models.DateTimeField(auto_now_add=True)),
+                ("last_failed_at", models.DateTimeField(auto_now=True, db_index=True)),
+                ("retry_at", models.DateTimeField(blank=True, null=True)),
+                ("dead", models.BooleanField(db_index=True, default=False)),
+                (
+                    "source",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="dead_letters",
+                        to="sources.source",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-last_failed_at",),
+            },
+        ),
+    ]
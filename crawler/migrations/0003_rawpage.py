@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0008_article_neardup"),
+        ("crawler", "0002_deadletter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RawPage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=1000, unique=True)),
+                ("segment", models.CharField(max_length=64)),
+                ("offset", models.BigIntegerField()),
+                ("length", models.PositiveIntegerField()),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("codec", models.CharField(default="zlib", max_length=8)),
+                ("fetched_at", models.DateTimeField()),
+                (
+                    "article",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="raw_pages",
+                        to="articles.article",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["segment", "offset"], name="rawpage_seg_idx")
+                ],
+            },
+        ),
+    ]
@@ -1,3 +1,110 @@
 from django.db import models
 
-# Create your models here.
+
+class CrawlRun(models.Model):
+    """1 lượt crawl (crawl_now, crawl_recent --sync, task feed...)."""
+    command = models.CharField(max_length=64)
+    started_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ("-started_at",)
+
+    def __str__(self):
+        return f"{self.command} @ {self.started_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def duration(self) -> float | None:
+        if not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+
+class CrawlEvent(models.Model):
+    """
+    Kết quả của 1 nguồn trong 1 lượt crawl (append-only).
+    time_*: tổng thời gian (giây) cộng dồn qua các bài của nguồn trong lượt đó.
+    """
+    STAGES = ("fetch", "readability", "trafilatura", "sanitize", "images", "db")
+
+    run = models.ForeignKey(CrawlRun, related_name="events", on_delete=models.CASCADE)
+    source = models.ForeignKey("sources.Source", related_name="crawl_events", blank=True, null=True,
+                               on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    feed_status = models.CharField(max_length=16, blank=True, default="")
+
+    entries_seen = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    fetched = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    too_short = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    bytes = models.BigIntegerField(default=0)   # feed + HTML bài
+
+    time_fetch = models.FloatField(default=0)
+    time_readability = models.FloatField(default=0)
+    time_trafilatura = models.FloatField(default=0)
+    time_sanitize = models.FloatField(default=0)
+    time_images = models.FloatField(default=0)
+    time_db = models.FloatField(default=0)
+    time_other = models.FloatField(default=0)   # parse, metadata, blocks, neardup...
+    timings = models.JSONField(blank=True, default=dict)   # mọi stage, chi tiết
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [models.Index(fields=["source", "-created_at"], name="crawlevent_src_idx")]
+
+    def __str__(self):
+        return f"{self.source or '?'} ({self.run_id})"
+
+    @property
+    def total_time(self) -> float:
+        return sum(getattr(self, f"time_{s}") for s in self.STAGES) + self.time_other
+
+
+class DeadLetter(models.Model):
+    """
+    URL tải/trích xuất lỗi (crawler/deadletter.py). Lỗi tạm thời: thử lại theo
+    retry_at (lùi theo cấp số nhân); lỗi vĩnh viễn hoặc quá số lần thử: dead=True,
+    crawler bỏ qua URL cho tới khi xoá dòng này.
+    """
+    KIND_CHOICES = (("page", "Trang bài"), ("image", "Ảnh"))
+
+    url = models.URLField(max_length=1000, unique=True)   # URL chuẩn hoá (crawler.canonical)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES, default="page")
+    source = models.ForeignKey("sources.Source", related_name="dead_letters", blank=True, null=True,
+                               on_delete=models.SET_NULL)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    first_failed_at = models.DateTimeField(auto_now_add=True)
+    last_failed_at = models.DateTimeField(auto_now=True, db_index=True)
+    retry_at = models.DateTimeField(blank=True, null=True)
+    dead = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        ordering = ("-last_failed_at",)
+
+    def __str__(self):
+        return self.url
+
+
+class RawPage(models.Model):
+    """Chỉ mục của crawler/raw_archive.py: HTML gốc của 1 URL chuẩn nằm ở đâu trong segment."""
+    url = models.URLField(max_length=1000, unique=True)
+    article = models.ForeignKey("articles.Article", related_name="raw_pages", blank=True, null=True,
+                                on_delete=models.SET_NULL)
+    segment = models.CharField(max_length=64)
+    offset = models.BigIntegerField()
+    length = models.PositiveIntegerField()          # byte trên đĩa (header + meta + body nén)
+    size = models.PositiveIntegerField(default=0)   # byte HTML gốc
+    codec = models.CharField(max_length=8, default="zlib")
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["segment", "offset"], name="rawpage_seg_idx")]
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,142 @@
+# crawler/neardup.py
+"""
+Phát hiện bài gần trùng (tin phát lại giữa các báo) bằng MinHash + LSH.
+
+- Văn bản -> token không dấu -> shingle 3 từ -> chữ ký MinHash NUM_PERM số.
+- Chữ ký chia BANDS band × ROWS hàng, mỗi band băm thành 1 khoá 64-bit:
+  2 bài có Jaccard J trùng ít nhất 1 khoá với xác suất 1 - (1 - J^ROWS)^BANDS
+  (J=0.8 -> ~98%, J=0.3 -> ~6%) -> tra ứng viên = 1 query IN trên khoá có index,
+  rồi ước lượng Jaccard từ chữ ký để chốt.
+- `LSHIndex`: index trong RAM (backfill, benchmark).
+- `find_duplicate` / `save_bands`: bảng ArticleLSHBand lúc ingest.
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+import struct
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from articles.textnorm import tokens
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+_MASK = (1 << 64) - 1
+# "hoán vị" = XOR với mặt nạ ngẫu nhiên cố định (seed cố định -> chữ ký ổn định giữa các lần chạy)
+_PERMS = [random.Random(0x5EED + i).getrandbits(64) for i in range(NUM_PERM)]
+_SIG = struct.Struct(f"<{NUM_PERM}Q")
+
+THRESHOLD = getattr(settings, "CRAWLER_NEARDUP_THRESHOLD", 0.6)
+WINDOW_DAYS = getattr(settings, "CRAWLER_NEARDUP_DAYS", 7)
+MIN_TOKENS = getattr(settings, "CRAWLER_NEARDUP_MIN_TOKENS", 40)
+
+
+def _hash64(b: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(b, digest_size=8).digest(), "little")
+
+
+def signature(text: str) -> tuple[int, ...] | None:
+    """Chữ ký MinHash (không dấu); None nếu văn bản quá ngắn để tin cậy."""
+    toks = tokens(text)
+    if len(toks) < MIN_TOKENS:
+        return None
+    grams = {" ".join(toks[i:i + SHINGLE]) for i in range(len(toks) - SHINGLE + 1)}
+    hashes = [_hash64(g.encode("utf-8")) for g in grams]
+    return tuple(min([h ^ m for h in hashes]) for m in _PERMS)
+
+
+def similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Jaccard ước lượng từ 2 chữ ký."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_keys(sig: tuple[int, ...]) -> list[int]:
+    """Khoá LSH (int64 có dấu để lưu BigIntegerField), đã gắn số band."""
+    out = []
+    for i in range(BANDS):
+        h = _hash64(struct.pack(f"<B{ROWS}Q", i, *sig[i * ROWS:(i + 1) * ROWS]))
+        out.append(h - (1 << 64) if h >= 1 << 63 else h)
+    return out
+
+
+def pack(sig: tuple[int, ...] | None) -> bytes | None:
+    return _SIG.pack(*sig) if sig else None
+
+
+def unpack(raw) -> tuple[int, ...] | None:
+    return _SIG.unpack(bytes(raw)) if raw else None
+
+
+class LSHIndex:
+    """Index band trong RAM: add O(BANDS), tra ứng viên = BANDS lần dict lookup."""
+
+    def __init__(self, threshold: float = THRESHOLD):
+        self.threshold = threshold
+        self.buckets: dict[int, list[int]] = defaultdict(list)
+        self.sigs: dict[int, tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.sigs)
+
+    def add(self, key: int, sig: tuple[int, ...]) -> None:
+        self.sigs[key] = sig
+        for k in band_keys(sig):
+            self.buckets[k].append(key)
+
+    def candidates(self, sig: tuple[int, ...]) -> set[int]:
+        out: set[int] = set()
+        for k in band_keys(sig):
+            out.update(self.buckets.get(k, ()))
+        return out
+
+    def find(self, sig: tuple[int, ...], accept=None) -> tuple[int, float] | None:
+        """(key, jaccard) giống nhất trên ngưỡng, None nếu không có. `accept(key)` lọc thêm."""
+        best = None
+        for key in self.candidates(sig):
+            if accept is not None and not accept(key):
+                continue
+            s = similarity(sig, self.sigs[key])
+            if s >= self.threshold and (best is None or s > best[1]):
+                best = (key, s)
+        return best
+
+
+def find_duplicate(sig: tuple[int, ...] | None, exclude_id: int | None = None) -> tuple[int, float] | None:
+    """
+    (id bài gốc của cụm, jaccard) nếu đã có bài gần trùng trong WINDOW_DAYS ngày.
+    1 query IN trên ArticleLSHBand.key (có index).
+    """
+    from articles.models import ArticleLSHBand
+
+    if sig is None:
+        return None
+    qs = ArticleLSHBand.objects.filter(key__in=band_keys(sig))
+    if WINDOW_DAYS:
+        qs = qs.filter(article__published_at__gte=timezone.now() - timedelta(days=WINDOW_DAYS))
+    if exclude_id:
+        qs = qs.exclude(article_id=exclude_id)
+    best, seen = None, set()
+    for pk, root_id, raw in qs.values_list("article_id", "article__duplicate_of_id", "article__minhash")[:200]:
+        if pk in seen:
+            continue
+        seen.add(pk)
+        s = similarity(sig, unpack(raw))
+        if s >= THRESHOLD and (best is None or s > best[1]):
+            best = (root_id or pk, s)
+    return best
+
+
+def save_bands(rows: list[tuple[int, tuple[int, ...] | None]]) -> None:
+    """Ghi khoá LSH cho [(article_id, sig)] (bỏ qua sig None), xoá khoá cũ của các bài đó."""
+    from articles.models import ArticleLSHBand
+
+    ArticleLSHBand.objects.filter(article_id__in=[pk for pk, _ in rows]).delete()
+    ArticleLSHBand.objects.bulk_create([
+        ArticleLSHBand(article_id=pk, key=k) for pk, sig in rows if sig for k in band_keys(sig)
+    ])
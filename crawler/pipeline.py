@@ -0,0 +1,365 @@
+# crawler/pipeline.py
+"""
+Pipeline crawl theo stage cho `crawl_now --pipeline` / `crawl_recent --sync --pipeline`.
+
+    discovery (thread) -> fetch (thread, I/O) -> extract (process) -> images (thread, I/O)
+        -> persist (thread gọi run())
+
+- discovery: poll feed có điều kiện, lọc entry (limit, entry_filter, entries_hook).
+- fetch: tải trang qua client dùng chung (rate limit / breaker / robots theo host),
+  tối đa `per_host` request cùng lúc mỗi host.
+- extract: phần chỉ tốn CPU (parse lxml, readability/trafilatura, sanitize, MinHash)
+  chạy trong ProcessPoolExecutor (tasks._prepare_page) -> không giành GIL với các
+  thread tải; mỗi worker thread của stage giữ đúng 1 job trong pool.
+- images: dựng lại ParsedDocument từ snapshot, tra DB (URL đã có, tin gần trùng,
+  category) + mirror ảnh (tasks._extract_document).
+- persist: chạy ở thread gọi `run()` qua callback (ORM ghi, SQLite chỉ 1 writer):
+  BatchWriter, raw archive, ledger, dead-letter.
+
+Các stage nối bằng queue.Queue(maxsize=queue_size): stage sau chậm thì put() của stage
+trước chặn (backpressure), RAM không phình theo số bài. `stats.stages`: số item, %
+bận (thời gian xử lý / (số worker × thời gian chạy)), thời gian bị chặn ở put(), độ
+sâu queue đầu vào (lấy mẫu mỗi lần get) — stage nào nghẽn thì queue trước nó đầy.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+from urllib.parse import urlparse
+
+from django.db import connections
+
+from crawler.document import FetchedPage, ParsedDocument
+from crawler.engine import FeedJob, FeedResult, PageResult
+from crawler.feeds import conditional_get
+from crawler.http_client import REQUEST_TIMEOUT, get_client
+from crawler.persist import ExtractedArticle
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Chạy theo stage: feed -> tải (thread) -> trích xuất (process) -> ảnh (thread) -> ghi DB")
+    parser.add_argument("--feed-workers", type=int, default=4, help="Với --pipeline: số thread poll feed")
+    parser.add_argument("--fetch-workers", type=int, default=16, help="Với --pipeline: số thread tải trang")
+    parser.add_argument("--extract-workers", type=int, default=0,
+                        help="Với --pipeline: số process trích xuất (0 = số CPU)")
+    parser.add_argument("--image-workers", type=int, default=4,
+                        help="Với --pipeline: số thread mirror ảnh + tra DB (SQLite: nên để nhỏ)")
+    parser.add_argument("--queue-size", type=int, default=32,
+                        help="Với --pipeline: sức chứa mỗi queue giữa 2 stage")
+
+
+@dataclass
+class StageStats:
+    name: str
+    width: int
+    capacity: int = 0           # maxsize của queue đầu vào (0 = không giới hạn)
+    items: int = 0
+    busy: float = 0.0           # tổng thời gian worker xử lý (không tính lúc chờ put)
+    blocked: float = 0.0        # tổng thời gian chờ put() vào queue sau (backpressure)
+    depth_sum: int = 0
+    depth_max: int = 0
+    samples: int = 0
+
+    def sample(self, depth: int) -> None:
+        self.samples += 1
+        self.depth_sum += depth
+        self.depth_max = max(self.depth_max, depth)
+
+    @property
+    def avg_depth(self) -> float:
+        return self.depth_sum / self.samples if self.samples else 0.0
+
+    def utilization(self, elapsed: float) -> float:
+        return self.busy / (self.width * elapsed) if elapsed else 0.0
+
+
+@dataclass
+class PipelineStats:
+    feeds: int = 0
+    feeds_skipped: int = 0
+    pages: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    stages: list[StageStats] = field(default_factory=list)
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    def lines(self) -> list[str]:
+        out = [f"{'stage':<10} {'worker':>6} {'item':>6} {'bận':>5} {'chờ put':>8}  queue vào tb/max/cap"]
+        for st in self.stages:
+            cap = st.capacity or "-"
+            out.append(
+                f"{st.name:<10} {st.width:>6} {st.items:>6} {st.utilization(self.elapsed):>5.0%} "
+                f"{st.blocked:>7.1f}s  {st.avg_depth:.1f}/{st.depth_max}/{cap}"
+            )
+        return out
+
+
+@dataclass
+class _Prepared:
+    page: PageResult
+    snapshot: dict
+
+
+@dataclass
+class ArticleResult:
+    source_id: int
+    url: str
+    doc: ParsedDocument
+    item: ExtractedArticle | None     # None = quá ngắn
+
+
+class _Stage:
+    """`width` thread cùng chạy generator `fn(item)`; mỗi giá trị yield được put vào `outbox`."""
+
+    def __init__(self, name: str, fn, width: int, inbox: queue.Queue, outbox: queue.Queue,
+                 stop: threading.Event):
+        self.name = name
+        self.fn = fn
+        self.width = max(1, width)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self.downstream = 1               # số consumer của outbox, mỗi consumer nhận 1 _DONE
+        self.stats = StageStats(name, self.width, capacity=inbox.maxsize)
+        self._alive = self.width
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.width):
+            th = threading.Thread(target=self._work, name=f"crawl-{self.name}-{i}", daemon=True)
+            th.start()
+            self._threads.append(th)
+
+    def join(self) -> None:
+        for th in self._threads:
+            th.join()
+
+    def _work(self) -> None:
+        try:
+            while True:
+                item = self.inbox.get()
+                with self._lock:
+                    self.stats.sample(self.inbox.qsize())
+                if item is _DONE:
+                    break
+                if self.stop.is_set():
+                    continue              # đang dừng: chỉ xả queue
+                t0 = time.perf_counter()
+                blocked = 0.0
+                try:
+                    for out in self.fn(item):
+                        t1 = time.perf_counter()
+                        self.outbox.put(out)
+                        blocked += time.perf_counter() - t1
+                except Exception:
+                    logger.exception("pipeline stage %s failed on %r", self.name, item)
+                with self._lock:
+                    self.stats.items += 1
+                    self.stats.busy += time.perf_counter() - t0 - blocked
+                    self.stats.blocked += blocked
+        finally:
+            connections.close_all()   # connection DB riêng của thread này
+            with self._lock:
+                self._alive -= 1
+                last = self._alive == 0
+            if last:
+                for _ in range(self.downstream):
+                    self.outbox.put(_DONE)
+
+
+def init_worker():
+    """Initializer cho ProcessPoolExecutor: process spawn (Windows/macOS) cần setup Django lại; fork thì đã sẵn."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+class CrawlPipeline:
+    """
+    pipeline = CrawlPipeline(fetch_workers=16, extract_workers=4, image_workers=4, limit=50)
+    stats = pipeline.run(jobs, on_article=..., on_feed=..., on_error=...)
+
+    Cùng kiểu callback với crawler.engine.CrawlEngine; `on_article(ArticleResult)`,
+    `on_feed(FeedResult)`, `on_error(PageResult)` đều chạy ở thread gọi `run()`.
+    """
+
+    def __init__(self, feed_workers: int = 4, fetch_workers: int = 16, extract_workers: int = 0,
+                 image_workers: int = 4, queue_size: int = 32, per_host: int = 2, limit: int = 50,
+                 timeout=REQUEST_TIMEOUT,
+                 entry_filter: Callable[[dict], bool] | None = None,
+                 entries_hook: Callable[[FeedJob, list], list] | None = None):
+        self.feed_workers = max(1, feed_workers)
+        self.fetch_workers = max(1, fetch_workers)
+        self.extract_workers = max(1, extract_workers or os.cpu_count() or 1)
+        self.image_workers = max(1, image_workers)
+        self.queue_size = max(1, queue_size)
+        self.per_host = max(1, per_host)
+        self.limit = limit
+        self.timeout = timeout
+        self.entry_filter = entry_filter
+        self.entries_hook = entries_hook
+        self._client = get_client()
+        self._hosts: dict[str, threading.BoundedSemaphore] = {}
+        self._hosts_lock = threading.Lock()
+
+    @classmethod
+    def from_options(cls, opts: dict, **kwargs) -> "CrawlPipeline":
+        return cls(feed_workers=opts["feed_workers"], fetch_workers=opts["fetch_workers"],
+                   extract_workers=opts["extract_workers"], image_workers=opts["image_workers"],
+                   queue_size=opts["queue_size"], **kwargs)
+
+    # ---------- stage ----------
+    def _discover(self, job: FeedJob):
+        try:
+            poll = conditional_get(job.rss_url, job.etag, job.last_modified, job.feed_hash, job.feed_bytes,
+                                   client=self._client, timeout=self.timeout)
+        except Exception as e:
+            self._sink.put(FeedResult(job, error=str(e) or e.__class__.__name__))
+            return
+        if poll.error or poll.skipped:
+            self._sink.put(FeedResult(job, error=poll.error, poll=poll))
+            return
+        picked = [e for e in poll.entries[:self.limit]
+                  if e.get("link") and (not self.entry_filter or self.entry_filter(e))]
+        if self.entries_hook and picked:
+            picked = self.entries_hook(job, picked)
+        self._sink.put(FeedResult(job, entries=picked, poll=poll))
+        for e in picked:
+            yield job, PageResult(job.source_id, e.get("link"), e.get("published") or e.get("updated"))
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            return self._hosts.setdefault(host, threading.BoundedSemaphore(self.per_host))
+
+    def _fetch(self, task):
+        job, res = task
+        t0 = time.perf_counter()
+        try:
+            with self._host_slot(res.url):
+                r = self._client.get(res.url, kind="page", timeout=self.timeout)
+                r.raise_for_status()
+            res.page = FetchedPage.from_response(res.url, r, elapsed=time.perf_counter() - t0)
+        except Exception as e:
+            res.error, res.exc = str(e) or e.__class__.__name__, e
+        res.elapsed = time.perf_counter() - t0
+        if res.error:
+            self._sink.put(res)
+            return
+        yield job, res
+
+    def _extract(self, task):
+        from crawler.tasks import _prepare_page
+
+        job, res = task
+        try:
+            snap = self._pool.submit(_prepare_page, res.page, job.extract_profile or None).result()
+        except Exception as e:
+            res.error, res.exc = str(e) or e.__class__.__name__, e
+            self._sink.put(res)
+            return
+        yield _Prepared(res, snap)
+
+    def _images(self, prepared: _Prepared):
+        from crawler.tasks import _extract_document
+
+        res = prepared.page
+        doc = ParsedDocument.from_snapshot(res.page, prepared.snapshot)
+        try:
+            item = _extract_document(doc, res.published)
+        except Exception as e:
+            res.error, res.exc = str(e) or e.__class__.__name__, e
+            self._sink.put(res)
+            return
+        yield ArticleResult(res.source_id, res.url, doc, item)
+
+    # ---------- API ----------
+    def run(self, jobs: Iterable[FeedJob],
+            on_article: Callable[[ArticleResult], object],
+            on_feed: Callable[[FeedResult], object] | None = None,
+            on_error: Callable[[PageResult], object] | None = None) -> PipelineStats:
+        jobs = list(jobs)
+        stats = PipelineStats()
+        stop = threading.Event()
+        feeds_q: queue.Queue = queue.Queue()      # chỉ có các feed job, nạp hết từ đầu
+        fetch_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        extract_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        images_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._sink: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        # fork process con trước khi có thread nào (ProcessPoolExecutor + fork tạo đủ worker
+        # ở lần submit đầu); không để process con dùng chung connection DB của cha
+        connections.close_all()
+        self._pool = ProcessPoolExecutor(max_workers=self.extract_workers, initializer=init_worker)
+        self._pool.submit(os.getpid).result()
+
+        stages = [
+            _Stage("discovery", self._discover, self.feed_workers, feeds_q, fetch_q, stop),
+            _Stage("fetch", self._fetch, self.fetch_workers, fetch_q, extract_q, stop),
+            _Stage("extract", self._extract, self.extract_workers, extract_q, images_q, stop),
+            _Stage("images", self._images, self.image_workers, images_q, self._sink, stop),
+        ]
+        for st, nxt in zip(stages, stages[1:]):
+            st.downstream = nxt.width
+        persist = StageStats("persist", 1, capacity=self.queue_size)
+        stats.stages = [st.stats for st in stages] + [persist]
+
+        for job in jobs:
+            feeds_q.put(job)
+        for _ in range(stages[0].width):
+            feeds_q.put(_DONE)
+
+        t0 = time.perf_counter()
+        for st in stages:
+            st.start()
+        finished = False
+        try:
+            while True:
+                item = self._sink.get()
+                persist.sample(self._sink.qsize())
+                if item is _DONE:
+                    finished = True
+                    break
+                t1 = time.perf_counter()
+                if isinstance(item, FeedResult):
+                    stats.feeds += 1
+                    stats.feeds_skipped += int(item.skipped)
+                    if on_feed:
+                        on_feed(item)
+                elif isinstance(item, PageResult):
+                    stats.failed += 1
+                    if on_error:
+                        on_error(item)
+                else:
+                    on_article(item)
+                    stats.pages += 1
+                persist.items += 1
+                persist.busy += time.perf_counter() - t1
+        finally:
+            if not finished:
+                # callback lỗi giữa chừng: các stage chỉ xả queue, chờ _DONE cuối
+                stop.set()
+                while self._sink.get() is not _DONE:
+                    pass
+            for st in stages:
+                st.join()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        stats.elapsed = time.perf_counter() - t0
+        return stats
@@ -0,0 +1,212 @@
+# crawler/profiles.py
+"""
+Profile trích xuất theo nguồn (Source.extract_profile): selector cho các báo có
+layout ổn định -> lấy thẳng từ cây lxml đã parse, bỏ qua readability + trafilatura.
+
+    {
+      "title":   "h1.title-detail",
+      "body":    ["article.fck_detail", "div.sidebar-1 article"],   # bắt buộc
+      "hero":    "div.fig-picture img",
+      "caption": "figure figcaption",
+      "date":    "span.date",
+      "description": "p.description",
+      "drop":    ["div.box-ads", "xpath://div[@id='related']"],
+      "min_text": 200
+    }
+
+- Mỗi selector là CSS, hoặc XPath nếu bắt đầu bằng "xpath:" / "/" / "(";
+  giá trị là 1 chuỗi hoặc danh sách (selector đầu tiên khớp được dùng).
+- `drop` chỉ áp dụng trên bản copy của phần thân bài (cây gốc không bị sửa,
+  để đường chung vẫn chạy được khi profile trượt).
+- Trượt (không khớp body hoặc thân bài < min_text ký tự) -> `extract()` trả
+  None, ParsedDocument quay về readability/trafilatura.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+FIELDS = ("title", "body", "hero", "caption", "date", "description", "drop")
+MIN_TEXT = 200
+
+_WS_RE = re.compile(r"\s+")
+# "Thứ bảy, 18/10/2026, 09:30 (GMT+7)" / "18-10-2026 09:30"
+_VN_DATE_RE = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{4})(?:\D{1,4}(\d{1,2})[:h](\d{2}))?")
+_VN_TZ = timezone(timedelta(hours=7))
+_IMG_ATTRS = ("src", "data-src", "data-original", "srcset", "data-srcset")
+
+
+class ProfileError(ValueError):
+    """Profile không hợp lệ (selector sai cú pháp, thiếu body, key lạ)."""
+
+
+def _compile_one(sel: str):
+    sel = sel.strip()
+    try:
+        if sel.startswith("xpath:"):
+            return etree.XPath(sel[len("xpath:"):])
+        if sel.startswith(("/", "(")):
+            return etree.XPath(sel)
+        return CSSSelector(sel)
+    except Exception as e:
+        raise ProfileError(f"selector không hợp lệ {sel!r}: {e}") from e
+
+
+def _compile(value) -> list:
+    if not value:
+        return []
+    sels = [value] if isinstance(value, str) else list(value)
+    if not all(isinstance(s, str) for s in sels):
+        raise ProfileError(f"selector phải là chuỗi hoặc danh sách chuỗi: {value!r}")
+    return [_compile_one(s) for s in sels if s.strip()]
+
+
+def _first(selectors, root):
+    for sel in selectors:
+        for el in sel(root):
+            if isinstance(el, etree._Element):
+                return el
+    return None
+
+
+def _text(el) -> str:
+    if el is None:
+        return ""
+    return _WS_RE.sub(" ", el.text_content()).strip()
+
+
+def _img_src(el) -> str:
+    if el is None:
+        return ""
+    if el.tag != "img":
+        el = next(el.iter("img"), None)
+        if el is None:
+            return ""
+    for attr in _IMG_ATTRS:
+        v = (el.get(attr) or "").strip()
+        if v and not v.startswith("data:"):
+            return v.split(",")[0].split()[0] if "srcset" in attr else v
+    return ""
+
+
+def parse_date(value: str | None) -> datetime | None:
+    """ISO 8601 (attr datetime/content) hoặc dd/mm/yyyy[, hh:mm] giờ Việt Nam."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        d = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return d if d.tzinfo else d.replace(tzinfo=_VN_TZ)
+    except ValueError:
+        pass
+    m = _VN_DATE_RE.search(value)
+    if not m:
+        return None
+    day, month, year, hour, minute = (int(x) if x else 0 for x in m.groups())
+    try:
+        return datetime(year, month, day, hour, minute, tzinfo=_VN_TZ)
+    except ValueError:
+        return None
+
+
+@dataclass
+class ProfileResult:
+    """Cùng tên thuộc tính với metadata của trafilatura (title/description/image/date)."""
+    title: str
+    body_html: str
+    text: str
+    description: str = ""
+    image: str = ""              # ảnh đại diện (hero, không có thì og:image)
+    caption: str = ""
+    date: str = ""
+
+
+class Profile:
+    def __init__(self, spec: dict):
+        if not isinstance(spec, dict):
+            raise ProfileError("profile phải là object JSON")
+        unknown = set(spec) - set(FIELDS) - {"min_text"}
+        if unknown:
+            raise ProfileError(f"key không hỗ trợ: {', '.join(sorted(unknown))}")
+        self.selectors = {f: _compile(spec.get(f)) for f in FIELDS}
+        if not self.selectors["body"]:
+            raise ProfileError("profile cần selector 'body'")
+        self.min_text = int(spec.get("min_text") or MIN_TEXT)
+
+    def extract(self, tree, base_url: str = "") -> ProfileResult | None:
+        sel = self.selectors
+        body_src = _first(sel["body"], tree)
+        if body_src is None:
+            return None
+        body = copy.deepcopy(body_src)
+        for s in sel["drop"]:
+            for el in s(body):
+                if isinstance(el, etree._Element) and el.getparent() is not None:
+                    el.drop_tree()
+        text = _text(body)
+        if len(text) < self.min_text:
+            return None
+
+        hero_el = _first(sel["hero"], tree)
+        hero = _img_src(hero_el)
+        caption = _text(_first(sel["caption"], tree))
+        body_html = lxml.html.tostring(body, encoding="unicode")
+        if hero and body_src not in hero_el.iterancestors():
+            # ảnh đầu bài nằm ngoài khung thân bài -> đưa vào đầu để mirror/chọn hero như đường chung
+            fig = etree.Element("figure")
+            etree.SubElement(fig, "img", src=hero, alt="")
+            if caption:
+                etree.SubElement(fig, "figcaption").text = caption
+            body_html = lxml.html.tostring(fig, encoding="unicode") + body_html
+
+        date_el = _first(sel["date"], tree)
+        date = ""
+        if date_el is not None:
+            date = date_el.get("datetime") or date_el.get("content") or _text(date_el)
+
+        return ProfileResult(
+            title=_text(_first(sel["title"], tree)) or _meta(tree, '//meta[@property="og:title"]')
+            or _text(next(iter(tree.xpath("//title")), None)),
+            body_html=body_html,
+            text=text,
+            description=_text(_first(sel["description"], tree))
+            or _meta(tree, '//meta[@name="description"]') or _meta(tree, '//meta[@property="og:description"]'),
+            image=hero or _meta(tree, '//meta[@property="og:image"]'),
+            caption=caption,
+            date=date,
+        )
+
+
+def _meta(tree, xpath: str) -> str:
+    for el in tree.xpath(xpath):
+        if el.get("content"):
+            return el.get("content").strip()
+    return ""
+
+
+@lru_cache(maxsize=128)
+def _compiled(spec_json: str) -> Profile:
+    return Profile(json.loads(spec_json))
+
+
+def compile_profile(spec: dict | None) -> Profile | None:
+    """Profile đã biên dịch (cache trong process theo nội dung JSON); None nếu trống."""
+    if not spec:
+        return None
+    return _compiled(json.dumps(spec, sort_keys=True, ensure_ascii=False))
+
+
+def for_source(source) -> Profile | None:
+    """Profile của Source; profile lỗi -> None (đi đường chung) thay vì làm hỏng cả lượt crawl."""
+    try:
+        return compile_profile(getattr(source, "extract_profile", None))
+    except ProfileError:
+        return None
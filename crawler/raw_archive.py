@@ -0,0 +1,233 @@
+# crawler/raw_archive.py
+"""
+Kho HTML gốc của trang bài đã crawl, để trích xuất lại bằng code mới
+(`manage.py reextract`) mà không phải tải lại publisher.
+
+- Segment append-only trong CRAWLER_RAW_ARCHIVE: mỗi process ghi file riêng
+  (`<thời điểm>-<pid>-<n>.seg`, không cần khoá giữa các worker Celery), sang file
+  mới khi vượt CRAWLER_RAW_SEGMENT_BYTES. Mỗi bản ghi:
+
+      header <4sBII> = magic "VNRA", codec, độ dài meta, độ dài body nén
+      meta JSON (url chuẩn, url đã tải, final_url, encoding, status, fetched_at, size)
+      body HTML nén
+
+- Nén zstd (gói `zstandard`, tuỳ chọn) hoặc zlib nếu không có; codec ghi trong
+  từng bản ghi nên đọc được segment lẫn lộn.
+- Chỉ mục: bảng crawler.RawPage (URL chuẩn -> segment/offset/độ dài, article_id),
+  gom trong bộ nhớ rồi `flush()` bằng 1 bulk upsert (như known_urls.flush);
+  article_id lấy theo Article.source_url lúc flush. Mất chỉ mục (process chết
+  trước flush) thì dựng lại bằng `scan()` (`reextract --reindex`).
+- Cùng URL tải lại -> bản ghi mới, chỉ mục trỏ về bản mới nhất.
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd là tuỳ chọn
+    zstandard = None
+
+MAGIC = b"VNRA"
+_HEADER = struct.Struct("<4sBII")
+ZLIB, ZSTD = 0, 1
+CODEC_NAMES = {ZLIB: "zlib", ZSTD: "zstd"}
+FLUSH_EVERY = 200   # số bản ghi chỉ mục gom trước khi tự flush
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+@dataclass
+class RawRecord:
+    url: str            # URL chuẩn (khoá chỉ mục)
+    segment: str
+    offset: int
+    length: int         # cả header + meta + body nén
+    size: int           # byte HTML gốc
+    codec: int
+    fetched_at: datetime
+
+
+_local = threading.local()
+
+
+def _compress(data: bytes) -> tuple[int, bytes]:
+    if zstandard is not None:
+        c = getattr(_local, "zstd", None)
+        if c is None:   # ZstdCompressor không dùng chung giữa các thread
+            c = _local.zstd = zstandard.ZstdCompressor(level=_setting("CRAWLER_RAW_ZSTD_LEVEL", 10))
+        return ZSTD, c.compress(data)
+    return ZLIB, zlib.compress(data, 6)
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("bản ghi nén zstd nhưng chưa cài gói zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"codec lạ: {codec}")
+
+
+def unpack(buf: bytes):
+    """bytes của 1 bản ghi -> (meta dict, HTML gốc)."""
+    magic, codec, meta_len, body_len = _HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("không phải bản ghi raw archive")
+    start = _HEADER.size
+    meta = json.loads(buf[start:start + meta_len])
+    body = _decompress(codec, buf[start + meta_len:start + meta_len + body_len])
+    return meta, body
+
+
+class RawArchive:
+    """Ghi từ nhiều thread trong 1 process (lock quanh file segment đang mở)."""
+
+    def __init__(self, root, segment_bytes: int | None = None):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes or _setting("CRAWLER_RAW_SEGMENT_BYTES", 256 * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._file = None
+        self._name = ""
+        self._seq = 0
+        self._pending: dict[str, RawRecord] = {}
+
+    # ---------- ghi ----------
+    def _segment(self):
+        if self._file is not None and self._file.tell() < self.segment_bytes:
+            return self._file
+        if self._file is not None:
+            self._file.close()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        self._name = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{self._seq}.seg"
+        self._file = open(self.root / self._name, "ab")
+        return self._file
+
+    def store(self, url: str, page) -> RawRecord:
+        """Thêm HTML gốc của `page` (crawler.document.FetchedPage) với khoá `url` (URL chuẩn)."""
+        now = datetime.now(timezone.utc)
+        meta = json.dumps({
+            "url": url, "fetched_url": page.url, "final_url": page.final_url, "encoding": page.encoding,
+            "status": page.status, "fetched_at": now.isoformat(), "size": len(page.content),
+        }, ensure_ascii=False).encode("utf-8")
+        codec, body = _compress(page.content)
+        record = _HEADER.pack(MAGIC, codec, len(meta), len(body)) + meta + body
+        with self._lock:
+            f = self._segment()
+            offset = f.tell()
+            f.write(record)
+            f.flush()
+            rec = RawRecord(url, self._name, offset, len(record), len(page.content), codec, now)
+            self._pending[url] = rec
+            full = len(self._pending) >= FLUSH_EVERY
+        if full:
+            self.flush()
+        return rec
+
+    def flush(self) -> int:
+        """Ghi chỉ mục đang gom (1 query tìm article_id + 1 bulk upsert)."""
+        from articles.models import Article
+
+        from crawler.models import RawPage
+
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        if not pending:
+            return 0
+        ids = dict(Article.objects.filter(source_url__in=[r.url for r in pending]).values_list("source_url", "id"))
+        RawPage.objects.bulk_create(
+            [RawPage(url=r.url[:1000], article_id=ids.get(r.url), segment=r.segment, offset=r.offset,
+                     length=r.length, size=r.size, codec=CODEC_NAMES[r.codec], fetched_at=r.fetched_at)
+             for r in pending],
+            update_conflicts=True, unique_fields=["url"],
+            update_fields=["article", "segment", "offset", "length", "size", "codec", "fetched_at"],
+        )
+        return len(pending)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------- đọc ----------
+    def read(self, segment: str, offset: int, length: int):
+        """-> (meta, HTML gốc) của 1 bản ghi."""
+        return read_record(self.root / segment, offset, length)
+
+    def scan(self):
+        """
+        Duyệt mọi bản ghi trong mọi segment: (segment, offset, length, meta) — để dựng lại chỉ mục.
+        meta có thêm "codec" (tên codec của bản ghi).
+        """
+        for path in sorted(self.root.glob("*.seg")):
+            with open(path, "rb") as f:
+                offset = 0
+                while True:
+                    head = f.read(_HEADER.size)
+                    if len(head) < _HEADER.size:
+                        break
+                    magic, codec, meta_len, body_len = _HEADER.unpack(head)
+                    if magic != MAGIC:
+                        break   # đuôi ghi dở (process chết giữa chừng)
+                    meta = f.read(meta_len)
+                    f.seek(body_len, os.SEEK_CUR)
+                    length = _HEADER.size + meta_len + body_len
+                    if len(meta) < meta_len or f.tell() > path.stat().st_size:
+                        break
+                    yield path.name, offset, length, {**json.loads(meta), "codec": CODEC_NAMES.get(codec, "")}
+                    offset += length
+
+    def disk_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.root.glob("*.seg")) if self.root.exists() else 0
+
+
+def read_record(path, offset: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return unpack(f.read(length))
+
+
+_archive: RawArchive | None = None
+_archive_pid: int | None = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> RawArchive | None:
+    """Archive dùng chung trong process (tạo lại sau fork); None nếu CRAWLER_RAW_ARCHIVE trống."""
+    global _archive, _archive_pid
+    root = _setting("CRAWLER_RAW_ARCHIVE", "")
+    if not root:
+        return None
+    with _archive_lock:
+        if _archive is None or _archive_pid != os.getpid():
+            _archive = RawArchive(root)
+            _archive_pid = os.getpid()
+        return _archive
+
+
+def store(url: str, page) -> None:
+    archive = get_archive()
+    if archive is not None:
+        archive.store(url, page)
+
+
+def flush() -> None:
+    archive = get_archive()
+    if archive is not None:
+        archive.flush()
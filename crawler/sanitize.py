@@ -0,0 +1,610 @@
+# crawler/sanitize.py
+"""
+Sanitize + chuẩn hoá HTML thân bài: 1 lần parse lxml, 1 lượt duyệt cây.
+
+Thay chuỗi cũ BeautifulSoup -> bleach (html5lib) -> BeautifulSoup -> 3 lượt
+duyệt (link ảnh, thẻ tên file, text node tên file) -> BeautifulSoup lần nữa
+cho blocks/excerpt. Trong 1 lượt duyệt (`clean`):
+
+- bỏ script/style/noscript/iframe (cả nội dung) và comment; thẻ ngoài
+  allow-list bị gỡ, giữ chữ bên trong (như bleach strip=True); attr ngoài
+  allow-list và href/src sai protocol bị bỏ; nguồn ảnh thật (src/srcset/
+  data-src/…) được chọn sẵn cho bước mirror ảnh;
+- <a href=*.jpg> -> <img> (<p> chỉ có link ảnh -> <figure>), <p>/<span>/…
+  chỉ là tên file ảnh và text node tên file trần bị xoá.
+
+Thứ tự quyết định giữ như chuỗi cũ (<p> tên file trước, rồi thẻ, rồi text
+node; text node hai bên chỗ vừa xoá không gộp lại khi xét), serialize theo
+định dạng BeautifulSoup (`<br/>`, cách quote attr). Cây dựng bằng libxml2
+chứ không phải html5lib, nên phải bù 2 chỗ readability hay sinh ra:
+`<body id="readabilityBody">` (trang không chọn được khối nội dung) được tính
+là thẻ đầu tiên như tokenizer của bleach, và <figure>/<figcaption> nằm trong
+<p> được tách ra như html5lib (`_close_p`). Với các chỗ đó, content_html/
+blocks/excerpt trùng từng byte với bản cũ trên corpus benchmark
+(crawler.tests so với baseline lưu sẵn).
+
+Khác biệt còn lại (HTML thô không qua readability, vd: summary của feed):
+- thẻ khối nằm sâu trong <p> (<p><em>…<h3>): html5lib đóng <p> rồi mở lại
+  <em> (adoption agency), ở đây giữ lồng nhau; <a> lồng trong <a> cũng vậy;
+- `</p>` lẻ sau thẻ khối libxml2 đã tự đóng <p> (<p>a<h3>b</h3>c</p>):
+  html5lib thêm <p></p> rỗng, libxml2 bỏ đi;
+- thẻ khối ngoài allow-list (<div>, <table>, …) trong <p>: bleach gỡ ở mức
+  token nên <p> không bị đóng, libxml2 thì đóng.
+
+`CleanHTML.render()`: content_html + blocks + excerpt trong 1 lượt qua các
+phần tử cấp 1, không parse lại.
+"""
+from __future__ import annotations
+
+import html as html_lib
+import re
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlparse
+
+import lxml.html
+
+# bleach.sanitizer.ALLOWED_TAGS + thẻ bài báo
+ALLOWED_TAGS = frozenset({
+    "a", "abbr", "acronym", "b", "blockquote", "code", "em", "i", "li", "ol", "strong", "ul",
+    "p", "br", "u", "span", "h2", "h3", "h4", "h5", "h6", "figure", "figcaption", "img",
+})
+# ALLOWED_ATTRS: thêm data-src, data-original, srcset, data-srcset, sizes
+ALLOWED_ATTRS = {
+    "a": ["href", "title", "rel", "target"],
+    "img": ["src", "alt", "title", "loading", "data-src", "data-original", "srcset", "data-srcset", "sizes"],
+}
+ALLOWED_PROTOCOLS = ["http", "https", "data"]
+# allow-list hẹp (bleach mặc định + vài thẻ) cho cleaned_html lấy thẳng từ thân bài readability:
+# ứng viên content_html khi dài hơn bản đã chuẩn hoá (tasks._extract_document, reextract)
+SUMMARY_TAGS = frozenset({
+    "p", "br", "strong", "b", "em", "i", "a", "ul", "ol", "li", "blockquote", "h2", "h3", "h4", "img",
+})
+SUMMARY_ATTRS = {"a": ["href", "title", "rel", "target"], "img": ["src", "alt", "title"]}
+SUMMARY_PROTOCOLS = ["http", "https", "mailto"]
+
+DROP_TAGS = frozenset({"script", "style", "noscript", "iframe"})   # bỏ cả nội dung
+# thẻ khối bị gỡ -> "\n" (trừ thẻ đầu tiên của input), như tokenizer của bleach strip=True
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "details", "dialog", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hgroup", "hr",
+    "li", "main", "nav", "ol", "p", "pre", "section", "table", "ul",
+})
+# html5lib đóng <p> đang mở khi gặp các thẻ này (libxml2 chỉ biết phần HTML4)
+_P_CLOSERS = frozenset({
+    "address", "article", "aside", "blockquote", "center", "details", "dialog", "dir", "div", "dl",
+    "fieldset", "figcaption", "figure", "footer", "header", "hgroup", "main", "menu", "nav", "ol", "p",
+    "section", "summary", "ul", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "listing", "form", "table",
+    "hr", "xmp", "li", "dd", "dt",
+})
+VOID_TAGS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+                       "param", "source", "track", "wbr"})
+
+IMG_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".svg")
+IMG_FILENAME_RE = re.compile(r'\.(jpg|jpeg|png|webp|gif|svg)(\s*\(ở đây\))?$', re.I)
+# ký tự cuối có thể khớp IMG_FILENAME_RE -> lọc nhanh trước khi chạy regex
+_FILENAME_LAST = frozenset("gGpPfF)")
+_ARTIFACT_TAGS = frozenset({"p", "span", "em", "strong", "small", "a"})
+
+_ASCII_SPACES = " \n\t\x0c\r"
+_DATA_BLOCKS = frozenset({"h2", "h3", "h4", "h5", "h6", "ul", "ol", "figure"})   # block không mang html
+_PRE_TAGS = frozenset({"pre", "textarea"})     # BeautifulSoup giữ nguyên khoảng trắng bên trong
+_WS_RE = re.compile(r"\s+")
+_NEWLINES_RE = re.compile(r"\n{3,}")
+_URI_JUNK_RE = re.compile(r"[`\000-\040\177-\240\s]+")
+_BODY_TAG_RE = re.compile(r"\s*<body[\s/>]", re.I)
+_FULL_DOC_RE = re.compile(r"\s*(<\?xml[^>]*>\s*)?(<!--.*?-->\s*)*<(!doctype|html)[\s>]", re.I | re.S)
+
+
+# ---------- ảnh ----------
+def pick_from_srcset(srcset: str | None) -> str | None:
+    if not srcset:
+        return None
+    # "url 1x, url2 2x, url3 3x" -> lấy url đầu
+    parts = [p.strip() for p in srcset.split(",") if p.strip()]
+    if not parts:
+        return None
+    return parts[0].split()[0]
+
+
+def best_img_src(img) -> str | None:
+    """Ưu tiên src -> srcset -> data-src -> data-srcset -> data-original."""
+    return (
+        img.get("src")
+        or pick_from_srcset(img.get("srcset"))
+        or img.get("data-src")
+        or pick_from_srcset(img.get("data-srcset"))
+        or img.get("data-original")
+    )
+
+
+def is_image_url(href: str | None) -> bool:
+    if not href:
+        return False
+    href = href.strip().split("?", 1)[0].split("#", 1)[0]
+    return any(href.lower().endswith(ext) for ext in IMG_EXTS)
+
+
+def abs_url(base: str, maybe_url: str | None) -> str | None:
+    if not maybe_url:
+        return None
+    try:
+        u = maybe_url.strip()
+        if u.startswith("//"):          # ← xử lý protocol-relative
+            return "https:" + u
+        return urljoin(base, u)
+    except Exception:
+        return maybe_url
+
+
+def uri_allowed(value: str, protocols) -> bool:
+    """Cùng quy tắc với bleach (sanitize_uri_value): URL tương đối / #anchor được giữ."""
+    uri = _URI_JUNK_RE.sub("", html_lib.unescape(value)).replace("�", "").lower()
+    try:
+        parsed = urlparse(uri)
+    except ValueError:
+        return False
+    if parsed.scheme:
+        return parsed.scheme in protocols
+    if uri.startswith("#"):
+        return True
+    if ":" in uri and uri.split(":")[0] in protocols:
+        return True
+    return "http" in protocols or "https" in protocols
+
+
+# ---------- tên file ảnh ----------
+def _lonely_filename(text: str, limit: int, lead: str) -> bool:
+    if not text or text[-1] not in _FILENAME_LAST:
+        return False
+    t = _WS_RE.sub(" ", text).strip()
+    if len(t) > limit:
+        return False
+    return bool(IMG_FILENAME_RE.search(t.lstrip(lead)))
+
+
+def _is_filename_tag(text: str) -> bool:
+    # <span>/<em>/… chỉ chứa tên file (tối đa 120 ký tự)
+    return _lonely_filename(text, 120, "@•-–—:··*")
+
+
+def _is_filename_text(text: str) -> bool:
+    # text node trần (tối đa 160 ký tự, bỏ nhiều ký hiệu mở đầu hơn)
+    return _lonely_filename(text.strip(), 160, "@•-–—:·*[]()“”\"'")
+
+
+def _text_of(items, skip_dropped_p: bool) -> str:
+    """get_text(" ", strip=True) của nội dung đã sanitize (trước các bước xoá tên file sau)."""
+    parts = []
+
+    def walk(items):
+        for it in items:
+            if it.__class__ is str:
+                s = it.strip()
+                if s:
+                    parts.append(s)
+            elif not (skip_dropped_p and it.dropped == "p"):
+                walk(it.items)
+
+    walk(items)
+    return " ".join(parts)
+
+
+def _last_char(items, skip_dropped_p: bool) -> str:
+    """Ký tự cuối của `_text_of` mà không dựng cả chuỗi (đa số đoạn kết thúc bằng dấu chấm)."""
+    for it in reversed(items):
+        if it.__class__ is str:
+            s = it.rstrip()
+            if s:
+                return s[-1]
+        elif not (skip_dropped_p and it.dropped == "p"):
+            c = _last_char(it.items, skip_dropped_p)
+            if c:
+                return c
+    return ""
+
+
+# ---------- 1 lượt duyệt ----------
+class _Node:
+    """Phần tử đã giữ lại: element lxml + nội dung (chuỗi / _Node con) để xét các quy tắc tên file."""
+    __slots__ = ("el", "items", "dropped", "gone", "from_link")
+
+    def __init__(self, el, items, from_link=False):
+        self.el = el
+        self.items = items
+        self.dropped = None      # "p": <p> tên file, "tag": thẻ tên file
+        self.gone = False        # parent rỗng sau khi xoá text node tên file
+        self.from_link = from_link
+
+
+class _Cleaner:
+    def __init__(self, base_url, tags, attrs, protocols, normalize):
+        self.base_url = base_url or ""
+        self.tags = tags
+        self.attrs = attrs
+        self.protocols = protocols
+        self.normalize = normalize
+        self.sources = {}        # img -> URL ảnh thật (src/srcset/data-*)
+        self.seen_tag = False
+
+    def collect(self, el, out: list) -> None:
+        """Nội dung của `el` (text, con đã giữ, tail) vào `out`; thẻ ngoài allow-list bị gỡ tại chỗ."""
+        if el.text:
+            out.append(el.text if el.tag in _PRE_TAGS else _blank(el.text))
+        for child in el:
+            tag = child.tag
+            if tag.__class__ is str and tag not in DROP_TAGS:   # comment/PI: tag không phải str
+                if tag in self.tags:
+                    self.seen_tag = True
+                    out.append(self.element(child, tag))
+                else:
+                    if self.seen_tag and tag in BLOCK_TAGS:
+                        out.append("\n")
+                    self.seen_tag = True
+                    self.collect(child, out)
+            if child.tail:
+                out.append(_blank(child.tail))
+
+    def element(self, el, tag: str) -> _Node:
+        attrib = el.attrib
+        if attrib:
+            allowed = self.attrs.get(tag) or ()
+            keep = [(k, v) for k, v in attrib.items()
+                    if k in allowed and (k not in ("href", "src") or uri_allowed(v, self.protocols))]
+            attrib.clear()
+            for k, v in keep:
+                if k == "rel":
+                    v = " ".join(v.split())
+                attrib[k] = _normalize_text(v)
+
+        if tag == "a" and self.normalize:
+            href = el.get("href")
+            if is_image_url(href):
+                src = abs_url(self.base_url, href) or href
+                img = el.makeelement("img", {"src": src})
+                self.sources[img] = src
+                return _Node(img, [], from_link=True)
+        if tag == "img":
+            self.sources[el] = best_img_src(el)
+
+        items = []
+        self.collect(el, items)
+        items = _merge(items, self.normalize)
+        node = _Node(el, items)
+        if not self.normalize:
+            _assemble(el, items)
+            return node
+
+        if tag == "p" and len(items) == 1 and items[0].__class__ is _Node and items[0].from_link:
+            fig = el.makeelement("figure", {})
+            fig.append(items[0].el)
+            node.items = items = [_Node(fig, items)]
+        if tag in _ARTIFACT_TAGS:
+            if tag == "p" and _last_char(items, False) in _FILENAME_LAST \
+                    and IMG_FILENAME_RE.search(_text_of(items, False)):
+                node.dropped = "p"
+                return node
+            if _last_char(items, True) in _FILENAME_LAST and _is_filename_tag(_text_of(items, True)):
+                node.dropped = "tag"
+                return node
+
+        kept, node.gone = _drop_filename_texts(items)
+        if not node.gone:
+            _assemble(el, kept)
+        return node
+
+
+def _blank(s: str) -> str:
+    # BeautifulSoup: text node chỉ gồm khoảng trắng ASCII -> "\n" (nếu có xuống dòng) hoặc " "
+    if s[0] in _ASCII_SPACES and s[-1] in _ASCII_SPACES and not s.strip(_ASCII_SPACES):
+        return "\n" if "\n" in s else " "
+    return s
+
+
+def _normalize_text(s: str) -> str:
+    # html5lib (bleach cũ) đổi \r\n, \r -> \n; rồi rút gọn >= 3 newline còn 2
+    if "\r" in s:
+        s = s.replace("\r\n", "\n").replace("\r", "\n")
+    if "\n\n\n" in s:
+        s = _NEWLINES_RE.sub("\n\n", s)
+    return s
+
+
+def _merge(items: list, reparse: bool) -> list:
+    """
+    Chuỗi liền nhau (hai bên thẻ đã gỡ / comment / script) gộp thành 1 text node.
+    `reparse`: chuỗi cũ parse lại bằng BeautifulSoup sau bleach -> rút gọn text chỉ có khoảng trắng.
+    """
+    out = []
+    for it in items:
+        if it.__class__ is str and out and out[-1].__class__ is str:
+            out[-1] += it
+        else:
+            out.append(it)
+    if reparse:
+        return [_blank(_normalize_text(it)) if it.__class__ is str else it for it in out]
+    return [_normalize_text(it) if it.__class__ is str else it for it in out]
+
+
+def _drop_filename_texts(items: list) -> tuple[list, bool]:
+    """
+    Bỏ phần tử con đã xoá + text node chỉ là tên file ảnh (xét theo thứ tự tài liệu như bản cũ).
+    -> (nội dung còn lại, True nếu parent không còn chữ/thẻ nào sau khi xoá -> bỏ cả parent).
+    """
+    items = [it for it in items if it.__class__ is str or it.dropped is None]
+    hits = {i for i, it in enumerate(items) if it.__class__ is str and _is_filename_text(it)}
+    if not hits:
+        return items, False
+    # after[i]: từ vị trí i trở đi còn thẻ hoặc chữ (chưa tới lượt xét thì vẫn còn)
+    after = [False] * (len(items) + 1)
+    for i in range(len(items) - 1, -1, -1):
+        it = items[i]
+        after[i] = after[i + 1] or it.__class__ is not str or bool(it.strip())
+    before = False
+    for i, it in enumerate(items):
+        if i in hits:
+            if not before and not after[i + 1]:
+                return [], True
+        elif it.__class__ is str:
+            before = before or bool(it.strip())
+        elif not it.gone:
+            before = True
+    return [it for i, it in enumerate(items) if i not in hits], False
+
+
+def _assemble(el, items: list) -> None:
+    """Đặt lại text + con của `el` theo `items` (con đã xoá thì bỏ, chữ hai bên nối lại)."""
+    del el[:]
+    el.text = None
+    last = None
+    for it in items:
+        if it.__class__ is str:
+            if last is None:
+                el.text = (el.text or "") + it
+            else:
+                last.tail = (last.tail or "") + it
+        elif it.dropped is None and not it.gone:
+            last = it.el
+            el.append(last)
+            last.tail = None
+
+
+def _close_p(root, tags) -> None:
+    """
+    Thẻ khối được giữ là con trực tiếp của <p> -> đóng <p> tại đó như html5lib: thẻ đó và phần
+    sau ra ngoài làm anh em của <p>, `</p>` gốc thành <p></p> rỗng. (libxml2 đã tự đóng với thẻ
+    HTML4; còn lại chủ yếu <figure>/<figcaption>.)
+    """
+    closers = _P_CLOSERS.intersection(tags)
+    for p in list(root.iter("p")):
+        at = next((i for i, child in enumerate(p) if child.tag in closers), None)
+        if at is None:
+            continue
+        parent = p.getparent()
+        pos = parent.index(p)
+        moved = p[at:]
+        for k, el in enumerate(moved, 1):
+            parent.insert(pos + k, el)          # tail đi theo phần tử
+        empty = p.makeelement("p", {})
+        empty.tail, p.tail = p.tail, None
+        parent.insert(pos + len(moved) + 1, empty)
+
+
+def _parse(html: str):
+    """Gốc chứa nội dung: <body> của fragment, hoặc <html> nếu là cả trang (giữ chữ trong <head> như bleach)."""
+    full = bool(_FULL_DOC_RE.match(html))
+    src = html if full else f"<html><body>{html}</body></html>"
+    try:
+        doc = lxml.html.document_fromstring(src)
+    except ValueError:      # str có khai báo encoding (<?xml … encoding=…?>)
+        doc = lxml.html.document_fromstring(
+            src.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+    if full:
+        return doc
+    return doc.find("body")
+
+
+# ---------- kết quả ----------
+@dataclass
+class Rendered:
+    html: str
+    blocks: list[dict]
+    excerpt: str
+
+
+class CleanHTML:
+    """
+    HTML đã sạch trên 1 cây lxml: `root` chứa nội dung (tag của root không được serialize).
+    Sửa cây tại chỗ được (mirror ảnh: utils._rewrite_images_to_media) rồi `render()`.
+    """
+
+    def __init__(self, root, sources: dict | None = None):
+        self.root = root
+        self.sources = sources or {}
+
+    def images(self) -> list[tuple]:
+        """[(img, URL ảnh thật)] theo thứ tự tài liệu."""
+        return [(img, self.sources.get(img) or best_img_src(img)) for img in self.root.iter("img")]
+
+    @property
+    def html(self) -> str:
+        out = [_esc(self.root.text)] if self.root.text else []
+        for el in self.root:
+            _write(el, out)
+            if el.tail:
+                out.append(_esc(el.tail))
+        return "".join(out)
+
+    def render(self) -> Rendered:
+        """content_html + blocks (để render/đổi layout sau này) + excerpt, 1 lượt qua phần tử cấp 1."""
+        root = self.root
+        out = [_esc(root.text)] if root.text else []
+        blocks: list[dict] = []
+        excerpt = None
+
+        def push(btype: str, data: dict):
+            blocks.append({"type": btype, "order": len(blocks), "data": data})
+
+        for el in root:
+            start = len(out)
+            _write(el, out)
+            piece = "".join(out[start:])
+            del out[start:]
+            out.append(piece)
+            if el.tail:
+                out.append(_esc(el.tail))
+            if el.tag not in _DATA_BLOCKS and _has_blank(el):
+                # blocks cũ lấy từ lần parse lại content_html -> text node chỉ có khoảng trắng bị rút gọn lần nữa
+                piece = serialize(el, _esc_blank)
+
+            name = el.tag
+            if name in {"h2", "h3", "h4", "h5", "h6"}:
+                push("heading", {"level": name, "text": text_content(el)})
+
+            elif name == "p":
+                img = _first(el, "img")
+                if img is not None and not text_content(el):
+                    push("figure", {"src": img.get("src"), "alt": img.get("alt", ""), "caption": ""})
+                else:
+                    push("paragraph", {"html": piece})
+                    if excerpt is None:
+                        excerpt = text_content(el)[:240] or None
+
+            elif name in {"ul", "ol"}:
+                items = [text_content(li) for li in el if li.tag == "li"]
+                push("list", {"ordered": name == "ol", "items": items})
+
+            elif name == "blockquote":
+                push("quote", {"html": piece})
+
+            elif name == "figure":
+                img = _first(el, "img")
+                cap = _first(el, "figcaption")
+                if img is not None:
+                    push("figure", {
+                        "src": img.get("src"),
+                        "alt": img.get("alt", ""),
+                        "caption": text_content(cap) if cap is not None else "",
+                    })
+            else:
+                push("raw", {"html": piece})
+
+        return Rendered("".join(out), blocks, excerpt or "")
+
+
+def clean(html: str, base_url: str = "", tags=ALLOWED_TAGS, attrs=None, protocols=ALLOWED_PROTOCOLS,
+          normalize: bool = True) -> CleanHTML:
+    """
+    Sanitize (+ chuẩn hoá link ảnh / tên file nếu `normalize`) trong 1 lượt duyệt.
+    `base_url`: để tuyệt đối hoá <a href=*.jpg> khi đổi thành <img>.
+    """
+    attrs = ALLOWED_ATTRS if attrs is None else attrs
+    html = html or ""
+    if not html.strip():
+        return _text_only(html)
+    root = _parse(html)
+    _close_p(root, tags)
+    cleaner = _Cleaner(base_url, tags, attrs, protocols, normalize)
+    # cả trang: <html> là thẻ đầu tiên; <body> của fragment thì libxml2 nuốt mất
+    cleaner.seen_tag = root.tag == "html" or bool(_BODY_TAG_RE.match(html))
+    items = []
+    cleaner.collect(root, items)
+    items = _merge(items, normalize)
+    if normalize:
+        items, gone = _drop_filename_texts(items)
+        if gone:
+            items = []
+    _assemble(root, items)
+    return CleanHTML(root, cleaner.sources)
+
+
+def clean_summary(html: str | None) -> str:
+    """Thân bài readability qua allow-list hẹp, không chuẩn hoá ảnh / tên file -> HTML ("" nếu rỗng)."""
+    if not html:
+        return ""
+    return clean(html, tags=SUMMARY_TAGS, attrs=SUMMARY_ATTRS, protocols=SUMMARY_PROTOCOLS,
+                 normalize=False).html
+
+
+def _text_only(text: str) -> CleanHTML:
+    root = _parse("")
+    root.text = _normalize_text(text) or None
+    return CleanHTML(root)
+
+
+def parse(clean_html: str) -> CleanHTML:
+    """Dựng lại cây từ HTML đã qua `clean` (vd: snapshot từ process khác) — không chạy lại quy tắc."""
+    if not (clean_html or "").strip():
+        return _text_only(clean_html or "")
+    return CleanHTML(_parse(clean_html))
+
+
+# ---------- serialize (định dạng BeautifulSoup "minimal": attr theo thứ tự abc) ----------
+def _esc(s: str) -> str:
+    if "&" in s:
+        s = s.replace("&", "&amp;")
+    if "<" in s:
+        s = s.replace("<", "&lt;")
+    if ">" in s:
+        s = s.replace(">", "&gt;")
+    return s
+
+
+def _esc_blank(s: str) -> str:
+    return _esc(_blank(s))
+
+
+def _has_blank(el) -> bool:
+    for d in el.iter():
+        if d.text and d.text != _blank(d.text):
+            return True
+        if d is not el and d.tail and d.tail != _blank(d.tail):
+            return True
+    return False
+
+
+def _quote(v: str) -> str:
+    v = _esc(v)
+    if '"' in v:
+        if "'" in v:
+            return '"' + v.replace('"', "&quot;") + '"'
+        return "'" + v + "'"
+    return '"' + v + '"'
+
+
+def _write(el, out: list, esc=_esc) -> None:
+    tag = el.tag
+    if tag.__class__ is not str:
+        return
+    if el.attrib:
+        out.append("<" + tag + "".join(f" {k}={_quote(v)}" for k, v in sorted(el.items())))
+    else:
+        out.append("<" + tag)
+    if tag in VOID_TAGS and not el.text and not len(el):
+        out.append("/>")
+        return
+    out.append(">")
+    if el.text:
+        out.append(esc(el.text))
+    for child in el:
+        _write(child, out, esc)
+        if child.tail:
+            out.append(esc(child.tail))
+    out.append("</" + tag + ">")
+
+
+def serialize(el, esc=_esc) -> str:
+    """1 phần tử (kể cả thẻ của nó) như str(tag) của BeautifulSoup."""
+    out = []
+    _write(el, out, esc)
+    return "".join(out)
+
+
+def text_content(el) -> str:
+    """get_text(" ", strip=True)."""
+    return " ".join(s for s in (t.strip() for t in el.itertext()) if s)
+
+
+def _first(el, tag: str):
+    for d in el.iterdescendants(tag):
+        return d
+    return None
@@ -0,0 +1,149 @@
+# crawler/scheduler.py
+"""
+Lịch poll RSS thích nghi theo từng nguồn (thay cho beat cố định 2 tiếng/lần).
+
+- Học tốc độ đăng bài (bài/giờ, EWMA) từ timestamp các entry trong feed:
+  số entry trong CRAWLER_POLL_RATE_WINDOW giờ gần nhất / khoảng thời gian quan sát được
+  (cả cửa sổ nếu feed còn entry cũ hơn, ngược lại từ entry cũ nhất tới giờ).
+  Feed không đổi (304 / trùng hash) -> tốc độ chỉ có thể giảm (1 / số giờ từ bài mới nhất).
+- Khoảng poll = CRAWLER_POLL_TARGET_ITEMS / tốc độ, kẹp trong [MIN, MAX], cộng jitter
+  ±CRAWLER_POLL_JITTER để các feed không dồn vào cùng 1 phút.
+- Feed lỗi: lùi theo cấp số nhân (khoảng poll × 2^số lần lỗi liên tiếp), trần BACKOFF_MAX.
+- Lịch được ghi cùng validator trong `FeedPoll.save_to()` -> mọi đường poll (task,
+  crawl_now, crawl_recent) đều cập nhật next_poll_at.
+- Beat chỉ chạy task `dispatch_due_sources` mỗi CRAWLER_POLL_TICK giây: `due_sources()`
+  = 1 SELECT trên index next_poll_at + 1 UPDATE "giữ chỗ" (lease), rồi fan-out task feed.
+"""
+from __future__ import annotations
+
+import calendar
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+MIN_INTERVAL = _setting("CRAWLER_POLL_MIN", 5 * 60)
+MAX_INTERVAL = _setting("CRAWLER_POLL_MAX", 2 * 3600)
+BACKOFF_MAX = _setting("CRAWLER_POLL_BACKOFF_MAX", 24 * 3600)
+JITTER = _setting("CRAWLER_POLL_JITTER", 0.1)
+TARGET_ITEMS = _setting("CRAWLER_POLL_TARGET_ITEMS", 1.0)
+RATE_WINDOW_HOURS = _setting("CRAWLER_POLL_RATE_WINDOW", 24)
+LEASE = _setting("CRAWLER_POLL_LEASE", 15 * 60)
+DISPATCH_LIMIT = _setting("CRAWLER_POLL_DISPATCH_LIMIT", 200)
+ALPHA = 0.5   # trọng số quan sát mới trong EWMA
+
+
+@dataclass
+class PollState:
+    """Các field lịch của Source."""
+    poll_interval: int = 0
+    publish_rate: float = 0.0
+    poll_failures: int = 0
+    last_entry_at: datetime | None = None
+
+
+def entry_times(entries, now: datetime) -> list[datetime]:
+    """Timestamp (UTC) của các entry có published/updated, bỏ giờ ở tương lai xa (feed sai múi giờ)."""
+    out = []
+    limit = now + timedelta(minutes=10)
+    for e in entries:
+        t = e.get("published_parsed") or e.get("updated_parsed")
+        if not t:
+            continue
+        dt = datetime.fromtimestamp(calendar.timegm(t), tz=dt_timezone.utc)
+        if dt <= limit:
+            out.append(min(dt, now))
+    return out
+
+
+def observed_rate(times: list[datetime], now: datetime) -> float | None:
+    """Bài/giờ quan sát được từ timestamp entry; None nếu feed không có timestamp."""
+    if not times:
+        return None
+    newest = max(times)
+    recent = [t for t in times if now - t <= timedelta(hours=RATE_WINDOW_HOURS)]
+    if not recent:
+        # feed im lặng: nhiều nhất 1 bài trong khoảng từ bài mới nhất tới giờ
+        return 1.0 / max((now - newest).total_seconds() / 3600, 1.0)
+    if len(recent) < len(times):
+        span = RATE_WINDOW_HOURS    # feed phủ hết cửa sổ -> đếm trên cả cửa sổ
+    else:
+        span = (now - min(recent)).total_seconds() / 3600    # feed bị cắt: chỉ thấy từng này
+    return len(recent) / max(span, 1.0)
+
+
+def interval_for(rate: float) -> int:
+    if rate <= 0:
+        return MAX_INTERVAL
+    return int(min(MAX_INTERVAL, max(MIN_INTERVAL, 3600 * TARGET_ITEMS / rate)))
+
+
+def _jittered(seconds: float, rng=random) -> timedelta:
+    return timedelta(seconds=seconds * (1 + rng.uniform(-JITTER, JITTER)))
+
+
+def plan(state: PollState, poll, now: datetime | None = None, rng=random) -> dict:
+    """Field cần ghi lên Source sau 1 lần poll (status/entries của `poll`)."""
+    from crawler.feeds import ERROR
+
+    now = now or timezone.now()
+    interval = state.poll_interval or MAX_INTERVAL
+
+    if poll.status == ERROR:
+        failures = state.poll_failures + 1
+        wait = min(BACKOFF_MAX, interval * 2 ** failures)
+        return {"poll_failures": failures, "next_poll_at": now + _jittered(wait, rng)}
+
+    rate, last_entry_at = state.publish_rate, state.last_entry_at
+    times = entry_times(poll.entries, now) if poll.entries else []
+    if times:
+        obs = observed_rate(times, now)
+        rate = obs if not rate else ALPHA * obs + (1 - ALPHA) * rate
+        last_entry_at = max(times + ([last_entry_at] if last_entry_at else []))
+    elif poll.skipped and last_entry_at:
+        # không có bài mới: tốc độ chỉ giảm
+        ceiling = 1.0 / max((now - last_entry_at).total_seconds() / 3600, 1.0)
+        if ceiling < rate:
+            rate = ALPHA * ceiling + (1 - ALPHA) * rate
+    if rate:
+        interval = interval_for(rate)
+
+    return {
+        "poll_interval": interval,
+        "publish_rate": round(rate, 4),
+        "poll_failures": 0,
+        "last_entry_at": last_entry_at,
+        "next_poll_at": now + _jittered(interval, rng),
+    }
+
+
+def plan_for(source_id: int, poll) -> dict:
+    """`plan()` với trạng thái lịch hiện tại của nguồn trong DB ({} nếu nguồn không còn)."""
+    from sources.models import Source
+
+    row = Source.objects.filter(pk=source_id).values(*PollState.__dataclass_fields__).first()
+    return plan(PollState(**row), poll) if row else {}
+
+
+def due_sources(now: datetime | None = None, limit: int = DISPATCH_LIMIT) -> list[int]:
+    """
+    Id các nguồn tới hạn poll, đã "giữ chỗ" next_poll_at = now + LEASE để tick sau
+    không phát lại trong lúc task feed còn chạy (task xong sẽ ghi lịch thật).
+    """
+    from sources.models import Source
+
+    now = now or timezone.now()
+    due = (Source.objects.filter(is_active=True).exclude(rss_url__isnull=True).exclude(rss_url="")
+           .filter(Q(next_poll_at__lte=now) | Q(next_poll_at__isnull=True)))
+    ids = list(due.order_by("next_poll_at").values_list("id", flat=True)[:limit])
+    if ids:
+        Source.objects.filter(pk__in=ids).update(next_poll_at=now + timedelta(seconds=LEASE))
+    return ids
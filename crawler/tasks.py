@@ -1,35 +1,32 @@
 # crawler/tasks.py
 import datetime as dt
-import feedparser, requests, bleach
-from celery import shared_task
+import logging
+import time
+from feedparser.datetimes import _parse_date  # feedparser 6 không còn feedparser._parse_date
+from celery import chord, shared_task
 from django.conf import settings
+from django.core.cache import caches
 from django.utils import timezone
-from trafilatura import fetch_url, extract
-from trafilatura.metadata import extract_metadata
-from readability import Document
-from bs4 import BeautifulSoup
-from django.utils.text import slugify
 
-from sources.models import Source, Category
+from sources.models import Source
 from articles.models import Article
-from crawler.utils import fetch_and_extract  # lấy HTML sạch + blocks + figure/caption
+from crawler.document import FetchedPage, ParsedDocument, fetch_page  # fetch 1 lần, parse 1 lần
+from crawler.feeds import poll_feed
+from crawler import (
+    canonical, classifier, deadletter, known_urls, ledger, neardup, profiles, raw_archive, sanitize, scheduler,
+)
+from crawler.persist import BatchWriter, ExtractedArticle, save_one
 
-
-HEADERS = {"User-Agent": "VNNewsBot/1.0 (+contact@example.com)"}
-
-ALLOWED_TAGS = [
-    "p","br","strong","b","em","i","a","ul","ol","li","blockquote","h2","h3","h4","img"
-]
-ALLOWED_ATTRS = {"a": ["href","title","rel","target"], "img": ["src","alt","title"]}
+logger = logging.getLogger(__name__)
 
 
 def _parse_datetime(s):
     if not s:
         return None
     try:
-        t = feedparser._parse_date(s)
+        t = _parse_date(s)
         if t:
-            return dt.datetime(*t[:6])
+            return dt.datetime(*t[:6], tzinfo=dt.timezone.utc)  # struct_time của feedparser là UTC
     except Exception:
         pass
     try:
@@ -38,189 +35,341 @@ def _parse_datetime(s):
         return None
 
 
-# crawler/tasks.py
-from django.utils.text import slugify
-from sources.models import Category
-
-def _pick_category(title: str) -> Category | None:
-    """
-    Chọn category dựa trên từ khóa trong tiêu đề.
-    Nếu không match thì fallback category đầu tiên hoặc tạo 'Khác'.
-    """
-    if not title:
-        return Category.objects.order_by("id").first()
-
-    t = title.lower()
-    mapping = [
-        (["bóng đá", "thể thao", "world cup", "v-league"], "Thể thao"),
-        (["kinh tế", "tài chính", "chứng khoán", "doanh nghiệp", "giá xăng"], "Kinh tế"),
-        (["giáo dục", "học sinh", "thi tốt nghiệp", "đại học"], "Giáo dục"),
-        (["công nghệ", "ai ", "trí tuệ nhân tạo", "iphone", "android", "mạng xã hội"], "Công nghệ"),
-        (["chính phủ", "quốc hội", "bộ trưởng", "thời sự"], "Thời sự"),
-        (["sức khỏe", "bệnh", "dịch", "vaccine", "y tế"], "Sức khỏe"),
-        (["giải trí", "showbiz", "ca sĩ", "phim", "nghệ sĩ"], "Giải trí"),
-        (["du lịch", "resort", "khách sạn", "travel"], "Du lịch"),
-    ]
-    for kws, catname in mapping:
-        if any(kw in t for kw in kws):
-            cat, _ = Category.objects.get_or_create(
-                name=catname,
-                defaults={"slug": slugify(catname)}
-            )
-            return cat
-
-    # fallback
-    fallback, _ = Category.objects.get_or_create(name="Khác", defaults={"slug": "khac"})
-    return fallback
-
-
-
-def _extract_image_from_meta(html):
-    try:
-        soup = BeautifulSoup(html, "lxml")
-        for prop in ["og:image", "twitter:image", "image"]:
-            tag = soup.find("meta", {"property": prop}) or soup.find("meta", {"name": prop})
-            if tag and tag.get("content"):
-                return tag["content"]
-        first_img = soup.find("img")
-        if first_img and first_img.get("src"):
-            return first_img["src"]
-    except Exception:
-        pass
-    return ""
-
-
-def _sanitize_html(html: str) -> str:
-    return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=True)
-
-
-def _fetch_and_save_article(source_id: int, url: str, published_str: str | None = None) -> str:
+def _fetch_and_save_article(source_id: int, url: str, published_str: str | None = None,
+                            html: str | None = None, page: FetchedPage | None = None,
+                            timings: dict | None = None, writer: BatchWriter | None = None,
+                            ledger=None) -> str:
+    """
+    Tải (1 lần) + parse (1 lần) + lưu Article.
+    `html` / `page`: trang đã tải sẵn (vd: từ crawler.engine) -> bỏ qua bước tải.
+    `timings`: dict để cộng dồn thời gian từng stage (fetch/parse/readability/…).
+    `writer`: gom vào lô của BatchWriter thay vì ghi ngay (trả về "queued").
+    `ledger`: CrawlLedger / RunRecorder nhận kết quả + timings của bài.
+    Lỗi tải / trích xuất được ghi vào dead-letter (crawler.deadletter) rồi raise tiếp.
+    Trang thành bài được cất HTML gốc vào crawler.raw_archive (chỉ mục ghi ở raw_archive.flush()).
+    """
     src = Source.objects.get(pk=source_id)
 
-    # 1. tải HTML
-    html = fetch_url(url) or ""
-    if not html:
-        r = requests.get(url, headers={"User-Agent": "vnnewsbot"}, timeout=20)
-        r.raise_for_status()
-        html = r.text
+    # 1. tải HTML (đúng 1 request)
+    if page is None:
+        t0 = time.perf_counter()
+        try:
+            page = FetchedPage.from_html(url, html) if html else fetch_page(url)
+        except Exception as e:
+            deadletter.record(url, e, source_id=source_id)
+            if ledger is not None:
+                ledger.page(source_id, "failed", {"fetch": time.perf_counter() - t0})
+            raise
+    doc = ParsedDocument(page, profile=profiles.for_source(src))
+    try:
+        try:
+            item = _extract_document(doc, published_str)
+        except Exception as e:
+            deadletter.record(url, e, source_id=source_id)
+            if ledger is not None:
+                ledger.page(source_id, "failed", doc.timings, len(page.content))
+            raise
+        return _save_extracted(doc, item, source_id, writer=writer, ledger=ledger)
+    finally:
+        logger.debug("article %s timings %s", url, {k: round(v, 4) for k, v in doc.timings.items()})
+        if timings is not None:
+            for k, v in doc.timings.items():
+                timings[k] = timings.get(k, 0.0) + v
+
+
+def _save_extracted(doc: ParsedDocument, item: ExtractedArticle | None, source_id: int | None,
+                    writer: BatchWriter | None = None, ledger=None) -> str:
+    """
+    Phần sau trích xuất của _fetch_and_save_article (lưu bài, raw archive, dead-letter,
+    ledger) — crawler.pipeline gọi ở thread ghi DB với bài đã trích xuất ở stage trước.
+    """
+    status = "failed"
+    try:
+        status = _save_item(doc, item, writer=writer, source_id=source_id)
+        if status != "too_short":
+            with doc.timed("archive"):
+                raw_archive.store(doc.canonical_url, doc.page)
+        return status
+    except Exception as e:
+        deadletter.record(doc.url, e, source_id=source_id)
+        raise
+    finally:
+        if ledger is not None:
+            ledger.page(source_id, status, doc.timings, len(doc.page.content))
+
+
+def _prepare_page(page: FetchedPage, profile_spec: dict | None = None) -> dict:
+    """
+    Phần chỉ tốn CPU của trích xuất 1 trang (parse, readability/trafilatura, sanitize,
+    chữ ký MinHash), không đụng DB/mạng -> chạy trong process pool (crawler.pipeline).
+    Kết quả dựng lại bằng ParsedDocument.from_snapshot() rồi đưa vào _extract_document.
+    """
+    try:
+        profile = profiles.compile_profile(profile_spec)
+    except profiles.ProfileError:
+        profile = None
+    doc = ParsedDocument(page, profile=profile)
+    summary_html = doc.summary_html
+    with doc.timed("sanitize"):
+        doc.precomputed["cleaned_html"] = sanitize.clean_summary(summary_html)
+    title = (getattr(doc.metadata, "title", None) or "").strip()
+    with doc.timed("neardup"):
+        doc.precomputed["signature"] = neardup.signature(f"{title}\n{doc.text}")
+    return doc.snapshot()
+
+
+def _extract_document(doc: ParsedDocument, published_str: str | None) -> ExtractedArticle | None:
+    """Trích xuất 1 trang thành ExtractedArticle (chỉ đọc DB); None nếu bài quá ngắn."""
+    url = doc.url
+    # URL chuẩn (rel=canonical/og:url, bỏ tracking/AMP/mobile) là khoá của bài;
+    # URL feed/redirect còn lại được lưu thành alias
+    canonical_url = doc.canonical_url
+    seen_urls = canonical.variants(canonical_url, url, doc.page.final_url)
 
     # 2. readability + sanitize
-    try:
-        doc = Document(html)
-        main_html = doc.summary(html_partial=True)
-        cleaned_html = _sanitize_html(main_html)
-    except Exception:
-        cleaned_html = ""
+    summary_html = doc.summary_html
+    with doc.timed("sanitize"):
+        cleaned_html = doc.precomputed.get("cleaned_html")
+        if cleaned_html is None:
+            cleaned_html = sanitize.clean_summary(summary_html)
 
     # 3. plain text (để check độ dài / fallback excerpt)
-    text = extract(html, include_comments=False, include_links=False) or ""
+    text = doc.text
     if len(text.strip()) < 300 and len(cleaned_html) < 300:
-        return "too_short"
+        return None
 
     # 4. metadata
-    meta = None
-    try:
-        meta = extract_metadata(html, url)
-    except Exception:
-        pass
-
-    title = (getattr(meta, "title", None) or "").strip()
-    description = (getattr(meta, "description", None) or "").strip()
-    meta_image = (getattr(meta, "image", None) or "")
+    title = (getattr(doc.metadata, "title", None) or "").strip()
+    description = doc.description
+    meta_image = (getattr(doc.metadata, "image", None) or "")
 
     pub_dt = _parse_datetime(published_str)
+    if not pub_dt and doc.profiled is not None:
+        pub_dt = profiles.parse_date(doc.profiled.date)
     if pub_dt and timezone.is_naive(pub_dt):
         pub_dt = timezone.make_aware(pub_dt, timezone.get_current_timezone())
 
-    # 5. pick category theo title hoặc text
-    category = _pick_category(title or text[:120])
-
-    # 6. parse thêm bằng utils
-    parsed = fetch_and_extract(url)
+    # 5. category theo từ khoá (title + mô tả), luật đã biên dịch sẵn trong process
+    category_ids = classifier.pick(title, description or text[:300])
+
+    # 5b. bài mới: tìm cụm tin gần trùng (MinHash LSH) trước khi mirror ảnh
+    with doc.timed("db"):
+        existing = canonical.resolve(seen_urls)
+        hit = next((existing[u] for u in seen_urls if u in existing), None)
+    sig, dup, dup_image = None, None, ""
+    if not hit:
+        with doc.timed("neardup"):
+            if "signature" in doc.precomputed:
+                sig = doc.precomputed["signature"]
+            else:
+                sig = neardup.signature(f"{title}\n{text}")
+            dup = neardup.find_duplicate(sig)
+        if dup and getattr(settings, "CRAWLER_NEARDUP_SKIP_IMAGES", False):
+            # tin phát lại: dùng ảnh của bài gốc, khỏi tải lại cả bộ ảnh
+            dup_image = Article.objects.filter(pk=dup[0]).values_list("main_image_url", flat=True).first() or ""
+            doc.mirror_images = False
+
+    # 6. nội dung sạch + blocks + ảnh (cùng 1 cây đã parse)
+    parsed = doc.content
     if parsed.get("content_html") and len(parsed["content_html"]) > len(cleaned_html):
         cleaned_html = parsed["content_html"]
 
-    # 7. tạo hoặc update Article
-    article, created = Article.objects.get_or_create(
-        source_url=url,
-        defaults=dict(
-            title=(title[:500] if title else (parsed.get("title") or url)),
-            content_html=cleaned_html or "",
-            excerpt=(parsed.get("excerpt") or description or text[:300])[:800],
-            main_image_url=(parsed.get("main_image_url") or meta_image or "")[:1000],
-            main_image_caption=parsed.get("main_image_caption", ""),
-            blocks=parsed.get("blocks") or {},
-            published_at=pub_dt or timezone.now(),
-            is_visible=True,
-        ),
+    return ExtractedArticle(
+        url=canonical_url,
+        seen_urls=seen_urls,
+        existing_id=hit[0] if hit else None,
+        title=title or parsed.get("title") or url,
+        content_html=cleaned_html,
+        blocks=parsed.get("blocks") or {},
+        excerpt=parsed.get("excerpt") or "",
+        fallback_excerpt=description or text[:300],
+        main_image_url=parsed.get("main_image_url") or meta_image or "",
+        dup_image_url=dup_image,
+        main_image_caption=parsed.get("main_image_caption") or "",
+        published_at=pub_dt,
+        category_ids=category_ids,
+        duplicate_of_id=dup[0] if dup else None,
+        signature=sig,
     )
 
-    changed = []
 
-    if cleaned_html and (not article.content_html or len(article.content_html) < len(cleaned_html)):
-        article.content_html = cleaned_html
-        changed.append("content_html")
+def _save_item(doc: ParsedDocument, item: ExtractedArticle | None, writer: BatchWriter | None = None,
+               source_id: int | None = None) -> str:
+    if item is None:
+        return "too_short"
+    item.source_id = source_id
+    if writer is not None:
+        writer.add(item)
+        return "queued"
+    # 7. tạo hoặc update Article (từng bài)
+    with doc.timed("db"):
+        _, created = save_one(item)
+    return "created" if created else "updated"
 
-    if not article.blocks and parsed.get("blocks"):
-        article.blocks = parsed["blocks"]
-        changed.append("blocks")
 
-    if (parsed.get("main_image_url") or meta_image) and not article.main_image_url:
-        article.main_image_url = (parsed.get("main_image_url") or meta_image)[:1000]
-        changed.append("main_image_url")
+# ---------- khoá idempotency: URL đang nằm trong hàng đợi / đang xử lý ----------
+def _inflight_key(url: str) -> str:
+    return "crawler:inflight:" + (canonical.canonicalize(url) or url)
 
-    if parsed.get("main_image_caption") and not article.main_image_caption:
-        article.main_image_caption = parsed["main_image_caption"]
-        changed.append("main_image_caption")
 
-    if parsed.get("excerpt") and not article.excerpt:
-        article.excerpt = parsed["excerpt"][:800]
-        changed.append("excerpt")
+def _claim(entries: list) -> list:
+    """
+    Giữ chỗ URL trước khi đẩy vào hàng đợi (cache.add = set-if-absent, nguyên tử trên
+    Redis/Memcached): 2 lượt poll chồng nhau không xếp cùng 1 URL 2 lần. Khoá tự hết
+    hạn sau CRAWLER_INFLIGHT_TTL giây nếu worker chết giữa chừng.
+    """
+    cache = caches[getattr(settings, "CRAWLER_TASK_CACHE", "default")]
+    ttl = getattr(settings, "CRAWLER_INFLIGHT_TTL", 30 * 60)
+    return [e for e in entries if e.get("link") and cache.add(_inflight_key(e["link"]), 1, ttl)]
 
-    if not article.published_at and pub_dt:
-        article.published_at = pub_dt
-        changed.append("published_at")
 
-    if category and not article.categories.filter(pk=category.pk).exists():
-        article.categories.add(category)
+def _release(urls: list[str]) -> None:
+    caches[getattr(settings, "CRAWLER_TASK_CACHE", "default")].delete_many([_inflight_key(u) for u in urls])
 
-    if article.is_visible is False:
-        article.is_visible = True
-        changed.append("is_visible")
 
-    if changed:
-        article.save(update_fields=changed)
+def _chunks(items: list, size: int):
+    size = max(1, size)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
-    return "created" if created else "updated"
+
+@shared_task
+def task_fetch_article(source_id: int, url: str, published_str: str | None = None, run_id: int | None = None):
+    """`run_id`: CrawlRun do task_fetch_feed mở -> cộng kết quả vào CrawlEvent của nguồn."""
+    recorder = ledger.RunRecorder(run_id) if run_id else None
+    try:
+        return _fetch_and_save_article(source_id, url, published_str, ledger=recorder)
+    finally:
+        known_urls.flush()
+        raw_archive.flush()
+
+
+@shared_task
+def task_fetch_articles(source_id: int, items: list, run_id: int | None = None):
+    """
+    1 message = 1 lô CRAWLER_ARTICLE_CHUNK bài của cùng nguồn ([url, published], ...).
+    Lỗi 1 bài không làm hỏng cả lô; khoá idempotency được nhả sau khi xử lý.
+    """
+    recorder = ledger.RunRecorder(run_id) if run_id else None
+    statuses = {}
+    try:
+        for url, pub in items:
+            try:
+                status = _fetch_and_save_article(source_id, url, pub, ledger=recorder)
+            except Exception:
+                logger.warning("article %s failed", url, exc_info=True)
+                status = "failed"
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        _release([url for url, _ in items])
+        known_urls.flush()
+        raw_archive.flush()
+    return statuses
+
+
+@shared_task
+def task_save_feed_validators(results: list, source_id: int, fields: dict):
+    """
+    Callback chord của task_fetch_feed: ghi ETag / Last-Modified / hash của lần poll
+    khi mọi lô task_fetch_articles không có bài lỗi; ngược lại giữ validator cũ để
+    lần poll sau duyệt lại feed (bài lỗi đã vào dead-letter, thử lại theo retry_at).
+    """
+    if not fields or any((r or {}).get("failed") for r in results):
+        return False
+    Source.objects.filter(pk=source_id).update(**fields)
+    return True
 
 
 @shared_task
-def task_fetch_article(source_id: int, url: str, published_str: str | None = None):
-    return _fetch_and_save_article(source_id, url, published_str)
+def task_make_image_variants(paths: list[str]):
+    """
+    Resize ảnh vừa mirror (WebP/JPEG theo MEDIA_VARIANT_WIDTHS) ngoài luồng request,
+    rồi render lại thân bài đã lưu trước khi có bản resize (srcset, articles.render).
+    """
+    from articles import render
+    from crawler import media
+
+    made = []
+    for path in media.missing_variants(paths):
+        rows = media.make_variants(path)
+        media.save_variants(rows)
+        if rows:
+            made.append(path)
+    if made:
+        render.refresh_pending(made)
+    return len(made)
 
 
 @shared_task
-def task_fetch_feed(source_id: int):
+def task_fetch_feed(source_id: int, force: bool = False):
     src = Source.objects.get(pk=source_id)
     if not src.is_active or not src.rss_url:
         return 0
-    feed = feedparser.parse(src.rss_url)
-    count = 0
-    for entry in feed.entries[:80]:
-        url = entry.get("link")
-        if not url:
-            continue
-        pub = entry.get("published") or entry.get("updated")
-        if getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False):
-            _fetch_and_save_article(src.id, url, pub)
-        else:
-            task_fetch_article.delay(src.id, url, pub)
-        count += 1
+    poll = poll_feed(src, force=force)
+    if poll.skipped:
+        # feed không đổi (304 / trùng hash) -> không duyệt entry, không fan-out
+        logger.info("feed %s skipped (%s)", src.name, poll.status)
+        ledger.open_event("task_fetch_feed", src.id, poll)
+        poll.save_to(src.id)
+        Source.objects.filter(pk=src.id).update(last_crawled_at=timezone.now())
+        return 0
+    # bỏ URL đã có trong DB, rồi URL đang nằm trong hàng đợi của lượt khác, trước khi fan-out
+    entries, known = known_urls.filter_known(poll.entries[:80])
+    claimed = _claim(entries)
+    logger.info("feed %s: %s, in-flight=%d", src.name, known, len(entries) - len(claimed))
+    run_id = ledger.open_event("task_fetch_feed", src.id, poll, seen=len(poll.entries), to_fetch=len(claimed))
+    eager = getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False)
+    items = [[e["link"], e.get("published") or e.get("updated")] for e in claimed]
+    chunks = list(_chunks(items, getattr(settings, "CRAWLER_ARTICLE_CHUNK", 10)))
+    if not eager:
+        # an toàn: Bloom chỉ trả "có thể đã biết", URL vẫn được DB xác nhận ở lần sau
+        for url, _ in items:
+            known_urls.remember(url)
+    # validator feed chỉ ghi khi mọi lô đã xong và không bài nào lỗi (callback của chord);
+    # còn bài bị hoãn (dead-letter chờ thử lại / đang ở lượt khác) -> chỉ ghi lịch poll
+    complete = not known.deferred and len(claimed) == len(entries)
+    poll.save_to(src.id, validators=complete and not chunks)
+    tasks = [task_fetch_articles.s(src.id, chunk, run_id=run_id) for chunk in chunks]
+    if tasks and complete:
+        chord(tasks)(task_save_feed_validators.s(src.id, poll.validator_fields()))   # eager: chạy ngay
+    else:
+        for task in tasks:
+            task.delay()
+    count = len(items)
+    known_urls.flush()
     src.last_crawled_at = timezone.now()
     src.save(update_fields=["last_crawled_at"])
     return count
 
 
+@shared_task
+def dispatch_due_sources():
+    """
+    Tick của beat: chỉ phát task cho nguồn đã tới next_poll_at (crawler/scheduler.py),
+    rồi xếp lại các trang bài dead-letter đã tới giờ thử lại (crawler/deadletter.py).
+    """
+    deadletter.purge_resolved()
+    ids = scheduler.due_sources()
+    for source_id in ids:
+        task_fetch_feed.delay(source_id)
+    dispatch_retries()
+    return len(ids)
+
+
+def dispatch_retries() -> int:
+    """Phát task_fetch_articles cho URL dead-letter tới hạn (trừ URL đang trong hàng đợi); trả về số URL."""
+    count = 0
+    chunk_size = getattr(settings, "CRAWLER_ARTICLE_CHUNK", 10)
+    for source_id, urls in deadletter.due().items():
+        claimed = _claim([{"link": u} for u in urls])
+        for chunk in _chunks([[e["link"], None] for e in claimed], chunk_size):
+            task_fetch_articles.delay(source_id, chunk)
+        count += len(claimed)
+    if count:
+        logger.info("dead-letter: re-queued %d url(s)", count)
+    return count
+
+
 @shared_task
 def schedule_all_sources():
     for s in Source.objects.filter(is_active=True):
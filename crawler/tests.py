@@ -1,3 +1,1100 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from articles.models import Article, ArticleURLAlias, MediaAsset
+from crawler import (
+    breaker, canonical, classifier, deadletter, feeds, known_urls, media, neardup, raw_archive, sanitize, scheduler,
+)
+from crawler.bench import corpus, extract
+from crawler.document import FetchedPage, ParsedDocument
+from crawler.engine import CrawlEngine, FeedJob
+from crawler.http_client import CrawlerClient, ResponseTooLarge, RobotsDisallowed, TokenBucket, read_capped
+from crawler.models import RawPage
+from crawler.persist import BatchWriter, ExtractedArticle
+from crawler.pipeline import CrawlPipeline
+from sources.models import Category, Source
+
+BASELINES = Path(__file__).resolve().parent / "bench" / "baselines"
+
+
+class SanitizeBaselineTests(SimpleTestCase):
+    """content_html/blocks/excerpt phải trùng output của chuỗi BeautifulSoup/bleach cũ."""
+
+    def test_bench_corpus_matches_stored_baseline(self):
+        baseline = json.loads((BASELINES / "extract.json").read_text("utf-8"))
+        corp = corpus.synthetic(40, 3)
+        self.assertEqual(corp.digest(), baseline["corpus"]["digest"])
+        changed = []
+        for page in corp.pages:
+            *_, digest = extract.run_page(page, repeat=1)
+            if digest != baseline["pages"][page.id]:
+                changed.append(page.id)
+        self.assertEqual(changed, [])
+
+    def assertRendered(self, html, expected_html, expected_blocks, expected_excerpt):
+        r = sanitize.clean(html, base_url="https://e.vn/tin/1.html").render()
+        self.assertEqual(r.html, expected_html)
+        self.assertEqual(r.blocks, expected_blocks)
+        self.assertEqual(r.excerpt, expected_excerpt)
+
+    # output mong đợi lấy từ chuỗi cũ trên cùng input
+    def test_readability_body_wrapper(self):
+        self.assertRendered(
+            '<body id="readabilityBody"><article><p>Ngắn.</p><h3>Tít</h3>'
+            '<p><a href="/a.jpg"><img src="/a.jpg"></a></p></article></body>',
+            '\n<p>Ngắn.</p><h3>Tít</h3><p><figure><img src="https://e.vn/a.jpg"/></figure></p>',
+            [
+                {"type": "paragraph", "order": 0, "data": {"html": "<p>Ngắn.</p>"}},
+                {"type": "heading", "order": 1, "data": {"level": "h3", "text": "Tít"}},
+                {"type": "figure", "order": 2, "data": {"src": "https://e.vn/a.jpg", "alt": "", "caption": ""}},
+            ],
+            "Ngắn.",
+        )
+
+    def test_figure_inside_p_is_split(self):
+        self.assertRendered(
+            '<div><p>Mở đầu <figure><img src="/b.jpg"><figcaption>Chú thích</figcaption></figure> sau</p></div>',
+            '<p>Mở đầu </p><figure><img src="/b.jpg"/><figcaption>Chú thích</figcaption></figure> sau<p></p>',
+            [
+                {"type": "paragraph", "order": 0, "data": {"html": "<p>Mở đầu </p>"}},
+                {"type": "figure", "order": 1, "data": {"src": "/b.jpg", "alt": "", "caption": "Chú thích"}},
+                {"type": "paragraph", "order": 2, "data": {"html": "<p></p>"}},
+            ],
+            "Mở đầu",
+        )
+
+    def test_linked_image_survives_filename_paragraph(self):
+        self.assertRendered(
+            '<div><p>anh-1.jpg<figure><a href="/c.jpg"><img src="/c1.jpg"></a></figure></p><p>Chữ.</p></div>',
+            '<figure><img src="https://e.vn/c.jpg"/></figure><p></p><p>Chữ.</p>',
+            [
+                {"type": "figure", "order": 0, "data": {"src": "https://e.vn/c.jpg", "alt": "", "caption": ""}},
+                {"type": "paragraph", "order": 1, "data": {"html": "<p></p>"}},
+                {"type": "paragraph", "order": 2, "data": {"html": "<p>Chữ.</p>"}},
+            ],
+            "Chữ.",
+        )
+
+    def test_snapshot_round_trip(self):
+        first = sanitize.clean('<p>a <a href="/x.png">x</a> <b>b</b></p>', base_url="https://e.vn/").render()
+        again = sanitize.parse(first.html).render()
+        self.assertEqual((again.html, again.blocks, again.excerpt), (first.html, first.blocks, first.excerpt))
+
+
+class DocumentCharsetTests(SimpleTestCase):
+    def _page(self, content, encoding=None):
+        return FetchedPage(url="https://e.vn/a.html", content=content, final_url="https://e.vn/a.html",
+                           encoding=encoding)
+
+    def test_unknown_header_charset_falls_back_to_meta_then_utf8(self):
+        page = self._page('<meta charset="windows-1258"><p>Chào</p>'.encode("cp1258"), encoding="x-bogus")
+        self.assertEqual(page.charset, "windows-1258")
+        page = self._page("<p>Chào bạn</p>".encode(), encoding="x-bogus")
+        self.assertEqual((page.charset, page.text), ("utf-8", "<p>Chào bạn</p>"))
+
+    def test_unknown_meta_charset_still_parses(self):
+        page = self._page('<html><head><meta charset="x-bogus"></head><body><p>Chào bạn</p></body></html>'.encode())
+        self.assertEqual(page.charset, "utf-8")
+        self.assertEqual(ParsedDocument(page, mirror_images=False).tree.findtext(".//p"), "Chào bạn")
+
+    def test_codec_unknown_to_libxml2_parses_decoded_text(self):
+        page = self._page("<html><body><p>Café</p></body></html>".encode("mac_roman"), encoding="mac-roman")
+        self.assertEqual(ParsedDocument(page, mirror_images=False).tree.findtext(".//p"), "Café")
+
+
+def _words(n, seed):
+    rnd = random.Random(seed)
+    return [f"tu{rnd.randrange(400)}" for _ in range(n)]
+
+
+class KnownURLTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "bloom.bin")
+        settings = override_settings(CRAWLER_BLOOM_PATH=self.path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(self._reset)
+        self._reset()
+
+    @staticmethod
+    def _reset():
+        known_urls._bloom, known_urls._bloom_mtime = None, None
+        known_urls._pending.clear()
+
+    def test_bloom_round_trip(self):
+        bf = known_urls.BloomFilter(capacity=1000)
+        bf.add("https://e.vn/a.html")
+        bf.save(self.path)
+        loaded = known_urls.BloomFilter.load(self.path)
+        self.assertIn("https://e.vn/a.html", loaded)
+        self.assertNotIn("https://e.vn/b.html", loaded)
+
+    def test_filter_known_skips_canonical_match_and_asks_db_only_for_bloom_hits(self):
+        Article.objects.create(title="A", source_url="https://e.vn/a.html")
+        known_urls.rebuild_bloom(save=True)
+        entries = [{"link": "https://e.vn/a.html?utm_source=fb"}, {"link": "https://e.vn/moi.html"}]
+        out, stats = known_urls.filter_known(entries, revisit_hours=0)
+        self.assertEqual([e["link"] for e in out], ["https://e.vn/moi.html"])
+        self.assertEqual((stats.seen, stats.new, stats.skipped, stats.db_checked), (2, 1, 1, 1))
+
+    def test_filter_known_revisits_recent_articles(self):
+        Article.objects.create(title="A", source_url="https://e.vn/a.html", published_at=timezone.now())
+        out, stats = known_urls.filter_known([{"link": "https://e.vn/a.html"}], revisit_hours=6)
+        self.assertEqual(len(out), 1)
+        self.assertEqual(stats.revisit, 1)
+
+    def test_filter_known_defers_dead_letters(self):
+        deadletter.record("https://e.vn/loi.html", requests.Timeout("hết giờ"))
+        out, stats = known_urls.filter_known([{"link": "https://e.vn/loi.html"}], revisit_hours=0)
+        self.assertEqual(out, [])
+        self.assertEqual(stats.deferred, 1)
+
+    def test_flush_keeps_urls_written_by_another_process(self):
+        known_urls.rebuild_bloom(save=True)
+        known_urls.remember("https://e.vn/cua-minh.html")
+        # process khác ghi file sau khi process này đã nạp -> bản trong bộ nhớ đã cũ
+        other = known_urls.BloomFilter.load(self.path)
+        other.add("https://e.vn/process-khac.html")
+        other.save(self.path)
+        known_urls.flush()
+        on_disk = known_urls.BloomFilter.load(self.path)
+        self.assertIn("https://e.vn/process-khac.html", on_disk)
+        self.assertIn("https://e.vn/cua-minh.html", on_disk)
+        self.assertEqual(known_urls._pending, [])
+
+
+class CanonicalTests(TestCase):
+    def test_canonicalize(self):
+        self.assertEqual(
+            canonical.canonicalize("https://m.vnexpress.net/tin-abc-123.html?utm_source=fb&b=2&a=1#x"),
+            "https://vnexpress.net/tin-abc-123.html?a=1&b=2",
+        )
+        self.assertEqual(canonical.canonicalize("HTTP://E.vn:80/a/amp/"), "http://e.vn/a")
+        self.assertEqual(canonical.canonicalize("https://e.vn/x.amp.html"), "https://e.vn/x.html")
+        self.assertEqual(canonical.canonicalize("ftp://e.vn/a"), "")
+
+    def test_pick_canonical_ignores_homepage(self):
+        self.assertEqual(canonical.pick_canonical("https://e.vn/a.html", "/"), "https://e.vn/a.html")
+        self.assertEqual(
+            canonical.pick_canonical("https://e.vn/a.html", "https://e.vn/b.html?utm_medium=x"),
+            "https://e.vn/b.html",
+        )
+
+    def test_resolve_through_source_url_and_alias(self):
+        a = Article.objects.create(title="A", source_url="https://e.vn/a.html")
+        added = canonical.remember_aliases(a, ["https://e.vn/a.html", "https://m.e.vn/a.html"])
+        self.assertEqual(added, ["https://m.e.vn/a.html"])
+        found = canonical.resolve(["https://e.vn/a.html", "https://m.e.vn/a.html", "https://e.vn/khac.html"])
+        self.assertEqual({u: v[0] for u, v in found.items()},
+                         {"https://e.vn/a.html": a.id, "https://m.e.vn/a.html": a.id})
+
+
+class NearDupTests(SimpleTestCase):
+    def test_short_text_has_no_signature(self):
+        self.assertIsNone(neardup.signature(" ".join(_words(neardup.MIN_TOKENS - 1, 1))))
+
+    def test_lsh_finds_lightly_edited_copy_only(self):
+        base = _words(120, 1)
+        edited = base[:60] + ["khac"] + base[61:]
+        a, b, c = (neardup.signature(" ".join(w)) for w in (base, edited, _words(120, 2)))
+        self.assertGreaterEqual(neardup.similarity(a, b), neardup.THRESHOLD)
+        self.assertLess(neardup.similarity(a, c), neardup.THRESHOLD)
+        self.assertEqual(neardup.unpack(neardup.pack(a)), a)
+
+        index = neardup.LSHIndex()
+        index.add(1, a)
+        self.assertEqual(index.find(b)[0], 1)
+        self.assertIsNone(index.find(c))
+
+
+class ClassifierTests(TestCase):
+    def setUp(self):
+        classifier.invalidate()
+        self.addCleanup(classifier.invalidate)
+        Category.objects.all().delete()    # bỏ bộ category mẫu của migration
+        self.sport = Category.objects.create(name="Thể thao", slug="the-thao", keywords="Bóng đá, V-League")
+        self.money = Category.objects.create(name="Kinh tế", slug="kinh-te", keywords="chứng khoán\nlãi suất")
+
+    def test_parse_keywords(self):
+        self.assertEqual(classifier.parse_keywords("Bóng đá, V-League\nworld cup;"),
+                         ["bong da", "v league", "world cup"])
+
+    def test_pick_weights_title_and_falls_back(self):
+        self.assertEqual(classifier.pick("Kết quả bóng đá hôm nay"), [self.sport.id])
+        # tít x2: 2 vs 1 -> cả 2 (MIN_SHARE); 4 vs 1 -> chỉ category thắng
+        self.assertEqual(classifier.pick("Lãi suất tăng", "trận bóng đá tối qua"), [self.money.id, self.sport.id])
+        self.assertEqual(classifier.pick("Lãi suất tăng, chứng khoán giảm", "bóng đá"), [self.money.id])
+        fallback = Category.objects.get(name=classifier.FALLBACK_NAME)
+        self.assertEqual(classifier.pick("Thời tiết"), [fallback.id])
+
+    def test_reloads_when_db_version_changes(self):
+        self.assertEqual(classifier.pick("Giá vàng"), [Category.objects.get(name=classifier.FALLBACK_NAME).id])
+        # .update() không phát signal: chỉ version (count, max updated_at) báo thay đổi
+        Category.objects.filter(pk=self.money.pk).update(
+            keywords="giá vàng", updated_at=timezone.now() + timedelta(seconds=1))
+        with mock.patch.object(classifier, "RECHECK_SECONDS", 0):
+            self.assertEqual(classifier.pick("Giá vàng"), [self.money.id])
+
+
+class BatchWriterTests(TestCase):
+    def _item(self, url, title="Tin", body="<p>Nội dung.</p>", **kw):
+        return ExtractedArticle(url=url, seen_urls=kw.pop("seen_urls", [url]), existing_id=None,
+                                title=title, content_html=body, **kw)
+
+    def test_insert_then_upsert_by_source_url(self):
+        cat = Category.objects.create(name="Thử nghiệm", slug="thu-nghiem")
+        with BatchWriter(batch_size=10) as w:
+            w.add(self._item("https://e.vn/a.html", seen_urls=["https://e.vn/a.html?utm_source=x", "https://e.vn/a.html"],
+                             category_ids=[cat.id]))
+        self.assertEqual((w.stats.created, w.stats.updated), (1, 0))
+        a = Article.objects.get(source_url="https://e.vn/a.html")
+        self.assertEqual(list(a.categories.values_list("id", flat=True)), [cat.id])
+        self.assertEqual(list(ArticleURLAlias.objects.values_list("url", flat=True)),
+                         ["https://e.vn/a.html?utm_source=x"])
+
+        # lúc trích xuất chưa biết bài đã có -> lô sau vẫn gộp vào đúng dòng cũ
+        with BatchWriter(batch_size=10) as w:
+            w.add(self._item("https://e.vn/a.html", body="<p>Nội dung dài hơn hẳn bản trước.</p>",
+                             main_image_url="https://e.vn/a.jpg"))
+        self.assertEqual((w.stats.created, w.stats.updated), (0, 1))
+        a.refresh_from_db()
+        self.assertEqual(Article.objects.count(), 1)
+        self.assertEqual(a.content_html, "<p>Nội dung dài hơn hẳn bản trước.</p>")
+        self.assertEqual(a.main_image_url, "https://e.vn/a.jpg")
+
+    def test_duplicates_within_a_batch(self):
+        text = " ".join(_words(120, 3))
+        edited = text.replace(text.split()[50], "khac", 1)
+        with BatchWriter(batch_size=10) as w:
+            w.add(self._item("https://e.vn/b.html", seen_urls=["https://e.vn/b.html"]))
+            w.add(self._item("https://e.vn/b.html", seen_urls=["https://m.e.vn/b.html"]))
+            w.add(self._item("https://e.vn/goc.html", signature=neardup.signature(text)))
+            w.add(self._item("https://x.vn/chep.html", signature=neardup.signature(edited)))
+        self.assertEqual(w.stats.created, 3)
+        b = Article.objects.get(source_url="https://e.vn/b.html")
+        self.assertEqual(list(b.url_aliases.values_list("url", flat=True)), ["https://m.e.vn/b.html"])
+        original = Article.objects.get(source_url="https://e.vn/goc.html")
+        self.assertEqual(Article.objects.get(source_url="https://x.vn/chep.html").duplicate_of_id, original.id)
+
+
+class _Response:
+    def __init__(self, status_code, content=b"", headers=None, url=""):
+        self.status_code, self.content, self.headers = status_code, content, headers or {}
+        self.url, self.encoding, self.elapsed = url, None, timedelta(0)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+
+class _FeedClient:
+    """CrawlerClient giả: trả lần lượt các response, ghi lại header đã gửi."""
+
+    def __init__(self, *responses):
+        self.responses, self.sent = list(responses), []
+
+    def get(self, url, kind=None, headers=None, timeout=None):
+        self.sent.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+RSS = (b'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>'
+       b'<item><title>A</title><link>https://e.vn/a.html</link></item>'
+       b'<item><title>B</title><link>https://e.vn/b.html</link></item></channel></rss>')
+
+
+class FeedPollTests(TestCase):
+    def setUp(self):
+        self.src = Source.objects.create(name="E", rss_url="https://e.vn/rss")
+
+    def _poll(self, response):
+        client = _FeedClient(response)
+        self.src.refresh_from_db()
+        return feeds.poll_feed(self.src, client=client), client.sent[0]
+
+    def test_validators_round_trip(self):
+        poll, sent = self._poll(_Response(200, RSS, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}))
+        self.assertEqual(sent, {})
+        self.assertEqual((poll.status, len(poll.entries)), (feeds.FETCHED, 2))
+        poll.save_to(self.src.id)
+
+        poll, sent = self._poll(_Response(304))
+        self.assertEqual(sent, {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        self.assertEqual(poll.status, feeds.NOT_MODIFIED)
+        self.assertTrue(poll.skipped)
+        self.assertEqual((poll.etag, poll.saved_bytes), ('"v1"', len(RSS)))
+
+    def test_same_body_without_validators_is_unchanged(self):
+        self._poll(_Response(200, RSS))[0].save_to(self.src.id)
+        poll, _ = self._poll(_Response(200, RSS))
+        self.assertEqual((poll.status, poll.entries), (feeds.UNCHANGED, []))
+
+    def test_error_and_deferred_polls_keep_old_validators(self):
+        self._poll(_Response(200, RSS, {"ETag": '"v1"'}))[0].save_to(self.src.id)
+        poll, _ = self._poll(_Response(503))
+        self.assertEqual((poll.status, poll.validator_fields()), (feeds.ERROR, {}))
+        poll.save_to(self.src.id)
+
+        poll, _ = self._poll(_Response(200, RSS + b" ", {"ETag": '"v2"'}))
+        poll.save_to(self.src.id, validators=False)
+        self.src.refresh_from_db()
+        self.assertEqual(self.src.feed_etag, '"v1"')
+        self.assertIsNotNone(self.src.next_poll_at)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(breaker.time, "monotonic", return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cb = breaker.CircuitBreaker(threshold=2, cooldown=10, max_cooldown=100, jitter=0)
+
+    def test_opens_after_threshold_and_probes_once(self):
+        self.cb.failure("e.vn")
+        self.cb.before("e.vn")
+        self.cb.failure("e.vn")
+        self.assertEqual(self.cb.state("e.vn"), breaker.OPEN)
+        with self.assertRaises(breaker.HostUnavailable):
+            self.cb.before("e.vn")
+
+        self.clock.return_value = 1010.0
+        self.cb.before("e.vn")
+        self.assertEqual(self.cb.state("e.vn"), breaker.HALF_OPEN)
+        with self.assertRaises(breaker.HostUnavailable):
+            self.cb.before("e.vn")
+        self.cb.success("e.vn")
+        self.assertEqual(self.cb.state("e.vn"), breaker.CLOSED)
+        self.cb.before("e.vn")
+
+    def test_failed_probe_doubles_cooldown(self):
+        self.cb.failure("e.vn")
+        self.cb.failure("e.vn")
+        self.clock.return_value = 1010.0
+        self.cb.before("e.vn")
+        self.cb.failure("e.vn")
+        self.assertEqual(self.cb.state("e.vn"), breaker.OPEN)
+        self.assertEqual(self.cb.snapshot()["e.vn"].retry_at, 1030.0)
+
+    def test_release_returns_the_probe(self):
+        self.cb.failure("e.vn")
+        self.cb.failure("e.vn")
+        self.clock.return_value = 1010.0
+        self.cb.before("e.vn")
+        self.cb.release("e.vn")
+        self.cb.before("e.vn")
+        self.assertEqual(self.cb.state("e.vn"), breaker.HALF_OPEN)
+
+    def test_host_failure_classification(self):
+        self.assertTrue(breaker.is_host_failure(requests.ConnectTimeout()))
+        self.assertTrue(breaker.is_host_failure(status=503))
+        self.assertFalse(breaker.is_host_failure(status=404))
+
+
+class _SiteClient:
+    """CrawlerClient giả cho engine: response theo URL, đo số request đồng thời mỗi host."""
+
+    def __init__(self, pages, delay=0.0):
+        self.pages, self.delay = pages, delay
+        self.lock = threading.Lock()
+        self.active, self.peak = {}, {}
+
+    def get(self, url, kind=None, headers=None, timeout=None, **kwargs):
+        host = url.split("/")[2]
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+        try:
+            time.sleep(self.delay)
+            if url not in self.pages:
+                return _Response(404, url=url)
+            return _Response(200, self.pages[url], url=url)
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+
+def _rss(links):
+    items = "".join(f"<item><title>{u}</title><link>{u}</link></item>" for u in links)
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode()
+
+
+class CrawlEngineTests(SimpleTestCase):
+    def _run(self, client, jobs, **kw):
+        pages, feeds, errors = [], [], []
+        with mock.patch("crawler.engine.get_client", return_value=client):
+            engine = CrawlEngine(**kw)
+        stats = engine.run(jobs, on_page=pages.append, on_feed=feeds.append, on_error=errors.append)
+        return stats, pages, feeds, errors
+
+    def test_fetches_entries_and_reports_failures(self):
+        links = [f"https://a.vn/{i}.html" for i in range(4)]
+        site = {"https://a.vn/rss": _rss(links), **{u: b"<html>ok</html>" for u in links[:3]}}
+        stats, pages, feeds, errors = self._run(_SiteClient(site), [FeedJob(1, "A", "https://a.vn/rss")],
+                                                concurrency=4)
+
+        self.assertEqual((stats.feeds, stats.pages, stats.failed), (1, 3, 1))
+        self.assertEqual([e["link"] for e in feeds[0].entries], links)
+        self.assertEqual(sorted(p.url for p in pages), links[:3])
+        self.assertEqual(pages[0].page.content, b"<html>ok</html>")
+        self.assertEqual(errors[0].url, links[3])
+        self.assertIsInstance(errors[0].exc, requests.HTTPError)
+
+    def test_limit_filter_and_hook(self):
+        links = [f"https://a.vn/{i}.html" for i in range(6)]
+        site = {"https://a.vn/rss": _rss(links), **{u: b"x" for u in links}}
+        seen = []
+
+        def hook(job, entries):
+            seen.append(job.source_id)
+            return entries[1:]       # vd: bỏ URL đã có trong DB
+
+        stats, pages, feeds, _ = self._run(
+            _SiteClient(site), [FeedJob(7, "A", "https://a.vn/rss")], limit=4,
+            entry_filter=lambda e: not e["link"].endswith("2.html"), entries_hook=hook)
+
+        self.assertEqual(seen, [7])
+        self.assertEqual([e["link"] for e in feeds[0].entries], [links[1], links[3]])
+        self.assertEqual(sorted(p.url for p in pages), [links[1], links[3]])
+        self.assertEqual(stats.pages, 2)
+
+    def test_feed_error_has_no_entries(self):
+        stats, pages, feeds, _ = self._run(_SiteClient({}), [FeedJob(1, "A", "https://a.vn/rss")])
+        self.assertEqual((stats.feeds, stats.pages), (1, 0))
+        self.assertTrue(feeds[0].error)
+        self.assertEqual(feeds[0].entries, [])
+
+    def test_per_host_limit(self):
+        site = {}
+        jobs = []
+        for host in ("a.vn", "b.vn"):
+            links = [f"https://{host}/{i}.html" for i in range(6)]
+            site[f"https://{host}/rss"] = _rss(links)
+            site.update({u: b"x" for u in links})
+            jobs.append(FeedJob(len(jobs) + 1, host, f"https://{host}/rss"))
+        client = _SiteClient(site, delay=0.02)
+
+        stats, *_ = self._run(client, jobs, concurrency=8, per_host=2)
+
+        self.assertEqual(stats.pages, 12)
+        self.assertEqual(client.peak, {"a.vn": 2, "b.vn": 2})
+
+    def test_consumer_error_stops_engine(self):
+        links = [f"https://a.vn/{i}.html" for i in range(20)]
+        site = {"https://a.vn/rss": _rss(links), **{u: b"x" for u in links}}
+        with mock.patch("crawler.engine.get_client", return_value=_SiteClient(site)):
+            engine = CrawlEngine(concurrency=2)
+
+        def boom(page):
+            raise RuntimeError("db down")
+
+        with self.assertRaises(RuntimeError):
+            engine.run([FeedJob(1, "A", "https://a.vn/rss")], on_page=boom)
+        self.assertTrue(engine._stop.is_set())
+
+
+class _Clock:
+    """Thay `time` trong crawler.http_client: sleep() chỉ cộng giờ, không chờ thật."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _http(status, body=b"", url=""):
+    r = requests.Response()
+    r.status_code, r._content, r.url = status, body, url
+    return r
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch("crawler.http_client.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        b = TokenBucket(rate=2, burst=3)
+        self.assertEqual([b.acquire() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(b.acquire(), 0.5)
+        self.assertAlmostEqual(b.acquire(), 0.5)
+        self.assertAlmostEqual(self.clock.now, 1001.0)
+
+    def test_idle_refill_capped_at_burst(self):
+        b = TokenBucket(rate=1, burst=2)
+        b.acquire(), b.acquire()
+        self.clock.sleep(60)
+        self.assertEqual([b.acquire() for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(b.acquire(), 1.0)
+
+
+class RobotsTests(SimpleTestCase):
+    ROBOTS = b"User-agent: *\nDisallow: /private/\nCrawl-delay: 2\n"
+
+    def _client(self, robots, **kw):
+        client = CrawlerClient(obey_robots=True, rate=10, burst=5, **kw)
+        sent = []
+
+        def send(url, kind, headers, timeout, stream, max_bytes):
+            sent.append(url)
+            if url.endswith("/robots.txt"):
+                if isinstance(robots, Exception):
+                    raise robots
+                return robots
+            return _http(200, b"ok", url)
+
+        client._send = send
+        return client, sent
+
+    def test_disallowed_url_is_not_fetched(self):
+        client, sent = self._client(_http(200, self.ROBOTS))
+        self.assertEqual(client.get("https://a.vn/news/1.html").content, b"ok")
+        with self.assertRaises(RobotsDisallowed):
+            client.get("https://a.vn/private/2.html")
+        self.assertEqual(sent, ["https://a.vn/robots.txt", "https://a.vn/news/1.html"])
+
+    def test_crawl_delay_slows_host(self):
+        client, _ = self._client(_http(200, self.ROBOTS))
+        client.get("https://a.vn/news/1.html")
+        bucket = client._bucket("a.vn")
+        self.assertEqual((bucket.rate, bucket.burst), (0.5, 1))
+        self.assertEqual(client._bucket("b.vn").rate, 10)
+
+    def test_missing_or_unreachable_robots_allows_all(self):
+        for robots in (_http(404), requests.ConnectionError("down")):
+            client, _ = self._client(robots)
+            self.assertTrue(client.allowed("https://a.vn/private/2.html"))
+
+    def test_robots_cached_per_host(self):
+        client, sent = self._client(_http(200, self.ROBOTS))
+        for url in ("https://a.vn/1", "https://a.vn/2", "https://b.vn/1"):
+            client.allowed(url)
+        self.assertEqual(sent, ["https://a.vn/robots.txt", "https://b.vn/robots.txt"])
+
+        client.robots_ttl = 0
+        client.allowed("https://a.vn/3")
+        self.assertEqual(sent[-1], "https://a.vn/robots.txt")
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Trả lần lượt các status trong `server.statuses`, sau đó 200."""
+
+    def do_GET(self):
+        self.server.hits += 1
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(CRAWLER_HTTP_BACKOFF_MAX=0)   # retry ngay, test không phải chờ backoff
+class RetryTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+        self.server.hits, self.server.statuses = 0, []
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/a.html"
+
+    def _get(self, *statuses, retries=2):
+        self.server.statuses = list(statuses)
+        client = CrawlerClient(obey_robots=False, retries=retries)
+        return client, client.get(self.url)
+
+    def test_transient_status_is_retried(self):
+        client, r = self._get(503, 502)
+        self.assertEqual((r.status_code, r.content), (200, b"ok"))
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(client.stats()["127.0.0.1:%d" % self.server.server_port].errors, 0)
+
+    def test_gives_up_after_retries(self):
+        client, r = self._get(503, 503, 503, retries=1)
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(self.server.hits, 2)
+
+    def test_client_error_not_retried(self):
+        _, r = self._get(404)
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(self.server.hits, 1)
+
+
+def _image(w, h, fmt="PNG", mode="RGB"):
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new(mode, (w, h), (200, 30, 30)).save(buf, fmt)
+    return buf.getvalue()
+
+
+class _MediaTestCase(TestCase):
+    """MEDIA_ROOT tạm cho mỗi test."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=tmp.name, MEDIA_MAKE_VARIANTS=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class MediaStoreTests(_MediaTestCase):
+    def test_same_bytes_stored_once(self):
+        data = _image(40, 20)
+        sha, path = media.store_bytes(data, ".png")
+        self.assertEqual(media.store_bytes(data, ".png"), (sha, path))
+        self.assertEqual(path, f"images/{sha[:2]}/{sha[2:4]}/{sha}.png")
+        self.assertEqual(list(media.walk("images")), [path])
+
+        _, other = media.store_bytes(_image(41, 20), ".png")
+        self.assertNotEqual(other, path)
+
+    def test_lookup_maps_urls_to_shared_file(self):
+        sha, path = media.store_bytes(_image(40, 20), ".png")
+        media.record([media.StoredImage(u, sha, path, "image/png", 10)
+                      for u in ("https://a.vn/logo.png", "https://b.vn/logo.png?v=2")])
+        media.record([media.StoredImage("https://c.vn/gone.png", "0" * 64, "images/00/00/gone.png")])
+
+        found = media.lookup(["https://a.vn/logo.png", "https://b.vn/logo.png?v=2",
+                              "https://c.vn/gone.png", "https://d.vn/new.png"])
+        self.assertEqual(found, {"https://a.vn/logo.png": media.media_url(path),
+                                 "https://b.vn/logo.png?v=2": media.media_url(path)})
+
+    def test_record_updates_existing_url(self):
+        url = "https://a.vn/x.png"
+        media.record([media.StoredImage(url, "a" * 64, "images/aa/aa/old.png")])
+        media.record([media.StoredImage(url, "b" * 64, "images/bb/bb/new.png", width=4, height=2)])
+        asset = MediaAsset.objects.get(source_url=url)
+        self.assertEqual((asset.path, asset.width, asset.height), ("images/bb/bb/new.png", 4, 2))
+
+    def test_mirror_skips_known_urls(self):
+        from crawler import utils
+
+        known, new = "https://a.vn/known.png", "https://a.vn/new.png"
+        sha, path = media.store_bytes(_image(40, 20), ".png")
+        media.record([media.StoredImage(known, sha, path)])
+        fetched = media.StoredImage(new, *media.store_bytes(_image(50, 20), ".png"))
+
+        with mock.patch.object(utils, "_download_many", return_value={new: fetched}) as download:
+            mirrored = utils._mirror_images([known, new])
+
+        self.assertEqual(download.call_args.args[0], [new])
+        self.assertEqual(mirrored, {known: media.media_url(path), new: fetched.url})
+        self.assertTrue(MediaAsset.objects.filter(source_url=new, sha256=fetched.sha256).exists())
+
+
+class ImageVariantTests(_MediaTestCase):
+    def _store(self, data, ext=".png"):
+        return media.store_bytes(data, ext)[1]
+
+    def test_widths_and_formats(self):
+        path = self._store(_image(800, 400))
+        rows = media.make_variants(path)
+
+        self.assertEqual(rows[0], dict(original=path, path=path, format="original", width=800, height=400))
+        got = {(r["format"], r["width"], r["height"]) for r in rows[1:]}
+        self.assertEqual(got, {(f, w, w // 2) for f in ("webp", "jpeg") for w in (320, 640, 800)})
+        for r in rows:
+            self.assertTrue(default_storage.exists(r["path"]))
+        self.assertIn(media.variant_path(path, 320, ".webp"), [r["path"] for r in rows])
+
+    def test_large_image_capped_at_widest_variant(self):
+        rows = media.make_variants(self._store(_image(1200, 600)))
+        self.assertEqual(sorted({r["width"] for r in rows if r["format"] == "jpeg"}), [320, 640, 960])
+
+    def test_small_transparent_image_recompressed_once(self):
+        rows = media.make_variants(self._store(_image(100, 50, mode="RGBA")))
+        self.assertEqual(sorted((r["format"], r["width"]) for r in rows),
+                         [("jpeg", 100), ("original", 100), ("webp", 100)])
+
+    def test_skipped_inputs(self):
+        svg = self._store(b'<svg xmlns="http://www.w3.org/2000/svg"/>', ".svg")
+        variant = media.variant_path(self._store(_image(400, 200)), 320, ".jpg")
+        broken = self._store(b"not an image", ".jpg")
+        for path in (svg, variant, broken, "images/no/such.png"):
+            self.assertEqual(media.make_variants(path), [], path)
+
+    def test_saved_variants_give_srcset(self):
+        from articles.images import attach_card_images, responsive_images
+
+        done, todo = self._store(_image(800, 400)), self._store(_image(500, 250))
+        media.save_variants(media.make_variants(done))
+        media.save_variants(media.make_variants(done))     # chạy lại: upsert, không lỗi unique
+        self.assertEqual(media.missing_variants([done, todo, todo]), [todo])
+
+        img = responsive_images([done, todo])[done]
+        self.assertEqual(list(responsive_images([done, todo])), [done])
+        self.assertEqual((img.src, img.width, img.height),
+                         (media.media_url(media.variant_path(done, 800, ".jpg")), 800, 400))
+        self.assertEqual(img.webp_srcset, ", ".join(
+            f"{media.media_url(media.variant_path(done, w, '.webp'))} {w}w" for w in (320, 640, 800)))
+
+        a = Article(pk=1, main_image_url=media.media_url(done))
+        b = Article(pk=2, main_image_url="https://a.vn/x.jpg")
+        attach_card_images([a, b])
+        self.assertEqual(a.card_image.srcset, img.srcset)
+        self.assertIsNone(b.card_image)
+
+
+def _chunks(data, size=1000):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def _stream(body, headers=None, url="https://a.vn/x.jpg"):
+    r = requests.Response()
+    r.status_code, r.url, r.raw = 200, url, io.BytesIO(body)
+    r.headers.update(headers or {})
+    return r
+
+
+class StoreStreamTests(_MediaTestCase):
+    def test_format_and_size_from_bytes(self):
+        img = media.store_stream(_chunks(_image(300, 200, "JPEG")), "https://a.vn/photo.png")
+        self.assertEqual((img.content_type, img.width, img.height), ("image/jpeg", 300, 200))
+        self.assertTrue(img.path.endswith(".jpg"))
+        self.assertTrue(default_storage.exists(img.path))
+
+        again = media.store_stream(_chunks(_image(300, 200, "JPEG"), 7), "https://b.vn/p.jpg")
+        self.assertEqual((again.path, again.size), (img.path, img.size))
+
+    def test_sniff_format(self):
+        cases = {
+            "GIF": _image(4, 4, "GIF"), "WEBP": _image(4, 4, "WEBP"), "PNG": _image(4, 4),
+            "SVG": b'\xef\xbb\xbf<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg"/>',
+            None: b"<!doctype html><html>",
+        }
+        for fmt, head in cases.items():
+            self.assertEqual(media.sniff_format(head), fmt)
+
+    def test_rejected_streams_leave_no_file(self):
+        big = _image(300, 200, "JPEG")
+        cases = [
+            (dict(chunks=_chunks(b"<html><body>404 not found</body></html>")), "không phải ảnh"),
+            (dict(chunks=_chunks(big), max_bytes=len(big) - 1), "bytes"),
+            (dict(chunks=_chunks(big), deadline=time.monotonic() - 1), "quá hạn"),
+        ]
+        for kwargs, message in cases:
+            with self.assertRaisesMessage(media.ImageRejected, message):
+                media.store_stream(**kwargs)
+        with mock.patch.object(media, "MAX_IMAGE_PIXELS", 300 * 199):
+            with self.assertRaisesMessage(media.ImageRejected, "300x200"):
+                media.store_stream(_chunks(big))
+        self.assertFalse(default_storage.exists("images"))
+
+    def test_oversized_stream_stops_reading(self):
+        pulled = []
+
+        def endless():
+            head = _image(10, 10)
+            while True:
+                pulled.append(1)
+                yield head
+
+        with self.assertRaises(media.ImageRejected):
+            media.store_stream(endless(), max_bytes=len(_image(10, 10)) * 3)
+        self.assertEqual(len(pulled), 4)
+
+    def test_read_capped(self):
+        self.assertEqual(read_capped(_stream(b"x" * 100), 100), b"x" * 100)
+        with self.assertRaises(ResponseTooLarge):
+            read_capped(_stream(b"x" * 101), 100, chunk_size=10)
+        with self.assertRaisesMessage(ResponseTooLarge, "Content-Length"):
+            read_capped(_stream(b"", {"Content-Length": "5000"}), 100)
+
+    def test_download_skips_non_images(self):
+        from crawler import utils
+
+        client = mock.Mock()
+        client.get.side_effect = [
+            _stream(_image(20, 10), {"Content-Type": "image/png"}),
+            _stream(b"<html></html>", {"Content-Type": "text/html; charset=utf-8"}),
+            _stream(b"", {"Content-Type": "image/jpeg", "Content-Length": str(media.MAX_IMAGE_BYTES + 1)}),
+            _stream(b"Access denied for hotlinked images", {"Content-Type": "image/jpeg"}),
+        ]
+        errors = {}
+        with mock.patch.object(utils, "get_client", return_value=client):
+            got = [utils._download_to_media(f"https://a.vn/{i}.jpg", errors=errors) for i in range(4)]
+
+        self.assertEqual((got[0].width, got[0].height, got[0].content_type), (20, 10, "image/png"))
+        self.assertEqual(got[1:], [None, None, None])
+        self.assertEqual(list(errors), ["https://a.vn/3.jpg"])    # Content-Type nói là ảnh, bytes thì không
+        self.assertIsInstance(errors["https://a.vn/3.jpg"], media.ImageRejected)
+        self.assertEqual(client.record_bytes.call_args_list[0].args, ("https://a.vn/0.jpg", got[0].size))
+
+
+NO_JITTER = mock.Mock(uniform=lambda a, b: 0.0)
+
+
+def _entries(now, hours_ago):
+    return [{"published_parsed": (now - timedelta(hours=h)).utctimetuple()} for h in hours_ago]
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+
+    def _times(self, hours_ago):
+        return scheduler.entry_times(_entries(self.now, hours_ago), self.now)
+
+    def test_entry_times(self):
+        entries = _entries(self.now, [1, -0.1, -5]) + [{"title": "không có giờ"}]
+        self.assertEqual(scheduler.entry_times(entries, self.now),
+                         [self.now - timedelta(hours=1), self.now])    # lệch vài phút: kẹp về now
+
+    def test_observed_rate(self):
+        # feed dài hơn cửa sổ 24h: đếm trên cả cửa sổ
+        self.assertAlmostEqual(scheduler.observed_rate(self._times(range(0, 48, 2)), self.now), 13 / 24)
+        # feed bị cắt sau 6 bài: chỉ tính từ bài cũ nhất
+        self.assertAlmostEqual(scheduler.observed_rate(self._times(range(6)), self.now), 6 / 5)
+        # feed im lặng 2 ngày
+        self.assertAlmostEqual(scheduler.observed_rate(self._times([48, 60]), self.now), 1 / 48)
+        self.assertIsNone(scheduler.observed_rate([], self.now))
+
+    def test_interval_clamped(self):
+        self.assertEqual(scheduler.interval_for(0), scheduler.MAX_INTERVAL)
+        self.assertEqual(scheduler.interval_for(0.01), scheduler.MAX_INTERVAL)
+        self.assertEqual(scheduler.interval_for(1000), scheduler.MIN_INTERVAL)
+        self.assertEqual(scheduler.interval_for(2), 1800)
+
+    def test_plan_learns_rate(self):
+        poll = feeds.FeedPoll(feeds.FETCHED, entries=_entries(self.now, range(6)))
+        fields = scheduler.plan(scheduler.PollState(), poll, self.now, NO_JITTER)
+        self.assertEqual(fields, {"poll_interval": 3000, "publish_rate": 1.2, "poll_failures": 0,
+                                  "last_entry_at": self.now,
+                                  "next_poll_at": self.now + timedelta(seconds=3000)})
+
+        state = scheduler.PollState(poll_interval=3000, publish_rate=0.2, poll_failures=3)
+        fields = scheduler.plan(state, poll, self.now, NO_JITTER)
+        self.assertEqual((fields["publish_rate"], fields["poll_failures"]), (0.7, 0))   # EWMA
+
+    def test_plan_unchanged_feed_only_slows_down(self):
+        last = self.now - timedelta(hours=10)
+        poll = feeds.FeedPoll(feeds.NOT_MODIFIED)
+        fields = scheduler.plan(scheduler.PollState(600, 1.0, 0, last), poll, self.now, NO_JITTER)
+        self.assertEqual((fields["publish_rate"], fields["last_entry_at"]), (0.55, last))
+        self.assertGreater(fields["poll_interval"], 600)
+
+        fields = scheduler.plan(scheduler.PollState(7200, 0.05, 0, last), poll, self.now, NO_JITTER)
+        self.assertEqual(fields["publish_rate"], 0.05)
+
+    def test_plan_error_backs_off(self):
+        poll = feeds.FeedPoll(feeds.ERROR, error="503")
+        fields = scheduler.plan(scheduler.PollState(600, 1.0, 1), poll, self.now, NO_JITTER)
+        self.assertEqual(fields, {"poll_failures": 2, "next_poll_at": self.now + timedelta(seconds=2400)})
+
+        fields = scheduler.plan(scheduler.PollState(600, 1.0, 20), poll, self.now, NO_JITTER)
+        self.assertEqual(fields["next_poll_at"], self.now + timedelta(seconds=scheduler.BACKOFF_MAX))
+
+    def test_jitter_bounds(self):
+        rng = random.Random(1)
+        poll = feeds.FeedPoll(feeds.FETCHED, entries=_entries(self.now, range(6)))
+        for _ in range(50):
+            wait = (scheduler.plan(scheduler.PollState(), poll, self.now, rng)["next_poll_at"] - self.now)
+            self.assertLessEqual(abs(wait.total_seconds() - 3000), 3000 * scheduler.JITTER)
+
+    def test_due_sources_leases(self):
+        past, future = self.now - timedelta(minutes=1), self.now + timedelta(hours=1)
+        due = Source.objects.create(name="due", rss_url="https://a.vn/rss", next_poll_at=past)
+        new = Source.objects.create(name="new", rss_url="https://b.vn/rss")
+        Source.objects.create(name="later", rss_url="https://c.vn/rss", next_poll_at=future)
+        Source.objects.create(name="off", rss_url="https://d.vn/rss", next_poll_at=past, is_active=False)
+        Source.objects.create(name="no rss", rss_url="", next_poll_at=past)
+
+        self.assertEqual(sorted(scheduler.due_sources(self.now)), sorted([due.id, new.id]))
+        self.assertEqual(scheduler.due_sources(self.now), [])
+        due.refresh_from_db()
+        self.assertEqual(due.next_poll_at, self.now + timedelta(seconds=scheduler.LEASE))
+        self.assertEqual(scheduler.due_sources(self.now, limit=1), [])
+        later = self.now + timedelta(seconds=scheduler.LEASE)
+        self.assertEqual(len(scheduler.due_sources(later, limit=1)), 1)
+
+    def test_save_to_writes_schedule(self):
+        src = Source.objects.create(name="E", rss_url="https://e.vn/rss", poll_failures=2)
+        feeds.FeedPoll(feeds.FETCHED, entries=_entries(timezone.now(), range(6))).save_to(src.id)
+        src.refresh_from_db()
+        self.assertEqual(src.poll_failures, 0)
+        self.assertAlmostEqual(src.publish_rate, 1.2, places=3)     # timestamp entry bỏ phần micro giây
+        self.assertGreater(src.next_poll_at, timezone.now())
+
+
+class RawArchiveTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.archive = raw_archive.RawArchive(self.root)
+        self.addCleanup(self.archive.close)
+
+    def _page(self, url, html):
+        return FetchedPage(url=url + "?utm=x", content=html.encode("utf-8"), final_url=url, encoding="utf-8")
+
+    def test_round_trip(self):
+        html = "<html><body><p>Tiếng Việt có dấu</p></body></html>" * 50
+        rec = self.archive.store("https://a.vn/1.html", self._page("https://a.vn/1.html", html))
+        self.assertLess(rec.length, rec.size)
+
+        meta, body = self.archive.read(rec.segment, rec.offset, rec.length)
+        self.assertEqual(body.decode("utf-8"), html)
+        self.assertEqual((meta["url"], meta["fetched_url"], meta["size"]),
+                         ("https://a.vn/1.html", "https://a.vn/1.html?utm=x", rec.size))
+        with self.assertRaises(ValueError):
+            raw_archive.unpack(b"XXXX" + bytes(20))
+
+    def test_segments_roll_over_and_scan_skips_torn_tail(self):
+        small = raw_archive.RawArchive(self.root, segment_bytes=1)
+        recs = [small.store(f"https://a.vn/{i}.html", self._page(f"https://a.vn/{i}.html", f"<p>{i}</p>"))
+                for i in range(3)]
+        small.close()
+        self.assertEqual(len({r.segment for r in recs}), 3)
+        with open(self.root / recs[-1].segment, "ab") as f:
+            f.write(raw_archive.MAGIC + b"\x00\x10")      # process chết giữa lúc ghi
+
+        scanned = list(self.archive.scan())
+        self.assertEqual([(seg, off, length) for seg, off, length, _ in scanned],
+                         [(r.segment, r.offset, r.length) for r in recs])
+        self.assertEqual([m["url"] for *_, m in scanned], [r.url for r in recs])
+
+    def test_flush_points_index_at_latest_copy(self):
+        url = "https://a.vn/1.html"
+        article = Article.objects.create(title="A", slug="a", source_url=url)
+        self.archive.store(url, self._page(url, "<p>cũ</p>"))
+        self.archive.flush()
+        latest = self.archive.store(url, self._page(url, "<p>mới</p>"))
+        self.archive.store("https://a.vn/2.html", self._page("https://a.vn/2.html", "<p>2</p>"))
+        self.assertEqual(self.archive.flush(), 2)
+
+        row = RawPage.objects.get(url=url)
+        self.assertEqual((row.article_id, row.offset, row.codec), (article.id, latest.offset, "zlib"))
+        self.assertEqual(self.archive.read(row.segment, row.offset, row.length)[1], "<p>mới</p>".encode())
+        self.assertIsNone(RawPage.objects.get(url="https://a.vn/2.html").article_id)
+
+    def test_reindex_rebuilds_lost_index(self):
+        from crawler.management.commands.reextract import Command
+
+        for html in ("<p>1</p>", "<p>2</p>"):
+            rec = self.archive.store("https://a.vn/1.html", self._page("https://a.vn/1.html", html))
+        self.archive._pending.clear()     # process chết trước flush
+
+        self.assertEqual(Command._reindex(self.archive), 1)
+        row = RawPage.objects.get()
+        self.assertEqual((row.segment, row.offset, row.length, row.size), (rec.segment, rec.offset, rec.length, 8))
+
+    def test_reextract_updates_changed_articles(self):
+        from crawler.management.commands.reextract import Command, _extract
+
+        page = corpus.synthetic_page(1, images=0)
+        url = page.url
+        article = Article.objects.create(title="A", slug="a", source_url=url, content_html="<p>cũ</p>")
+        rec = self.archive.store(url, FetchedPage(url=url, content=page.content, final_url=url))
+
+        aid, fields, size = _extract((article.id, str(self.root / rec.segment), rec.offset, rec.length,
+                                      corpus.SYNTHETIC_PROFILE, False))
+        self.assertEqual((aid, size), (article.id, len(page.content)))
+        self.assertIn("<p", fields["content_html"])
+
+        self.assertEqual(Command._write([(aid, fields)], dry_run=True), 1)
+        self.assertEqual(Article.objects.get().content_html, "<p>cũ</p>")
+        self.assertEqual(Command._write([(aid, fields)], dry_run=False), 1)
+        article.refresh_from_db()
+        self.assertEqual(article.content_html, fields["content_html"])
+        self.assertTrue(article.body_html)
+        self.assertEqual(Command._write([(aid, fields)], dry_run=False), 0)    # không đổi: không ghi
+
+        self.assertIsNone(_extract((aid, str(self.root / "missing.seg"), 0, 10, None, False))[1])
+
+
+class CrawlPipelineTests(TransactionTestCase):
+    """Các stage chạy ở thread/process riêng, mỗi thread 1 connection -> cần dữ liệu đã commit."""
+
+    def setUp(self):
+        pages = [corpus.synthetic_page(i, paragraphs=10, images=0) for i in range(4)]
+        self.pages = {p.url: p for p in pages}
+        links = [p.url for p in pages] + ["https://vnexpress.net/mat-tich.html"]
+        self.site = {"https://vnexpress.net/rss": _rss(links), **{p.url: p.content for p in pages}}
+        self.job = FeedJob(1, "VE", "https://vnexpress.net/rss", extract_profile=corpus.SYNTHETIC_PROFILE)
+        client = _SiteClient(self.site)
+        for target in ("crawler.pipeline.get_client", "crawler.utils.get_client"):
+            patcher = mock.patch(target, return_value=client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _pipeline(self, **kw):
+        return CrawlPipeline(feed_workers=1, fetch_workers=3, extract_workers=2, image_workers=2,
+                             queue_size=2, **kw)
+
+    def test_pages_flow_through_all_stages(self):
+        articles, feeds_, errors = [], [], []
+        stats = self._pipeline().run([self.job], on_article=articles.append, on_feed=feeds_.append,
+                                     on_error=errors.append)
+
+        self.assertEqual((stats.feeds, stats.pages, stats.failed), (1, 4, 1))
+        self.assertEqual(len(feeds_[0].entries), 5)
+        self.assertEqual(errors[0].url, "https://vnexpress.net/mat-tich.html")
+        self.assertEqual(sorted(a.url for a in articles), sorted(self.pages))
+        self.assertEqual([st.name for st in stats.stages], ["discovery", "fetch", "extract", "images", "persist"])
+        self.assertEqual([st.items for st in stats.stages], [1, 5, 4, 4, 6])
+
+    def test_matches_in_process_extraction(self):
+        from crawler import profiles
+        from crawler.tasks import _extract_document
+
+        articles = []
+        self._pipeline().run([self.job], on_article=articles.append)
+        self.assertEqual(len(articles), len(self.pages))
+        profile = profiles.compile_profile(corpus.SYNTHETIC_PROFILE)
+        for a in articles:
+            page = self.pages[a.url]
+            expected = _extract_document(ParsedDocument(FetchedPage(url=page.url, content=page.content),
+                                                        profile=profile), None)
+            self.assertEqual(
+                (a.item.title, a.item.content_html, a.item.blocks, a.item.excerpt, a.item.signature),
+                (expected.title, expected.content_html, expected.blocks, expected.excerpt, expected.signature))
+
+    def test_limit_and_hook(self):
+        seen = []
+
+        def hook(job, entries):
+            seen.append(len(entries))
+            return entries[:1]
+
+        articles = []
+        stats = self._pipeline(limit=3, entry_filter=lambda e: "mat-tich" not in e["link"],
+                               entries_hook=hook).run([self.job], on_article=articles.append)
+        self.assertEqual(seen, [3])
+        self.assertEqual((stats.pages, stats.failed), (1, 0))
+
+    def test_consumer_error_drains_stages(self):
+        def boom(article):
+            raise RuntimeError("db down")
+
+        pipeline = self._pipeline()
+        with self.assertRaisesMessage(RuntimeError, "db down"):
+            pipeline.run([self.job], on_article=boom)
+        self.assertFalse([th for th in threading.enumerate() if th.name.startswith("crawl-")])
@@ -1,15 +1,35 @@
 # sources/admin.py
 from django.contrib import admin
+from django.utils import timezone
 from .models import Category, Source
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ("name", "parent", "slug")
-    search_fields = ("name", "slug")
+    list_display = ("name", "parent", "slug", "keywords")
+    search_fields = ("name", "slug", "keywords")
     list_filter = ("parent",)
 
 @admin.register(Source)
 class SourceAdmin(admin.ModelAdmin):
-    list_display = ("name", "is_active", "rss_url", "last_crawled_at")
+    list_display = ("name", "is_active", "rss_url", "has_profile", "last_crawled_at",
+                    "poll_every", "publish_rate", "poll_failures", "next_poll_at")
     list_filter = ("is_active",)
     search_fields = ("name", "rss_url")
+    readonly_fields = ("poll_interval", "publish_rate", "poll_failures", "last_entry_at")
+    actions = ["poll_soon"]
+
+    @admin.display(boolean=True, description="Extract profile")
+    def has_profile(self, obj):
+        return bool(obj.extract_profile)
+
+    @admin.display(description="Poll mỗi", ordering="poll_interval")
+    def poll_every(self, obj):
+        if not obj.poll_interval:
+            return "-"
+        minutes = obj.poll_interval // 60
+        return f"{minutes // 60}h{minutes % 60:02d}" if minutes >= 60 else f"{minutes} phút"
+
+    @admin.action(description="Poll ở tick beat kế tiếp")
+    def poll_soon(self, request, queryset):
+        n = queryset.update(next_poll_at=timezone.now())
+        self.message_user(request, f"Đã xếp {n} nguồn vào tick kế tiếp.")
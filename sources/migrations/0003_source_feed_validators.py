@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sources", "0002_source_alter_category_slug"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="source",
+            name="feed_bytes",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="feed_etag",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="feed_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="feed_last_modified",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:40
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+# Bộ từ khoá trước đây hard-code trong crawler.tasks._pick_category
+DEFAULT_KEYWORDS = {
+    "Thể thao": "bóng đá, thể thao, world cup, v-league",
+    "Kinh tế": "kinh tế, tài chính, chứng khoán, doanh nghiệp, giá xăng",
+    "Giáo dục": "giáo dục, học sinh, thi tốt nghiệp, đại học",
+    "Công nghệ": "công nghệ, ai, trí tuệ nhân tạo, iphone, android, mạng xã hội",
+    "Thời sự": "chính phủ, quốc hội, bộ trưởng, thời sự",
+    "Sức khỏe": "sức khỏe, bệnh, dịch, vaccine, y tế",
+    "Giải trí": "giải trí, showbiz, ca sĩ, phim, nghệ sĩ",
+    "Du lịch": "du lịch, resort, khách sạn, travel",
+}
+
+
+def seed_keywords(apps, schema_editor):
+    Category = apps.get_model("sources", "Category")
+    for name, keywords in DEFAULT_KEYWORDS.items():
+        cat, _ = Category.objects.get_or_create(name=name, defaults={"slug": slugify(name)})
+        if not cat.keywords:
+            cat.keywords = keywords
+            cat.save(update_fields=["keywords"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sources", "0003_source_feed_validators"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="keywords",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.RunPython(seed_keywords, migrations.RunPython.noop),
+    ]
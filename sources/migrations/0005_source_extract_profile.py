@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sources", "0004_category_keywords"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="source",
+            name="extract_profile",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sources", "0005_source_extract_profile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="source",
+            name="last_entry_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="next_poll_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="poll_failures",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="poll_interval",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="publish_rate",
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -1,4 +1,5 @@
 # sources/models.py
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.text import slugify
 
@@ -10,6 +11,11 @@ class Category(models.Model):
         'self', null=True, blank=True, related_name='children', on_delete=models.CASCADE
     )
     description = models.TextField(blank=True, default='')
+    # Từ khoá để crawler tự gắn category (crawler/classifier.py): mỗi dòng hoặc cách nhau dấu phẩy,
+    # so khớp không dấu trên tiêu đề + mô tả
+    keywords = models.TextField(blank=True, default='')
+    # Mọi process crawler so (số category, updated_at lớn nhất) để biết luật từ khoá đã đổi
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["parent__id", "name"]
@@ -33,8 +39,32 @@ class Source(models.Model):
     source_score = models.FloatField(default=1.0)
     last_crawled_at = models.DateTimeField(blank=True, null=True)
 
+    # Conditional GET cho RSS: lưu validator của lần tải trước
+    feed_etag = models.CharField(max_length=255, blank=True, default="")
+    feed_last_modified = models.CharField(max_length=64, blank=True, default="")
+    feed_hash = models.CharField(max_length=64, blank=True, default="")  # sha256 body
+    feed_bytes = models.PositiveIntegerField(default=0)  # kích thước body lần gần nhất
+
+    # Selector trích xuất riêng cho layout của báo (crawler/profiles.py); trống = readability/trafilatura
+    extract_profile = models.JSONField(blank=True, default=dict)
+
+    # Lịch poll thích nghi (crawler/scheduler.py): học từ timestamp entry của feed
+    poll_interval = models.PositiveIntegerField(default=0)  # giây, 0 = chưa học (dùng CRAWLER_POLL_MAX)
+    next_poll_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    publish_rate = models.FloatField(default=0.0)  # bài/giờ (EWMA)
+    poll_failures = models.PositiveSmallIntegerField(default=0)  # số lần lỗi liên tiếp -> backoff
+    last_entry_at = models.DateTimeField(blank=True, null=True)  # entry mới nhất từng thấy
+
     class Meta:
         ordering = ["name"]
 
     def __str__(self):
         return self.name
+
+    def clean(self):
+        from crawler.profiles import ProfileError, compile_profile
+
+        try:
+            compile_profile(self.extract_profile)
+        except ProfileError as e:
+            raise ValidationError({"extract_profile": str(e)})
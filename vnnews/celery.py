@@ -1,7 +1,6 @@
 # vnnews/celery.py
 import os
 from celery import Celery
-from celery.schedules import crontab
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "vnnews.settings")
 
@@ -9,11 +8,12 @@ app = Celery("vnnews")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
-# chạy mỗi 2 tiếng, phút 0
+# tick rẻ mỗi CRAWLER_POLL_TICK giây: chỉ phát task cho nguồn tới hạn (lịch riêng từng nguồn,
+# xem crawler/scheduler.py); schedule_all_sources vẫn còn để poll tất cả bằng tay
 app.conf.beat_schedule = {
-    "crawl-every-2h": {
-        "task": "crawler.tasks.schedule_all_sources",  # <- đã có trong crawler/tasks.py
-        "schedule": crontab(minute=0, hour="*/2"),
+    "poll-due-sources": {
+        "task": "crawler.tasks.dispatch_due_sources",
+        "schedule": float(os.getenv("CRAWLER_POLL_TICK", "60")),
     },
 }
 
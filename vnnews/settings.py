@@ -131,6 +131,12 @@ CACHES = {
         "LOCATION": "vnnews-locmem",
     }
 }
+# Cache dùng chung giữa các worker Celery (khoá idempotency của crawler), vd redis://localhost:6379/2
+if os.getenv("CRAWLER_CACHE_URL"):
+    CACHES["crawler"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CRAWLER_CACHE_URL"),
+    }
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 7  # 7 ngày
 SESSION_SAVE_EVERY_REQUEST = True
 
@@ -146,6 +152,113 @@ CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:63
 CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_ALWAYS_EAGER", "0") == "1"
 CELERY_TASK_EAGER_PROPAGATES = True
 
+# Hàng đợi riêng: poll feed nhanh không phải xếp sau bài/ảnh chậm. Worker theo hàng đợi:
+#   celery -A vnnews worker -Q feeds -c 2
+#   celery -A vnnews worker -Q articles -c 8
+#   celery -A vnnews worker -Q media -c 2
+CELERY_TASK_ROUTES = {
+    "crawler.tasks.dispatch_due_sources": {"queue": "feeds"},
+    "crawler.tasks.schedule_all_sources": {"queue": "feeds"},
+    "crawler.tasks.task_fetch_feed": {"queue": "feeds"},
+    "crawler.tasks.task_save_feed_validators": {"queue": "feeds"},
+    "crawler.tasks.task_fetch_article": {"queue": "articles"},
+    "crawler.tasks.task_fetch_articles": {"queue": "articles"},
+    "crawler.tasks.task_make_image_variants": {"queue": "media"},
+}
+# Giới hạn tốc độ theo hàng đợi (message/worker, cú pháp rate_limit của Celery; "" = không giới hạn),
+# áp lên mọi task được route vào hàng đợi đó
+CRAWLER_QUEUE_RATE_LIMITS = {"feeds": "", "articles": "30/m", "media": "60/m"}
+CELERY_TASK_ANNOTATIONS = {
+    task: {"rate_limit": CRAWLER_QUEUE_RATE_LIMITS[route["queue"]]}
+    for task, route in CELERY_TASK_ROUTES.items()
+    if CRAWLER_QUEUE_RATE_LIMITS.get(route["queue"])
+}
+# task_fetch_feed gửi N URL / message task_fetch_articles (ít message broker hơn)
+CRAWLER_ARTICLE_CHUNK = int(os.getenv("CRAWLER_ARTICLE_CHUNK", "10"))
+# Khoá idempotency "URL đang trong hàng đợi" (cache.add); nhiều worker cần cache dùng chung (Redis)
+CRAWLER_TASK_CACHE = "crawler" if os.getenv("CRAWLER_CACHE_URL") else "default"
+CRAWLER_INFLIGHT_TTL = 30 * 60  # giây: khoá tự hết hạn nếu worker chết giữa lô
+
+# -------------------------------------------------
+# Crawler
+# -------------------------------------------------
+# Bloom filter các URL đã crawl (rỗng = tắt, chỉ lọc bằng 1 query source_url__in mỗi feed)
+CRAWLER_BLOOM_PATH = os.getenv("CRAWLER_BLOOM_PATH", "")
+CRAWLER_BLOOM_CAPACITY = int(os.getenv("CRAWLER_BLOOM_CAPACITY", "1000000"))
+# Bài đã có nhưng đăng trong N giờ gần đây vẫn được tải lại (0 = không tải lại)
+CRAWLER_REVISIT_HOURS = int(os.getenv("CRAWLER_REVISIT_HOURS", "0"))
+
+# Tin gần trùng (MinHash LSH): Jaccard ước lượng >= ngưỡng, trong N ngày; tin phát lại dùng ảnh bài gốc
+CRAWLER_NEARDUP_THRESHOLD = 0.6
+CRAWLER_NEARDUP_DAYS = 7
+CRAWLER_NEARDUP_MIN_TOKENS = 40
+CRAWLER_NEARDUP_SKIP_IMAGES = True
+
+# Lịch poll RSS thích nghi (crawler/scheduler.py); beat chạy dispatch_due_sources mỗi TICK giây
+CRAWLER_POLL_TICK = int(os.getenv("CRAWLER_POLL_TICK", "60"))
+CRAWLER_POLL_MIN = int(os.getenv("CRAWLER_POLL_MIN", str(5 * 60)))      # khoảng poll ngắn nhất (giây)
+CRAWLER_POLL_MAX = int(os.getenv("CRAWLER_POLL_MAX", str(2 * 3600)))    # dài nhất (nguồn ít bài / chưa học)
+CRAWLER_POLL_BACKOFF_MAX = 24 * 3600   # trần lùi lịch khi feed lỗi liên tiếp
+CRAWLER_POLL_JITTER = 0.1              # ±10% để các feed không dồn vào cùng 1 tick
+CRAWLER_POLL_TARGET_ITEMS = 1.0        # số bài mới mong đợi mỗi lần poll
+CRAWLER_POLL_RATE_WINDOW = 24          # giờ: cửa sổ đếm entry để ước lượng tốc độ đăng
+CRAWLER_POLL_LEASE = 15 * 60           # giây "giữ chỗ" nguồn đã phát task, tránh phát trùng
+
+# crawl_now / crawl_recent --sync: ghi DB theo lô N bài (bulk upsert, 1 transaction/lô)
+CRAWLER_PERSIST_BATCH = int(os.getenv("CRAWLER_PERSIST_BATCH", "50"))
+
+# bench_extract: thư mục corpus HTML đã ghi (mỗi phiên bản 1 thư mục con, tạo bằng --record N)
+CRAWLER_BENCH_CORPUS = os.getenv("CRAWLER_BENCH_CORPUS", str(BASE_DIR / "benchdata" / "extract-corpus"))
+
+# Host phụ -> host chính khi chuẩn hoá URL bài (ngoài luật chung m./mobile./amp.)
+CRAWLER_HOST_ALIASES = {}
+
+# HTTP client dùng chung (crawler/http_client.py)
+CRAWLER_CONNECT_TIMEOUT = 5
+CRAWLER_READ_TIMEOUT = 20
+CRAWLER_HTTP_RETRIES = 2
+CRAWLER_POOL_MAXSIZE = 32          # connection keep-alive tối đa mỗi host
+CRAWLER_HOST_RATE = float(os.getenv("CRAWLER_HOST_RATE", "4"))  # request/giây mỗi domain
+CRAWLER_HOST_BURST = 8
+CRAWLER_OBEY_ROBOTS = os.getenv("CRAWLER_OBEY_ROBOTS", "1") == "1"
+CRAWLER_ROBOTS_TTL = 3600          # giây
+CRAWLER_MAX_PAGE_BYTES = 5 * 1024 * 1024    # trần body feed/trang bài
+CRAWLER_MAX_IMAGE_BYTES = 10 * 1024 * 1024  # trần mỗi ảnh (tải dạng stream)
+CRAWLER_MAX_IMAGE_PIXELS = 40_000_000
+CRAWLER_HTTP_BACKOFF_JITTER = 0.5  # giây ngẫu nhiên cộng vào mỗi lần retry (urllib3)
+CRAWLER_HTTP_BACKOFF_MAX = 10
+# Circuit breaker theo host (crawler/breaker.py): ngắt sau N lỗi liên tiếp, nghỉ COOLDOWN giây
+# (nhân đôi mỗi lần thăm dò thất bại, trần MAX_COOLDOWN) rồi cho 1 request thăm dò
+CRAWLER_BREAKER_FAILURES = 5
+CRAWLER_BREAKER_COOLDOWN = 60
+CRAWLER_BREAKER_MAX_COOLDOWN = 30 * 60
+# Dead-letter URL lỗi (crawler/deadletter.py): thử lại sau BASE × 2^(lần-1) giây, trần MAX, quá ATTEMPTS lần -> bỏ
+CRAWLER_RETRY_BASE = 15 * 60
+CRAWLER_RETRY_MAX = 24 * 3600
+CRAWLER_RETRY_ATTEMPTS = 5
+CRAWLER_RETRY_BATCH = 200          # beat (dispatch_due_sources) xếp lại tối đa N URL tới hạn mỗi tick
+# Ghi / phát lại response (crawler/http_archive.py): "" | "record" | "replay"
+CRAWLER_HTTP_MODE = os.getenv("CRAWLER_HTTP_MODE", "")
+CRAWLER_HTTP_ARCHIVE = os.getenv("CRAWLER_HTTP_ARCHIVE", "")
+CRAWLER_REPLAY_LATENCY = float(os.getenv("CRAWLER_REPLAY_LATENCY", "0"))   # giây mỗi request
+CRAWLER_REPLAY_BANDWIDTH = int(os.getenv("CRAWLER_REPLAY_BANDWIDTH", "0"))  # byte/giây, 0 = không giới hạn
+# Kho HTML gốc trang bài (crawler/raw_archive.py) cho `manage.py reextract`; "" = tắt.
+# Nén zstd nếu có gói `zstandard`, không thì zlib.
+CRAWLER_RAW_ARCHIVE = os.getenv("CRAWLER_RAW_ARCHIVE", str(BASE_DIR / "rawdata" / "html"))
+CRAWLER_RAW_SEGMENT_BYTES = 256 * 1024 * 1024
+CRAWLER_RAW_ZSTD_LEVEL = 10
+
+# Mirror ảnh: số luồng tải song song mỗi bài, hạn chót cho cả bài (giây, 0 = không giới hạn)
+CRAWLER_IMAGE_WORKERS = int(os.getenv("CRAWLER_IMAGE_WORKERS", "6"))
+CRAWLER_IMAGE_DEADLINE = int(os.getenv("CRAWLER_IMAGE_DEADLINE", "30"))
+
+# Bản resize ảnh (WebP + JPEG) cho srcset của card
+MEDIA_MAKE_VARIANTS = os.getenv("MEDIA_MAKE_VARIANTS", "1") == "1"
+MEDIA_VARIANT_WIDTHS = (320, 640, 960)
+
+# Tìm kiếm toàn văn (articles/search.py): chỉ xếp hạng N bài khớp mới nhất (từ quá phổ biến), 0 = tất cả
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "20000"))
+
 # -------------------------------------------------
 # Logging (gọn nhẹ, dễ debug)
 # -------------------------------------------------
@@ -6,6 +6,7 @@ from django.core.validators import EmailValidator
 from django.utils import timezone
 
 from articles.models import Article
+from crawler import sanitize
 from sources.models import Category
 
 UserModel = get_user_model()
@@ -21,6 +22,30 @@ def is_phone(s: str) -> bool:
     return bool(PHONE_RE.fullmatch(s or ""))
 
 
+class SanitizedContentMixin:
+    """
+    content_html người dùng nhập đi qua cùng bộ sanitize với bài crawl (crawler.sanitize):
+    allow-list tag/attr, link ảnh -> <img>, bỏ tên file ảnh; blocks tính luôn,
+    excerpt để trống thì lấy đoạn đầu.
+    """
+    _content_excerpt = ""
+
+    def clean_content_html(self):
+        return self._sanitize_content(self.cleaned_data.get("content_html") or "")
+
+    def _sanitize_content(self, html: str) -> str:
+        rendered = sanitize.clean(html).render()
+        self.instance.blocks = rendered.blocks
+        self._content_excerpt = rendered.excerpt
+        return rendered.html
+
+    def clean(self):
+        cleaned = super().clean()
+        if "excerpt" in self.fields and not (cleaned.get("excerpt") or "").strip() and self._content_excerpt:
+            cleaned["excerpt"] = self._content_excerpt
+        return cleaned
+
+
 # web/forms.py (đoạn RegisterForm đã sửa)
 
 from django import forms
@@ -168,7 +193,7 @@ class GuestCommentForm(forms.Form):
 
 
 # --------- Article create/update form for journalists ----------
-class ArticleCreateForm(forms.ModelForm):
+class ArticleCreateForm(SanitizedContentMixin, forms.ModelForm):
     """
     Form đăng bài thủ công cho nhà báo.
     - Không yêu cầu source_url.
@@ -217,7 +242,7 @@ class ArticleCreateForm(forms.ModelForm):
         content = (self.cleaned_data.get("content_html") or "").strip()
         if len(content) < 3:
             raise forms.ValidationError("Nội dung quá ngắn")
-        return content
+        return self._sanitize_content(content)
 
     def save(self, user, commit=True):
         """
@@ -252,7 +277,7 @@ from django.contrib.auth import get_user_model
 UserModel = get_user_model()
 
 
-class ArticleForm(forms.ModelForm):
+class ArticleForm(SanitizedContentMixin, forms.ModelForm):
     categories = forms.ModelMultipleChoiceField(
         queryset=Category.objects.all(),
         required=False,
@@ -297,7 +322,7 @@ from django import forms
 from articles.models import Article
 from sources.models import Category
 
-class SubmitArticleForm(forms.ModelForm):
+class SubmitArticleForm(SanitizedContentMixin, forms.ModelForm):
     class Meta:
         model = Article
         fields = ["title", "excerpt", "content_html", "main_image_url",
@@ -329,7 +354,7 @@ class SubmitArticleForm(forms.ModelForm):
         self.fields["categories"].label = "Chuyên mục"
         self.fields["is_visible"].label = "Hiển thị"
 
-class ArticleSubmitFormSimple(forms.ModelForm):
+class ArticleSubmitFormSimple(SanitizedContentMixin, forms.ModelForm):
     class Meta:
         model = Article
         fields = ["title", "excerpt", "main_image_url", "content_html", "categories", "is_visible"]
@@ -355,7 +380,7 @@ from articles.models import Article
 
 IMG_SRC_RE = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.I)
 
-class ArticleSubmitForm(forms.ModelForm):
+class ArticleSubmitForm(SanitizedContentMixin, forms.ModelForm):
     class Meta:
         model = Article
         fields = ["title", "excerpt", "main_image_url", "content_html", "categories", "is_visible"]
@@ -398,7 +423,7 @@ class ArticleSubmitForm(forms.ModelForm):
         # (Optional) very light guard so empty posts aren’t allowed
         if not strip_tags(html).strip():
             raise forms.ValidationError("Nội dung không được để trống.")
-        return html
+        return self._sanitize_content(html)
 
     def extract_first_image(self):
         """Return first <img src="..."> in content_html if any."""
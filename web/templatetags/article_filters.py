@@ -1,16 +1,18 @@
 from django import template
-from bs4 import BeautifulSoup
 from django.utils.safestring import mark_safe
 
+from crawler import sanitize
+
 register = template.Library()
 
 @register.filter
 def remove_lead_image(html):
+    """Bỏ ảnh đầu (cả figure chứa nó)."""
     if not html: return html
-    soup = BeautifulSoup(html, 'html.parser')
-    first_img = soup.find('img')
-    if first_img:
-        # nếu ảnh có figcaption kèm: bỏ cả figure
-        fig = first_img.find_parent('figure')
-        (fig or first_img).decompose()
-    return mark_safe(str(soup))
+    cleaned = sanitize.parse(html)
+    img = next(cleaned.root.iter("img"), None)
+    if img is None:
+        return mark_safe(html)
+    fig = next(img.iterancestors("figure"), None)
+    (img if fig is None else fig).drop_tree()
+    return mark_safe(cleaned.html)
@@ -9,9 +9,14 @@ from django.views.generic import DetailView, ListView
 
 # Stdlib / third-party
 import json
+import logging
+import re
 
 # Local apps
+from articles import search
 from articles.models import Article
+from articles.images import attach_card_images
+from articles.textnorm import fold
 from sources.models import Category
 from web.models import Comment, Reaction
 
@@ -154,66 +159,22 @@ def react_article(request):
 
 
 def _qsearch(qs, q):
-    if not q:
-        return qs
-    q = q.strip()
-    # ưu tiên search_blob nếu có
-    if "search_blob" in [f.name for f in Article._meta.get_fields()]:
-        toks = [t for t in q.split() if t]
-        for t in toks:
-            qs = qs.filter(search_blob__icontains=t.lower())
-        return qs
-    return qs.filter(Q(title__icontains=q) | Q(excerpt__icontains=q))
+    # giữ tên cũ: mọi đường tìm kiếm đi qua articles.search
+    return search.search(qs, q)
 
-import unicodedata, re
 
 def normalize_query(q: str) -> str:
-    """Bỏ dấu + lowercase + strip"""
-    if not q:
-        return ""
-    try:
-        q = unicodedata.normalize("NFKD", q)
-        q = q.encode("ascii", "ignore").decode("utf-8")
-    except Exception:
-        pass
-    return re.sub(r"\s+", " ", q).lower().strip()
-
-
-# web/views.py (chỉ paste phần helper + 2 view list)
+    """Bỏ dấu (cả đ) + lowercase + strip"""
+    return re.sub(r"\s+", " ", fold(q)).strip()
 
-from django.db.models import Q
-import unicodedata, logging
-
-def _normalize_no_accent(s: str) -> str:
-    try:
-        return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("utf-8").lower().strip()
-    except Exception:
-        return (s or "").lower().strip()
 
 def search_articles(qs, q: str):
     """
-    Tìm kiếm:
-    - Có search_blob: tách token đã bỏ dấu -> filter search_blob__icontains(token)
-    - Không có search_blob: dùng query gốc (có dấu) -> filter title/excerpt
+    Tìm kiếm toàn văn (articles.search): FTS5 / tsvector, bỏ dấu, xếp theo độ khớp.
     Luôn bắt ngoại lệ để không vỡ trang.
     """
-    if not q:
-        return qs
     try:
-        has_search_blob = any(f.name == "search_blob" for f in Article._meta.get_fields())
-    except Exception:
-        has_search_blob = False
-
-    try:
-        if has_search_blob:
-            nq = _normalize_no_accent(q)
-            toks = [t for t in nq.split() if t]
-            for t in toks:
-                qs = qs.filter(search_blob__icontains=t)
-            return qs
-        else:
-            # Fallback: giữ nguyên dấu để SQLite/Postgres match đúng
-            return qs.filter(Q(title__icontains=q) | Q(excerpt__icontains=q))
+        return search.search(qs, q)
     except Exception as e:
         logging.exception("Search error: %s", e)
         return qs  # không lọc nếu có lỗi
@@ -264,23 +225,32 @@ def _common_filters(qs, request):
     """Áp dụng q / origin / sort giống nhau cho Home & Category."""
     q = (request.GET.get("q") or "").strip()
     origin = (request.GET.get("origin") or "").strip()
-    sort = (request.GET.get("sort") or "new").strip()
+    sort = (request.GET.get("sort") or "").strip()
 
-    if q:
-        qs = qs.filter(
-            Q(title__icontains=q) |
-            Q(excerpt__icontains=q) |
-            Q(search_blob__icontains=q.lower())
-        )
     if origin in {"user", "crawler"}:
         qs = qs.filter(origin=origin)
+    if q:
+        # sort trống = liên quan nhất (bm25 / ts_rank), rồi bài mới hơn
+        qs = search.search(qs, q, order=sort not in {"new", "old"})
 
     if sort == "old":
         qs = qs.order_by("published_at", "id")
-    else:
+    elif sort == "new" or not q:
         qs = qs.order_by("-published_at", "-id")
     return qs
 
+def _collapse_duplicates(qs, request):
+    """Gom cụm tin gần trùng (neardup) thành 1 card: chỉ hiện bài gốc + số bài cùng cụm."""
+    if request.GET.get("q") or request.GET.get("dups") == "1":
+        return qs
+    return (qs.filter(Q(duplicate_of__isnull=True) | Q(duplicate_of__is_visible=False))
+              .annotate(dup_count=Count("duplicates", filter=Q(duplicates__is_visible=True),
+                                        distinct=True)))
+
+# cột lớn card không dùng: không đọc khi liệt kê / sắp theo độ khớp (SQLite giải mã cả dòng cho mỗi bài khớp)
+CARD_DEFER = ("content_html", "blocks", "body_html", "search_blob", "search_body", "minhash")
+
+
 def _common_ctx(ctx):
     """Đưa list categories vào base để render dải chip."""
     ctx["categories"] = Category.objects.order_by("name")
@@ -296,12 +266,15 @@ class HomeView(ListView):
     paginate_by = 18  # 3 cột * 6 hàng
 
     def get_queryset(self):
-        qs = Article.objects.filter(is_visible=True).prefetch_related("categories").select_related("author")
+        qs = (Article.objects.filter(is_visible=True).prefetch_related("categories").select_related("author")
+              .defer(*CARD_DEFER))
         qs = _common_filters(qs, self.request)
-        return qs
+        return _collapse_duplicates(qs, self.request)
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
+        attach_card_images(ctx["page_obj"])
+        search.attach_snippets(ctx["page_obj"], self.request.GET.get("q"))
         return _common_ctx(ctx)
 
 # =========================
@@ -315,13 +288,15 @@ class CategoryView(ListView):
     def get_queryset(self):
         self.category = get_object_or_404(Category, slug=self.kwargs["slug"])
         qs = (Article.objects.filter(is_visible=True, categories=self.category)
-              .prefetch_related("categories").select_related("author"))
+              .prefetch_related("categories").select_related("author").defer(*CARD_DEFER))
         qs = _common_filters(qs, self.request)
         return qs
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["category"] = self.category
+        attach_card_images(ctx["page_obj"])
+        search.attach_snippets(ctx["page_obj"], self.request.GET.get("q"))
         return _common_ctx(ctx)
 
 # =========================
@@ -336,7 +311,9 @@ class ArticleDetailView(DetailView):
     context_object_name = "a"
 
     def get_queryset(self):
-        return Article.objects.filter(is_visible=True).prefetch_related("categories")
+        # thân bài đọc từ biến thể đã render (Article.detail_html); content_html chỉ tải khi bài chưa render
+        return (Article.objects.filter(is_visible=True).prefetch_related("categories")
+                .defer("content_html", "blocks", "minhash", "search_blob"))
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
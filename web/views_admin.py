@@ -2,7 +2,6 @@
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.generic import UpdateView, View
 from django.urls import reverse
@@ -10,8 +9,10 @@ from django.http import HttpResponseBadRequest
 from django.utils.decorators import method_decorator
 from django.core.management import call_command
 
+from articles import search
 from articles.models import Article
 from web.forms import ArticleForm
+from web.views import CARD_DEFER
 from crawler.tasks import schedule_all_sources  # nếu dùng Celery
 
 def is_admin(u):
@@ -26,20 +27,19 @@ class AdminArticleListView(View):
     def get(self, request):
         q = (request.GET.get("q") or "").strip()
         origin = (request.GET.get("origin") or "").strip()  # "user" | "crawler" | ""
-        qs = Article.objects.all().select_related("author").order_by("-published_at", "-id")
-
-        if q:
-            qs = qs.filter(
-                Q(title__icontains=q) |
-                Q(excerpt__icontains=q) |
-                Q(search_blob__icontains=q.lower())
-            )
+        qs = (Article.objects.all().select_related("author").order_by("-published_at", "-id")
+              .defer(*CARD_DEFER))
 
         # Lọc nguồn CHUẨN: model đang dùng "crawler" và "user"
+        # (trước search: cửa sổ xếp hạng tính trên tập đã lọc)
         if origin in {"user", "crawler"}:
             qs = qs.filter(origin=origin)
 
+        if q:
+            qs = search.search(qs, q)   # toàn văn, bỏ dấu, liên quan nhất trước
+
         page_obj = Paginator(qs, 25).get_page(request.GET.get("page"))
+        search.attach_snippets(page_obj, q)
 
         ctx = {
             "page_obj": page_obj,